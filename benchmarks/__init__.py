@@ -0,0 +1,14 @@
+"""
+Mesures de performance de Commandly.
+
+- generator : jeu de données déterministe, de 10 000 à 10 000 000 de lignes ;
+- scenarios : listes, recherches rapides, saisie de commandes et de paiements,
+  tableau de bord, mesurés par measure (p50, p95, requêtes, pic mémoire) ;
+- render : temps de rendu des gabarits des listes.
+
+Tout se lance avec `python -m benchmarks <commande>` (voir benchmarks/__main__.py)
+et les résultats sont écrits en JSON, comparables d'une mesure à l'autre avec
+`python -m benchmarks compare`. Les données sont créées dans une base de test en
+mémoire ou dans le fichier SQLite donné : la base de développement n'est jamais
+modifiée.
+"""
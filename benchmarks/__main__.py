@@ -0,0 +1,183 @@
+"""
+Ligne de commande des mesures :
+
+    python -m benchmarks generate --rows 1M --database /tmp/commandly-1m.sqlite3
+    python -m benchmarks run --rows 10k --output avant.json
+    python -m benchmarks run --database /tmp/commandly-1m.sqlite3 --scenario list search --output apres.json
+    python -m benchmarks compare avant.json apres.json
+    python -m benchmarks render --rows 100
+"""
+import argparse
+import json
+import platform
+import sqlite3
+import sys
+import time
+from datetime import date, datetime
+import django
+from benchmarks import environment
+
+# Les modules de mesure importent les modèles : Django est chargé avant eux
+environment.configure()
+
+from benchmarks import generator, scenarios  # noqa: E402
+from orders.models import Order  # noqa: E402
+
+
+def positive_int(value):
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f'entier strictement positif attendu : {value}')
+    return number
+
+
+def rows_argument(value):
+    try:
+        return generator.parse_rows(value)
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def write_report(report, path):
+    text = json.dumps(report, indent=2, ensure_ascii=False, default=str)
+    if path:
+        with open(path, 'w') as output:
+            output.write(text + '\n')
+    else:
+        sys.stdout.write(text + '\n')
+
+
+def model_counts():
+    from django.apps import apps
+
+    labels = [
+        'products.Category', 'products.Product', 'customers.Customer', 'orders.Order',
+        'orders.OrderItem', 'invoices.Invoice', 'payments.Payment',
+    ]
+    return {label: apps.get_model(label).objects.count() for label in labels}
+
+
+def generate(options):
+    environment.setup(options.database)
+    started = time.perf_counter()
+    counts = generator.generate(
+        options.rows, seed=options.seed, end_date=options.end_date,
+        batch_size=options.batch_size, verbose=True,
+    )
+    write_report({
+        'database': options.database,
+        'scale': generator.Scale(options.rows).as_dict(),
+        'seed': options.seed,
+        'seconds': round(time.perf_counter() - started, 1),
+        'counts': counts,
+    }, None)
+
+
+def run(options):
+    database = environment.setup(options.database)
+    names = scenarios.select(options.scenario)
+    meta = {'database': options.database or 'mémoire', 'seed': options.seed}
+    if not Order.objects.exists():
+        started = time.perf_counter()
+        generator.generate(options.rows, seed=options.seed, end_date=options.end_date, verbose=options.verbose)
+        meta.update({
+            'scale': generator.Scale(options.rows).as_dict(),
+            'generation_seconds': round(time.perf_counter() - started, 1),
+        })
+    meta.update({
+        'counts': model_counts(),
+        'iterations': options.iterations,
+        'caches': 'warm' if options.warm else 'cold',
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'machine': platform.platform(),
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+    })
+    if options.verbose:
+        sys.stderr.write(f'Mesures sur {database} : {", ".join(names)}\n')
+    results = scenarios.run(names, options.iterations, warm=options.warm, seed=options.seed)
+    write_report({'meta': meta, 'scenarios': results}, options.output)
+
+
+def _change(before, after):
+    if not before:
+        return '      -'
+    return f'{(after - before) / before * 100:+6.1f}%'
+
+
+def compare(options):
+    """Écarts de latence et de requêtes, par scénario, entre deux rapports de `run`"""
+    with open(options.before) as before_file, open(options.after) as after_file:
+        before = json.load(before_file)['scenarios']
+        after = json.load(after_file)['scenarios']
+    lines = [f'{"scénario":<24} {"p50 (ms)":>22} {"p95 (ms)":>22} {"requêtes":>10}']
+    for name in [name for name in before if name in after]:
+        a, b = before[name], after[name]
+        lines.append(
+            f'{name:<24} '
+            f'{a["p50_ms"]:>7.2f} → {b["p50_ms"]:>7.2f} {_change(a["p50_ms"], b["p50_ms"])} '
+            f'{a["p95_ms"]:>7.2f} → {b["p95_ms"]:>7.2f} {_change(a["p95_ms"], b["p95_ms"])} '
+            f'{a["queries_p50"]:>4} → {b["queries_p50"]:<3}'
+        )
+    missing = sorted(set(before) ^ set(after))
+    if missing:
+        lines.append(f'Scénarios absents de l\'un des rapports : {", ".join(missing)}')
+    sys.stdout.write('\n'.join(lines) + '\n')
+
+
+def render(options):
+    from benchmarks import render as render_benchmark
+
+    render_benchmark.main(options.arguments)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Mesures de performance de Commandly')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    parser_generate = commands.add_parser('generate', help='génère un jeu de données dans une base SQLite')
+    parser_generate.add_argument('--rows', type=rows_argument, required=True, help='volume total de lignes (10k, 1M…)')
+    parser_generate.add_argument('--database', required=True, help='fichier SQLite (créé et migré au besoin)')
+    parser_generate.add_argument('--batch-size', type=positive_int, default=generator.DEFAULT_BATCH_SIZE)
+    parser_generate.set_defaults(handler=generate)
+
+    parser_run = commands.add_parser('run', help='mesure les scénarios et écrit un rapport JSON')
+    parser_run.add_argument('--rows', type=rows_argument, default=10_000, help='volume généré si la base est vide')
+    parser_run.add_argument('--database', help='fichier SQLite réutilisé (base de test en mémoire par défaut)')
+    parser_run.add_argument('--scenario', nargs='+', help='noms ou groupes (list, search, write, dashboard)')
+    parser_run.add_argument('--iterations', type=positive_int, default=50, help='exécutions mesurées par scénario')
+    parser_run.add_argument('--warm', action='store_true', help='caches conservés entre les exécutions')
+    parser_run.add_argument('--output', help='fichier JSON des résultats (sortie standard par défaut)')
+    parser_run.add_argument('--verbose', action='store_true')
+    parser_run.set_defaults(handler=run)
+
+    for subparser in (parser_generate, parser_run):
+        subparser.add_argument('--seed', type=int, default=generator.DEFAULT_SEED)
+        subparser.add_argument('--end-date', type=date.fromisoformat, help='dernier jour d\'activité (hier par défaut)')
+
+    parser_compare = commands.add_parser('compare', help='compare deux rapports de `run`')
+    parser_compare.add_argument('before')
+    parser_compare.add_argument('after')
+    parser_compare.set_defaults(handler=compare)
+
+    # Arguments transmis tels quels à benchmarks.render
+    parser_render = commands.add_parser('render', help='temps de rendu des gabarits (benchmarks.render)', add_help=False)
+    parser_render.set_defaults(handler=render)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    options, arguments = parser.parse_known_args(argv)
+    if arguments and options.command != 'render':
+        parser.error(f'arguments non reconnus : {" ".join(arguments)}')
+    options.arguments = arguments
+    try:
+        options.handler(options)
+    except ValueError as exc:
+        sys.exit(f'Erreur : {exc}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,36 @@
+"""
+Préparation de Django pour les mesures.
+
+La base de mesure est soit un fichier SQLite donné (créé et migré au besoin,
+réutilisable d'une mesure à l'autre), soit une base de test en mémoire. Dans
+les deux cas, la base de développement (settings.DATABASES) n'est jamais ouverte.
+"""
+import os
+
+
+def configure():
+    """Charge la configuration et les applications, sans ouvrir de connexion"""
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'commandly.settings')
+    import django
+    django.setup()
+
+
+def setup(database=None):
+    """
+    Configure Django sur la base `database` (chemin d'un fichier SQLite) ou, à
+    défaut, sur une base de test en mémoire. Retourne le nom de la base utilisée.
+    """
+    configure()
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    # Client de test (hôte testserver), sans DEBUG ni journal des requêtes
+    setup_test_environment()
+    if database:
+        # Comme pour une base de test : la connexion n'est pas encore ouverte
+        connection.settings_dict['NAME'] = str(database)
+        call_command('migrate', verbosity=0, interactive=False)
+    else:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    return connection.settings_dict['NAME']
@@ -0,0 +1,454 @@
+"""
+Générateur de données de mesure, déterministe.
+
+Catégories, produits, clients, commandes et leurs lignes, factures et paiements
+sont produits à partir d'une graine et d'une date de fin : deux générations avec
+les mêmes paramètres donnent les mêmes lignes. Le volume est donné en nombre
+total de lignes (de 10 000 à 10 000 000) et réparti selon les proportions
+d'une activité courante (ROWS_PER_ORDER lignes par commande en moyenne).
+
+Les lignes sont écrites par lots avec bulk_create et des identifiants fixés,
+dans une base vide. Les données dérivées que les signaux maintiennent d'habitude
+sont calculées au fil de l'eau ou reconstruites à la fin : totaux des commandes,
+soldes des factures, réservations et journal de stock, compteurs de
+numérotation, agrégats des clients, index de recherche et métriques du tableau
+de bord.
+
+    python -m benchmarks generate --rows 1M --database /tmp/commandly-1m.sqlite3
+"""
+import random
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from datetime import time as day_time
+from decimal import Decimal
+from django.db import connection, transaction
+from django.utils import timezone
+from customers.models import Customer
+from customers.services import lifetime
+from dashboard.services.metrics import build_metrics
+from invoices.models import Invoice
+from orders.models import Order, OrderItem
+from orders.services.totals import ZERO, line_amounts, quantize
+from payments.models import Payment
+from products.models import Category, Product, stock_level_expression
+from search.services import INDEXES, rebuild_index
+from sequences.models import DocumentSequence
+from sequences.services import format_number
+from stock.models import StockMovement, StockReservation
+
+
+DEFAULT_SEED = 42
+DEFAULT_BATCH_SIZE = 5000
+# Jours d'historique avant la date de fin
+HISTORY_DAYS = 730
+# Lignes écrites par commande en moyenne : la commande, ses lignes, sa facture,
+# ses paiements, plus les clients et les produits
+ROWS_PER_ORDER = 5
+
+MIN_ROWS = 1000
+MAX_ROWS = 10_000_000
+
+# Répartition des statuts de commande (en millièmes)
+ORDER_STATUS_WEIGHTS = {
+    'draft': 40,
+    'confirmed': 50,
+    'in_progress': 30,
+    'ready': 20,
+    'delivered': 700,
+    'cancelled': 60,
+    'closed': 100,
+}
+HOLDING_STATUSES = ('confirmed', 'in_progress', 'ready')
+INVOICED_STATUSES = ('delivered', 'closed')
+PAYMENT_METHODS = ('cash', 'mobile_money', 'mobile_money', 'bank_transfer', 'check', 'card')
+
+FIRST_NAMES = (
+    'Aminata', 'Moussa', 'Fatou', 'Ibrahima', 'Awa', 'Cheikh', 'Mariama', 'Ousmane', 'Aïssatou', 'Mamadou',
+    'Khady', 'Abdoulaye', 'Ndeye', 'Pape', 'Coumba', 'Babacar', 'Sokhna', 'Modou', 'Astou', 'Lamine',
+    'Marie', 'Jean', 'Claire', 'Pierre', 'Sophie', 'Louis', 'Camille', 'Thomas', 'Julie', 'Nicolas',
+)
+LAST_NAMES = (
+    'Diop', 'Ndiaye', 'Fall', 'Sow', 'Diallo', 'Ba', 'Sarr', 'Faye', 'Gueye', 'Mbaye',
+    'Cissé', 'Seck', 'Kane', 'Thiam', 'Niang', 'Camara', 'Touré', 'Diouf', 'Sy', 'Wade',
+    'Martin', 'Bernard', 'Dubois', 'Durand', 'Lefebvre', 'Moreau', 'Laurent', 'Simon', 'Michel', 'Garcia',
+)
+COMPANY_WORDS = (
+    'Sahel', 'Téranga', 'Baobab', 'Atlantique', 'Horizon', 'Cap-Vert', 'Sénégal', 'Kora', 'Soleil', 'Delta',
+    'Union', 'Avenir', 'Progrès', 'Étoile', 'Lumière', 'Savane', 'Océan', 'Jappo', 'Yaatal', 'Dunes',
+)
+COMPANY_KINDS = ('SARL', 'SA', 'SUARL', 'GIE', 'Services', 'Distribution', 'Négoce', 'Industries')
+CITIES = (
+    ('Dakar', '10000'), ('Thiès', '21000'), ('Saint-Louis', '32000'), ('Kaolack', '23000'),
+    ('Ziguinchor', '27000'), ('Touba', '22000'), ('Mbour', '23000'), ('Rufisque', '20000'),
+)
+STREETS = ('Avenue Cheikh Anta Diop', 'Rue Carnot', 'Boulevard de la République', 'Route de Ouakam', 'Rue Félix Faure')
+CATEGORY_WORDS = (
+    'Informatique', 'Bureautique', 'Mobilier', 'Électroménager', 'Téléphonie', 'Alimentation', 'Boissons',
+    'Entretien', 'Quincaillerie', 'Papeterie', 'Textile', 'Cosmétique', 'Électricité', 'Plomberie', 'Jardin',
+)
+PRODUCT_NOUNS = (
+    'Ordinateur', 'Écran', 'Clavier', 'Souris', 'Imprimante', 'Chaise', 'Bureau', 'Armoire', 'Téléphone',
+    'Câble', 'Lampe', 'Ventilateur', 'Climatiseur', 'Cartouche', 'Ramette', 'Classeur', 'Stylo', 'Sac', 'Riz',
+    'Huile', 'Savon', 'Détergent', 'Perceuse', 'Tournevis', 'Ampoule', 'Tuyau', 'Robinet', 'Tondeuse',
+)
+PRODUCT_QUALIFIERS = ('Pro', 'Plus', 'Eco', 'Max', 'Mini', 'Premium', 'Standard', 'Confort', 'Duo', 'Lite')
+SERVICE_NAMES = ('Installation', 'Maintenance', 'Livraison', 'Formation', 'Dépannage', 'Audit', 'Support')
+TAX_RATES = (Decimal('18.00'), Decimal('18.00'), Decimal('18.00'), Decimal('10.00'), Decimal('0.00'))
+
+_SCALE_SUFFIXES = {'k': 1_000, 'm': 1_000_000}
+
+
+def parse_rows(value):
+    """Volume de lignes : entier, éventuellement suffixé par k ou M (10k, 2.5M)"""
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*', str(value))
+    if not match:
+        raise ValueError(f'Volume invalide : {value}')
+    number, suffix = match.groups()
+    rows = int(Decimal(number) * _SCALE_SUFFIXES.get(suffix.lower(), 1))
+    if not MIN_ROWS <= rows <= MAX_ROWS:
+        raise ValueError(f'Le volume doit être compris entre {MIN_ROWS} et {MAX_ROWS} lignes : {value}')
+    return rows
+
+
+def _clamp(value, low, high):
+    return max(low, min(high, value))
+
+
+class Scale:
+    """Nombre d'objets de chaque modèle pour un volume total de lignes"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.orders = max(1, rows // ROWS_PER_ORDER)
+        self.categories = _clamp(self.orders // 5000, 10, 200)
+        self.products = _clamp(self.orders // 50, 100, 100_000)
+        self.customers = _clamp(self.orders // 10, 100, 1_000_000)
+
+    def as_dict(self):
+        return {
+            'rows': self.rows,
+            'categories': self.categories,
+            'products': self.products,
+            'customers': self.customers,
+            'orders': self.orders,
+        }
+
+
+class Generator:
+    """
+    Génération d'un jeu de données complet dans la base par défaut, qui doit
+    être vide de clients, de produits et de commandes
+    """
+
+    def __init__(self, rows, seed=DEFAULT_SEED, end_date=None, batch_size=DEFAULT_BATCH_SIZE, verbose=False):
+        self.scale = Scale(rows)
+        self.seed = seed
+        self.end_date = end_date or timezone.localdate() - timedelta(days=1)
+        self.batch_size = batch_size
+        self.verbose = verbose
+        self.random = random.Random(seed)
+        self.counts = Counter()
+        # Numéros attribués par (préfixe, jour)
+        self.sequences = Counter()
+        # Produits : (id, type, prix, TVA) ; quantités réservées et vendues
+        self.products = []
+        self.reserved = defaultdict(int)
+        self.sold = defaultdict(int)
+
+    def log(self, message):
+        if self.verbose:
+            sys.stderr.write(message + '\n')
+
+    def check_empty(self):
+        for model in (Category, Product, Customer, Order):
+            if model.objects.exists():
+                raise ValueError(f'La base contient déjà des {model._meta.verbose_name_plural.lower()} : base vide requise.')
+
+    def run(self):
+        """Génère toutes les données ; retourne le nombre de lignes écrites par modèle"""
+        self.check_empty()
+        started = time.perf_counter()
+        if connection.vendor == 'sqlite' and not connection.in_atomic_block:
+            with connection.cursor() as cursor:
+                # Écritures en masse : pas de synchronisation disque à chaque validation
+                # (réglage impossible dans une transaction déjà ouverte)
+                cursor.execute('PRAGMA synchronous = OFF')
+        with transaction.atomic():
+            self.create_categories()
+            self.create_products()
+        self.create_customers()
+        self.create_orders()
+        with transaction.atomic():
+            self.update_stock()
+            self.create_sequences()
+        self.rebuild_derived()
+        self.log(f'Génération terminée en {time.perf_counter() - started:.1f} s')
+        return dict(self.counts)
+
+    # Numérotation et dates
+
+    def number(self, prefix, day):
+        self.sequences[prefix, day] += 1
+        return format_number(prefix, day, self.sequences[prefix, day])
+
+    def moment(self, day):
+        seconds = self.random.randrange(8 * 3600, 19 * 3600)
+        return timezone.make_aware(datetime.combine(day, day_time(seconds // 3600, seconds // 60 % 60, seconds % 60)))
+
+    def later(self, day, max_days):
+        """Jour compris entre `day` et `day + max_days`, sans dépasser la date de fin"""
+        return min(self.end_date, day + timedelta(days=self.random.randint(0, max_days)))
+
+    def bulk(self, model, objects):
+        model.objects.bulk_create(objects, batch_size=self.batch_size)
+        self.counts[model._meta.label] += len(objects)
+
+    # Catalogue et clients
+
+    def create_categories(self):
+        self.bulk(Category, [
+            Category(
+                id=i,
+                name=f'{CATEGORY_WORDS[(i - 1) % len(CATEGORY_WORDS)]} {i}',
+                slug=f'categorie-{i}',
+                is_active=i % 20 != 0,
+            )
+            for i in range(1, self.scale.categories + 1)
+        ])
+
+    def create_products(self):
+        rng = self.random
+        products = []
+        for i in range(1, self.scale.products + 1):
+            service = rng.random() < 0.1
+            if service:
+                name = f'{rng.choice(SERVICE_NAMES)} {rng.choice(PRODUCT_QUALIFIERS)} {i}'
+            else:
+                name = f'{rng.choice(PRODUCT_NOUNS)} {rng.choice(PRODUCT_QUALIFIERS)} {i}'
+            unit_price = Decimal(rng.randrange(500, 500_000, 50))
+            tax_rate = rng.choice(TAX_RATES)
+            product_type = 'service' if service else 'product'
+            products.append(Product(
+                id=i,
+                name=name,
+                category_id=rng.randint(1, self.scale.categories),
+                product_type=product_type,
+                unit_price=unit_price,
+                tax_rate=tax_rate,
+                min_stock_level=0 if service else rng.choice((5, 10, 20)),
+                sku=f'SKU-{i:07d}',
+                is_active=rng.random() > 0.03,
+            ))
+            self.products.append((i, product_type, unit_price, tax_rate))
+        # Stock écrit par update_stock(), une fois les réservations connues
+        self.bulk(Product, products)
+
+    def create_customers(self):
+        rng = self.random
+        for start in range(1, self.scale.customers + 1, self.batch_size):
+            customers = []
+            for i in range(start, min(start + self.batch_size, self.scale.customers + 1)):
+                company = rng.random() < 0.35
+                city, postal_code = rng.choice(CITIES)
+                customers.append(Customer(
+                    id=i,
+                    customer_type='company' if company else 'individual',
+                    first_name=rng.choice(FIRST_NAMES),
+                    last_name=rng.choice(LAST_NAMES),
+                    company_name=f'{rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_KINDS)} {i}' if company else None,
+                    email=f'client{i}@example.com',
+                    phone=f'+2217{rng.randrange(10 ** 8):08d}',
+                    address_line1=f'{rng.randint(1, 250)} {rng.choice(STREETS)}',
+                    city=city,
+                    postal_code=postal_code,
+                    country='Sénégal',
+                    is_active=rng.random() > 0.05,
+                    slug=f'client-{i}',
+                ))
+            with transaction.atomic():
+                self.bulk(Customer, customers)
+        self.log(f'{self.scale.customers} clients')
+
+    # Commandes, factures et paiements
+
+    def create_orders(self):
+        statuses = list(ORDER_STATUS_WEIGHTS)
+        weights = list(ORDER_STATUS_WEIGHTS.values())
+        ids = {'item': 0, 'invoice': 0, 'payment': 0}
+        for start in range(1, self.scale.orders + 1, self.batch_size):
+            stop = min(start + self.batch_size, self.scale.orders + 1)
+            batch = {'orders': [], 'items': [], 'invoices': [], 'payments': [], 'reservations': []}
+            for order_id in range(start, stop):
+                self.build_order(order_id, self.random.choices(statuses, weights)[0], ids, batch)
+            with transaction.atomic():
+                self.write_orders(batch)
+            self.log(f'{stop - 1}/{self.scale.orders} commandes')
+
+    def build_order(self, order_id, status, ids, batch):
+        """Commande et ses lignes ; réservations d'une commande en cours, facture d'une commande livrée"""
+        rng = self.random
+        day = self.end_date - timedelta(days=int(rng.triangular(0, HISTORY_DAYS, 0)))
+        order_date = self.moment(day)
+        customer_id = rng.randint(1, self.scale.customers)
+
+        subtotal = tax = ZERO
+        quantities = defaultdict(int)
+        for product_id, product_type, unit_price, tax_rate in rng.sample(self.products, rng.randint(1, 4)):
+            quantity = rng.choice((1, 1, 1, 2, 2, 3, 5, 10))
+            line_ht, line_tax = line_amounts(unit_price, quantity, tax_rate)
+            subtotal += line_ht
+            tax += line_tax
+            ids['item'] += 1
+            batch['items'].append(OrderItem(
+                id=ids['item'], order_id=order_id, product_id=product_id,
+                quantity=quantity, unit_price=unit_price, tax_rate=tax_rate,
+            ))
+            if product_type == 'product':
+                quantities[product_id] += quantity
+
+        delivered_date = self.later(day, 10) if status in INVOICED_STATUSES else None
+        order = Order(
+            id=order_id,
+            order_number=self.number('CMD', day),
+            customer_id=customer_id,
+            status=status,
+            order_date=order_date,
+            delivered_date=delivered_date,
+            subtotal_ht=subtotal,
+            tax_amount=tax,
+            total_amount=subtotal + tax,
+        )
+        batch['orders'].append(order)
+
+        if status in HOLDING_STATUSES:
+            for product_id, quantity in quantities.items():
+                self.reserved[product_id] += quantity
+                batch['reservations'].append(StockReservation(
+                    order_id=order_id, product_id=product_id, quantity=quantity, status='reserved',
+                ))
+        elif status in INVOICED_STATUSES:
+            for product_id, quantity in quantities.items():
+                self.sold[product_id] += quantity
+            self.build_invoice(order, ids, batch)
+
+    def build_invoice(self, order, ids, batch):
+        """Facture d'une commande livrée et ses paiements, statut déduit du solde et de l'échéance"""
+        rng = self.random
+        invoice_date = order.delivered_date
+        due_date = invoice_date + timedelta(days=30)
+        ids['invoice'] += 1
+        invoice_id = ids['invoice']
+
+        # Payée entièrement (en un ou deux versements), en partie ou pas encore
+        outcome = rng.random()
+        if outcome < 0.65:
+            amounts = [order.total_amount]
+            if rng.random() < 0.15 and order.total_amount >= 2:
+                first = quantize(order.total_amount * Decimal(rng.randint(20, 80)) / 100)
+                amounts = [first, order.total_amount - first]
+        elif outcome < 0.8 and order.total_amount >= 2:
+            amounts = [quantize(order.total_amount * Decimal(rng.randint(10, 90)) / 100)]
+        else:
+            amounts = []
+
+        paid = ZERO
+        payment_date = invoice_date
+        for amount in amounts:
+            payment_date = self.later(payment_date, 40)
+            ids['payment'] += 1
+            batch['payments'].append(Payment(
+                id=ids['payment'],
+                payment_number=self.number('PAY', payment_date),
+                invoice_id=invoice_id,
+                customer_id=order.customer_id,
+                amount=amount,
+                payment_method=rng.choice(PAYMENT_METHODS),
+                status='completed',
+                payment_date=payment_date,
+                processed_date=self.moment(payment_date),
+            ))
+            paid += amount
+
+        remaining = order.total_amount - paid
+        if not remaining:
+            status = 'paid'
+        elif due_date < self.end_date:
+            status = 'overdue'
+        else:
+            status = 'partially_paid' if paid else 'pending'
+        batch['invoices'].append(Invoice(
+            id=invoice_id,
+            invoice_number=self.number('FAC', invoice_date),
+            order_id=order.pk,
+            customer_id=order.customer_id,
+            status=status,
+            invoice_date=invoice_date,
+            due_date=due_date,
+            paid_date=payment_date if status == 'paid' else None,
+            subtotal_ht=order.subtotal_ht,
+            tax_amount=order.tax_amount,
+            total_amount=order.total_amount,
+            paid_amount=paid,
+            remaining_amount=remaining,
+        ))
+
+    def write_orders(self, batch):
+        self.bulk(Order, batch['orders'])
+        self.bulk(OrderItem, batch['items'])
+        self.bulk(StockReservation, batch['reservations'])
+        self.bulk(Invoice, batch['invoices'])
+        self.bulk(Payment, batch['payments'])
+
+    # Stock, numérotation et données dérivées
+
+    def update_stock(self):
+        """
+        Stock des produits physiques : disponible tiré au hasard (dont ruptures et
+        stocks faibles), réservé par les commandes en cours. Le journal reçoit une
+        entrée initiale et une sortie cumulée des ventes par produit.
+        """
+        rng = self.random
+        products, movements = [], []
+        for product_id, product_type, _, _ in self.products:
+            if product_type == 'service':
+                continue
+            draw = rng.random()
+            available = 0 if draw < 0.05 else rng.randint(1, 15) if draw < 0.15 else rng.randint(20, 1000)
+            reserved = self.reserved.get(product_id, 0)
+            sold = self.sold.get(product_id, 0)
+            product = Product(id=product_id, stock_quantity=available, reserved_quantity=reserved)
+            products.append(product)
+            movements.append(StockMovement(
+                product_id=product_id, kind='receipt', quantity=available + reserved + sold, note='Stock initial',
+            ))
+            if sold:
+                movements.append(StockMovement(product_id=product_id, kind='sale', quantity=-sold, note='Ventes'))
+        Product.objects.bulk_update(products, ['stock_quantity', 'reserved_quantity'], batch_size=self.batch_size)
+        self.bulk(StockMovement, movements)
+
+        # Niveau de stock calculé par la base, comme après un mouvement
+        Product.objects.update(stock_level=stock_level_expression())
+
+    def create_sequences(self):
+        self.bulk(DocumentSequence, [
+            DocumentSequence(prefix=prefix, day=day, last_value=last_value)
+            for (prefix, day), last_value in sorted(self.sequences.items())
+        ])
+
+    def rebuild_derived(self):
+        started = time.perf_counter()
+        self.counts['customers.CustomerStats'] = lifetime.rebuild()
+        for name in INDEXES:
+            with transaction.atomic():
+                rebuild_index(name)
+        build_metrics(full=True)
+        self.log(f'Agrégats, index et métriques reconstruits en {time.perf_counter() - started:.1f} s')
+
+
+def generate(rows, seed=DEFAULT_SEED, end_date=None, batch_size=DEFAULT_BATCH_SIZE, verbose=False):
+    """Point d'entrée de la génération ; retourne le nombre de lignes écrites par modèle"""
+    return Generator(rows, seed=seed, end_date=end_date, batch_size=batch_size, verbose=verbose).run()
+
@@ -0,0 +1,81 @@
+"""
+Mesures d'une action répétée : latence (p50, p95), requêtes SQL et pic mémoire.
+
+Les durées sont prises sans ramasse-miettes (comme timeit) ; les requêtes sont
+comptées sans les points de sauvegarde des transactions ; le pic mémoire
+(tracemalloc, qui ralentit l'exécution) est relevé à part, sur une exécution de
+plus, pour ne pas fausser les durées.
+"""
+import gc
+import statistics
+import time
+import tracemalloc
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from commandly.testing import TRANSACTION_STATEMENTS
+
+
+def percentile(values, percent):
+    """Centile par rang (valeurs triées)"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(percent / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(durations):
+    milliseconds = [duration * 1000 for duration in durations]
+    return {
+        'p50_ms': round(percentile(milliseconds, 50), 3),
+        'p95_ms': round(percentile(milliseconds, 95), 3),
+        'mean_ms': round(statistics.fmean(milliseconds), 3),
+        'min_ms': round(min(milliseconds), 3),
+    }
+
+
+def count_queries(queries):
+    return sum(1 for query in queries.captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS))
+
+
+def peak_memory(action):
+    """Pic d'allocation (octets) pendant une exécution de l'action"""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        action()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(action, iterations, prepare=None):
+    """
+    Exécute `action` une fois pour rien (caches de gabarits, connexion), puis
+    `iterations` fois en mesurant chaque exécution. `prepare`, appelée avant
+    chaque exécution hors mesure, remet l'état voulu (caches vidés, par exemple).
+    """
+    prepare = prepare or (lambda: None)
+    prepare()
+    action()
+
+    durations, queries = [], []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            prepare()
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                action()
+                durations.append(time.perf_counter() - start)
+            queries.append(count_queries(captured))
+    finally:
+        gc.enable()
+
+    prepare()
+    return {
+        **summarize(durations),
+        'queries_p50': percentile(queries, 50),
+        'queries_max': max(queries),
+        'peak_memory_kb': round(peak_memory(action) / 1024, 1),
+    }
@@ -0,0 +1,199 @@
+"""
+Temps de rendu des gabarits des pages de liste.
+
+Chaque page est rendue avec 100 lignes (par défaut) et le contexte de sa vue,
+lu une fois en base : seules les mesures du rendu sont répétées (les listes de
+choix des formulaires de filtre restent relues à chaque rendu). Deux moteurs
+sont comparés, tous deux avec les chargeurs par défaut de Django (cached.Loader
+autour des chargeurs du projet et des applications) :
+
+- baseline : gabarits d'avant les badges précompilés, reconstitués au chargement (composant de badge inclus par ligne, chaînes de
+  {% if %} pour les couleurs, menu et pied de page sans {% cache %}) ;
+- current : configuration de settings.TEMPLATES et gabarits actuels.
+
+    python -m benchmarks render --rows 100 --iterations 200 --output render.json
+"""
+import argparse
+import gc
+import json
+import re
+import sys
+import time
+from pathlib import Path
+from benchmarks import environment
+from benchmarks.measure import summarize
+
+
+PAGES = {
+    'products': 'products.views.product.ProductListView',
+    'categories': 'products.views.product.CategoryListView',
+    'customers': 'customers.views.customer.CustomerListView',
+    'orders': 'orders.views.order.OrderListView',
+    'invoices': 'invoices.views.invoice.InvoiceListView',
+    'payments': 'payments.views.payment.PaymentListView',
+}
+
+BASELINE_TEMPLATES = Path(__file__).resolve().parent / 'templates'
+BASELINE_BADGE = 'benchmarks/baseline/status_badge.html'
+
+_STATUS_BADGE = re.compile(r"\{%\s*status_badge\s+(\S+)\s+'(\w+)'(?:\s+\S+)?\s*%\}")
+_STATUS_COLOR = re.compile(r"\{\{\s*([\w.]+)\|status_color:'(\w+)'\s*\}\}")
+_CACHE_TAGS = re.compile(r"\{%\s*(?:cache\s[^%]*|endcache\s*)%\}")
+
+
+def _color_chain(variable, kind):
+    from commandly.badges import BADGES, DEFAULT_STYLE
+
+    branches = ''.join(
+        f"{{% {'if' if index == 0 else 'elif'} {variable} == '{status}' %}}{color}"
+        for index, (status, (color, *_)) in enumerate(BADGES[kind].items())
+    )
+    return f'{branches}{{% else %}}{DEFAULT_STYLE[0]}{{% endif %}}'
+
+
+def to_baseline(source):
+    """Source d'un gabarit telle qu'avant les badges précompilés et les fragments en cache"""
+    source = _STATUS_BADGE.sub(
+        lambda match: f"{{% include '{BASELINE_BADGE}' with status={match[1]} type='{match[2]}' %}}", source,
+    )
+    source = _STATUS_COLOR.sub(lambda match: _color_chain(match[1], match[2]), source)
+    return _CACHE_TAGS.sub('', source)
+
+
+class BaselineMixin:
+    def get_contents(self, origin):
+        return to_baseline(super().get_contents(origin))
+
+
+def _baseline_loaders():
+    from django.template.loaders import app_directories, filesystem
+
+    # Classes créées à la demande : Django doit être configuré avant leur import
+    global BaselineFilesystemLoader, BaselineAppDirectoriesLoader
+    BaselineFilesystemLoader = type('BaselineFilesystemLoader', (BaselineMixin, filesystem.Loader), {})
+    BaselineAppDirectoriesLoader = type('BaselineAppDirectoriesLoader', (BaselineMixin, app_directories.Loader), {})
+    # Chargeurs par défaut de Django (cached.Loader autour des deux autres), sources réécrites
+    return [
+        ('django.template.loaders.cached.Loader', [
+            f'{__name__}.BaselineFilesystemLoader',
+            f'{__name__}.BaselineAppDirectoriesLoader',
+        ]),
+    ]
+
+
+def template_engines():
+    """Moteur de référence et moteur configuré par settings.TEMPLATES"""
+    from django.conf import settings
+    from django.template.backends.django import DjangoTemplates
+
+    config = settings.TEMPLATES[0]
+    options = {key: value for key, value in config.get('OPTIONS', {}).items() if key != 'loaders'}
+    return {
+        'baseline': DjangoTemplates({
+            'NAME': 'baseline',
+            'DIRS': [BASELINE_TEMPLATES, *config.get('DIRS', [])],
+            'APP_DIRS': False,
+            'OPTIONS': {**options, 'loaders': _baseline_loaders()},
+        }),
+        'current': DjangoTemplates({
+            'NAME': 'current',
+            'DIRS': config.get('DIRS', []),
+            'APP_DIRS': config.get('APP_DIRS', False),
+            'OPTIONS': config.get('OPTIONS', {}),
+        }),
+    }
+
+
+def build_request(user):
+    from django.contrib.messages.storage import default_storage
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.test import RequestFactory
+
+    request = RequestFactory().get('/')
+    request.user = user
+    request.session = SessionStore()
+    request._messages = default_storage(request)
+    return request
+
+
+def page_context(view_path, request, rows):
+    """Gabarit et contexte de la première page d'une vue de liste, de `rows` lignes"""
+    from django.utils.module_loading import import_string
+    from commandly.viewcache import CachedViewMixin
+
+    view = import_string(view_path)(paginate_by=rows)
+    view.setup(request)
+    # Le cache des pages est contourné : la vue produit son contexte à chaque appel
+    get = super(CachedViewMixin, view).get if isinstance(view, CachedViewMixin) else view.get
+    response = get(request)
+    names = response.template_name
+    return names if isinstance(names, str) else names[0], response.context_data
+
+
+def measure(engines, template_name, context, request, iterations):
+    """
+    Durées de rendu d'une page par moteur ; les moteurs sont alternés à chaque
+    itération pour que les variations de charge de la machine touchent chacun
+    """
+    from django.db import connection, reset_queries
+    from django.test.utils import CaptureQueriesContext
+
+    reset_queries()
+    # Premier rendu : lecture des lignes et des objets liés, compilation des gabarits
+    for engine in engines.values():
+        engine.get_template(template_name).render(context, request)
+    durations = {name: [] for name in engines}
+    # Comme timeit : pas de ramasse-miettes pendant les mesures
+    gc.collect()
+    gc.disable()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            for _ in range(iterations):
+                for name, engine in engines.items():
+                    start = time.perf_counter()
+                    engine.get_template(template_name).render(context, request)
+                    durations[name].append(time.perf_counter() - start)
+    finally:
+        gc.enable()
+    return {
+        name: {**summarize(values), 'queries': len(queries.captured_queries)}
+        for name, values in durations.items()
+    }
+
+
+def run(rows, iterations):
+    from django.core.cache import caches
+    from commandly.testing import build_sample_data
+    from users.models import CustomUser
+
+    user = CustomUser.objects.create_user(username='benchmark', password='benchmark', role='admin')
+    build_sample_data(rows)
+    caches['default'].clear()
+
+    engines = template_engines()
+    results = {}
+    for page, view_path in PAGES.items():
+        request = build_request(user)
+        template_name, context = page_context(view_path, request, rows)
+        results[page] = measure(engines, template_name, context, request, iterations)
+    return {'rows': rows, 'iterations': iterations, 'pages': results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100, help='lignes par page')
+    parser.add_argument('--iterations', type=int, default=200, help='rendus mesurés par page et par moteur')
+    parser.add_argument('--output', help='fichier JSON des résultats (sortie standard par défaut)')
+    options = parser.parse_args(argv)
+
+    environment.setup()
+    report = json.dumps(run(options.rows, options.iterations), indent=2)
+    if options.output:
+        with open(options.output, 'w') as output:
+            output.write(report + '\n')
+    else:
+        sys.stdout.write(report + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,282 @@
+"""
+Scénarios de mesure : les chemins les plus fréquents de chaque application,
+parcourus par le client de test de Django (middlewares, vues, gabarits et base),
+connecté en administrateur.
+
+- listes : première page de chaque liste, dernière page des commandes (OFFSET
+  le plus profond) et produits en stock faible ;
+- recherches rapides : clients, produits et commandes, termes tirés des
+  mêmes vocabulaires que le générateur ;
+- saisie d'une commande : création, deux lignes, confirmation (réservation du stock) ;
+- enregistrement d'un paiement sur une facture ouverte ;
+- tableau de bord et statistiques.
+
+Par défaut, tous les caches sont vidés avant chaque exécution (mesure à froid) ;
+à chaud, ils sont conservés. Les scénarios d'écriture ajoutent des commandes et
+des paiements à la base : une base réutilisée dérive légèrement d'une mesure à l'autre.
+"""
+import random
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import caches
+from django.test import Client
+from django.urls import resolve, reverse
+from django.utils import timezone
+from benchmarks import generator
+from benchmarks.measure import measure
+from customers.models import Customer
+from invoices.models import Invoice
+from orders.models import Order
+from products.models import Product
+from users.models import CustomUser
+
+
+BENCHMARK_USERNAME = 'benchmark'
+# Clients, produits, factures (et termes de recherche) retenus par scénario
+WRITE_POOL_SIZE = 50
+PAYMENT_AMOUNT = Decimal('1.00')
+
+
+class ScenarioError(Exception):
+    """Réponse inattendue d'une vue pendant un scénario"""
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def benchmark_client():
+    """Client de test connecté avec l'administrateur des mesures (créé au besoin)"""
+    user = CustomUser.objects.filter(username=BENCHMARK_USERNAME).first()
+    if user is None:
+        user = CustomUser.objects.create_user(username=BENCHMARK_USERNAME, password=BENCHMARK_USERNAME, role='admin')
+    client = Client()
+    client.force_login(user)
+    return client
+
+
+class Scenario:
+    """Action mesurée ; setup() prépare une fois ses données, run() est répétée"""
+    group = ''
+
+    def __init__(self, client, rng):
+        self.client = client
+        self.random = rng
+
+    def setup(self):
+        pass
+
+    def run(self):
+        raise NotImplementedError
+
+    def check(self, response, expected=200):
+        if response.status_code != expected:
+            raise ScenarioError(
+                f'{type(self).__name__} : {response.request["PATH_INFO"]} a répondu {response.status_code} '
+                f'au lieu de {expected}'
+            )
+        return response
+
+
+class Page(Scenario):
+    group = 'list'
+    url_name = ''
+    query = ''
+
+    def run(self):
+        self.check(self.client.get(reverse(self.url_name) + self.query))
+
+
+class ProductList(Page):
+    url_name = 'products:product_list'
+
+
+class CategoryList(Page):
+    url_name = 'products:category_list'
+
+
+class LowStockProducts(Page):
+    url_name = 'products:product_low_stock'
+
+
+class CustomerList(Page):
+    url_name = 'customers:customer_list'
+
+
+class OrderList(Page):
+    url_name = 'orders:order_list'
+
+
+class OrderListLastPage(Page):
+    """Page la plus profonde de la pagination par numéro (OFFSET)"""
+    url_name = 'orders:order_list'
+    query = '?page=last'
+
+
+class InvoiceList(Page):
+    url_name = 'invoices:invoice_list'
+
+
+class PaymentList(Page):
+    url_name = 'payments:payment_list'
+
+
+class Dashboard(Page):
+    group = 'dashboard'
+    url_name = 'dashboard:home'
+
+
+class DashboardStats(Page):
+    group = 'dashboard'
+    url_name = 'dashboard:stats'
+
+
+class QuickSearch(Scenario):
+    """Recherche rapide ; les termes sont pris à tour de rôle"""
+    group = 'search'
+    url_name = ''
+
+    def setup(self):
+        self.terms = self.get_terms()
+        self.position = 0
+
+    def get_terms(self):
+        raise NotImplementedError
+
+    def run(self):
+        term = self.terms[self.position % len(self.terms)]
+        self.position += 1
+        self.check(self.client.get(reverse(self.url_name), {'q': term}))
+
+
+class CustomerSearch(QuickSearch):
+    url_name = 'customers:customer_quick_search'
+
+    def get_terms(self):
+        return [*generator.LAST_NAMES, *generator.COMPANY_WORDS]
+
+
+class ProductSearch(QuickSearch):
+    url_name = 'products:product_quick_search'
+
+    def get_terms(self):
+        return [*generator.PRODUCT_NOUNS, *generator.SERVICE_NAMES]
+
+
+class OrderSearch(QuickSearch):
+    url_name = 'orders:order_quick_search'
+
+    def get_terms(self):
+        # Numéros des dernières commandes, complets ou réduits au préfixe de leur jour
+        numbers = list(Order.objects.order_by('-order_date', '-id').values_list('order_number', flat=True)[:WRITE_POOL_SIZE])
+        prefixes = dict.fromkeys(number[:len('CMD') + 8] for number in numbers)
+        return [*prefixes, *numbers] or ['CMD']
+
+
+class OrderEntry(Scenario):
+    """Création d'une commande, ajout de deux lignes et confirmation"""
+    group = 'write'
+
+    def setup(self):
+        self.customers = list(
+            Customer.objects.filter(is_active=True).order_by('pk').values_list('pk', flat=True)[:WRITE_POOL_SIZE]
+        )
+        self.products = list(
+            Product.objects.filter(is_active=True, product_type='product', stock_quantity__gte=20)
+            .order_by('pk').values('pk', 'unit_price', 'tax_rate')[:WRITE_POOL_SIZE]
+        )
+        if not self.customers or len(self.products) < 2:
+            raise ScenarioError('Saisie de commande : clients actifs ou produits en stock manquants.')
+
+    def run(self):
+        response = self.check(self.client.post(reverse('orders:order_create'), {
+            'customer': self.random.choice(self.customers),
+            'status': 'draft',
+            'notes': '',
+        }), 302)
+        order_id = resolve(response.url).kwargs['pk']
+        for product in self.random.sample(self.products, 2):
+            self.check(self.client.post(reverse('orders:order_item_create', args=[order_id]), {
+                'product': product['pk'],
+                'quantity': 1,
+                'unit_price': product['unit_price'],
+                'tax_rate': product['tax_rate'],
+                'notes': '',
+            }), 302)
+        url = reverse('orders:order_status_update', args=[order_id])
+        response = self.check(self.client.post(url, {'status': 'confirmed'}))
+        if not response.json()['success']:
+            raise ScenarioError(f'Confirmation de la commande {order_id} : {response.json()["message"]}')
+
+
+class PaymentEntry(Scenario):
+    """Paiement partiel d'une facture ouverte (PAYMENT_AMOUNT)"""
+    group = 'write'
+
+    def setup(self):
+        self.invoices = list(
+            Invoice.objects.filter(
+                status__in=('pending', 'partially_paid'), customer__is_active=True, remaining_amount__gte=100,
+            ).order_by('pk').values('pk', 'customer_id')[:WRITE_POOL_SIZE]
+        )
+        if not self.invoices:
+            raise ScenarioError('Paiement : aucune facture ouverte.')
+
+    def run(self):
+        invoice = self.random.choice(self.invoices)
+        self.check(self.client.post(reverse('payments:payment_create'), {
+            'invoice': invoice['pk'],
+            'customer': invoice['customer_id'],
+            'amount': PAYMENT_AMOUNT,
+            'payment_method': 'cash',
+            'status': 'completed',
+            'payment_date': timezone.localdate().isoformat(),
+        }), 302)
+
+
+SCENARIOS = {
+    'product_list': ProductList,
+    'category_list': CategoryList,
+    'product_low_stock': LowStockProducts,
+    'customer_list': CustomerList,
+    'order_list': OrderList,
+    'order_list_last_page': OrderListLastPage,
+    'invoice_list': InvoiceList,
+    'payment_list': PaymentList,
+    'customer_search': CustomerSearch,
+    'product_search': ProductSearch,
+    'order_search': OrderSearch,
+    'order_entry': OrderEntry,
+    'payment_entry': PaymentEntry,
+    'dashboard': Dashboard,
+    'dashboard_stats': DashboardStats,
+}
+
+
+def select(patterns=None):
+    """Noms des scénarios retenus : tous, ou ceux dont le nom ou le groupe contient un des motifs"""
+    if not patterns:
+        return list(SCENARIOS)
+    names = [
+        name for name, scenario in SCENARIOS.items()
+        if any(pattern in name or pattern == scenario.group for pattern in patterns)
+    ]
+    if not names:
+        raise ValueError(f'Aucun scénario ne correspond à : {", ".join(patterns)}')
+    return names
+
+
+def run(names=None, iterations=50, warm=False, seed=generator.DEFAULT_SEED):
+    """Mesure des scénarios donnés (tous par défaut) ; retourne les résultats par scénario"""
+    client = benchmark_client()
+    results = {}
+    for name in names or SCENARIOS:
+        scenario = SCENARIOS[name](client, random.Random(seed))
+        clear_caches()
+        scenario.setup()
+        results[name] = {
+            'group': scenario.group,
+            **measure(scenario.run, iterations, prepare=None if warm else clear_caches),
+        }
+    return results
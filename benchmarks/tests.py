@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import Sum
+from django.test import TestCase
+from django.utils import timezone
+from benchmarks import scenarios
+from benchmarks.generator import MIN_ROWS, Scale, generate, parse_rows
+from customers.models import Customer, CustomerStats
+from invoices.models import Invoice
+from orders.models import Order
+from payments.models import Payment
+from products.models import Product
+from stock.models import StockReservation
+
+
+class Rollback(Exception):
+    pass
+
+
+class ParseRowsTests(TestCase):
+
+    def test_suffixes(self):
+        self.assertEqual(parse_rows('10k'), 10_000)
+        self.assertEqual(parse_rows('2.5M'), 2_500_000)
+        self.assertEqual(parse_rows(20000), 20_000)
+
+    def test_out_of_range(self):
+        for value in ('10', '20M', 'beaucoup'):
+            with self.assertRaises(ValueError):
+                parse_rows(value)
+
+
+class GeneratorTests(TestCase):
+    """
+    Jeu de données du volume minimal, daté jusqu'à aujourd'hui : cohérence des
+    données dérivées que les signaux maintiennent d'habitude
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.counts = generate(MIN_ROWS, end_date=timezone.localdate())
+
+    def test_scale(self):
+        scale = Scale(MIN_ROWS)
+        self.assertEqual(Order.objects.count(), scale.orders)
+        self.assertEqual(Customer.objects.count(), scale.customers)
+        self.assertEqual(self.counts['orders.Order'], scale.orders)
+
+    def test_invoice_balances_match_payments(self):
+        for invoice in Invoice.objects.annotate(payments_total=Sum('payments__amount')):
+            self.assertEqual(invoice.paid_amount, invoice.payments_total or 0)
+            self.assertEqual(invoice.remaining_amount, invoice.total_amount - invoice.paid_amount)
+
+    def test_reserved_quantities_match_reservations(self):
+        reserved = dict(
+            StockReservation.objects.filter(status='reserved')
+            .values_list('product').annotate(total=Sum('quantity'))
+        )
+        for product in Product.objects.filter(product_type='product'):
+            self.assertEqual(product.reserved_quantity, reserved.get(product.pk, 0))
+
+    def test_customer_stats(self):
+        self.assertEqual(CustomerStats.objects.count(), Customer.objects.count())
+        self.assertEqual(CustomerStats.objects.aggregate(total=Sum('total_orders'))['total'], Order.objects.count())
+
+    def test_numbering_continues_after_generation(self):
+        order = Order.objects.create(customer=Customer.objects.first())
+        self.assertEqual(Order.objects.filter(order_number=order.order_number).count(), 1)
+
+    def test_scenarios_run(self):
+        results = scenarios.run(iterations=1)
+        self.assertEqual(list(results), list(scenarios.SCENARIOS))
+        for result in results.values():
+            self.assertGreater(result['queries_max'], 0)
+            self.assertGreaterEqual(result['p95_ms'], result['p50_ms'])
+        self.assertTrue(Payment.objects.filter(amount=scenarios.PAYMENT_AMOUNT).exists())
+
+
+class RenderBaselineTests(TestCase):
+
+    def test_templates_rewritten_as_before_badges(self):
+        from benchmarks.render import BASELINE_BADGE, to_baseline
+
+        source = (
+            "{% load static cache badges %}{% cache 3600 layout_footer %}pied{% endcache %}"
+            "{% status_badge order.status 'order' order.get_status_display %}"
+            "<span class=\"bg-{{ invoice.status|status_color:'invoice' }}\">"
+        )
+        baseline = to_baseline(source)
+        self.assertNotIn('{% cache', baseline)
+        self.assertIn(f"{{% include '{BASELINE_BADGE}' with status=order.status type='order' %}}", baseline)
+        self.assertIn("{% if invoice.status == 'draft' %}secondary{% elif", baseline)
+        self.assertNotIn('status_color', baseline)
+
+
+class GeneratorDeterminismTests(TestCase):
+
+    def generated(self, seed):
+        """Empreinte d'une génération, annulée ensuite"""
+        try:
+            with transaction.atomic():
+                generate(MIN_ROWS, seed=seed, end_date=timezone.localdate())
+                fingerprint = (
+                    list(Order.objects.order_by('pk').values_list('order_number', 'customer_id', 'status', 'total_amount')),
+                    list(Payment.objects.order_by('pk').values_list('payment_number', 'invoice_id', 'amount')),
+                )
+                raise Rollback
+        except Rollback:
+            return fingerprint
+
+    def test_same_seed_same_data(self):
+        first = self.generated(seed=1)
+        self.assertEqual(self.generated(seed=1), first)
+        self.assertNotEqual(self.generated(seed=2), first)
+
+    def test_non_empty_database(self):
+        Customer.objects.create(first_name='Awa', last_name='Diop', email='awa@example.com', slug='awa-diop')
+        with self.assertRaises(ValueError):
+            generate(MIN_ROWS)
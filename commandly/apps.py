@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class CommandlyConfig(AppConfig):
+    name = 'commandly'
+    verbose_name = 'Socle commun'
+
+    def ready(self):
+        # Invalidation du cache des pages (commandly.viewcache) à chaque écriture
+        from commandly import viewcache
+        viewcache.connect_signals()
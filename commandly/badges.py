@@ -0,0 +1,122 @@
+"""
+Badges de statut : bibliothèque de gabarits `badges` (settings.TEMPLATES).
+
+Les tables de style (couleur Bootstrap, icône, libellé) par type d'objet et
+statut sont compilées au chargement du module, badges HTML compris : une ligne
+de liste coûte une recherche dans un dictionnaire au lieu d'un gabarit inclus
+et d'une chaîne de {% if %}.
+
+    {% load badges %}
+    {% status_badge order.status 'order' order.get_status_display %}
+    <span class="badge bg-{{ invoice.status|status_color:'invoice' }}">…</span>
+"""
+from django import template
+from django.utils.html import format_html
+from django.utils.text import capfirst
+
+
+register = template.Library()
+
+DEFAULT_STYLE = ('secondary', 'question-circle')
+
+# {type: {statut: (couleur, icône, libellé)}}
+BADGES = {
+    'order': {
+        'draft': ('secondary', 'file-earmark', 'Brouillon'),
+        'pending': ('info', 'clock', 'En attente'),
+        'confirmed': ('primary', 'check-circle', 'Confirmée'),
+        'in_progress': ('warning', 'gear', 'En cours'),
+        'ready': ('info', 'box-seam', 'Prête'),
+        'delivered': ('success', 'truck', 'Livrée'),
+        'cancelled': ('danger', 'x-circle', 'Annulée'),
+        'closed': ('dark', 'archive', 'Clôturée'),
+    },
+    'invoice': {
+        'draft': ('secondary', 'file-earmark', 'Brouillon'),
+        'sent': ('info', 'send', 'Envoyée'),
+        'pending': ('info', 'clock', 'En attente de paiement'),
+        'paid': ('success', 'check-circle-fill', 'Payée'),
+        'partially_paid': ('warning', 'clock-history', 'Partiellement payée'),
+        'overdue': ('danger', 'exclamation-triangle', 'En retard'),
+        'cancelled': ('dark', 'x-circle', 'Annulée'),
+    },
+    'payment': {
+        'pending': ('warning', 'clock', 'En attente'),
+        'completed': ('success', 'check-circle-fill', 'Complété'),
+        'failed': ('danger', 'x-circle', 'Échoué'),
+        'cancelled': ('dark', 'x-circle', 'Annulé'),
+        'refunded': ('info', 'arrow-counterclockwise', 'Remboursé'),
+    },
+    'customer': {
+        'active': ('success', 'person-check', 'Actif'),
+        'inactive': ('danger', 'person-x', 'Inactif'),
+        'suspended': ('warning', 'person-dash', 'Suspendu'),
+    },
+    'product': {
+        'active': ('success', 'check-circle', 'Actif'),
+        'inactive': ('danger', 'x-circle', 'Inactif'),
+        'discontinued': ('warning', 'archive', 'Arrêté'),
+    },
+    'stock': {
+        'available': ('success', 'check-circle', 'Disponible'),
+        'low': ('warning', 'exclamation-triangle', 'Stock faible'),
+        'out': ('danger', 'x-circle', 'Rupture'),
+    },
+    'priority': {
+        'low': ('secondary', 'arrow-down', 'Faible'),
+        'medium': ('warning', 'dash', 'Moyenne'),
+        'high': ('danger', 'arrow-up', 'Élevée'),
+        'critical': ('dark', 'exclamation-triangle-fill', 'Critique'),
+    },
+    'general': {
+        'active': ('success', 'check-circle', 'Actif'),
+        'inactive': ('danger', 'x-circle', 'Inactif'),
+        'pending': ('warning', 'clock', 'En attente'),
+        'completed': ('success', 'check-circle-fill', 'Terminé'),
+    },
+}
+
+_TEMPLATE = '<span class="badge bg-{} status-badge"><i class="bi bi-{}"></i> {}</span>'
+
+# Badges rendus une fois pour toutes : {(type, statut): html}
+_RENDERED = {
+    (kind, status): format_html(_TEMPLATE, color, icon, label)
+    for kind, styles in BADGES.items()
+    for status, (color, icon, label) in styles.items()
+}
+
+
+def normalize(status, kind):
+    """Statut sous sa forme de clé : booléens (actif/inactif) et quantités de stock"""
+    if status is True:
+        return 'active'
+    if status is False:
+        return 'inactive'
+    if kind == 'stock' and isinstance(status, int):
+        return 'available' if status > 0 else 'out'
+    return status
+
+
+def style(status, kind='general'):
+    """(couleur, icône, libellé) d'un statut ; libellé vide si le statut est inconnu"""
+    kind = kind if kind in BADGES else 'general'
+    return BADGES[kind].get(normalize(status, kind), (*DEFAULT_STYLE, ''))
+
+
+@register.simple_tag
+def status_badge(status, kind='general', display=None):
+    """Badge d'un statut ; `display` (libellé du modèle) remplace celui de la table"""
+    kind = kind if kind in BADGES else 'general'
+    status = normalize(status, kind)
+    if not display:
+        rendered = _RENDERED.get((kind, status))
+        if rendered is not None:
+            return rendered
+    color, icon, label = BADGES[kind].get(status, (*DEFAULT_STYLE, ''))
+    return format_html(_TEMPLATE, color, icon, display or label or capfirst(str(status)))
+
+
+@register.filter
+def status_color(status, kind='general'):
+    """Couleur Bootstrap d'un statut (bg-…, text-…)"""
+    return style(status, kind)[0]
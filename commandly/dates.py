@@ -0,0 +1,18 @@
+"""
+Bornes de dates utilisables par les index.
+
+Filtrer un DateTimeField avec `__date` applique une fonction à la colonne et
+empêche l'utilisation de ses index ; on compare plutôt à des bornes de jour.
+"""
+from datetime import datetime, time, timedelta
+from django.utils import timezone
+
+
+def start_of_day(day):
+    """Début (heure locale) du jour donné, en date/heure avec fuseau"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def day_range(start, end):
+    """Filtre couvrant les jours [start, end] : (début de start, début du lendemain de end)"""
+    return start_of_day(start), start_of_day(end + timedelta(days=1))
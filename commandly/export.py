@@ -0,0 +1,266 @@
+"""
+Export des listes en CSV et en XLSX, en flux.
+
+Une vue d'export hérite de la vue de liste (mêmes filtres du formulaire de
+recherche, même tri) et d'ExportMixin. Les lignes sont lues par
+`.values().iterator(chunk_size=...)` et écrites au fil de l'eau dans une
+StreamingHttpResponse : la mémoire utilisée ne dépend pas du nombre de lignes,
+et l'en-tête du fichier part avant la fin de la requête SQL.
+
+Le classeur XLSX est produit sans bibliothèque externe : une archive zip écrite
+en flux (descripteurs de données, sans retour en arrière) dont la feuille
+contient des chaînes en ligne.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+DEFAULT_CHUNK_SIZE = 2000
+# Taille des morceaux envoyés au client pendant l'écriture du classeur
+XLSX_FLUSH_SIZE = 64 * 1024
+
+
+class Column:
+    """
+    Colonne d'export : libellé, champs lus par .values() et valeur affichée
+    (par défaut celle du premier champ)
+    """
+
+    def __init__(self, label, *fields, value=None):
+        self.label = label
+        self.fields = fields
+        self.value = value or (lambda row: row[fields[0]])
+
+
+def choice_column(label, field, choices):
+    """Colonne affichant le libellé d'un champ à choix"""
+    labels = dict(choices)
+    return Column(label, field, value=lambda row: labels.get(row[field], row[field]))
+
+
+def customer_column(label='Client', prefix='customer__'):
+    """Nom d'un client comme Customer.__str__ : raison sociale d'une société, sinon prénom et nom"""
+    fields = [prefix + name for name in ('customer_type', 'company_name', 'first_name', 'last_name')]
+    kind, company, first_name, last_name = fields
+
+    def value(row):
+        if row[kind] == 'company' and row[company]:
+            return row[company]
+        return f'{row[first_name]} {row[last_name]}'
+    return Column(label, *fields, value=value)
+
+
+# CSV
+
+class _Echo:
+    """Pseudo-fichier : csv.writer retourne la ligne au lieu de l'écrire"""
+
+    def write(self, value):
+        return value
+
+
+# Début de texte interprété comme une formule par les tableurs : la cellule est
+# préfixée d'une apostrophe (injection de formules)
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'Oui' if value else 'Non'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.strftime('%Y-%m-%d %H:%M')
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows):
+    """Lignes CSV (séparateur « ; ») produites au fil de l'eau"""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow([_csv_value(value) for value in row])
+
+
+# XLSX
+
+# Caractères interdits en XML 1.0
+_INVALID_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+_EXCEL_EPOCH = datetime(1899, 12, 30)
+
+# Styles de cellule (index dans cellXfs) : date, date et heure, montant
+_DATE_STYLE, _DATETIME_STYLE, _DECIMAL_STYLE = 1, 2, 3
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>'
+    '</workbook>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>'
+    '</Relationships>'
+)
+# Formats intégrés : 14 date, 22 date et heure, 4 nombre à deux décimales avec séparateur
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="22" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '</styleSheet>'
+)
+_HEADER_STYLE = 4
+
+
+class _Buffer:
+    """Sortie non repositionnable de l'archive : les octets écrits sont repris par take()"""
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks, self.size = [], 0
+        return data
+
+
+def _text(value):
+    return escape(_INVALID_XML.sub('', str(value)))
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, datetime):
+        if timezone.is_aware(value):
+            value = timezone.make_naive(value)
+        serial = (value - _EXCEL_EPOCH).total_seconds() / 86400
+        return f'<c s="{_DATETIME_STYLE}"><v>{serial:.6f}</v></c>'
+    if isinstance(value, date):
+        return f'<c s="{_DATE_STYLE}"><v>{(value - _EXCEL_EPOCH.date()).days}</v></c>'
+    if isinstance(value, Decimal):
+        return f'<c s="{_DECIMAL_STYLE}"><v>{value}</v></c>'
+    if isinstance(value, (int, float)):
+        return f'<c><v>{value}</v></c>'
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{_text(value)}</t></is></c>'
+
+
+def iter_xlsx(header, rows, sheet_name='Export'):
+    """Classeur XLSX d'une feuille, produit par morceaux d'environ XLSX_FLUSH_SIZE octets"""
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        archive.writestr('_rels/.rels', _ROOT_RELS)
+        archive.writestr('xl/workbook.xml', _WORKBOOK.format(name=_text(sheet_name[:31])))
+        archive.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        archive.writestr('xl/styles.xml', _STYLES)
+        yield buffer.take()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                '<row>' + ''.join(
+                    f'<c t="inlineStr" s="{_HEADER_STYLE}"><is><t>{_text(label)}</t></is></c>' for label in header
+                ) + '</row>'
+            ).encode())
+            for row in rows:
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode())
+                if buffer.size >= XLSX_FLUSH_SIZE:
+                    yield buffer.take()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.take()
+
+
+WRITERS = {
+    'csv': iter_csv,
+    'xlsx': iter_xlsx,
+}
+
+
+class ExportMixin:
+    """
+    Export d'une vue de liste (?format=csv ou xlsx), avec les filtres de son
+    get_queryset(). À placer avant la vue de liste :
+
+        class OrderExportView(ExportMixin, OrderListView):
+            export_filename = 'commandes'
+            export_columns = [Column('Numéro', 'order_number'), ...]
+    """
+    export_columns = []
+    export_filename = 'export'
+    export_chunk_size = DEFAULT_CHUNK_SIZE
+
+    def get_export_queryset(self):
+        fields = list(dict.fromkeys(field for column in self.export_columns for field in column.fields))
+        return self.get_queryset().values(*fields)
+
+    def iter_export_rows(self):
+        for row in self.get_export_queryset().iterator(chunk_size=self.export_chunk_size):
+            yield [column.value(row) for column in self.export_columns]
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in WRITERS:
+            return JsonResponse({'success': False, 'message': "Format d'export inconnu."}, status=400)
+
+        header = [column.label for column in self.export_columns]
+        content = WRITERS[export_format](header, self.iter_export_rows())
+        response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[export_format])
+        filename = f'{self.export_filename}_{timezone.localdate():%Y%m%d}.{export_format}'
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
@@ -0,0 +1,234 @@
+"""
+Pagination des listes.
+
+Deux modes sont disponibles :
+
+- « offset » (par défaut) : Paginator de Django, avec numéros de page. Chaque page
+  coûte un COUNT(*) et un OFFSET, proportionnels à la profondeur de la page ;
+- « keyset » (curseur) : la page suivante est lue à partir de la clé de tri de la
+  dernière ligne affichée (WHERE (date, id) < (...) ORDER BY date DESC, id DESC),
+  au même coût quelle que soit sa profondeur, par l'index du tri.
+
+Le mode curseur est activé par `pagination_mode = 'keyset'` sur la vue, ou pour une
+requête par le paramètre `?pagination=keyset`. Son total peut être exact, approximatif
+(compté jusqu'à APPROXIMATE_COUNT_LIMIT lignes) ou omis (`count_mode`).
+"""
+import base64
+import binascii
+import json
+from datetime import date, datetime, time
+from decimal import Decimal
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+PAGINATION_MODES = ('offset', 'keyset')
+COUNT_MODES = ('exact', 'approximate', 'none')
+# Au-delà, le total approximatif est affiché « plus de N »
+APPROXIMATE_COUNT_LIMIT = 10_000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def _dump(value):
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, direction):
+    """Curseur opaque : valeurs de la clé de tri d'une ligne et sens de lecture ('n' ou 'p')"""
+    payload = json.dumps([direction, [_dump(value) for value in values]], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields):
+    """Valeurs typées (selon les champs de la clé de tri) et sens d'un curseur"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if direction not in ('n', 'p') or len(values) != len(fields):
+            raise InvalidCursor(cursor)
+        return [field.to_python(value) for field, value in zip(fields, values)], direction
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, ValidationError) as error:
+        raise InvalidCursor(cursor) from error
+
+
+def keyset_filter(ordering, values, reverse=False):
+    """
+    Condition « après la ligne de clé `values` » dans l'ordre `ordering`
+    (« avant » si `reverse`) : (a < x) OR (a = x AND id < y), précédée de la borne
+    a <= x qui permet au planificateur de parcourir l'index du premier champ.
+    """
+    condition = Q()
+    equal = {}
+    bound = None
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        condition |= Q(**equal, **{f'{name}__{"lt" if descending else "gt"}': value})
+        equal[name] = value
+        if bound is None:
+            bound = Q(**{f'{name}__{"lte" if descending else "gte"}': value})
+    return bound & condition
+
+
+def reverse_ordering(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class KeysetPaginator:
+    """
+    Pagination par curseur d'un queryset trié selon `ordering`, dont le dernier
+    champ doit être unique (id) pour que l'ordre soit total et stable.
+    """
+
+    def __init__(self, queryset, per_page, ordering, count_mode='approximate'):
+        if count_mode not in COUNT_MODES:
+            raise ValueError(f'count_mode inconnu : {count_mode}')
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = list(ordering)
+        self.count_mode = count_mode
+        opts = queryset.model._meta
+        self.fields = [
+            opts.pk if field.lstrip('-') == 'pk' else opts.get_field(field.lstrip('-'))
+            for field in self.ordering
+        ]
+
+    @cached_property
+    def count(self):
+        """Nombre de lignes : exact, plafonné à APPROXIMATE_COUNT_LIMIT, ou None"""
+        if self.count_mode == 'none':
+            return None
+        queryset = self.queryset.order_by()
+        if self.count_mode == 'exact':
+            return queryset.count()
+        return min(queryset[:APPROXIMATE_COUNT_LIMIT + 1].count(), APPROXIMATE_COUNT_LIMIT)
+
+    @cached_property
+    def count_is_exact(self):
+        if self.count_mode == 'approximate':
+            return self.count < APPROXIMATE_COUNT_LIMIT
+        return self.count_mode == 'exact'
+
+    def cursor_for(self, obj, direction):
+        # to_python ramène la valeur au type du champ (date d'un DateField initialisé par now())
+        values = [field.to_python(getattr(obj, field.attname)) for field in self.fields]
+        return encode_cursor(values, direction)
+
+    def page_queryset(self, cursor=None):
+        """
+        Requête d'une page (une ligne de plus que la page, qui indique s'il en reste
+        dans ce sens) et indicateur de lecture à rebours (page précédente)
+        """
+        queryset = self.queryset
+        backwards = False
+        if cursor:
+            values, direction = decode_cursor(cursor, self.fields)
+            backwards = direction == 'p'
+            queryset = queryset.filter(keyset_filter(self.ordering, values, reverse=backwards))
+        ordering = reverse_ordering(self.ordering) if backwards else self.ordering
+        return queryset.order_by(*ordering)[:self.per_page + 1], backwards
+
+    def page(self, cursor=None):
+        """Page suivant (ou précédant) la ligne désignée par `cursor`, première page sinon"""
+        queryset, backwards = self.page_queryset(cursor)
+        rows = list(queryset)
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            return KeysetPage(rows, self, has_previous=more, has_next=True)
+        return KeysetPage(rows, self, has_previous=bool(cursor), has_next=more)
+
+
+class KeysetPage:
+    """Page d'un KeysetPaginator, utilisable comme une Page de Django dans les gabarits"""
+
+    is_keyset = True
+
+    def __init__(self, object_list, paginator, has_previous, has_next):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_previous = has_previous and bool(object_list)
+        self._has_next = has_next and bool(object_list)
+
+    def __repr__(self):
+        return f'<KeysetPage de {len(self)} lignes>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @cached_property
+    def next_cursor(self):
+        if not self._has_next:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'n')
+
+    @cached_property
+    def previous_cursor(self):
+        if not self._has_previous:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], 'p')
+
+
+class KeysetPaginationMixin:
+    """
+    Ajoute le mode de pagination par curseur à une ListView.
+
+    `keyset_ordering` est la clé de tri du mode curseur, terminée par un champ
+    unique. En mode curseur, la page est désignée par le paramètre `cursor`.
+    Dans les deux modes, `page_obj` du contexte est la page (et non sa liste
+    d'objets, même si la vue l'utilise comme context_object_name).
+    """
+
+    keyset_ordering = None
+    pagination_mode = 'offset'
+    pagination_kwarg = 'pagination'
+    cursor_kwarg = 'cursor'
+    count_mode = 'approximate'
+
+    def get_pagination_mode(self):
+        mode = self.request.GET.get(self.pagination_kwarg) or self.pagination_mode
+        return mode if mode in PAGINATION_MODES and self.keyset_ordering else 'offset'
+
+    def paginate_queryset(self, queryset, page_size):
+        if self.get_pagination_mode() != 'keyset':
+            paginated = super().paginate_queryset(queryset, page_size)
+        else:
+            paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering, self.count_mode)
+            try:
+                page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+            except InvalidCursor:
+                raise Http404('Curseur de pagination invalide')
+            paginated = (paginator, page, page.object_list, page.has_other_pages())
+        self.page = paginated[1]
+        return paginated
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if getattr(self, 'page', None) is not None:
+            context['page_obj'] = self.page
+        return context
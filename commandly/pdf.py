@@ -0,0 +1,146 @@
+"""
+Écriture de documents PDF simples, en Python pur.
+
+Texte (Helvetica et Helvetica-Bold, polices standard que tout lecteur PDF fournit,
+encodage WinAnsi pour les accents), traits et rectangles, sur des pages A4. Les flux
+de contenu sont compressés (zlib). Le module n'importe pas Django : il peut être
+utilisé dans des processus de rendu en parallèle.
+"""
+import zlib
+
+
+# Format A4 en points (1/72 de pouce)
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+
+FONTS = {
+    False: ('F1', 'Helvetica'),
+    True: ('F2', 'Helvetica-Bold'),
+}
+
+# Largeurs des glyphes (millièmes de corps) des métriques AFM Helvetica, pour
+# aligner à droite ; les caractères absents prennent la largeur par défaut
+_WIDTHS = {
+    False: {
+        ' ': 278, ',': 278, '.': 278, '-': 333, '/': 278, ':': 278, '%': 889, '(': 333, ')': 333,
+        **dict.fromkeys('0123456789', 556),
+        'A': 667, 'B': 667, 'C': 722, 'D': 722, 'E': 667, 'F': 611, 'H': 722, 'I': 278,
+        'M': 833, 'N': 722, 'P': 667, 'R': 722, 'S': 667, 'T': 611, 'U': 722, 'V': 667,
+        'a': 556, 'c': 500, 'e': 556, 'i': 222, 'l': 222, 'n': 556, 'o': 556, 'r': 333,
+        's': 500, 't': 278, 'u': 556, 'y': 500, 'é': 556, 'è': 556, 'à': 556,
+    },
+    True: {
+        ' ': 278, ',': 278, '.': 278, '-': 333, '/': 278, ':': 333, '%': 889, '(': 333, ')': 333,
+        **dict.fromkeys('0123456789', 556),
+        'A': 722, 'B': 722, 'C': 722, 'D': 722, 'E': 667, 'F': 611, 'H': 722, 'I': 278,
+        'M': 833, 'N': 722, 'P': 667, 'R': 722, 'S': 667, 'T': 611, 'U': 722, 'V': 667,
+        'a': 556, 'c': 556, 'e': 556, 'i': 278, 'l': 278, 'n': 611, 'o': 611, 'r': 389,
+        's': 556, 't': 333, 'u': 611, 'y': 556, 'é': 556, 'è': 556, 'à': 556,
+    },
+}
+_DEFAULT_WIDTH = 556
+
+
+def text_width(text, size, bold=False):
+    """Largeur approchée d'un texte en points"""
+    widths = _WIDTHS[bold]
+    return sum(widths.get(char, _DEFAULT_WIDTH) for char in text) * size / 1000
+
+
+def _escape(text):
+    """Chaîne littérale PDF en WinAnsi (les caractères hors encodage sont remplacés)"""
+    data = text.encode('cp1252', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)').replace(b'\r', b'').replace(b'\n', b' ')
+
+
+def _number(value):
+    return f'{value:.2f}'.rstrip('0').rstrip('.') if isinstance(value, float) else str(value)
+
+
+class PDFDocument:
+    """
+    Document en construction : chaque appel dessine sur la page courante,
+    new_page() en commence une autre, render() retourne les octets du fichier
+    """
+
+    def __init__(self, title=''):
+        self.title = title
+        self.pages = []
+        self.new_page()
+
+    def new_page(self):
+        self.pages.append([])
+        return len(self.pages)
+
+    def _draw(self, operations, page=None):
+        self.pages[-1 if page is None else page - 1].append(operations)
+
+    def text(self, x, y, text, size=10, bold=False, align='left', page=None):
+        """
+        Texte dont la ligne de base commence (ou finit, align='right') en x, y,
+        sur la page courante ou sur la page numéro `page`
+        """
+        if align == 'right':
+            x -= text_width(text, size, bold)
+        elif align == 'center':
+            x -= text_width(text, size, bold) / 2
+        font = FONTS[bold][0]
+        self._draw(b'BT /%s %s Tf %s %s Td (%s) Tj ET' % (
+            font.encode(), _number(size).encode(), _number(float(x)).encode(), _number(float(y)).encode(), _escape(text),
+        ), page)
+
+    def line(self, x1, y1, x2, y2, width=0.5):
+        self._draw(b'%s w %s %s m %s %s l S' % tuple(
+            _number(float(value)).encode() for value in (width, x1, y1, x2, y2)
+        ))
+
+    def rect(self, x, y, width, height, gray=0.9):
+        """Rectangle plein en niveau de gris (0 noir, 1 blanc)"""
+        self._draw(b'q %s g %s %s %s %s re f Q' % tuple(
+            _number(float(value)).encode() for value in (gray, x, y, width, height)
+        ))
+
+    def render(self):
+        """Octets du fichier PDF"""
+        objects = []
+
+        def add(body):
+            objects.append(body)
+            return len(objects)
+
+        catalog = add(None)
+        pages = add(None)
+        fonts = {
+            bold: add(b'<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>' % name.encode())
+            for bold, (_, name) in FONTS.items()
+        }
+        resources = b'<< /Font << %s >> >>' % b' '.join(
+            b'/%s %d 0 R' % (FONTS[bold][0].encode(), number) for bold, number in fonts.items()
+        )
+        kids = []
+        for operations in self.pages:
+            stream = zlib.compress(b'\n'.join(operations))
+            content = add(b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(stream), stream))
+            kids.append(add(
+                b'<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources %s /Contents %d 0 R >>'
+                % (pages, PAGE_WIDTH, PAGE_HEIGHT, resources, content)
+            ))
+        objects[catalog - 1] = b'<< /Type /Catalog /Pages %d 0 R >>' % pages
+        objects[pages - 1] = b'<< /Type /Pages /Kids [%s] /Count %d >>' % (
+            b' '.join(b'%d 0 R' % kid for kid in kids), len(kids),
+        )
+        info = add(b'<< /Title (%s) /Producer (Commandly) >>' % _escape(self.title))
+
+        output = bytearray(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(output))
+            output += b'%d 0 obj\n%s\nendobj\n' % (number, body)
+        xref = len(output)
+        output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            output += b'%010d 00000 n \n' % offset
+        output += b'trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (
+            len(objects) + 1, catalog, info, xref,
+        )
+        return bytes(output)
@@ -39,6 +39,9 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     
+    # Socle commun (cache des pages, vérifications de configuration)
+    'commandly',
+
     # Applications métier
     'users',
     'products',
@@ -47,6 +50,9 @@ INSTALLED_APPS = [
     'invoices',
     'payments',
     'dashboard',
+    'sequences',
+    'search',
+    'stock',
 ]
 
 MIDDLEWARE = [
@@ -65,6 +71,7 @@ TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
+        # Chargeurs par défaut : gabarits compilés une fois par processus (cached.Loader)
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -72,6 +79,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'badges': 'commandly.badges',
+            },
         },
     },
 ]
@@ -90,6 +100,48 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Réponses des recherches rapides (autocomplétion) : LRU borné, propre au processus
+    'autocomplete': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'autocomplete',
+        'TIMEOUT': 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 5000,
+        },
+    },
+    # Blocs rendus des pages de liste et de détail (commandly.viewcache)
+    'views': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'views',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 2000,
+        },
+    },
+    # Versions des modèles lues par le cache des pages : partagées entre tous les
+    # processus (serveurs web et commandes de gestion), sinon une écriture faite
+    # ailleurs laisserait les pages périmées jusqu'à leur expiration
+    'view_versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'var' / 'view_versions',
+        'TIMEOUT': None,
+    },
+    # Fragments de gabarits ({% cache %}) : menu latéral et pied de page
+    'template_fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'template_fragments',
+        'TIMEOUT': 3600,
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -134,6 +186,9 @@ STATICFILES_DIRS = [
 # Répertoire de collecte des fichiers statiques en production
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
+# Factures PDF rendues (cache disque, régénéré à la demande)
+INVOICE_PDF_DIR = BASE_DIR / 'var' / 'invoices'
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
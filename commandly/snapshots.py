@@ -0,0 +1,54 @@
+"""
+État enregistré d'un objet, lu une seule fois avant son écriture ou sa suppression.
+
+Plusieurs applications maintiennent des agrégats à partir de la différence entre
+l'état enregistré d'un objet et son nouvel état (tableau de bord, agrégats par
+client). Chacune déclare les champs dont elle a besoin avec track() ; une seule
+requête lit l'union de ces champs en pre_save et en pre_delete, et stored_state()
+en donne la partie demandée dans les récepteurs post_save et post_delete.
+"""
+from collections import defaultdict
+from django.db.models.signals import pre_delete, pre_save
+
+
+# Champs lus avant l'écriture et avant la suppression, par modèle
+_save_fields = defaultdict(set)
+_delete_fields = defaultdict(set)
+
+
+def track(model, fields, on_save=True, on_delete=True):
+    """
+    Déclare les champs de `model` dont l'état enregistré est lu avant chaque
+    écriture (`on_save`) et avant chaque suppression (`on_delete`)
+    """
+    label = model._meta.label
+    if on_save:
+        if model not in _save_fields:
+            pre_save.connect(remember_saved, sender=model, dispatch_uid=f'snapshots_save_{label}')
+        _save_fields[model].update(fields)
+    if on_delete:
+        if model not in _delete_fields:
+            pre_delete.connect(remember_deleted, sender=model, dispatch_uid=f'snapshots_delete_{label}')
+        _delete_fields[model].update(fields)
+
+
+def _read(model, instance, fields):
+    if instance._state.adding or instance.pk is None:
+        return None
+    return model._base_manager.filter(pk=instance.pk).values(*sorted(fields)).first()
+
+
+def remember_saved(sender, instance, **kwargs):
+    instance._stored_state = _read(sender, instance, _save_fields[sender])
+
+
+def remember_deleted(sender, instance, **kwargs):
+    instance._stored_state = _read(sender, instance, _delete_fields[sender])
+
+
+def stored_state(instance, fields):
+    """Champs `fields` de l'état lu avant la dernière écriture de l'objet (None pour une création)"""
+    state = getattr(instance, '_stored_state', None)
+    if state is None:
+        return None
+    return {name: state[name] for name in fields}
@@ -0,0 +1,45 @@
+"""
+Statistiques agrégées des listes (cartes de synthèse).
+
+Toutes les cartes d'une page sont calculées en une seule requête d'agrégation
+conditionnelle sur le queryset déjà filtré de la liste.
+"""
+from decimal import Decimal
+from django.db.models import Count, DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def count_if(**lookups):
+    """Nombre de lignes satisfaisant les critères (toutes les lignes sans critère)"""
+    return Count('pk', filter=Q(**lookups) if lookups else None)
+
+
+def sum_of(field, **lookups):
+    """Somme d'un champ décimal (0 si aucune ligne), éventuellement filtrée"""
+    return Coalesce(
+        Sum(field, filter=Q(**lookups) if lookups else None),
+        Value(Decimal('0.00')),
+        output_field=DecimalField(max_digits=14, decimal_places=2),
+    )
+
+
+def count_by_choice(field, choices, prefix):
+    """Un compteur par valeur de `choices`, nommé `<prefix><code>`"""
+    return {
+        f'{prefix}{code}': count_if(**{field: code})
+        for code, label in choices
+    }
+
+
+def group(stats, prefix):
+    """Extrait les compteurs préfixés d'un résultat sous forme de dictionnaire {code: valeur}"""
+    return {
+        key[len(prefix):]: value
+        for key, value in stats.items()
+        if key.startswith(prefix)
+    }
+
+
+def summarize(queryset, **aggregates):
+    """Évalue toutes les agrégations en une seule requête sur le queryset donné"""
+    return queryset.order_by().aggregate(**aggregates)
@@ -0,0 +1,224 @@
+"""
+Outils de test partagés entre les applications.
+
+QueryCountTestCase vérifie qu'une page s'affiche avec un nombre maximal de
+requêtes SQL fixé, quel que soit le nombre de lignes affichées : une régression
+N+1 fait échouer les tests au lieu d'apparaître en production.
+
+QueryPlanTestCase vérifie avec EXPLAIN QUERY PLAN (SQLite) que les requêtes des
+listes utilisent un index plutôt qu'un parcours complet de table.
+"""
+from decimal import Decimal
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+
+TRANSACTION_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT')
+
+def build_sample_data(rows=25):
+    """
+    Crée un jeu de données cohérent : `rows` clients, produits, commandes (2 lignes
+    chacune), factures et paiements. Retourne un dictionnaire des premiers objets.
+    """
+    from customers.models import Customer
+    from invoices.models import Invoice
+    from orders.models import Order, OrderItem
+    from payments.models import Payment
+    from products.models import Category, Product
+
+    category = Category.objects.create(name='Catégorie de test')
+    products = [
+        Product.objects.create(
+            name=f'Produit {i}',
+            sku=f'SKU-{i:05d}',
+            category=category,
+            unit_price=Decimal('1000.00'),
+            tax_rate=Decimal('18.00'),
+            stock_quantity=100 if i % 3 else 0,
+            min_stock_level=5,
+        )
+        for i in range(rows)
+    ]
+    customers = [
+        Customer.objects.create(
+            customer_type='company' if i % 2 else 'individual',
+            first_name=f'Prénom{i}',
+            last_name=f'Nom{i}',
+            company_name=f'Société {i}' if i % 2 else None,
+            email=f'client{i}@example.com',
+            address_line1='1 rue de test',
+            city='Dakar',
+            postal_code='10000',
+            slug=f'client-{i}',
+        )
+        for i in range(rows)
+    ]
+
+    orders, invoices, payments = [], [], []
+    for i in range(rows):
+        customer = customers[i % len(customers)]
+        order = Order.objects.create(customer=customer, status='delivered')
+        for product in (products[i % rows], products[(i + 1) % rows]):
+            OrderItem.objects.create(
+                order=order,
+                product=product,
+                quantity=1,
+                unit_price=product.unit_price,
+                tax_rate=product.tax_rate,
+            )
+        order.refresh_from_db()
+        invoice = Invoice.objects.create(
+            order=order,
+            customer=customer,
+            invoice_date=timezone.now().date(),
+        )
+        payment = Payment.objects.create(
+            invoice=invoice,
+            customer=customer,
+            amount=Decimal('500.00'),
+            payment_method='cash',
+            status='completed',
+        )
+        orders.append(order)
+        invoices.append(invoice)
+        payments.append(payment)
+
+    return {
+        'category': category,
+        'product': products[0],
+        'customer': customers[0],
+        'order': orders[0],
+        'invoice': invoices[0],
+        'payment': payments[0],
+    }
+
+
+class QueryCountTestCase(TestCase):
+    """
+    Classe de base des tests de nombre de requêtes.
+    L'utilisateur de test est connecté avant chaque test.
+    """
+
+    # Nombre de lignes créées : supérieur à la taille d'une page (20)
+    sample_rows = 25
+
+    @classmethod
+    def setUpTestData(cls):
+        from users.models import CustomUser
+
+        cls.user = CustomUser.objects.create_user(
+            username='vendeur', password='motdepasse', role='seller'
+        )
+        cls.data = build_sample_data(cls.sample_rows)
+
+    def setUp(self):
+        from commandly import viewcache
+
+        # Les versions des modèles survivent au retour arrière de la base : pages en cache oubliées
+        viewcache.get_cache().clear()
+        self.client.force_login(self.user)
+
+    def assertMaxQueries(self, max_queries, url, status_code=200):
+        """Vérifie qu'une page répond avec au plus `max_queries` requêtes SQL"""
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status_code)
+        # Les points de sauvegarde des écritures atomiques ne sont pas des requêtes de données
+        captured = [
+            query for query in context.captured_queries
+            if not query['sql'].startswith(TRANSACTION_STATEMENTS)
+        ]
+        executed = len(captured)
+        if executed > max_queries:
+            queries = '\n'.join(
+                f"{i}. {query['sql']}" for i, query in enumerate(captured, start=1)
+            )
+            self.fail(f'{url} : {executed} requêtes exécutées pour un maximum de {max_queries}\n{queries}')
+        return response
+
+
+def simulate_table_sizes(rows):
+    """
+    Fait croire au planificateur SQLite que chaque table contient `rows` lignes.
+
+    Les statistiques de sqlite_stat1 calculées sur le jeu de test sont mises à
+    l'échelle : un index unique garde une ligne par valeur ; ailleurs, une valeur
+    répétée dans le jeu de test (statut, méthode) le reste dans la même proportion,
+    et une valeur quasi unique (client, date) est supposée répétée selon la racine
+    carrée du facteur d'échelle.
+    """
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+        cursor.execute('SELECT tbl, idx, stat FROM sqlite_stat1')
+        stats = cursor.fetchall()
+        for table, index, stat in stats:
+            counts = [int(value) for value in stat.split() if value.isdigit()]
+            if not counts or not counts[0]:
+                continue
+            scale = rows / counts[0]
+            cursor.execute('SELECT name, "unique" FROM pragma_index_list(%s)', [table])
+            unique = dict(cursor.fetchall()).get(index, 0)
+            scaled = [rows]
+            for position, value in enumerate(counts[1:], start=1):
+                if unique and position == len(counts) - 1:
+                    scaled.append(1)
+                elif value > 1:
+                    scaled.append(round(value * scale))
+                else:
+                    scaled.append(max(1, round(scale ** 0.5)))
+            cursor.execute(
+                'UPDATE sqlite_stat1 SET stat = %s WHERE tbl = %s AND idx IS %s',
+                [' '.join(str(value) for value in scaled), table, index],
+            )
+        # Rechargement des statistiques par le planificateur
+        cursor.execute('ANALYZE sqlite_master')
+
+
+class QueryPlanTestCase(QueryCountTestCase):
+    """
+    Classe de base des tests de plan d'exécution.
+    Les tables sont présentées au planificateur comme contenant `simulated_rows` lignes.
+    """
+
+    simulated_rows = 1_000_000
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        if connection.vendor == 'sqlite':
+            simulate_table_sizes(cls.simulated_rows)
+
+    def setUp(self):
+        super().setUp()
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN est propre à SQLite')
+
+    def list_queryset(self, view_class, params=None, page_size=20):
+        """Requête de la première page d'une vue liste pour les paramètres GET donnés"""
+        view = view_class()
+        view.setup(RequestFactory().get('/', params or {}))
+        view.request.user = self.user
+        return view.get_queryset()[:page_size]
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, ordered=True):
+        """
+        Vérifie qu'aucune table n'est parcourue entièrement et, si `ordered`,
+        que le tri est fourni par l'index sans table temporaire
+        """
+        plan = self.query_plan(queryset)
+        problems = [
+            step for step in plan
+            if (step.startswith('SCAN ') and 'INDEX' not in step)
+            or (ordered and 'TEMP B-TREE FOR ORDER BY' in step)
+        ]
+        if problems:
+            self.fail('Plan sans index :\n' + '\n'.join(plan))
+        return plan
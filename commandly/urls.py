@@ -26,4 +26,6 @@ urlpatterns = [
     path('orders/', include('orders.urls')),  # Temporairement commenté
     path('invoices/', include('invoices.urls')),  # Temporairement commenté
     path('payments/', include('payments.urls')),  # Temporairement commenté
+    path('search/', include('search.urls')),
+    path('stock/', include('stock.urls')),
 ]
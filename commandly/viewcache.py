@@ -0,0 +1,230 @@
+"""
+Cache des pages de liste et de détail, invalidé par modèle.
+
+Une vue qui hérite de CachedViewMixin met en cache le rendu des blocs de son
+gabarit (title, content, extra_js…), pas la page entière : le gabarit de base
+(nom de l'utilisateur, messages) est rendu à chaque requête autour des blocs
+en cache. Le jeton CSRF des formulaires est remplacé dans les blocs par un
+marqueur, remis à la valeur de la requête à chaque affichage.
+
+La clé est formée de la vue, du chemin, des paramètres de la requête (triés), du
+rôle de l'utilisateur et des versions des modèles lus par la vue (`cache_models`).
+Chaque enregistrement ou suppression d'un objet change la version de son modèle :
+les entrées qui en dépendent ne sont plus lues et expirent d'elles-mêmes. Les
+écritures sans signal (UPDATE relatifs, bulk_create) appellent invalidate().
+
+Les blocs rendus sont dans l'alias CACHE_ALIAS de settings.CACHES, propre à
+chaque processus si l'on veut. Les versions des modèles sont dans l'alias
+VERSIONS_ALIAS, qui doit être partagé par tous les processus (serveurs web et
+commandes de gestion) : une vérification système (commandly.E001) refuse un
+cache propre au processus hors DEBUG.
+"""
+import hashlib
+import time
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.template.base import NodeList, TextNode
+from django.template.context import make_context
+from django.template.loader import get_template
+from django.template.loader_tags import BLOCK_CONTEXT_KEY, BlockContext, BlockNode, ExtendsNode
+from django.template.response import TemplateResponse
+from django.utils.http import urlencode
+from orders.signals import order_totals_changed
+from payments.signals import invoice_balance_changed
+
+
+CACHE_ALIAS = 'views'
+VERSIONS_ALIAS = 'view_versions'
+# Caches dont le contenu n'est pas vu par les autres processus
+PROCESS_LOCAL_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+KEY_PREFIX = 'views'
+# Valeur du jeton CSRF pendant le rendu des blocs mis en cache
+CSRF_PLACEHOLDER = 'viewcache-csrf-token-placeholder'
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def get_versions_cache():
+    return caches[VERSIONS_ALIAS]
+
+
+def _label(model):
+    return model.lower() if isinstance(model, str) else model._meta.label_lower
+
+
+def _version_key(label):
+    return f'{KEY_PREFIX}:version:{label}'
+
+
+def model_versions(models):
+    """Versions courantes des modèles (créées à la première lecture)"""
+    cache = get_versions_cache()
+    keys = [_version_key(_label(model)) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def _bump(labels):
+    now = time.time_ns()
+    get_versions_cache().set_many({_version_key(label): now for label in labels}, None)
+
+
+def invalidate(*models):
+    """
+    Invalide les pages qui lisent l'un des modèles (classes ou libellés
+    « app.Model »). L'invalidation est refaite à la validation de la transaction,
+    pour écarter les pages mises en cache entre-temps à partir de l'ancien état.
+    """
+    labels = sorted({_label(model) for model in models})
+    _bump(labels)
+    transaction.on_commit(lambda: _bump(labels))
+
+
+# Rendu par blocs
+
+def _extends_node(template):
+    return next((node for node in template.nodelist if isinstance(node, ExtendsNode)), None)
+
+
+def render_blocks(template, context_data, request):
+    """
+    Rendu des blocs de premier niveau d'un gabarit qui en étend un autre,
+    jeton CSRF remplacé par CSRF_PLACEHOLDER
+    """
+    extends = _extends_node(template)
+    context = make_context({**context_data, 'csrf_token': CSRF_PLACEHOLDER}, request, autoescape=template.engine.autoescape)
+    with context.render_context.push_state(template), context.bind_template(template):
+        context.template_name = template.name
+        return {
+            node.name: node.render(context)
+            for node in extends.nodelist
+            if isinstance(node, BlockNode)
+        }
+
+
+def render_with_blocks(template, blocks, request, context_data=None):
+    """Rendu complet d'un gabarit dont les blocs de premier niveau sont déjà rendus"""
+    token = get_token(request)
+    block_context = BlockContext()
+    block_context.add_blocks({
+        name: BlockNode(name, NodeList([TextNode(html.replace(CSRF_PLACEHOLDER, token))]))
+        for name, html in blocks.items()
+    })
+    context = make_context(context_data or {}, request, autoescape=template.engine.autoescape)
+    with context.render_context.push_state(template), context.bind_template(template):
+        context.template_name = template.name
+        # Les blocs en cache, ajoutés avant ceux du gabarit, sont rendus à leur place
+        context.render_context[BLOCK_CONTEXT_KEY] = block_context
+        return template.nodelist.render(context)
+
+
+class CachedViewMixin:
+    """
+    Cache du rendu d'une vue de liste ou de détail (GET), à placer après
+    LoginRequiredMixin pour que l'accès soit vérifié avant toute lecture du cache :
+
+        class ProductListView(LoginRequiredMixin, CachedViewMixin, ListView):
+            cache_models = ['products.Product', 'products.Category']
+    """
+    cache_models = []
+    # Durée de vie des entrées (par défaut celle de l'alias de cache)
+    cache_timeout = DEFAULT_TIMEOUT
+
+    def get_cache_key(self):
+        request = self.request
+        query = urlencode(sorted((key, value) for key, values in request.GET.lists() for value in values))
+        parts = [
+            request.path,
+            query,
+            getattr(request.user, 'role', ''),
+            model_versions(self.cache_models),
+        ]
+        digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+        return f'{KEY_PREFIX}:page:{type(self).__module__}.{type(self).__name__}:{digest}'
+
+    def get_cache_template(self):
+        """
+        Gabarit Django compilé de la vue (template_name), s'il en étend un autre ;
+        sinon la vue n'est pas mise en cache
+        """
+        if not self.template_name:
+            return None
+        template = getattr(get_template(self.template_name), 'template', None)
+        return template if template is not None and _extends_node(template) is not None else None
+
+    def get(self, request, *args, **kwargs):
+        template = self.get_cache_template()
+        if template is None or not request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        # Clé lue avant la base : une écriture pendant le rendu rend l'entrée aussitôt périmée
+        key = self.get_cache_key()
+        blocks = get_cache().get(key)
+        if blocks is None:
+            response = super().get(request, *args, **kwargs)
+            if not isinstance(response, TemplateResponse) or response.status_code != 200:
+                return response
+            blocks = render_blocks(template, response.context_data, request)
+            get_cache().set(key, blocks, self.cache_timeout)
+        return HttpResponse(render_with_blocks(template, blocks, request, {'view': self}))
+
+
+# Invalidation à chaque écriture
+
+def model_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        invalidate(sender)
+
+
+def model_deleted(sender, instance, **kwargs):
+    invalidate(sender)
+
+
+def model_updated(sender, **kwargs):
+    """Totaux de commande et soldes de facture, modifiés par des UPDATE relatifs"""
+    invalidate(sender)
+
+
+def connect_signals():
+    """Branche l'invalidation sur les écritures de tous les modèles (CommandlyConfig.ready)"""
+    post_save.connect(model_saved, dispatch_uid='viewcache_saved')
+    post_delete.connect(model_deleted, dispatch_uid='viewcache_deleted')
+    order_totals_changed.connect(model_updated, dispatch_uid='viewcache_order_totals')
+    invoice_balance_changed.connect(model_updated, dispatch_uid='viewcache_invoice_balance')
+
+
+# Vérification de la configuration
+
+@checks.register(checks.Tags.caches)
+def check_versions_cache(app_configs, **kwargs):
+    """Hors DEBUG, les versions des modèles doivent être dans un cache partagé"""
+    backend = settings.CACHES.get(VERSIONS_ALIAS, {}).get('BACKEND')
+    if backend is None:
+        return [checks.Error(
+            f"L'alias de cache « {VERSIONS_ALIAS} » n'est pas défini.",
+            hint='Ajoutez-le à CACHES avec un cache partagé (fichiers, base de données, Redis).',
+            id='commandly.E001',
+        )]
+    if not settings.DEBUG and backend in PROCESS_LOCAL_BACKENDS:
+        return [checks.Error(
+            f"L'alias de cache « {VERSIONS_ALIAS} » est propre à chaque processus : "
+            "les écritures des autres processus n'invalideraient pas le cache des pages.",
+            hint='Utilisez un cache partagé (fichiers, base de données, Redis).',
+            id='commandly.E001',
+        )]
+    return []
@@ -5,3 +5,7 @@ class CustomersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'customers'
     verbose_name = 'Gestion des clients'
+
+    def ready(self):
+        # Agrégats par client maintenus à chaque écriture
+        from customers import signals  # noqa: F401
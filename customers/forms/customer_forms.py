@@ -155,3 +155,27 @@ class CustomerSearchForm(forms.Form):
             'style': 'max-width: 150px;'
         })
     )
+    
+    # Tri de la liste : clé du formulaire -> ordre sur les agrégats du client (CustomerStats)
+    SORT_ORDERINGS = {
+        'value': ('-stats__total_spent', '-id'),
+        'orders': ('-stats__total_orders', '-id'),
+        'last_order': ('-stats__last_order_date', '-id'),
+        'outstanding': ('-stats__outstanding_amount', '-id'),
+    }
+    
+    sort = forms.ChoiceField(
+        choices=[
+            ('', 'Plus récents'),
+            ('value', 'Total dépensé'),
+            ('orders', 'Nombre de commandes'),
+            ('last_order', 'Dernière commande'),
+            ('outstanding', 'Encours'),
+        ],
+        required=False,
+        label='Trier par',
+        widget=forms.Select(attrs={
+            'class': 'form-select',
+            'style': 'max-width: 180px;'
+        })
+    )
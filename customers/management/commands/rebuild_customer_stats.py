@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from customers.services.lifetime import DEFAULT_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recalcule les agrégats des clients (commandes, total dépensé, dernière commande, encours)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'customer_ids', nargs='*', type=int,
+            help='Identifiants des clients à recalculer (tous par défaut)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Nombre de clients recalculés par lot (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+
+        started = time.monotonic()
+        with transaction.atomic():
+            count = rebuild(options['customer_ids'] or None, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Agrégats de {count} client(s) recalculés en {time.monotonic() - started:.2f} s.'
+        ))
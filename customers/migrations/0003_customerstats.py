@@ -0,0 +1,126 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def compute_customer_stats(apps, schema_editor):
+    """Agrégats des clients existants, en deux requêtes groupées"""
+    Customer = apps.get_model("customers", "Customer")
+    CustomerStats = apps.get_model("customers", "CustomerStats")
+    Order = apps.get_model("orders", "Order")
+    Invoice = apps.get_model("invoices", "Invoice")
+    zero = Value(0, output_field=DecimalField(max_digits=14, decimal_places=2))
+
+    stats = {
+        pk: CustomerStats(customer_id=pk)
+        for pk in Customer.objects.values_list("pk", flat=True)
+    }
+    orders = (
+        Order.objects.order_by()
+        .values("customer_id")
+        .annotate(
+            total_orders=Count("pk"),
+            total_spent=Coalesce(
+                Sum("total_amount", filter=Q(status="delivered")), zero
+            ),
+            last_order_date=Max("order_date"),
+        )
+    )
+    for row in orders:
+        customer_id = row.pop("customer_id")
+        for name, value in row.items():
+            setattr(stats[customer_id], name, value)
+    invoices = (
+        Invoice.objects.filter(status__in=["pending", "partially_paid", "overdue"])
+        .order_by()
+        .values("customer_id")
+        .annotate(outstanding_amount=Sum("remaining_amount"))
+    )
+    for row in invoices:
+        stats[row["customer_id"]].outstanding_amount = row["outstanding_amount"]
+    CustomerStats.objects.bulk_create(stats.values(), batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0002_alter_customer_phone"),
+        ("invoices", "0002_invoice_invoice_date_idx_and_more"),
+        ("orders", "0002_order_order_date_idx_order_order_status_date_idx_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerStats",
+            fields=[
+                (
+                    "customer",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="stats",
+                        serialize=False,
+                        to="customers.customer",
+                        verbose_name="Client",
+                    ),
+                ),
+                (
+                    "total_orders",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Nombre de commandes"
+                    ),
+                ),
+                (
+                    "total_spent",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Total dépensé",
+                    ),
+                ),
+                (
+                    "last_order_date",
+                    models.DateTimeField(
+                        blank=True, null=True, verbose_name="Dernière commande"
+                    ),
+                ),
+                (
+                    "outstanding_amount",
+                    models.DecimalField(
+                        decimal_places=2,
+                        default=0,
+                        max_digits=14,
+                        verbose_name="Encours",
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Dernière modification"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Statistiques client",
+                "verbose_name_plural": "Statistiques clients",
+                "indexes": [
+                    models.Index(
+                        fields=["-total_spent"], name="customer_stats_spent_idx"
+                    ),
+                    models.Index(
+                        fields=["-last_order_date"],
+                        name="customer_stats_last_order_idx",
+                    ),
+                    models.Index(
+                        fields=["-outstanding_amount"],
+                        name="customer_stats_outstanding_idx",
+                    ),
+                ],
+            },
+        ),
+        migrations.RunPython(compute_customer_stats, migrations.RunPython.noop),
+    ]
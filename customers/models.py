@@ -174,13 +174,74 @@ class Customer(models.Model):
         address_parts.extend([self.postal_code, self.city, self.country])
         return ', '.join(filter(None, address_parts))
     
+    def get_stats(self):
+        """Agrégats du client (CustomerStats), calculés s'ils n'existent pas encore"""
+        from customers.services import lifetime
+        return lifetime.stats_for(self)
+    
     def get_total_orders(self):
         """Retourne le nombre total de commandes"""
-        from orders.models import Order
-        return Order.objects.filter(customer=self).count()
+        return self.get_stats().total_orders
     
     def get_total_spent(self):
-        """Retourne le montant total dépensé"""
-        from orders.models import Order
-        orders = Order.objects.filter(customer=self, status='delivered')
-        return sum(order.total_amount for order in orders)
+        """Retourne le montant total dépensé (commandes livrées)"""
+        return self.get_stats().total_spent
+
+
+class CustomerStats(models.Model):
+    """
+    Agrégats d'un client maintenus à chaque écriture de commande, de facture ou
+    de paiement (customers.services.lifetime) : tri des clients par valeur sans
+    parcourir leurs commandes
+    """
+    customer = models.OneToOneField(
+        Customer,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Client'
+    )
+    
+    total_orders = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Nombre de commandes'
+    )
+    
+    # Chiffre d'affaires TTC des commandes livrées
+    total_spent = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Total dépensé'
+    )
+    
+    last_order_date = models.DateTimeField(
+        blank=True,
+        null=True,
+        verbose_name='Dernière commande'
+    )
+    
+    # Restant dû des factures ouvertes
+    outstanding_amount = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        verbose_name='Encours'
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Dernière modification'
+    )
+    
+    class Meta:
+        verbose_name = 'Statistiques client'
+        verbose_name_plural = 'Statistiques clients'
+        indexes = [
+            models.Index(fields=['-total_spent'], name='customer_stats_spent_idx'),
+            models.Index(fields=['-last_order_date'], name='customer_stats_last_order_idx'),
+            models.Index(fields=['-outstanding_amount'], name='customer_stats_outstanding_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Statistiques {self.customer}"
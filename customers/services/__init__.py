@@ -0,0 +1,4 @@
+# Services pour l'application customers
+from . import lifetime, summary
+
+__all__ = ['lifetime', 'summary']
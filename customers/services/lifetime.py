@@ -0,0 +1,202 @@
+"""
+Agrégats par client (CustomerStats) : nombre de commandes, chiffre d'affaires des
+commandes livrées, date de la dernière commande et encours des factures ouvertes.
+
+Chaque écriture d'une commande ou d'une facture (customers.signals) applique sa
+variation par un UPDATE relatif (F expressions) sur la ligne du client ; la date
+de la dernière commande est relue par l'index (client, date) des commandes.
+Une ligne absente est recalculée entièrement (rebuild), de même que les clients
+touchés par une écriture en masse (bulk_create n'émet pas de signaux).
+
+Toute écriture liée à un client date sa ligne (updated_at), même sans variation
+des agrégats : la vue 360 du client (customers.services.summary) s'en sert comme
+version de son cache.
+"""
+import threading
+from collections import defaultdict
+from django.db.models import Case, Exists, F, Max, OuterRef, Subquery, When
+from django.utils import timezone
+from commandly import viewcache
+from commandly.stats import count_if, sum_of
+from customers.models import Customer, CustomerStats
+from invoices.models import Invoice
+from orders.models import Order
+from orders.services.totals import ZERO, quantize
+
+
+DELIVERED_STATUS = 'delivered'
+OPEN_INVOICE_STATUSES = ('pending', 'partially_paid', 'overdue')
+DEFAULT_BATCH_SIZE = 2000
+
+# Champs lus avant chaque écriture, par modèle
+ORDER_FIELDS = ('status', 'order_date', 'total_amount', 'customer_id')
+INVOICE_FIELDS = ('status', 'remaining_amount', 'customer_id')
+
+STATS_FIELDS = ('total_orders', 'total_spent', 'last_order_date', 'outstanding_amount')
+
+# Clients en cours de suppression : leurs commandes et factures supprimées en
+# cascade ne doivent pas recréer leur ligne d'agrégats
+_deleting = threading.local()
+
+
+def deleting_customers():
+    if not hasattr(_deleting, 'customers'):
+        _deleting.customers = set()
+    return _deleting.customers
+
+
+def order_value(state):
+    """Contribution d'une commande au chiffre d'affaires de son client"""
+    return state['total_amount'] if state['status'] == DELIVERED_STATUS else ZERO
+
+
+def invoice_outstanding(state):
+    """Contribution d'une facture à l'encours de son client"""
+    return state['remaining_amount'] if state['status'] in OPEN_INVOICE_STATUSES else ZERO
+
+
+def _last_order_date():
+    return Subquery(
+        Order.objects.filter(customer=OuterRef('customer')).order_by('-order_date').values('order_date')[:1]
+    )
+
+
+class Changes:
+    """Variations accumulées par client : [commandes, dépensé, encours, date à relire]"""
+
+    def __init__(self):
+        self.customers = defaultdict(lambda: [0, ZERO, ZERO, False])
+
+    def add_order(self, state, sign, dated=False):
+        if state is None:
+            return
+        delta = self.customers[state['customer_id']]
+        delta[0] += sign
+        delta[1] += sign * order_value(state)
+        delta[3] = delta[3] or dated
+
+    def add_invoice(self, state, sign):
+        if state is None:
+            return
+        self.customers[state['customer_id']][2] += sign * invoice_outstanding(state)
+
+    def apply(self):
+        for customer_id, (orders, spent, outstanding, dated) in self.customers.items():
+            apply(customer_id, orders, spent, outstanding, refresh_last_order=dated)
+
+
+def apply(customer_id, orders=0, spent=ZERO, outstanding=ZERO, refresh_last_order=False):
+    """Applique une variation aux agrégats d'un client (recalculés si absents) et date sa ligne"""
+    if customer_id is None or customer_id in deleting_customers():
+        return
+    changes = {'updated_at': timezone.now()}
+    if orders:
+        changes['total_orders'] = F('total_orders') + orders
+    if spent:
+        changes['total_spent'] = F('total_spent') + quantize(spent)
+    if outstanding:
+        changes['outstanding_amount'] = F('outstanding_amount') + quantize(outstanding)
+    if refresh_last_order:
+        changes['last_order_date'] = _last_order_date()
+    if not CustomerStats.objects.filter(pk=customer_id).update(**changes):
+        rebuild([customer_id])
+
+
+def touch(customer_id):
+    """Date la ligne d'un client après une écriture sans effet sur ses agrégats"""
+    if customer_id is None or customer_id in deleting_customers():
+        return
+    CustomerStats.objects.filter(pk=customer_id).update(updated_at=timezone.now())
+
+
+def touch_all(customer_ids):
+    """Date en une requête les lignes des clients touchés par une écriture en masse sans effet sur leurs agrégats"""
+    customer_ids = set(customer_ids) - deleting_customers() - {None}
+    if customer_ids:
+        CustomerStats.objects.filter(pk__in=customer_ids).update(updated_at=timezone.now())
+
+
+def apply_to_order(order_id, spent):
+    """Variation du total d'une commande : comptée seulement si elle est livrée"""
+    delivered = Exists(Order.objects.filter(pk=order_id, status=DELIVERED_STATUS))
+    CustomerStats.objects.filter(customer__orders__pk=order_id).update(
+        total_spent=Case(When(delivered, then=F('total_spent') + quantize(spent)), default=F('total_spent')),
+        updated_at=timezone.now(),
+    )
+
+
+def apply_to_invoice(invoice_id, outstanding):
+    """Variation de l'encours d'une facture, reportée sur son client"""
+    CustomerStats.objects.filter(customer__invoices__pk=invoice_id).update(
+        outstanding_amount=F('outstanding_amount') + quantize(outstanding), updated_at=timezone.now(),
+    )
+
+
+def compute(customer_ids):
+    """Agrégats recalculés des clients donnés, en deux requêtes groupées"""
+    orders = (
+        Order.objects.filter(customer_id__in=customer_ids)
+        .order_by().values('customer_id')
+        .annotate(
+            total_orders=count_if(),
+            total_spent=sum_of('total_amount', status=DELIVERED_STATUS),
+            last_order_date=Max('order_date'),
+        )
+    )
+    invoices = (
+        Invoice.objects.filter(customer_id__in=customer_ids, status__in=OPEN_INVOICE_STATUSES)
+        .order_by().values('customer_id')
+        .annotate(outstanding_amount=sum_of('remaining_amount'))
+    )
+    rows = {
+        customer_id: {'total_orders': 0, 'total_spent': ZERO, 'last_order_date': None, 'outstanding_amount': ZERO}
+        for customer_id in customer_ids
+    }
+    for row in orders:
+        rows[row.pop('customer_id')].update(row)
+    for row in invoices:
+        rows[row.pop('customer_id')].update(row)
+    for row in rows.values():
+        row['total_spent'] = quantize(row['total_spent'])
+        row['outstanding_amount'] = quantize(row['outstanding_amount'])
+    return rows
+
+
+def _rebuild_chunk(customer_ids):
+    now = timezone.now()
+    stats = [
+        CustomerStats(customer_id=customer_id, updated_at=now, **values)
+        for customer_id, values in compute(customer_ids).items()
+    ]
+    CustomerStats.objects.bulk_create(
+        stats, update_conflicts=True, unique_fields=['customer'], update_fields=[*STATS_FIELDS, 'updated_at'],
+    )
+    viewcache.invalidate(CustomerStats)
+    return len(stats)
+
+
+def rebuild(customer_ids=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Recalcule les agrégats des clients donnés (tous par défaut), par lots de
+    `batch_size` clients. Retourne le nombre de clients recalculés.
+    """
+    customers = Customer.objects.order_by('pk')
+    if customer_ids is not None:
+        customers = customers.filter(pk__in=set(customer_ids) - deleting_customers())
+    rebuilt = 0
+    last_id = 0
+    while True:
+        chunk = list(customers.filter(pk__gt=last_id).values_list('pk', flat=True)[:batch_size])
+        if not chunk:
+            return rebuilt
+        rebuilt += _rebuild_chunk(chunk)
+        last_id = chunk[-1]
+
+
+def stats_for(customer):
+    """Agrégats d'un client, calculés s'ils n'existent pas encore"""
+    try:
+        return customer.stats
+    except CustomerStats.DoesNotExist:
+        rebuild([customer.pk])
+        return CustomerStats.objects.get(pk=customer.pk)
@@ -0,0 +1,90 @@
+"""
+Vue 360 d'un client : activité récente (commandes, factures, paiements),
+agrégats (CustomerStats) et produits les plus achetés.
+
+Le client et ses agrégats sont lus ensemble (select_related), puis chaque bloc
+en une requête : quatre requêtes quel que soit l'historique du client. Le
+résultat est mis en cache sous une clé formée des dates de modification du
+client et de ses agrégats ; toute écriture liée au client date ses agrégats
+(customers.services.lifetime) et change donc la clé : l'ancienne entrée n'est
+plus lue et expire après SUMMARY_CACHE_TIMEOUT secondes.
+"""
+import hashlib
+from django.core.cache import cache
+from django.db.models import F, Sum
+from customers.services import lifetime
+from orders.models import OrderItem
+
+
+RECENT_LIMIT = 10
+TOP_PRODUCTS_LIMIT = 5
+SUMMARY_CACHE_TIMEOUT = 300
+# Commandes dont les produits ne comptent pas parmi les achats du client
+EXCLUDED_ORDER_STATUSES = ('draft', 'cancelled')
+
+
+class CustomerSummary:
+    """
+    Vue 360 d'un client : agrégats, activité récente et produits les plus achetés
+    """
+
+    def __init__(self, stats, orders, invoices, payments, top_products):
+        self.stats = stats
+        self.orders = orders
+        self.invoices = invoices
+        self.payments = payments
+        self.top_products = top_products
+
+    @property
+    def total_orders(self):
+        return self.stats.total_orders
+
+    @property
+    def total_spent(self):
+        return self.stats.total_spent
+
+    @property
+    def outstanding_amount(self):
+        return self.stats.outstanding_amount
+
+
+def cache_key(customer, stats):
+    parts = [customer.pk, customer.updated_at, stats.updated_at]
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()[:16]
+    return f'customer_summary:{customer.pk}:{digest}'
+
+
+def top_products(customer_id, limit=TOP_PRODUCTS_LIMIT):
+    """Produits les plus achetés par le client (quantités), en une requête groupée"""
+    return list(
+        OrderItem.objects.filter(order__customer_id=customer_id)
+        .exclude(order__status__in=EXCLUDED_ORDER_STATUSES)
+        .order_by().values('product_id', 'product__name', 'product__sku')
+        .annotate(total_quantity=Sum('quantity'), amount_ht=Sum(F('quantity') * F('unit_price')))
+        .order_by('-total_quantity', 'product_id')[:limit]
+    )
+
+
+def compute(customer, stats):
+    """Vue 360 lue en base (une requête par bloc)"""
+    return CustomerSummary(
+        stats,
+        orders=list(customer.orders.order_by('-order_date', '-id')[:RECENT_LIMIT]),
+        invoices=list(customer.invoices.order_by('-invoice_date', '-id')[:RECENT_LIMIT]),
+        payments=list(customer.payments.order_by('-payment_date', '-id')[:RECENT_LIMIT]),
+        top_products=top_products(customer.pk),
+    )
+
+
+def summary(customer, refresh=False):
+    """
+    Vue 360 d'un client, lue en cache si possible. Le client doit être chargé
+    avec ses agrégats (select_related('stats')) pour éviter une requête de plus.
+    """
+    stats = lifetime.stats_for(customer)
+    key = cache_key(customer, stats)
+    result = None if refresh else cache.get(key)
+    if result is None:
+        result = compute(customer, stats)
+        cache.set(key, result, SUMMARY_CACHE_TIMEOUT)
+    return result
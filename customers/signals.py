@@ -0,0 +1,116 @@
+"""
+Signaux de maintenance des agrégats par client (CustomerStats).
+
+L'état d'une commande ou d'une facture est lu en base juste avant son écriture
+ou sa suppression (commandly.snapshots, lecture partagée avec le tableau de bord),
+puis la différence avec le nouvel état est appliquée par customers.services.lifetime.
+Les totaux des commandes et les soldes des factures, modifiés par des UPDATE
+relatifs, arrivent par order_totals_changed et invoice_balance_changed. Les
+paiements ne font que dater la ligne du client.
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from commandly import snapshots
+from customers.models import Customer, CustomerStats
+from customers.services import lifetime
+from invoices.models import Invoice
+from orders.models import Order
+from orders.signals import order_totals_changed
+from payments.models import Payment
+from payments.signals import invoice_balance_changed
+
+
+snapshots.track(Order, lifetime.ORDER_FIELDS)
+snapshots.track(Invoice, lifetime.INVOICE_FIELDS)
+
+
+def _instance_state(instance, fields):
+    return {name: getattr(instance, name) for name in fields}
+
+
+# Clients
+
+@receiver(post_save, sender=Customer)
+def create_customer_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        # Par l'identifiant : la ligne n'est pas mise en cache sur l'instance, où elle vieillirait
+        CustomerStats.objects.get_or_create(customer_id=instance.pk)
+
+
+@receiver(pre_delete, sender=Customer)
+def remember_deleted_customer(sender, instance, **kwargs):
+    lifetime.deleting_customers().add(instance.pk)
+
+
+@receiver(post_delete, sender=Customer)
+def forget_deleted_customer(sender, instance, **kwargs):
+    lifetime.deleting_customers().discard(instance.pk)
+
+
+# Commandes
+
+@receiver(post_save, sender=Order)
+def track_order(sender, instance, update_fields=None, **kwargs):
+    previous = snapshots.stored_state(instance, lifetime.ORDER_FIELDS)
+    current = _instance_state(instance, lifetime.ORDER_FIELDS)
+    if previous is not None and (update_fields is None or 'total_amount' not in update_fields):
+        # Les totaux sont maintenus en base par le moteur de totaux, pas par save()
+        current['total_amount'] = previous['total_amount']
+    dated = previous is None or (previous['order_date'], previous['customer_id']) != (
+        current['order_date'], current['customer_id']
+    )
+    changes = lifetime.Changes()
+    changes.add_order(previous, -1, dated)
+    changes.add_order(current, 1, dated)
+    changes.apply()
+
+
+@receiver(post_delete, sender=Order)
+def track_deleted_order(sender, instance, **kwargs):
+    changes = lifetime.Changes()
+    changes.add_order(snapshots.stored_state(instance, lifetime.ORDER_FIELDS), -1, dated=True)
+    changes.apply()
+
+
+@receiver(order_totals_changed, sender=Order)
+def track_order_totals(sender, order_id, delta, **kwargs):
+    if delta is None:
+        # Totaux recalculés : variation inconnue, le client est recalculé
+        customer_id = Order.objects.filter(pk=order_id).values_list('customer_id', flat=True).first()
+        if customer_id is not None:
+            lifetime.rebuild([customer_id])
+    else:
+        lifetime.apply_to_order(order_id, delta)
+
+
+# Factures
+
+@receiver(post_save, sender=Invoice)
+def track_invoice(sender, instance, **kwargs):
+    changes = lifetime.Changes()
+    changes.add_invoice(snapshots.stored_state(instance, lifetime.INVOICE_FIELDS), -1)
+    changes.add_invoice(_instance_state(instance, lifetime.INVOICE_FIELDS), 1)
+    changes.apply()
+
+
+@receiver(post_delete, sender=Invoice)
+def track_deleted_invoice(sender, instance, **kwargs):
+    # État enregistré : l'instance supprimée peut être plus ancienne que la base
+    changes = lifetime.Changes()
+    changes.add_invoice(snapshots.stored_state(instance, lifetime.INVOICE_FIELDS), -1)
+    changes.apply()
+
+
+@receiver(invoice_balance_changed, sender=Invoice)
+def track_invoice_balance(sender, invoice_id, previous, current, **kwargs):
+    # Solde modifié par un UPDATE relatif (paiements), hors de Invoice.save()
+    lifetime.apply_to_invoice(invoice_id, lifetime.invoice_outstanding(current) - lifetime.invoice_outstanding(previous))
+
+
+# Paiements : le solde de la facture arrive par invoice_balance_changed, la ligne du
+# client est seulement datée (paiements récents de la vue 360)
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def track_payment(sender, instance, **kwargs):
+    lifetime.touch(instance.customer_id)
@@ -1,3 +1,198 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from commandly.testing import QueryCountTestCase
+from customers.models import Customer, CustomerStats
+from customers.services import lifetime, summary
+from invoices.services import billing
+from orders.models import Order, OrderItem
+from orders.services.importer import import_orders
+from payments.models import Payment
+from products.models import Product
 
-# Create your tests here.
+
+class CustomerQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_customer_list_queries(self):
+        self.assertMaxQueries(5, reverse('customers:customer_list'))
+
+    def test_customer_detail_queries(self):
+        self.assertMaxQueries(8, reverse('customers:customer_detail', args=[self.data['customer'].pk]))
+
+
+class CustomerExportTests(QueryCountTestCase):
+    """
+    Export des clients avec les filtres de la liste
+    """
+
+    def test_csv(self):
+        response = self.client.get(reverse('customers:customer_export'), {'search_type': 'name', 'customer_type': 'company'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1 + self.sample_rows // 2)
+        self.assertTrue(all(line.startswith('Société ') for line in lines[1:]))
+
+    def test_csv_neutralizes_formulas(self):
+        Customer.objects.create(
+            first_name='=HYPERLINK("http://exemple.test")', last_name='Sow', email='sow@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='sow',
+        )
+        response = self.client.get(reverse('customers:customer_export'))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"\'=HYPERLINK(""http://exemple.test"") Sow"', content)
+
+
+class CustomerStatsTests(QueryCountTestCase):
+    """
+    Agrégats des clients maintenus par les écritures des commandes, factures et paiements
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.product = Product.objects.filter(stock_quantity__gt=0).first()
+
+    def assertMatchesRebuild(self):
+        incremental = list(CustomerStats.objects.order_by('pk').values_list('pk', *lifetime.STATS_FIELDS))
+        lifetime.rebuild()
+        self.assertEqual(incremental, list(CustomerStats.objects.order_by('pk').values_list('pk', *lifetime.STATS_FIELDS)))
+
+    def test_sample_data(self):
+        stats = self.data['customer'].get_stats()
+        self.assertEqual((stats.total_orders, stats.total_spent, stats.outstanding_amount), (1, Decimal('2360.00'), Decimal('1860.00')))
+        self.assertMatchesRebuild()
+
+    def test_order_lifecycle(self):
+        customer, product = self.data['customer'], self.product
+        order = Order.objects.create(customer=customer)
+        OrderItem.objects.create(order=order, product=product, quantity=2, unit_price=product.unit_price)
+        self.assertMatchesRebuild()
+        self.assertEqual(customer.get_stats().total_orders, 2)
+
+        order.refresh_from_db()
+        order.status = 'delivered'
+        order.save()
+        item = OrderItem.objects.create(order=order, product=product, quantity=1, unit_price=product.unit_price)
+        self.assertMatchesRebuild()
+        self.assertEqual(CustomerStats.objects.get(pk=customer.pk).total_spent, Decimal('2360.00') * 2 + Decimal('1180.00'))
+
+        item.delete()
+        order.refresh_from_db()
+        order.customer = Customer.objects.exclude(pk=customer.pk).first()
+        order.save()
+        self.assertMatchesRebuild()
+
+        order.delete()
+        self.assertMatchesRebuild()
+
+    def test_invoices_and_payments(self):
+        invoice = self.data['invoice']
+        Payment.objects.create(invoice=invoice, customer=invoice.customer, amount=Decimal('360.00'), payment_method='cash', status='completed')
+        self.assertMatchesRebuild()
+        self.assertEqual(CustomerStats.objects.get(pk=invoice.customer_id).outstanding_amount, Decimal('1500.00'))
+
+        invoice.refresh_from_db()
+        invoice.status = 'cancelled'
+        invoice.save()
+        self.assertMatchesRebuild()
+        self.assertEqual(CustomerStats.objects.get(pk=invoice.customer_id).outstanding_amount, 0)
+
+    def test_deleting_stale_invoice(self):
+        # Instance chargée avant un paiement : la suppression retire le solde enregistré
+        invoice = self.data['invoice']
+        Payment.objects.create(invoice=invoice, customer=invoice.customer, amount=Decimal('360.00'), payment_method='cash', status='completed')
+        invoice.delete()
+        self.assertMatchesRebuild()
+
+    def test_one_stored_state_read_per_save(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        order = Order.objects.get(pk=self.data['order'].pk)
+        order.notes = 'Livraison le matin'
+        with CaptureQueriesContext(connection) as context:
+            order.save()
+        reads = [
+            query for query in context.captured_queries
+            if query['sql'].startswith('SELECT') and 'FROM "orders_order" WHERE "orders_order"."id"' in query['sql']
+        ]
+        self.assertEqual(len(reads), 1)
+
+    def test_customer_delete(self):
+        customer = Customer.objects.create(first_name='Nouveau', last_name='Client', email='nouveau@example.com', slug='nouveau')
+        self.assertTrue(CustomerStats.objects.filter(pk=customer.pk).exists())
+        Order.objects.create(customer=customer)
+        customer.delete()
+        self.assertFalse(CustomerStats.objects.filter(pk=customer.pk).exists())
+
+    def test_bulk_writes(self):
+        stream = StringIO(
+            'order_ref,customer_id,product_id,quantity,status\n'
+            f"A1,{self.data['customer'].pk},{self.product.pk},3,delivered\n"
+        )
+        report = import_orders(stream, 'csv')
+        self.assertEqual(report.orders_created, 1)
+        self.assertMatchesRebuild()
+        self.assertEqual(billing.generate().created, 1)
+        self.assertMatchesRebuild()
+
+    def test_sort_by_value(self):
+        customer = Customer.objects.get(pk=self.data['customer'].pk)
+        order = Order.objects.create(customer=customer, status='delivered')
+        OrderItem.objects.create(order=order, product=self.product, quantity=5, unit_price=Decimal('1000.00'))
+        response = self.client.get(reverse('customers:customer_list'), {'search_type': 'name', 'sort': 'value'})
+        self.assertEqual(response.context['page_obj'][0], customer)
+        response = self.client.get(reverse('customers:customer_list'), {'search_type': 'name', 'sort': 'value', 'pagination': 'keyset'})
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertEqual(response.context['page_obj'][0], customer)
+
+    def test_command(self):
+        CustomerStats.objects.all().delete()
+        out = StringIO()
+        call_command('rebuild_customer_stats', stdout=out)
+        self.assertIn(f'{self.sample_rows} client(s)', out.getvalue())
+        self.assertEqual(CustomerStats.objects.count(), self.sample_rows)
+
+
+class CustomerSummaryTests(QueryCountTestCase):
+    """
+    Vue 360 du client : nombre fixe de requêtes et cache invalidé par les écritures liées
+    """
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.customer = Customer.objects.select_related('stats').get(pk=self.data['customer'].pk)
+
+    def test_compute(self):
+        with self.assertNumQueries(4):
+            result = summary.summary(self.customer)
+        self.assertEqual([order.pk for order in result.orders], [self.data['order'].pk])
+        self.assertEqual([invoice.pk for invoice in result.invoices], [self.data['invoice'].pk])
+        self.assertEqual([payment.pk for payment in result.payments], [self.data['payment'].pk])
+        self.assertEqual((result.total_orders, result.total_spent, result.outstanding_amount), (1, Decimal('2360.00'), Decimal('1860.00')))
+        self.assertEqual([product['total_quantity'] for product in result.top_products], [1, 1])
+
+        # Lue en cache tant que le client et ses agrégats n'ont pas changé
+        with self.assertNumQueries(0):
+            summary.summary(self.customer)
+
+    def test_invalidated_by_related_writes(self):
+        summary.summary(self.customer)
+        invoice = self.data['invoice']
+        payment = Payment.objects.create(invoice=invoice, customer=invoice.customer, amount=Decimal('100.00'), payment_method='cash')
+        customer = Customer.objects.select_related('stats').get(pk=self.customer.pk)
+        self.assertIn(payment.pk, [payment.pk for payment in summary.summary(customer).payments])
+
+        order = Order.objects.create(customer=customer)
+        customer = Customer.objects.select_related('stats').get(pk=self.customer.pk)
+        self.assertEqual(summary.summary(customer).orders[0].pk, order.pk)
+
+    def test_detail_view(self):
+        url = reverse('customers:customer_detail', args=[self.customer.pk])
+        self.assertMaxQueries(7, url)
+        response = self.client.get(url)
+        self.assertContains(response, self.data['product'].name)
@@ -5,6 +5,7 @@ app_name = 'customers'
 
 urlpatterns = [
     path('', views.CustomerListView.as_view(), name='customer_list'),
+    path('export/', views.CustomerExportView.as_view(), name='customer_export'),
     path('create/', views.CustomerCreateView.as_view(), name='customer_create'),
     path('<int:pk>/', views.CustomerDetailView.as_view(), name='customer_detail'),
     path('<int:pk>/edit/', views.CustomerUpdateView.as_view(), name='customer_update'),
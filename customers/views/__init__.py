@@ -1,4 +1,5 @@
 # Vues pour l'application customers
+from .export import CustomerExportView
 from .customer import (
     CustomerListView, CustomerCreateView, CustomerDetailView, CustomerUpdateView, CustomerDeleteView,
     CustomerToggleStatusView, CustomerQuickSearchView
@@ -6,5 +7,5 @@ from .customer import (
 
 __all__ = [
     'CustomerListView', 'CustomerCreateView', 'CustomerDetailView', 'CustomerUpdateView', 'CustomerDeleteView',
-    'CustomerToggleStatusView', 'CustomerQuickSearchView'
+    'CustomerToggleStatusView', 'CustomerQuickSearchView', 'CustomerExportView'
 ]
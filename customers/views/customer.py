@@ -6,22 +6,44 @@ from django.db.models import Q
 from django.http import JsonResponse
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from commandly.pagination import KeysetPaginationMixin
+from commandly.stats import count_if, summarize
+from commandly.viewcache import CachedViewMixin
 from customers.models import Customer
 from customers.forms.customer_forms import CustomerForm, CustomerSearchForm
+from customers.services import summary
+from search.services import autocomplete, search
 
 
-class CustomerListView(LoginRequiredMixin, ListView):
+class CustomerListView(LoginRequiredMixin, CachedViewMixin, KeysetPaginationMixin, ListView):
     """
     Liste des clients avec recherche et pagination
     """
     model = Customer
     template_name = 'customers/customer_list.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['customers.Customer', 'customers.CustomerStats', 'orders.Order', 'invoices.Invoice', 'payments.Payment']
     context_object_name = 'page_obj'
     paginate_by = 20
+    # Tri du mode de pagination par curseur (?pagination=keyset)
+    keyset_ordering = ('-created_at', '-id')
     login_url = reverse_lazy('users:login')
     
+    def get_sort_ordering(self):
+        """Ordre choisi dans le formulaire (tri sur les agrégats), None par défaut"""
+        search_form = CustomerSearchForm(self.request.GET)
+        if search_form.is_valid():
+            return CustomerSearchForm.SORT_ORDERINGS.get(search_form.cleaned_data.get('sort'))
+        return None
+    
+    def get_pagination_mode(self):
+        # Le curseur ne suit que l'ordre par défaut : les tris sur les agrégats sont paginés par numéro
+        if self.get_sort_ordering():
+            return 'offset'
+        return super().get_pagination_mode()
+    
     def get_queryset(self):
-        queryset = Customer.objects.all()
+        queryset = Customer.objects.select_related('stats')
         
         # Récupération des paramètres de recherche
         search_form = CustomerSearchForm(self.request.GET)
@@ -53,52 +75,62 @@ class CustomerListView(LoginRequiredMixin, ListView):
             if is_active:
                 queryset = queryset.filter(is_active=is_active == 'True')
         
+        ordering = self.get_sort_ordering()
+        if ordering:
+            return queryset.order_by(*ordering)
         return queryset.order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         search_form = CustomerSearchForm(self.request.GET)
-        customers = self.get_queryset()
         
-        context.update({
-            'search_form': search_form,
-            'total_customers': customers.count(),
-            'active_customers': customers.filter(is_active=True).count(),
-            'company_customers': customers.filter(customer_type='company').count(),
-            'individual_customers': customers.filter(customer_type='individual').count(),
-        })
+        # Calcul des statistiques en une seule requête sur la liste filtrée
+        stats = summarize(
+            self.object_list,
+            total_customers=count_if(),
+            active_customers=count_if(is_active=True),
+            company_customers=count_if(customer_type='company'),
+            individual_customers=count_if(customer_type='individual'),
+        )
+        
+        context['search_form'] = search_form
+        context.update(stats)
         
         return context
 
 
-class CustomerDetailView(LoginRequiredMixin, DetailView):
+class CustomerDetailView(LoginRequiredMixin, CachedViewMixin, DetailView):
     """
     Détail d'un client
     """
     model = Customer
     template_name = 'customers/customer_detail.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = [
+        'customers.Customer', 'customers.CustomerStats', 'orders.Order', 'orders.OrderItem',
+        'invoices.Invoice', 'payments.Payment', 'products.Product',
+    ]
     context_object_name = 'customer'
     login_url = reverse_lazy('users:login')
     
+    def get_queryset(self):
+        return Customer.objects.select_related('stats')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        customer = self.get_object()
-        
-        # Récupération des commandes du client
-        orders = customer.orders.all().order_by('-order_date')[:10] if hasattr(customer, 'orders') else []
-        
-        # Récupération des factures du client
-        invoices = customer.invoices.all().order_by('-invoice_date')[:10] if hasattr(customer, 'invoices') else []
         
-        # Récupération des paiements du client
-        payments = customer.payments.all().order_by('-payment_date')[:10] if hasattr(customer, 'payments') else []
+        # Vue 360 en un nombre fixe de requêtes, lue en cache si le client n'a pas changé
+        customer_summary = summary.summary(self.object)
         
         context.update({
-            'orders': orders,
-            'invoices': invoices,
-            'payments': payments,
-            'total_orders': customer.get_total_orders(),
-            'total_spent': customer.get_total_spent(),
+            'summary': customer_summary,
+            'stats': customer_summary.stats,
+            'orders': customer_summary.orders,
+            'invoices': customer_summary.invoices,
+            'payments': customer_summary.payments,
+            'top_products': customer_summary.top_products,
+            'total_orders': customer_summary.total_orders,
+            'total_spent': customer_summary.total_spent,
         })
         
         return context
@@ -145,7 +177,7 @@ class CustomerUpdateView(LoginRequiredMixin, UpdateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        customer = self.get_object()
+        customer = self.object
         context.update({
             'title': f'Modifier {customer.full_name}',
             'submit_text': 'Enregistrer les modifications',
@@ -177,7 +209,7 @@ class CustomerDeleteView(LoginRequiredMixin, DeleteView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        customer = self.get_object()
+        customer = self.object
         
         # Vérification des dépendances
         has_orders = hasattr(customer, 'orders') and customer.orders.exists()
@@ -236,12 +268,12 @@ class CustomerQuickSearchView(LoginRequiredMixin, View):
         if len(query) < 2:
             return JsonResponse({'results': []})
         
-        customers = Customer.objects.filter(
-            Q(first_name__icontains=query) |
-            Q(last_name__icontains=query) |
-            Q(company_name__icontains=query) |
-            Q(email__icontains=query)
-        ).filter(is_active=True)[:10]
+        results = autocomplete.cached_results('customers', query, lambda: self.get_results(query))
+        return JsonResponse({'results': results})
+    
+    def get_results(self, query):
+        # Index plein texte : recherche par préfixe des mots, classée par pertinence
+        customers = search('customers', query, limit=10)
         
         results = []
         for customer in customers:
@@ -252,5 +284,4 @@ class CustomerQuickSearchView(LoginRequiredMixin, View):
                 'phone': customer.phone or '',
                 'address': customer.full_address
             })
-        
-        return JsonResponse({'results': results})
\ No newline at end of file
+        return results
\ No newline at end of file
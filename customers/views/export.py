@@ -0,0 +1,27 @@
+from commandly.export import Column, ExportMixin, choice_column, customer_column
+from customers.models import Customer
+from customers.views.customer import CustomerListView
+
+
+class CustomerExportView(ExportMixin, CustomerListView):
+    """
+    Export CSV / XLSX des clients, avec les filtres de la liste
+    """
+    export_filename = 'clients'
+    export_columns = [
+        customer_column('Nom', prefix=''),
+        choice_column('Type', 'customer_type', Customer.TYPE_CHOICES),
+        Column('Prénom', 'first_name'),
+        Column('Nom de famille', 'last_name'),
+        Column('Société', 'company_name'),
+        Column('Email', 'email'),
+        Column('Téléphone', 'phone'),
+        Column('Adresse', 'address_line1'),
+        Column('Complément', 'address_line2'),
+        Column('Code postal', 'postal_code'),
+        Column('Ville', 'city'),
+        Column('Pays', 'country'),
+        Column('NINEA', 'ninea'),
+        Column('Actif', 'is_active'),
+        Column('Créé le', 'created_at'),
+    ]
@@ -5,3 +5,7 @@ class DashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'dashboard'
     verbose_name = 'Tableau de bord'
+
+    def ready(self):
+        # Mise à jour incrémentale des métriques à chaque écriture
+        from dashboard import signals  # noqa: F401
@@ -0,0 +1,47 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from dashboard.services.metrics import TOP_N, build_metrics
+
+
+class Command(BaseCommand):
+    help = "Calcule les métriques précalculées du tableau de bord (jours, mois et classements)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help="Reconstruit tout l'historique au lieu des seules périodes modifiées",
+        )
+        parser.add_argument(
+            '--since',
+            help='Recalcule les périodes modifiées depuis cette date (ISO 8601)',
+        )
+        parser.add_argument(
+            '--top',
+            type=int,
+            default=TOP_N,
+            help='Taille des classements clients et produits (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            try:
+                since = parse_datetime(options['since'])
+            except ValueError:
+                # Date bien formée mais inexistante (2025-02-30)
+                since = None
+            if since is None:
+                raise CommandError(f"Date invalide : {options['since']}")
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        started = time.perf_counter()
+        result = build_metrics(since=since, full=options['full'], top_n=options['top'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Métriques recalculées : {result['days']} jour(s), {result['months']} mois en {elapsed:.2f} s."
+        ))
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="active_categories",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Catégories actives"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="active_products",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Produits actifs"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="pending_invoices",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Factures en attente"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="period_type",
+            field=models.CharField(
+                choices=[("day", "Jour"), ("month", "Mois")],
+                default="month",
+                max_length=10,
+                verbose_name="Type de période",
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="total_categories",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Total des catégories"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="total_invoices",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Total des factures"
+            ),
+        ),
+        migrations.AddField(
+            model_name="dashboardmetrics",
+            name="total_payments",
+            field=models.PositiveIntegerField(
+                default=0, verbose_name="Total des paiements"
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.5 on 2026-10-17 03:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dashboard", "0002_dashboardmetrics_active_categories_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StaleDay",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("day", models.DateField(unique=True, verbose_name="Jour")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de signalement"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Jour à recalculer",
+                "verbose_name_plural": "Jours à recalculer",
+            },
+        ),
+    ]
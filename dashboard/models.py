@@ -9,7 +9,20 @@ class DashboardMetrics(models.Model):
     Permet de mettre en cache les calculs coûteux
     """
     
+    # Types de période
+    PERIOD_CHOICES = [
+        ('day', 'Jour'),
+        ('month', 'Mois'),
+    ]
+    
     # Période de calcul
+    period_type = models.CharField(
+        max_length=10,
+        choices=PERIOD_CHOICES,
+        default='month',
+        verbose_name='Type de période'
+    )
+    
     period_start = models.DateField(
         verbose_name='Début de période'
     )
@@ -61,6 +74,22 @@ class DashboardMetrics(models.Model):
         verbose_name='Total restant dû'
     )
     
+    # Métriques des factures et paiements
+    total_invoices = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total des factures'
+    )
+    
+    pending_invoices = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Factures en attente'
+    )
+    
+    total_payments = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total des paiements'
+    )
+    
     # Métriques des clients
     total_customers = models.PositiveIntegerField(
         default=0,
@@ -83,6 +112,11 @@ class DashboardMetrics(models.Model):
         verbose_name='Total des produits'
     )
     
+    active_products = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Produits actifs'
+    )
+    
     low_stock_products = models.PositiveIntegerField(
         default=0,
         verbose_name='Produits en stock faible'
@@ -93,6 +127,17 @@ class DashboardMetrics(models.Model):
         verbose_name='Produits en rupture'
     )
     
+    # Métriques des catégories
+    total_categories = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Total des catégories'
+    )
+    
+    active_categories = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Catégories actives'
+    )
+    
     # Métadonnées
     last_calculated = models.DateTimeField(
         auto_now=True,
@@ -114,10 +159,11 @@ class DashboardMetrics(models.Model):
         return f"Métriques {self.period_start} - {self.period_end}"
     
     @classmethod
-    def get_current_metrics(cls):
+    def get_current_metrics(cls, period_type='month'):
         """Récupère les métriques actuelles"""
         today = timezone.now().date()
         return cls.objects.filter(
+            period_type=period_type,
             period_start__lte=today,
             period_end__gte=today,
             is_current=True
@@ -268,3 +314,28 @@ class TopProduct(models.Model):
     
     def __str__(self):
         return f"{self.product} - Rang {self.rank}"
+
+
+class StaleDay(models.Model):
+    """
+    Jour dont des données ont été supprimées ou déplacées vers un autre jour :
+    ces modifications n'apparaissent plus dans les données restantes et doivent
+    être signalées au calcul par lots (build_metrics)
+    """
+    
+    day = models.DateField(
+        unique=True,
+        verbose_name='Jour'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de signalement'
+    )
+    
+    class Meta:
+        verbose_name = 'Jour à recalculer'
+        verbose_name_plural = 'Jours à recalculer'
+    
+    def __str__(self):
+        return f"Jour à recalculer {self.day}"
@@ -0,0 +1,4 @@
+# Services pour l'application dashboard
+from . import events, metrics
+
+__all__ = ['events', 'metrics']
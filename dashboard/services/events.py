@@ -0,0 +1,325 @@
+"""
+Maintenance incrémentale des métriques du tableau de bord.
+
+Chaque écriture d'une commande, d'une ligne de commande, d'une facture ou d'un
+paiement est traduite en « contribution » aux compteurs de son jour et de son mois.
+La différence entre la contribution avant et après l'écriture est appliquée par
+des UPDATE relatifs (F expressions) sur DashboardMetrics, TopCustomer et TopProduct,
+dans la transaction de l'écriture.
+
+Les lignes absentes du jour ou du mois (première écriture d'une période) sont
+créées à zéro avant d'y appliquer le delta ; le jour est signalé au calcul par
+lots (build_metrics), qui vérifie ces lignes à partir des données. Tant qu'aucun
+calcul n'a eu lieu, les deltas sont ignorés. Les écritures en masse (bulk_create,
+update) n'émettent pas de signaux ; elles sont aussi reprises par build_metrics.
+"""
+from collections import defaultdict
+from datetime import datetime
+from django.db import transaction
+from django.db.models import DecimalField, F, Q, Sum, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+from dashboard.models import DashboardMetrics, TopCustomer, TopProduct
+from dashboard.services.metrics import (
+    BILLABLE_ORDER_STATUSES, CATALOG_FIELDS, COMPLETED_ORDER_STATUSES, OPEN_INVOICE_STATUSES,
+    PENDING_ORDER_STATUSES, TOP_N, _top_customers, _top_products, last_build, mark_stale,
+    month_bounds,
+)
+from orders.models import OrderItem
+from orders.services.totals import ZERO, line_amounts, quantize
+
+
+# Champs lus en base avant chaque écriture, par modèle
+ORDER_FIELDS = ('status', 'order_date', 'total_amount', 'customer_id')
+ORDER_ITEM_FIELDS = ('order_id', 'product_id', 'unit_price', 'quantity', 'tax_rate')
+INVOICE_FIELDS = ('status', 'invoice_date', 'remaining_amount')
+PAYMENT_FIELDS = ('status', 'payment_date', 'amount')
+# États (et non cumuls) recopiés de la période précédente dans une nouvelle ligne
+CARRIED_FIELDS = ('total_customers', *CATALOG_FIELDS)
+
+
+def local_day(value):
+    """Jour (heure locale) d'une date ou d'une date/heure"""
+    if isinstance(value, datetime):
+        return timezone.localtime(value).date() if timezone.is_aware(value) else value.date()
+    return value
+
+
+class Delta:
+    """
+    Variation des métriques d'un jour : compteurs de DashboardMetrics et
+    contributions aux classements des clients et des produits du mois.
+    """
+
+    def __init__(self):
+        self.counters = defaultdict(int)
+        # {customer_id: [commandes, montant dépensé]}
+        self.customers = defaultdict(lambda: [0, ZERO])
+        # {product_id: [quantité, chiffre d'affaires HT, commandes]}
+        self.products = defaultdict(lambda: [0, ZERO, 0])
+        self.last_order_date = None
+
+    def __bool__(self):
+        return (
+            any(self.counters.values())
+            or any(any(values) for values in self.customers.values())
+            or any(any(values) for values in self.products.values())
+        )
+
+
+class Changes:
+    """Accumule des contributions signées, regroupées par jour"""
+
+    def __init__(self):
+        self.days = defaultdict(Delta)
+
+    def add(self, day, sign, counters=None, customers=None, products=None, ordered=False):
+        delta = self.days[day]
+        for name, value in (counters or {}).items():
+            delta.counters[name] += sign * value
+        for customer_id, values in (customers or {}).items():
+            current = delta.customers[customer_id]
+            for index, value in enumerate(values):
+                current[index] += sign * value
+        for product_id, values in (products or {}).items():
+            current = delta.products[product_id]
+            for index, value in enumerate(values):
+                current[index] += sign * value
+        if ordered and sign > 0:
+            delta.last_order_date = day
+
+    def apply(self):
+        for day, delta in self.days.items():
+            if delta:
+                apply_delta(day, delta)
+
+
+# Contributions par modèle
+
+def order_contribution(changes, state, sign, lines=None):
+    """Contribution d'une commande : compteurs par statut, chiffre d'affaires et classements"""
+    if state is None:
+        return
+    day = local_day(state['order_date'])
+    status = state['status']
+    billable = status in BILLABLE_ORDER_STATUSES
+    counters = {
+        'total_orders': 1,
+        'pending_orders': int(status in PENDING_ORDER_STATUSES),
+        'completed_orders': int(status in COMPLETED_ORDER_STATUSES),
+        'cancelled_orders': int(status == 'cancelled'),
+    }
+    customers = products = None
+    if billable:
+        counters['total_revenue'] = state['total_amount']
+        customers = {state['customer_id']: (1, state['total_amount'])}
+        products = lines
+    changes.add(day, sign, counters, customers, products, ordered=billable)
+
+
+def order_lines(order_id):
+    """Contribution des lignes d'une commande au classement des produits (une requête)"""
+    rows = (
+        OrderItem.objects
+        .filter(order_id=order_id)
+        .order_by()
+        .values('product_id')
+        .annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(F('unit_price') * F('quantity'), output_field=DecimalField(max_digits=12, decimal_places=2)),
+        )
+    )
+    return {
+        row['product_id']: (row['total_quantity'], quantize(row['total_revenue']), 1)
+        for row in rows
+    }
+
+
+def lines_contribution(lines):
+    """Même contribution qu'order_lines(), calculée sur des lignes en mémoire (dictionnaires)"""
+    quantities = defaultdict(int)
+    revenues = defaultdict(lambda: ZERO)
+    for line in lines:
+        quantities[line['product_id']] += line['quantity']
+        revenues[line['product_id']] += line['unit_price'] * line['quantity']
+    return {
+        product_id: (quantity, quantize(revenues[product_id]), 1)
+        for product_id, quantity in quantities.items()
+    }
+
+
+def order_item_contribution(changes, state, order, sign):
+    """Contribution d'une ligne : chiffre d'affaires de la commande et classements"""
+    if state is None or order is None or order['status'] not in BILLABLE_ORDER_STATUSES:
+        return
+    line_ht, line_tax = line_amounts(state['unit_price'], state['quantity'], state['tax_rate'])
+    changes.add(
+        local_day(order['order_date']),
+        sign,
+        counters={'total_revenue': line_ht + line_tax},
+        customers={order['customer_id']: (0, line_ht + line_tax)},
+        products={state['product_id']: (state['quantity'], line_ht, 0)},
+    )
+
+
+def invoice_contribution(changes, state, sign):
+    """Contribution d'une facture : nombre de factures et encours"""
+    if state is None:
+        return
+    is_open = state['status'] in OPEN_INVOICE_STATUSES
+    changes.add(local_day(state['invoice_date']), sign, {
+        'total_invoices': 1,
+        'pending_invoices': int(is_open),
+        'total_outstanding': state['remaining_amount'] if is_open else ZERO,
+    })
+
+
+def payment_contribution(changes, state, sign):
+    """Contribution d'un paiement : seuls les paiements complétés sont comptés"""
+    if state is None or state['status'] != 'completed':
+        return
+    changes.add(local_day(state['payment_date']), sign, {
+        'total_payments': 1,
+        'total_paid': state['amount'],
+    })
+
+
+# Application des deltas
+
+def _period_filter(day):
+    month_start, month_end = month_bounds(day)
+    return (
+        Q(period_type='day', period_start=day, period_end=day)
+        | Q(period_type='month', period_start=month_start, period_end=month_end)
+    )
+
+
+def apply_delta(day, delta):
+    """
+    Applique la variation d'un jour aux lignes du jour et du mois, puis aux
+    classements du mois. Les lignes absentes sont créées avec la variation.
+    """
+    with transaction.atomic():
+        counters = {name: value for name, value in delta.counters.items() if value}
+        metrics = DashboardMetrics.objects.filter(_period_filter(day))
+        if counters:
+            updated = metrics.update(**{name: F(name) + value for name, value in counters.items()})
+        else:
+            updated = metrics.count()
+        if updated < 2 and not _create_periods(day, counters):
+            return
+
+        start, end = month_bounds(day)
+        for customer_id, (orders, spent) in delta.customers.items():
+            if orders or spent:
+                _adjust_customer(customer_id, orders, spent, delta.last_order_date, start, end)
+        for product_id, (quantity, revenue, orders) in delta.products.items():
+            if quantity or revenue or orders:
+                _adjust_product(product_id, quantity, revenue, orders, start, end)
+
+
+def _create_periods(day, counters):
+    """
+    Crée les lignes absentes du jour et du mois de `day` avec les compteurs
+    donnés et les états (clients, catalogue) de la période précédente, puis
+    signale le jour au calcul par lots, qui vérifie ces lignes à partir des
+    données. Retourne False si les métriques n'ont jamais été calculées.
+    """
+    built = last_build()
+    if built is None:
+        return False
+    month_start, month_end = month_bounds(day)
+    existing = set(DashboardMetrics.objects.filter(_period_filter(day)).values_list('period_type', flat=True))
+    # Un retrait sur une période jamais calculée ne peut pas descendre sous zéro :
+    # le calcul par lots rétablit la valeur exacte
+    initial = {name: max(value, 0) for name, value in counters.items()}
+    today = timezone.localdate()
+    rows = []
+    for period_type, start, end in (('day', day, day), ('month', month_start, month_end)):
+        if period_type in existing:
+            continue
+        previous = (
+            DashboardMetrics.objects
+            .filter(period_type=period_type, period_start__lt=start)
+            .order_by('-period_start')
+            .values(*CARRIED_FIELDS)
+            .first()
+        )
+        rows.append(DashboardMetrics(
+            period_type=period_type,
+            period_start=start,
+            period_end=end,
+            is_current=start <= today <= end,
+            **(previous or {}),
+            **initial,
+        ))
+    DashboardMetrics.objects.bulk_create(rows, ignore_conflicts=True)
+    # last_calculated (auto_now) sert de point de reprise au calcul par lots :
+    # une ligne créée ici ne doit pas l'avancer
+    DashboardMetrics.objects.filter(_period_filter(day), last_calculated__gt=built).update(last_calculated=built)
+    mark_stale(day)
+    return True
+
+
+def _adjust_customer(customer_id, orders, spent, last_order_date, start, end):
+    changes = {'total_orders': F('total_orders') + orders, 'total_spent': F('total_spent') + spent}
+    if last_order_date is not None:
+        changes['last_order_date'] = Greatest(F('last_order_date'), Value(last_order_date))
+    ranking = TopCustomer.objects.filter(period_start=start, period_end=end)
+    updated = ranking.filter(customer_id=customer_id).update(**changes)
+    _rerank(
+        TopCustomer, _top_customers, start, end, ('-total_spent', '-total_orders', 'customer_id'),
+        updated=updated, entered=not updated and spent > 0, decreased=updated and spent < 0,
+        customer_id=customer_id,
+    )
+
+
+def _adjust_product(product_id, quantity, revenue, orders, start, end):
+    ranking = TopProduct.objects.filter(period_start=start, period_end=end)
+    updated = ranking.filter(product_id=product_id).update(
+        total_quantity=F('total_quantity') + quantity,
+        total_revenue=F('total_revenue') + revenue,
+        total_orders=F('total_orders') + orders,
+    )
+    _rerank(
+        TopProduct, _top_products, start, end, ('-total_revenue', '-total_quantity', 'product_id'),
+        updated=updated, entered=not updated and revenue > 0, decreased=updated and revenue < 0,
+        product_id=product_id,
+    )
+
+
+def _rerank(model, builder, start, end, ordering, updated, entered, decreased, **entity):
+    """
+    Réattribue les rangs d'un classement mensuel (TOP_N entrées au minimum).
+
+    Une entité absente qui progresse y entre avec son total réel du mois si elle
+    dépasse la dernière. Si une entrée d'un classement complet recule, un absent
+    peut la dépasser : le classement du mois est alors recalculé.
+    """
+    if not updated and not entered:
+        return
+    rows = list(model.objects.filter(period_start=start, period_end=end).order_by(*ordering))
+    size = max(TOP_N, len(rows))
+
+    if decreased and len(rows) >= TOP_N:
+        model.objects.filter(period_start=start, period_end=end).delete()
+        model.objects.bulk_create(builder(start, end, size))
+        return
+    if entered:
+        # Total réel du mois de l'entité (requête limitée à cette entité)
+        candidates = builder(start, end, 1, **entity)
+        if not candidates:
+            return
+        model.objects.bulk_create(candidates)
+        rows = list(model.objects.filter(period_start=start, period_end=end).order_by(*ordering))
+
+    changed = []
+    for rank, row in enumerate(rows[:size], start=1):
+        if row.rank != rank:
+            row.rank = rank
+            changed.append(row)
+    if changed:
+        model.objects.bulk_update(changed, ['rank'])
+    dropped = [row.pk for row in rows[size:]]
+    if dropped:
+        model.objects.filter(pk__in=dropped).delete()
@@ -0,0 +1,380 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from django.db import transaction
+from django.db.models import Count, DateField, DecimalField, F, Max, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from commandly.dates import start_of_day
+from commandly.stats import count_if, sum_of, summarize
+from customers.models import Customer
+from dashboard.models import DashboardMetrics, StaleDay, TopCustomer, TopProduct
+from invoices.models import Invoice
+from orders.models import Order, OrderItem
+from payments.models import Payment
+from products.models import Category, Product
+
+
+PENDING_ORDER_STATUSES = ('draft', 'confirmed', 'in_progress', 'ready')
+COMPLETED_ORDER_STATUSES = ('delivered', 'closed')
+BILLABLE_ORDER_STATUSES = tuple(code for code, label in Order.STATUS_CHOICES if code != 'cancelled')
+OPEN_INVOICE_STATUSES = ('pending', 'partially_paid', 'overdue')
+TOP_N = 10
+
+# Champs recopiés lors de l'écriture des métriques (hors clé de période)
+METRIC_FIELDS = [
+    'period_type', 'total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders',
+    'total_revenue', 'total_paid', 'total_outstanding', 'total_invoices', 'pending_invoices',
+    'total_payments', 'total_customers', 'new_customers', 'active_customers', 'total_products',
+    'active_products', 'low_stock_products', 'out_of_stock_products', 'total_categories',
+    'active_categories', 'is_current', 'last_calculated',
+]
+# État du catalogue : connu seulement à l'instant du calcul, donc écrit sur les
+# seules périodes courantes (les périodes passées gardent leurs valeurs)
+CATALOG_FIELDS = [
+    'total_products', 'active_products', 'low_stock_products', 'out_of_stock_products',
+    'total_categories', 'active_categories',
+]
+HISTORICAL_FIELDS = [name for name in METRIC_FIELDS if name not in CATALOG_FIELDS]
+
+
+def month_bounds(day):
+    """Retourne le premier et le dernier jour du mois contenant `day`"""
+    start = day.replace(day=1)
+    end = (start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
+    return start, end
+
+
+def _in_range(model, field, start, end):
+    """Filtre indexable couvrant [start, end] pour un champ date ou date/heure"""
+    if model._meta.get_field(field).get_internal_type() == 'DateTimeField':
+        return {f'{field}__gte': start_of_day(start), f'{field}__lt': start_of_day(end + timedelta(days=1))}
+    return {f'{field}__gte': start, f'{field}__lte': end}
+
+
+def _grouped(queryset, field, start, end, **aggregates):
+    """Agrège par jour les lignes dont `field` tombe dans [start, end]"""
+    rows = (
+        queryset
+        .filter(**_in_range(queryset.model, field, start, end))
+        .annotate(period=Trunc(field, 'day', output_field=DateField()))
+        .order_by()
+        .values('period')
+        .annotate(**aggregates)
+    )
+    return {row.pop('period'): row for row in rows}
+
+
+def _order_aggregates():
+    return {
+        'total_orders': count_if(),
+        'pending_orders': count_if(status__in=PENDING_ORDER_STATUSES),
+        'completed_orders': count_if(status__in=COMPLETED_ORDER_STATUSES),
+        'cancelled_orders': count_if(status='cancelled'),
+        'total_revenue': sum_of('total_amount', status__in=BILLABLE_ORDER_STATUSES),
+        'active_customers': Count('customer', distinct=True),
+    }
+
+
+def _invoice_aggregates():
+    return {
+        'total_invoices': count_if(),
+        'pending_invoices': count_if(status__in=OPEN_INVOICE_STATUSES),
+        'total_outstanding': sum_of('remaining_amount', status__in=OPEN_INVOICE_STATUSES),
+    }
+
+
+def _payment_aggregates():
+    return {
+        'total_payments': count_if(status='completed'),
+        'total_paid': sum_of('amount', status='completed'),
+    }
+
+
+def catalog_snapshot():
+    """État actuel du catalogue (produits et catégories), en deux requêtes"""
+    snapshot = summarize(
+        Product.objects.all(),
+        total_products=count_if(),
+        active_products=count_if(is_active=True),
+        low_stock_products=count_if(stock_level='low'),
+        out_of_stock_products=count_if(stock_level='out'),
+    )
+    snapshot.update(summarize(
+        Category.objects.all(),
+        total_categories=count_if(),
+        active_categories=count_if(is_active=True),
+    ))
+    return snapshot
+
+
+def _month_metrics(month_start, days, snapshot, now):
+    """
+    Calcule les métriques du mois et des jours demandés de ce mois.
+    Quelques requêtes groupées par mois, quel que soit le nombre de jours.
+    L'état du catalogue (`snapshot`) n'est reporté que sur les périodes courantes.
+    """
+    start, end = month_bounds(month_start)
+    sources = [
+        (Order.objects.all(), 'order_date', _order_aggregates()),
+        (Invoice.objects.all(), 'invoice_date', _invoice_aggregates()),
+        (Payment.objects.all(), 'payment_date', _payment_aggregates()),
+        (Customer.objects.all(), 'created_at', {'new_customers': count_if()}),
+    ]
+
+    per_day = defaultdict(dict)
+    month = {}
+    for queryset, field, aggregates in sources:
+        for day, values in _grouped(queryset, field, start, end, **aggregates).items():
+            per_day[day].update(values)
+        month.update(summarize(queryset.filter(**_in_range(queryset.model, field, start, end)), **aggregates))
+
+    # Nombre cumulé de clients à la fin de chaque période
+    customers_before = Customer.objects.filter(created_at__lt=start_of_day(start)).count()
+    running = customers_before
+    cumulative = {}
+    day = start
+    while day <= end:
+        running += per_day.get(day, {}).get('new_customers', 0)
+        cumulative[day] = running
+        day += timedelta(days=1)
+
+    today = timezone.localdate()
+    is_current = start <= today <= end
+    rows = [DashboardMetrics(
+        period_type='month',
+        period_start=start,
+        period_end=end,
+        total_customers=cumulative[end],
+        is_current=is_current,
+        last_calculated=now,
+        **(snapshot if is_current else {}),
+        **month,
+    )]
+    for day in sorted(days):
+        rows.append(DashboardMetrics(
+            period_type='day',
+            period_start=day,
+            period_end=day,
+            total_customers=cumulative[day],
+            is_current=day == today,
+            last_calculated=now,
+            **(snapshot if day == today else {}),
+            **per_day.get(day, {}),
+        ))
+    return rows
+
+
+def _top_customers(start, end, top_n, **filters):
+    rows = (
+        Order.objects
+        .filter(status__in=BILLABLE_ORDER_STATUSES, **_in_range(Order, 'order_date', start, end), **filters)
+        .order_by()
+        .values('customer')
+        .annotate(
+            total_orders=Count('pk'),
+            total_spent=sum_of('total_amount'),
+            last_order=Max('order_date'),
+        )
+        .order_by('-total_spent', '-total_orders', 'customer')[:top_n]
+    )
+    return [
+        TopCustomer(
+            customer_id=row['customer'],
+            total_orders=row['total_orders'],
+            total_spent=row['total_spent'],
+            last_order_date=timezone.localtime(row['last_order']).date(),
+            rank=rank,
+            period_start=start,
+            period_end=end,
+        )
+        for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def _top_products(start, end, top_n, **filters):
+    line_total = F('unit_price') * F('quantity')
+    rows = (
+        OrderItem.objects
+        .filter(
+            order__status__in=BILLABLE_ORDER_STATUSES,
+            **{f'order__{key}': value for key, value in _in_range(Order, 'order_date', start, end).items()},
+            **filters
+        )
+        .order_by()
+        .values('product')
+        .annotate(
+            total_quantity=Sum('quantity'),
+            total_revenue=Sum(line_total, output_field=DecimalField(max_digits=12, decimal_places=2)),
+            total_orders=Count('order', distinct=True),
+        )
+        .order_by('-total_revenue', '-total_quantity', 'product')[:top_n]
+    )
+    return [
+        TopProduct(
+            product_id=row['product'],
+            total_quantity=row['total_quantity'],
+            total_revenue=row['total_revenue'],
+            total_orders=row['total_orders'],
+            rank=rank,
+            period_start=start,
+            period_end=end,
+        )
+        for rank, row in enumerate(rows, start=1)
+    ]
+
+
+def rebuild_periods(days, top_n=TOP_N):
+    """
+    Recalcule les métriques des jours donnés, de leurs mois et les classements
+    mensuels (meilleurs clients et produits). Retourne le nombre de jours et de mois traités.
+    """
+    now = timezone.now()
+    by_month = defaultdict(set)
+    for day in days:
+        by_month[day.replace(day=1)].add(day)
+
+    snapshot = catalog_snapshot() if timezone.localdate().replace(day=1) in by_month else {}
+    for month_start, month_days in sorted(by_month.items()):
+        start, end = month_bounds(month_start)
+        rows = _month_metrics(month_start, month_days, snapshot, now)
+        with transaction.atomic():
+            for current, update_fields in ((True, METRIC_FIELDS), (False, HISTORICAL_FIELDS)):
+                group = [row for row in rows if row.is_current is current]
+                if group:
+                    DashboardMetrics.objects.bulk_create(
+                        group,
+                        update_conflicts=True,
+                        unique_fields=['period_start', 'period_end'],
+                        update_fields=update_fields,
+                    )
+            TopCustomer.objects.filter(period_start=start, period_end=end).delete()
+            TopCustomer.objects.bulk_create(_top_customers(start, end, top_n))
+            TopProduct.objects.filter(period_start=start, period_end=end).delete()
+            TopProduct.objects.bulk_create(_top_products(start, end, top_n))
+
+    # Une seule période courante de chaque type
+    DashboardMetrics.objects.filter(is_current=True).exclude(
+        Q(period_type='day', period_start=timezone.localdate())
+        | Q(period_type='month', period_start=timezone.localdate().replace(day=1))
+    ).update(is_current=False)
+
+    # Horodatage commun au début du calcul : sert de point de reprise au prochain passage
+    DashboardMetrics.objects.filter(last_calculated__gte=now).update(last_calculated=now)
+    return {'days': len(days), 'months': len(by_month)}
+
+
+def mark_stale(*days):
+    """
+    Signale au prochain calcul par lots des jours dont des données ont disparu
+    (suppression, changement de date) : les jours restants ne les montrent plus
+    """
+    StaleDay.objects.bulk_create(
+        [StaleDay(day=day) for day in set(days) if day is not None],
+        update_conflicts=True,
+        unique_fields=['day'],
+        update_fields=['created_at'],
+    )
+
+
+def changed_days(since):
+    """
+    Jours dont les données ont été modifiées depuis `since`, plus les jours
+    signalés par mark_stale (suppressions et anciens jours des objets déplacés)
+    """
+    days = set(StaleDay.objects.values_list('day', flat=True))
+    for queryset, field in (
+        (Order.objects.filter(updated_at__gte=since), 'order_date'),
+        (Customer.objects.filter(updated_at__gte=since), 'created_at'),
+    ):
+        days.update(moment.date() for moment in queryset.datetimes(field, 'day'))
+    for queryset, field in (
+        (Invoice.objects.filter(updated_at__gte=since), 'invoice_date'),
+        (Payment.objects.filter(updated_at__gte=since), 'payment_date'),
+    ):
+        days.update(queryset.dates(field, 'day'))
+    return days
+
+
+def all_days():
+    """Tous les jours des mois couverts par les données, jusqu'à aujourd'hui"""
+    candidates = []
+    for queryset, field in (
+        (Order.objects.all(), 'order_date'),
+        (Customer.objects.all(), 'created_at'),
+        (Invoice.objects.all(), 'invoice_date'),
+        (Payment.objects.all(), 'payment_date'),
+    ):
+        first = queryset.order_by(field).values_list(field, flat=True).first()
+        if first is not None:
+            candidates.append(timezone.localtime(first).date() if isinstance(first, datetime) else first)
+
+    today = timezone.localdate()
+    day = min(candidates, default=today).replace(day=1)
+    days = set()
+    while day <= today:
+        days.add(day)
+        day += timedelta(days=1)
+    return days
+
+
+def last_build():
+    """Date du dernier calcul des métriques (None si jamais calculées)"""
+    return DashboardMetrics.objects.aggregate(last=Max('last_calculated'))['last']
+
+
+def build_metrics(since=None, full=False, top_n=TOP_N):
+    """
+    Met à jour les métriques du tableau de bord.
+    Par défaut, seules les périodes touchées depuis le dernier calcul sont recalculées ;
+    `full=True` reconstruit tout l'historique. Le jour et le mois courants sont
+    toujours recalculés pour rafraîchir l'état du catalogue. Les suppressions et
+    changements de date passés par les signaux sont repris via mark_stale ; les
+    écritures en masse (update, suppressions SQL brutes) demandent un calcul complet.
+    """
+    if since is None and not full:
+        since = last_build()
+    # Seuls les signalements antérieurs au calcul sont consommés
+    started = timezone.now()
+    if full or since is None:
+        days = all_days()
+    else:
+        days = changed_days(since)
+    days.add(timezone.localdate())
+    result = rebuild_periods(days, top_n=top_n)
+    StaleDay.objects.filter(created_at__lt=started).delete()
+    return result
+
+
+def dashboard_stats():
+    """
+    Statistiques du tableau de bord lues uniquement dans les métriques précalculées :
+    la ligne du mois courant et un cumul sur les lignes mensuelles (deux requêtes).
+    """
+    today = timezone.localdate()
+    current = DashboardMetrics.get_current_metrics()
+    totals = summarize(
+        DashboardMetrics.objects.filter(period_type='month'),
+        total_orders=Sum('total_orders'),
+        pending_orders=Sum('pending_orders'),
+        total_invoices=Sum('total_invoices'),
+        pending_invoices=Sum('pending_invoices'),
+        total_payments=Sum('total_payments'),
+        payments_amount=sum_of('total_paid'),
+        yearly_revenue=sum_of('total_revenue', period_start__year=today.year),
+    )
+
+    stats = {key: value or 0 for key, value in totals.items()}
+    if current is not None:
+        stats.update({
+            'monthly_revenue': current.total_revenue,
+            'total_customers': current.total_customers,
+            'active_customers': current.active_customers,
+            'total_products': current.total_products,
+            'active_products': current.active_products,
+            'low_stock_products': current.low_stock_products,
+            'out_of_stock_products': current.out_of_stock_products,
+            'total_categories': current.total_categories,
+            'active_categories': current.active_categories,
+            'last_calculated': current.last_calculated,
+        })
+    return stats
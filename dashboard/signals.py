@@ -0,0 +1,193 @@
+"""
+Signaux de maintenance incrémentale des métriques du tableau de bord.
+
+L'état d'un objet est lu en base juste avant son écriture ou sa suppression
+(commandly.snapshots, lecture partagée avec les agrégats par client), puis la
+différence avec le nouvel état est appliquée aux métriques (post_save /
+post_delete) par dashboard.services.events. Les jours quittés par un objet
+(suppression, changement de date) sont aussi signalés au calcul par lots.
+"""
+import threading
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from commandly import snapshots
+from customers.models import Customer
+from dashboard.services import events, metrics
+from invoices.models import Invoice
+from orders.models import Order, OrderItem
+from payments.models import Payment
+from payments.signals import invoice_balance_changed
+
+
+# Commandes en cours de suppression : leurs lignes supprimées en cascade
+# sont déjà retirées avec la commande
+_deleting = threading.local()
+
+
+def _deleting_orders():
+    if not hasattr(_deleting, 'orders'):
+        _deleting.orders = set()
+    return _deleting.orders
+
+
+snapshots.track(Order, events.ORDER_FIELDS)
+# Lignes supprimées : la plupart le sont en cascade avec leur commande, déjà décomptée
+snapshots.track(OrderItem, events.ORDER_ITEM_FIELDS, on_delete=False)
+snapshots.track(Invoice, events.INVOICE_FIELDS)
+snapshots.track(Payment, events.PAYMENT_FIELDS)
+snapshots.track(Customer, ('created_at',), on_save=False)
+
+
+def _mark_left_day(previous, current, field):
+    """Signale le jour quitté par un objet supprimé (current None) ou redaté"""
+    if previous is None:
+        return
+    day = events.local_day(previous[field])
+    if current is None or events.local_day(current[field]) != day:
+        metrics.mark_stale(day)
+
+
+def _instance_state(instance, fields):
+    return {name: getattr(instance, name) for name in fields}
+
+
+def _orders_info(*order_ids):
+    """Statut, date et client des commandes données, en une requête"""
+    ids = {order_id for order_id in order_ids if order_id is not None}
+    if not ids:
+        return {}
+    rows = Order._base_manager.filter(pk__in=ids).values('pk', 'status', 'order_date', 'customer_id')
+    return {row.pop('pk'): row for row in rows}
+
+
+# Commandes
+
+@receiver(post_save, sender=Order)
+def track_order(sender, instance, created, update_fields=None, **kwargs):
+    previous = snapshots.stored_state(instance, events.ORDER_FIELDS)
+    current = _instance_state(instance, events.ORDER_FIELDS)
+    if previous is not None and (update_fields is None or 'total_amount' not in update_fields):
+        # Les totaux sont maintenus en base par le moteur de totaux, pas par save()
+        current['total_amount'] = previous['total_amount']
+
+    lines = None
+    if previous is not None:
+        before = (previous['status'] in events.BILLABLE_ORDER_STATUSES,
+                  events.local_day(previous['order_date']), previous['customer_id'])
+        after = (current['status'] in events.BILLABLE_ORDER_STATUSES,
+                 events.local_day(current['order_date']), current['customer_id'])
+        if before != after and (before[0] or after[0]):
+            lines = events.order_lines(instance.pk)
+
+    changes = events.Changes()
+    events.order_contribution(changes, previous, -1, lines)
+    events.order_contribution(changes, current, 1, lines)
+    changes.apply()
+    _mark_left_day(previous, current, 'order_date')
+
+
+@receiver(pre_delete, sender=Order)
+def remember_deleted_order(sender, instance, **kwargs):
+    _deleting_orders().add(instance.pk)
+    instance._dashboard_lines = events.order_lines(instance.pk)
+
+
+@receiver(post_delete, sender=Order)
+def track_deleted_order(sender, instance, **kwargs):
+    _deleting_orders().discard(instance.pk)
+    previous = snapshots.stored_state(instance, events.ORDER_FIELDS)
+    changes = events.Changes()
+    events.order_contribution(changes, previous, -1, getattr(instance, '_dashboard_lines', None))
+    changes.apply()
+    _mark_left_day(previous, None, 'order_date')
+
+
+# Lignes de commande
+
+@receiver(post_save, sender=OrderItem)
+def track_order_item(sender, instance, **kwargs):
+    previous = snapshots.stored_state(instance, events.ORDER_ITEM_FIELDS)
+    orders = _orders_info(instance.order_id, previous and previous['order_id'])
+    changes = events.Changes()
+    if previous is not None:
+        events.order_item_contribution(changes, previous, orders.get(previous['order_id']), -1)
+    events.order_item_contribution(
+        changes, _instance_state(instance, events.ORDER_ITEM_FIELDS), orders.get(instance.order_id), 1
+    )
+    changes.apply()
+
+
+@receiver(pre_delete, sender=OrderItem)
+def remember_deleted_order_item(sender, instance, **kwargs):
+    instance._dashboard_orders = _orders_info(instance.order_id)
+
+
+@receiver(post_delete, sender=OrderItem)
+def track_deleted_order_item(sender, instance, **kwargs):
+    # Les pre_delete de toute la cascade sont émis avant les post_delete :
+    # la commande supprimée est déjà connue ici
+    if instance.order_id in _deleting_orders():
+        return
+    orders = getattr(instance, '_dashboard_orders', {})
+    changes = events.Changes()
+    events.order_item_contribution(
+        changes, _instance_state(instance, events.ORDER_ITEM_FIELDS), orders.get(instance.order_id), -1
+    )
+    changes.apply()
+
+
+# Factures et paiements
+
+def _track_change(instance, fields, contribution, date_field):
+    previous = snapshots.stored_state(instance, fields)
+    current = _instance_state(instance, fields)
+    changes = events.Changes()
+    contribution(changes, previous, -1)
+    contribution(changes, current, 1)
+    changes.apply()
+    _mark_left_day(previous, current, date_field)
+
+
+def _track_removal(instance, fields, contribution, date_field):
+    # État enregistré : l'instance supprimée peut être plus ancienne que la base
+    state = snapshots.stored_state(instance, fields)
+    changes = events.Changes()
+    contribution(changes, state, -1)
+    changes.apply()
+    _mark_left_day(state, None, date_field)
+
+
+@receiver(post_save, sender=Invoice)
+def track_invoice(sender, instance, **kwargs):
+    _track_change(instance, events.INVOICE_FIELDS, events.invoice_contribution, 'invoice_date')
+
+
+@receiver(post_delete, sender=Invoice)
+def track_deleted_invoice(sender, instance, **kwargs):
+    _track_removal(instance, events.INVOICE_FIELDS, events.invoice_contribution, 'invoice_date')
+
+
+@receiver(invoice_balance_changed, sender=Invoice)
+def track_invoice_balance(sender, previous, current, **kwargs):
+    # Solde modifié par un UPDATE relatif (paiements), hors de Invoice.save()
+    changes = events.Changes()
+    events.invoice_contribution(changes, previous, -1)
+    events.invoice_contribution(changes, current, 1)
+    changes.apply()
+
+
+@receiver(post_save, sender=Payment)
+def track_payment(sender, instance, **kwargs):
+    _track_change(instance, events.PAYMENT_FIELDS, events.payment_contribution, 'payment_date')
+
+
+@receiver(post_delete, sender=Payment)
+def track_deleted_payment(sender, instance, **kwargs):
+    _track_removal(instance, events.PAYMENT_FIELDS, events.payment_contribution, 'payment_date')
+
+
+# Clients : nouveaux clients et cumul, recalculés par lots uniquement
+
+@receiver(post_delete, sender=Customer)
+def track_deleted_customer(sender, instance, **kwargs):
+    _mark_left_day(snapshots.stored_state(instance, ('created_at',)), None, 'created_at')
@@ -1,3 +1,189 @@
-from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from commandly.testing import QueryCountTestCase
+from dashboard.models import DashboardMetrics, StaleDay, TopCustomer, TopProduct
+from dashboard.services import metrics
 
-# Create your tests here.
+
+class DashboardQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_home_queries(self):
+        self.assertMaxQueries(5, reverse('dashboard:home'))
+
+    def test_stats_queries(self):
+        self.assertMaxQueries(2, reverse('dashboard:stats'))
+
+
+class DashboardMetricsBuildTests(QueryCountTestCase):
+    """
+    Construction des métriques précalculées du tableau de bord
+    """
+
+    def test_full_build(self):
+        metrics.build_metrics(full=True)
+        current = DashboardMetrics.get_current_metrics()
+        self.assertIsNotNone(current)
+        self.assertEqual(current.total_orders, self.sample_rows)
+        self.assertEqual(current.total_payments, self.sample_rows)
+        self.assertTrue(TopCustomer.objects.exists())
+        self.assertTrue(TopProduct.objects.exists())
+
+        stats = metrics.dashboard_stats()
+        self.assertEqual(stats['total_orders'], self.sample_rows)
+        self.assertEqual(stats['total_customers'], self.sample_rows)
+
+    def test_incremental_build_only_touches_changed_days(self):
+        metrics.build_metrics(full=True)
+        built = metrics.build_metrics()
+        # Aucune modification depuis la dernière construction : seul le jour courant est recalculé
+        self.assertEqual(built['days'], 1)
+        self.assertEqual(DashboardMetrics.get_current_metrics().total_orders, self.sample_rows)
+
+    def test_incremental_build_covers_deletions_and_moves(self):
+        from datetime import timedelta
+        from customers.models import Customer
+        from orders.models import Order
+
+        past = timezone.now() - timedelta(days=60)
+        customers = list(Customer.objects.order_by('pk')[:2])
+        Customer.objects.filter(pk__in=[customer.pk for customer in customers]).update(created_at=past)
+        metrics.build_metrics(full=True)
+        month_start = timezone.localtime(past).date().replace(day=1)
+        self.assertEqual(DashboardMetrics.objects.get(period_type='month', period_start=month_start).new_customers, 2)
+
+        # Client supprimé : son jour de création ne figure plus dans les données
+        order = Order.objects.exclude(customer=customers[0]).first()
+        customers[0].delete()
+        moved_from = timezone.localtime(order.order_date).date()
+        order.order_date = past
+        order.save()
+        self.assertEqual(
+            set(StaleDay.objects.values_list('day', flat=True)),
+            {timezone.localtime(past).date(), moved_from},
+        )
+
+        metrics.build_metrics()
+        self.assertEqual(DashboardMetrics.objects.get(period_type='month', period_start=month_start).new_customers, 1)
+        self.assertFalse(StaleDay.objects.exists())
+
+    def test_catalog_snapshot_only_on_current_periods(self):
+        from datetime import timedelta
+        from customers.models import Customer
+
+        past = timezone.now() - timedelta(days=60)
+        Customer.objects.filter(pk=self.data['customer'].pk).update(created_at=past)
+        metrics.build_metrics(full=True)
+        current = DashboardMetrics.get_current_metrics()
+        self.assertEqual(current.total_products, self.sample_rows)
+        historical = DashboardMetrics.objects.filter(is_current=False)
+        self.assertTrue(historical.exists())
+        self.assertFalse(historical.exclude(total_products=0).exists())
+
+    def test_command_rejects_impossible_since(self):
+        from django.core.management import CommandError, call_command
+
+        with self.assertRaisesMessage(CommandError, 'Date invalide'):
+            call_command('build_dashboard_metrics', '--since', '2025-02-30T00:00')
+
+
+class DashboardEventTests(QueryCountTestCase):
+    """
+    Les mises à jour incrémentales doivent donner le même résultat qu'un recalcul complet
+    """
+
+    COMPARED_FIELDS = (
+        'total_orders', 'pending_orders', 'completed_orders', 'cancelled_orders',
+        'total_revenue', 'total_paid', 'total_outstanding', 'total_invoices',
+        'pending_invoices', 'total_payments',
+    )
+
+    def snapshot(self):
+        return {
+            'metrics': list(DashboardMetrics.objects.order_by('period_start', 'period_type').values_list(*self.COMPARED_FIELDS)),
+            'customers': list(TopCustomer.objects.order_by('rank').values_list('customer_id', 'total_orders', 'total_spent', 'rank')),
+            'products': list(TopProduct.objects.order_by('rank').values_list('product_id', 'total_quantity', 'total_revenue', 'rank')),
+        }
+
+    maxDiff = None
+
+    def test_incremental_matches_rebuild(self):
+        from decimal import Decimal
+        from django.utils import timezone
+        from invoices.models import Invoice
+        from orders.models import Order, OrderItem
+        from payments.models import Payment
+        from products.models import Product
+
+        metrics.build_metrics(full=True)
+
+        # Une commande confirmée réserve son stock
+        Product.objects.filter(pk=self.data['product'].pk).update(stock_quantity=100)
+        order = Order.objects.create(customer=self.data['customer'], status='confirmed')
+        OrderItem.objects.create(order=order, product=self.data['product'], quantity=30)
+        item = OrderItem.objects.create(order=order, product=self.data['product'], quantity=2)
+        item.quantity = 5
+        item.save()
+        order.refresh_from_db()
+        invoice = Invoice.objects.create(order=order, customer=order.customer, invoice_date=timezone.now().date())
+        Payment.objects.create(
+            invoice=invoice, customer=order.customer, amount=Decimal('1000.00'),
+            payment_method='cash', status='completed',
+        )
+
+        cancelled = Order.objects.exclude(pk=order.pk).first()
+        cancelled.status = 'cancelled'
+        cancelled.save()
+        OrderItem.objects.filter(order=self.data['order']).first().delete()
+        Order.objects.filter(pk=Order.objects.exclude(pk__in=[order.pk, cancelled.pk]).last().pk).delete()
+
+        incremental = self.snapshot()
+        self.assertEqual(TopCustomer.objects.first().customer_id, order.customer_id)
+        metrics.build_metrics(full=True)
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_first_write_of_a_period_creates_its_rows(self):
+        from datetime import timedelta
+        from orders.models import Order
+
+        metrics.build_metrics(full=True)
+        built = metrics.last_build()
+        current = DashboardMetrics.get_current_metrics()
+        day = timezone.localdate() - timedelta(days=400)
+        Order.objects.create(customer=self.data['customer'], status='draft', order_date=timezone.now() - timedelta(days=400))
+
+        rows = DashboardMetrics.objects.filter(period_start__in=[day, day.replace(day=1)])
+        self.assertEqual(sorted(rows.values_list('period_type', 'total_orders', 'pending_orders')), [
+            ('day', 1, 1), ('month', 1, 1),
+        ])
+        # Le point de reprise du calcul par lots ne bouge pas ; le jour lui est signalé
+        self.assertEqual(metrics.last_build(), built)
+        self.assertTrue(StaleDay.objects.filter(day=day).exists())
+        self.assertEqual(DashboardMetrics.get_current_metrics().total_customers, current.total_customers)
+
+    def test_import_updates_metrics(self):
+        from io import StringIO
+        from orders.services.importer import import_orders
+        from products.models import Product
+
+        metrics.build_metrics(full=True)
+        before = DashboardMetrics.get_current_metrics().total_orders
+        product = self.data['product']
+        Product.objects.filter(pk=product.pk).update(stock_quantity=100)
+        customer = self.data['customer']
+        rows = [
+            'order_ref,customer_id,product_id,quantity,status',
+            f'A,{customer.pk},{product.pk},3,confirmed',
+            f'A,{customer.pk},{product.pk},2,confirmed',
+            f'B,{customer.pk},{product.pk},1,draft',
+        ]
+        report = import_orders(StringIO(''.join(f'{row}\n' for row in rows)), 'csv')
+        self.assertEqual(report.orders_created, 2)
+
+        # bulk_create n'émet pas de signaux : l'import applique lui-même son delta
+        self.assertEqual(DashboardMetrics.get_current_metrics().total_orders, before + 2)
+        incremental = self.snapshot()
+        metrics.build_metrics(full=True)
+        self.assertEqual(incremental, self.snapshot())
@@ -1,6 +1,9 @@
 from django.views.generic import TemplateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
+from django.utils import timezone
+from dashboard.services.metrics import dashboard_stats
+from orders.models import Order
 
 
 class DashboardView(LoginRequiredMixin, TemplateView):
@@ -9,8 +12,30 @@ class DashboardView(LoginRequiredMixin, TemplateView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        # Ici nous ajouterons les statistiques du tableau de bord
+        # Statistiques lues dans les métriques précalculées (commande build_dashboard_metrics)
+        stats = dashboard_stats()
+        
+        alerts = []
+        if stats.get('out_of_stock_products'):
+            alerts.append({
+                'type': 'danger',
+                'icon': 'x-circle',
+                'title': 'Ruptures de stock',
+                'message': f"{stats['out_of_stock_products']} produit(s) en rupture de stock.",
+            })
+        if stats.get('low_stock_products'):
+            alerts.append({
+                'type': 'warning',
+                'icon': 'exclamation-triangle',
+                'title': 'Stock faible',
+                'message': f"{stats['low_stock_products']} produit(s) sous le niveau d'alerte.",
+            })
+        
         context['title'] = 'Tableau de bord'
+        context['today'] = timezone.localdate()
+        context['stats'] = stats
+        context['alerts'] = alerts
+        context['recent_orders'] = Order.objects.select_related('customer').order_by('-order_date')[:5]
         return context
 
 
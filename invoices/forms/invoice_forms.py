@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Q
 from django.utils import timezone
 from invoices.models import Invoice
 from orders.models import Order
@@ -45,20 +46,16 @@ class InvoiceForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        # Filtrer les commandes qui n'ont pas encore de facture
+        # Filtrer les commandes qui n'ont pas encore de facture (anti-jointure)
         if not self.instance.pk:
-            existing_invoices = Invoice.objects.values_list('order_id', flat=True)
-            self.fields['order'].queryset = Order.objects.exclude(
-                id__in=existing_invoices
-            ).filter(status__in=['confirmed', 'in_progress', 'ready', 'delivered'])
+            self.fields['order'].queryset = Order.objects.filter(
+                invoice__isnull=True,
+                status__in=['confirmed', 'in_progress', 'ready', 'delivered'],
+            )
         else:
             # Pour la modification, inclure la commande actuelle
             self.fields['order'].queryset = Order.objects.filter(
-                id__in=[self.instance.order.id] + list(
-                    Order.objects.exclude(
-                        id__in=Invoice.objects.values_list('order_id', flat=True)
-                    ).values_list('id', flat=True)
-                )
+                Q(pk=self.instance.order_id) | Q(invoice__isnull=True)
             )
         
         # Filtrer les clients actifs
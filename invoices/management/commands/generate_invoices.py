@@ -0,0 +1,59 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from invoices.services.billing import BILLABLE_STATUSES, DEFAULT_CHUNK_SIZE, generate
+from orders.models import Order
+
+
+class Command(BaseCommand):
+    help = "Facture en masse les commandes livrées qui n'ont pas encore de facture"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help="Date des factures AAAA-MM-JJ (aujourd'hui par défaut)",
+        )
+        parser.add_argument(
+            '--payment-terms',
+            default='30 jours',
+            help='Conditions de paiement des factures (défaut : %(default)s)',
+        )
+        parser.add_argument(
+            '--status',
+            action='append',
+            choices=[code for code, _ in Order.STATUS_CHOICES],
+            help='Statut des commandes à facturer, répétable (défaut : %s)' % ', '.join(BILLABLE_STATUSES),
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Nombre de factures écrites par lot (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        invoice_date = None
+        if options['date']:
+            try:
+                invoice_date = parse_date(options['date'])
+            except ValueError:
+                # Date bien formée mais inexistante (2025-02-30)
+                invoice_date = None
+            if invoice_date is None:
+                raise CommandError(f"Date invalide : {options['date']}")
+        if options['chunk_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+
+        def progress(report):
+            self.stdout.write(f'Lot {report.chunks} : {report.created} facture(s) créée(s) ({report.duration:.2f} s)')
+
+        report = generate(
+            invoice_date,
+            payment_terms=options['payment_terms'],
+            statuses=options['status'] or BILLABLE_STATUSES,
+            chunk_size=options['chunk_size'],
+            progress=progress if options['verbosity'] > 0 else None,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.created} facture(s) créée(s) au {report.invoice_date:%d/%m/%Y} '
+            f'pour {report.total_amount} FCFA ({report.chunks} lot(s) en {report.duration:.2f} s).'
+        ))
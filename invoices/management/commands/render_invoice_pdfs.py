@@ -0,0 +1,51 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from invoices.models import Invoice
+from invoices.services.pdf import DEFAULT_CHUNK_SIZE, render_batch
+
+
+class Command(BaseCommand):
+    help = "Rend à l'avance les PDF des factures d'un mois (ou de toutes), dans un pool de processus"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--month',
+            help='Mois des factures AAAA-MM (mois en cours par défaut)',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Toutes les factures, quel que soit le mois',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            help='Nombre de processus de rendu (nombre de processeurs par défaut, 0 : sans pool)',
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Nombre de factures lues par lot (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+        if options['workers'] is not None and options['workers'] < 0:
+            raise CommandError('Le nombre de processus ne peut pas être négatif.')
+
+        invoices = Invoice.objects.all()
+        if not options['all']:
+            try:
+                month = date.fromisoformat(f"{options['month']}-01") if options['month'] else timezone.localdate().replace(day=1)
+            except ValueError:
+                raise CommandError(f"Mois invalide : {options['month']}")
+            invoices = invoices.filter(invoice_date__year=month.year, invoice_date__month=month.month)
+
+        report = render_batch(invoices, workers=options['workers'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.rendered} PDF rendu(s), {report.cached} déjà à jour '
+            f'(en {report.duration:.2f} s).'
+        ))
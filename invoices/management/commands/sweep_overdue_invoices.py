@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+from invoices.services.overdue import DEFAULT_CHUNK_SIZE, sweep
+
+
+class Command(BaseCommand):
+    help = "Passe en retard les factures en attente ou partiellement payées dont l'échéance est dépassée (idempotent, à planifier)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--date',
+            help="Date de référence AAAA-MM-JJ (aujourd'hui par défaut)",
+        )
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=DEFAULT_CHUNK_SIZE,
+            help='Nombre de factures mises à jour par requête (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            try:
+                today = parse_date(options['date'])
+            except ValueError:
+                # Date bien formée mais inexistante (2025-02-30)
+                today = None
+            if today is None:
+                raise CommandError(f"Date invalide : {options['date']}")
+        if options['chunk_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+
+        report = sweep(today, chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'{report.updated} facture(s) passée(s) en retard au {report.as_of:%d/%m/%Y} '
+            f'({report.chunks} lot(s) en {report.duration:.2f} s).'
+        ))
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from orders.models import Order
@@ -123,35 +123,57 @@ class Invoice(models.Model):
         verbose_name = 'Facture'
         verbose_name_plural = 'Factures'
         ordering = ['-invoice_date']
+        # Index alignés sur les filtres et le tri de la liste des factures
+        indexes = [
+            models.Index(fields=['-invoice_date'], name='invoice_date_idx'),
+            models.Index(fields=['status', '-invoice_date'], name='invoice_status_date_idx'),
+            models.Index(fields=['customer', '-invoice_date'], name='invoice_customer_date_idx'),
+            models.Index(fields=['status', 'due_date'], name='invoice_status_due_idx'),
+            models.Index(fields=['due_date'], name='invoice_due_date_idx'),
+        ]
     
     def __str__(self):
         return f"Facture {self.invoice_number} - {self.customer}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._stored_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
-        # Génération automatique du numéro de facture
-        if not self.invoice_number:
-            self.invoice_number = self.generate_invoice_number()
-        
-        # Calcul automatique des montants
-        self.calculate_amounts()
-        
-        # Calcul automatique de la date d'échéance
-        if not self.due_date:
-            self.due_date = self.calculate_due_date()
-        
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Numéro attribué dans la transaction de l'enregistrement (pas de trou en cas d'échec)
+            if not self.invoice_number:
+                self.invoice_number = self.generate_invoice_number()
+            
+            # Le solde est maintenu en base par les paiements : il est relu (ligne
+            # verrouillée) pour ne pas écraser un paiement enregistré entre-temps
+            if not self._state.adding:
+                stored = (
+                    Invoice.objects.select_for_update().filter(pk=self.pk)
+                    .values('paid_amount', 'paid_date', 'status').first()
+                )
+                if stored is not None:
+                    self.paid_amount, self.paid_date = stored['paid_amount'], stored['paid_date']
+                    # Statut conservé sauf changement demandé par l'appelant
+                    if self.status == getattr(self, '_stored_status', self.status):
+                        self.status = stored['status']
+            
+            # Calcul automatique des montants
+            self.calculate_amounts()
+            
+            # Calcul automatique de la date d'échéance
+            if not self.due_date:
+                self.due_date = self.calculate_due_date()
+            
+            super().save(*args, **kwargs)
+        self._stored_status = self.status
     
     def generate_invoice_number(self):
         """Génère un numéro de facture unique"""
-        from datetime import datetime
-        prefix = "FAC"
-        date_str = datetime.now().strftime("%Y%m%d")
-        # Trouver le dernier numéro pour aujourd'hui
-        today_invoices = Invoice.objects.filter(
-            invoice_date=datetime.now().date()
-        ).count()
-        sequence = today_invoices + 1
-        return f"{prefix}{date_str}{sequence:03d}"
+        from sequences.services import next_number, seed_from
+        return next_number('FAC', seed=seed_from(Invoice, 'invoice_number'))
     
     def calculate_amounts(self):
         """Calcule les montants de la facture"""
@@ -191,22 +213,15 @@ class Invoice(models.Model):
         return (self.paid_amount / self.total_amount) * 100
     
     def mark_as_paid(self, amount=None):
-        """Marque la facture comme payée"""
-        if amount:
-            self.paid_amount += amount
-        else:
-            self.paid_amount = self.total_amount
-        
-        self.paid_date = timezone.now().date()
-        self.remaining_amount = self.total_amount - self.paid_amount
-        
-        # Mise à jour du statut
-        if self.is_fully_paid():
-            self.status = 'paid'
-        elif self.paid_amount > 0:
-            self.status = 'partially_paid'
-        
-        self.save()
+        """
+        Ajoute `amount` (par défaut le restant dû) au montant payé par un UPDATE
+        relatif, puis recharge le solde. Le solde suivant les paiements complétés,
+        un montant sans paiement enregistré est signalé par le rapprochement.
+        """
+        from payments.services import reconciliation
+        reconciliation.apply_delta(self.pk, self.remaining_amount if amount is None else amount)
+        self.refresh_from_db(fields=['paid_amount', 'remaining_amount', 'status', 'paid_date', 'updated_at'])
+        self._stored_status = self.status
     
     def get_status_display_color(self):
         """Retourne la couleur CSS pour le statut"""
@@ -0,0 +1,4 @@
+# Services pour l'application invoices
+from . import aging, billing, overdue, pdf
+
+__all__ = ['aging', 'billing', 'overdue', 'pdf']
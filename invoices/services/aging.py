@@ -0,0 +1,141 @@
+"""
+Balance âgée des créances clients.
+
+Le restant dû des factures est réparti par client en tranches de retard à une
+date d'arrêté (0–30, 31–60, 61–90 et plus de 90 jours après l'échéance ; une
+facture non échue compte dans la première tranche), en une seule requête groupée
+par client avec des sommes conditionnelles sur la date d'échéance.
+
+À une date d'arrêté passée, le restant dû d'une facture est reconstitué en lui
+ajoutant les paiements complétés après cette date. Le résultat est mis en cache
+par date d'arrêté pour AGING_CACHE_TIMEOUT secondes.
+"""
+import json
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import DecimalField, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from commandly import export
+from invoices.models import Invoice
+from orders.services.totals import ZERO, quantize
+from payments.models import Payment
+
+
+# (code, libellé, premier jour de retard, dernier jour de retard)
+BUCKETS = [
+    ('days_0_30', '0–30 jours', None, 30),
+    ('days_31_60', '31–60 jours', 31, 60),
+    ('days_61_90', '61–90 jours', 61, 90),
+    ('days_90_plus', '+90 jours', 91, None),
+]
+OPEN_STATUSES = ('pending', 'partially_paid', 'overdue')
+AGING_CACHE_TIMEOUT = 300
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
+
+
+def cache_key(as_of):
+    return f'invoices:aging:{as_of.isoformat()}'
+
+
+def _bucket_filter(as_of, first_day, last_day):
+    """Échéances en retard de first_day à last_day jours à la date d'arrêté"""
+    lookups = {}
+    if first_day is not None:
+        lookups['due_date__lte'] = as_of - timedelta(days=first_day)
+    if last_day is not None:
+        lookups['due_date__gte'] = as_of - timedelta(days=last_day)
+    return Q(**lookups)
+
+
+def aging_queryset(as_of):
+    """Requête groupée par client : une somme par tranche et le total"""
+    invoices = Invoice.objects.filter(invoice_date__lte=as_of)
+    if as_of >= timezone.localdate():
+        invoices = invoices.filter(status__in=OPEN_STATUSES)
+        outstanding = F('remaining_amount')
+    else:
+        # Factures ouvertes à la date d'arrêté, soldées ou non depuis
+        paid_after = (
+            Payment.objects
+            .filter(invoice=OuterRef('pk'), status='completed', payment_date__gt=as_of)
+            .order_by()
+            .values('invoice')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        invoices = invoices.exclude(status='cancelled')
+        outstanding = F('remaining_amount') + Coalesce(Subquery(paid_after), Value(ZERO), output_field=AMOUNT_FIELD)
+
+    buckets = {
+        code: Coalesce(Sum('outstanding', filter=_bucket_filter(as_of, first, last)), Value(ZERO), output_field=AMOUNT_FIELD)
+        for code, label, first, last in BUCKETS
+    }
+    return (
+        invoices
+        .annotate(outstanding=outstanding)
+        .order_by()
+        .values(
+            'customer_id', 'customer__customer_type', 'customer__company_name',
+            'customer__first_name', 'customer__last_name',
+        )
+        .annotate(**buckets, total=Sum('outstanding'))
+        .filter(total__gt=0)
+        .order_by('customer_id')
+    )
+
+
+def _customer_name(row):
+    if row['customer__customer_type'] == 'company' and row['customer__company_name']:
+        return row['customer__company_name']
+    return f"{row['customer__first_name']} {row['customer__last_name']}"
+
+
+def compute(as_of):
+    """Lignes de la balance âgée : une par client ayant un restant dû"""
+    rows = []
+    for row in aging_queryset(as_of).iterator(chunk_size=2000):
+        line = {'customer_id': row['customer_id'], 'customer': _customer_name(row)}
+        line.update({code: quantize(row[code]) for code, *_ in BUCKETS})
+        line['total'] = quantize(row['total'])
+        rows.append(line)
+    return rows
+
+
+def report(as_of=None, refresh=False):
+    """Balance âgée à la date d'arrêté (aujourd'hui par défaut), lue en cache si possible"""
+    as_of = as_of or timezone.localdate()
+    key = cache_key(as_of)
+    rows = None if refresh else cache.get(key)
+    if rows is None:
+        rows = compute(as_of)
+        cache.set(key, rows, AGING_CACHE_TIMEOUT)
+    return rows
+
+
+def totals(rows):
+    """Totaux de chaque tranche sur toutes les lignes"""
+    result = {code: ZERO for code, *_ in BUCKETS}
+    result['total'] = ZERO
+    for row in rows:
+        for name in result:
+            result[name] += row[name]
+    return result
+
+
+def iter_csv(rows):
+    """Lignes CSV de la balance âgée, produites au fil de l'eau"""
+    header = ['Client', *(label for _, label, *_ in BUCKETS), 'Total']
+    return export.iter_csv(header, ([row['customer'], *(row[code] for code, *_ in BUCKETS), row['total']] for row in rows))
+
+
+def iter_json(rows, as_of):
+    """Document JSON de la balance âgée, produit par morceaux"""
+    yield f'{{"as_of": "{as_of.isoformat()}", "buckets": '
+    yield json.dumps([{'code': code, 'label': label} for code, label, *_ in BUCKETS])
+    yield ', "rows": ['
+    for index, row in enumerate(rows):
+        yield (',' if index else '') + json.dumps(row, cls=DjangoJSONEncoder)
+    yield '], "totals": ' + json.dumps(totals(rows), cls=DjangoJSONEncoder) + '}'
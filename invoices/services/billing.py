@@ -0,0 +1,129 @@
+"""
+Facturation en masse des commandes livrées.
+
+Les commandes sans facture sont trouvées par anti-jointure (LEFT JOIN sur la
+facture, IS NULL) et parcourues par lots sur la clé primaire. Chaque lot est
+relu dans sa propre transaction, avec l'anti-jointure : une commande facturée
+entre-temps n'y figure plus. Les numéros sont réservés en un bloc, les montants
+repris de la commande et les factures écrites par bulk_create.
+"""
+import time
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+from commandly import viewcache
+from customers.services import lifetime
+from dashboard.services import events
+from invoices.models import Invoice
+from orders.models import Order, OrderItem
+from sequences.services import allocate_block, seed_from
+
+
+DEFAULT_CHUNK_SIZE = 1000
+BILLABLE_STATUSES = ('delivered',)
+ORDER_FIELDS = ('pk', 'customer_id', 'subtotal_ht', 'tax_amount', 'total_amount')
+
+
+class BillingReport:
+    """
+    Compte rendu d'une facturation en masse : factures créées, lots, durée
+    """
+
+    def __init__(self, invoice_date):
+        self.invoice_date = invoice_date
+        self.created = 0
+        self.chunks = 0
+        self.total_amount = 0
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {
+            'invoice_date': self.invoice_date.isoformat(),
+            'created': self.created,
+            'chunks': self.chunks,
+            'total_amount': self.total_amount,
+            'duration': round(self.duration, 3),
+        }
+
+
+def uninvoiced_orders(statuses=BILLABLE_STATUSES):
+    """Commandes facturables sans facture et avec au moins une ligne"""
+    return Order.objects.filter(
+        Exists(OrderItem.objects.filter(order=OuterRef('pk'))),
+        status__in=statuses,
+        invoice__isnull=True,
+    )
+
+
+def _create_invoices(orders, last_id, chunk_size, invoice_date, due_date, payment_terms):
+    """
+    Facture le lot des `chunk_size` commandes de `orders` qui suivent `last_id`,
+    sélectionné dans la transaction de l'écriture
+    """
+    with transaction.atomic():
+        chunk = list(orders.filter(pk__gt=last_id)[:chunk_size])
+        if not chunk:
+            return chunk, []
+        numbers = allocate_block('FAC', len(chunk), day=invoice_date, seed=seed_from(Invoice, 'invoice_number'))
+        invoices = [
+            Invoice(
+                invoice_number=number,
+                order_id=order['pk'],
+                customer_id=order['customer_id'],
+                status='pending',
+                invoice_date=invoice_date,
+                due_date=due_date,
+                subtotal_ht=order['subtotal_ht'],
+                tax_amount=order['tax_amount'],
+                total_amount=order['total_amount'],
+                paid_amount=0,
+                remaining_amount=order['total_amount'],
+                payment_terms=payment_terms,
+            )
+            for number, order in zip(numbers, chunk)
+        ]
+        Invoice.objects.bulk_create(invoices, batch_size=len(invoices))
+
+        # bulk_create n'émet pas de signaux : métriques du tableau de bord mises à jour en un delta,
+        # encours des clients recalculés
+        changes = events.Changes()
+        for invoice in invoices:
+            events.invoice_contribution(changes, {
+                'status': invoice.status,
+                'invoice_date': invoice.invoice_date,
+                'remaining_amount': invoice.remaining_amount,
+            }, 1)
+        changes.apply()
+        lifetime.rebuild({invoice.customer_id for invoice in invoices})
+        viewcache.invalidate(Invoice)
+    return chunk, invoices
+
+
+def generate(invoice_date=None, payment_terms='30 jours', statuses=BILLABLE_STATUSES,
+             chunk_size=DEFAULT_CHUNK_SIZE, progress=None):
+    """
+    Facture toutes les commandes de statut `statuses` qui n'en ont pas encore,
+    par lots de `chunk_size`. `progress`, s'il est donné, est appelé avec le
+    compte rendu après chaque lot.
+    """
+    invoice_date = invoice_date or timezone.localdate()
+    due_date = Invoice(invoice_date=invoice_date, payment_terms=payment_terms).calculate_due_date()
+    report = BillingReport(invoice_date)
+    started = time.perf_counter()
+    orders = uninvoiced_orders(statuses).order_by('pk').values(*ORDER_FIELDS)
+
+    last_id = 0
+    while True:
+        chunk, invoices = _create_invoices(orders, last_id, chunk_size, invoice_date, due_date, payment_terms)
+        if not chunk:
+            break
+        report.created += len(invoices)
+        report.chunks += 1
+        report.total_amount += sum(invoice.total_amount for invoice in invoices)
+        last_id = chunk[-1]['pk']
+        report.duration = time.perf_counter() - started
+        if progress is not None:
+            progress(report)
+
+    report.duration = time.perf_counter() - started
+    return report
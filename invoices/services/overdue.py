@@ -0,0 +1,76 @@
+"""
+Passage en retard des factures échues.
+
+Les factures en attente ou partiellement payées dont l'échéance est dépassée
+passent au statut « overdue » par UPDATE ensemblistes, un par lot de `chunk_size`
+factures sélectionnées sur l'index (status, due_date), puis la ligne d'agrégats
+de leurs clients est datée (customers.services.lifetime). Une facture déjà en retard
+ne correspond plus au filtre : le balayage est idempotent et peut être relancé
+à tout moment (ex. chaque minute), un passage sans facture échue coûtant une requête.
+"""
+import time
+from django.db import transaction
+from django.utils import timezone
+from commandly import viewcache
+from customers.services import lifetime
+from invoices.models import Invoice
+
+
+# Statuts susceptibles de passer en retard
+DUE_STATUSES = ('pending', 'partially_paid')
+DEFAULT_CHUNK_SIZE = 1000
+
+
+class SweepReport:
+    """
+    Compte rendu d'un balayage : date de référence, factures passées en retard,
+    lots traités et durée
+    """
+
+    def __init__(self, as_of):
+        self.as_of = as_of
+        self.updated = 0
+        self.chunks = 0
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {
+            'as_of': self.as_of.isoformat(),
+            'updated': self.updated,
+            'chunks': self.chunks,
+            'duration': round(self.duration, 3),
+        }
+
+
+def past_due(today=None):
+    """Factures échues non encore marquées en retard"""
+    today = today or timezone.localdate()
+    return Invoice.objects.filter(status__in=DUE_STATUSES, due_date__lt=today)
+
+
+def sweep(today=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Marque en retard les factures échues au `today` donné (aujourd'hui par défaut),
+    par lots. Chaque lot est une transaction courte : lecture des `chunk_size`
+    premières factures échues, UPDATE … WHERE id IN (…) qui revérifie statut et
+    échéance, puis datation des agrégats de leurs clients.
+    """
+    report = SweepReport(today or timezone.localdate())
+    started = time.perf_counter()
+    due = past_due(report.as_of)
+    while True:
+        with transaction.atomic():
+            chunk = dict(due.order_by().values_list('pk', 'customer_id')[:chunk_size])
+            if not chunk:
+                break
+            updated = due.filter(pk__in=chunk).update(status='overdue', updated_at=timezone.now())
+            # L'encours ne change pas (la facture reste ouverte) ; la vue 360 des
+            # clients, dont la clé de cache suit leurs agrégats, doit être relue
+            lifetime.touch_all(chunk.values())
+        viewcache.invalidate(Invoice)
+        report.updated += updated
+        report.chunks += 1
+        if updated < chunk_size:
+            break
+    report.duration = time.perf_counter() - started
+    return report
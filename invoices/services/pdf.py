@@ -0,0 +1,294 @@
+"""
+Rendu PDF des factures.
+
+Le document est mis en page par commandly.pdf (Python pur) à partir d'un
+dictionnaire de valeurs simples extrait de la facture, de sa commande et de son
+client (invoice_data). Le fichier rendu est conservé sur disque dans
+settings.INVOICE_PDF_DIR sous un nom formé de l'identifiant de la facture et
+d'une empreinte des dates de modification de la facture, de la commande et du
+client : toute modification produit un nouveau nom, et un téléchargement répété
+sert le fichier existant sans nouveau rendu.
+
+render_batch() rend des lots de factures (fin de mois) dans un pool de processus :
+les données sont lues en base par le processus principal, les processus de rendu
+ne font qu'écrire les fichiers.
+"""
+import hashlib
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import django
+from django.conf import settings
+from django.db import connections
+from django.db.models import Prefetch
+from commandly.pdf import PAGE_HEIGHT, PAGE_WIDTH, PDFDocument
+from invoices.models import Invoice
+from orders.models import OrderItem
+
+
+# À incrémenter quand la mise en page change : les fichiers en cache sont alors renouvelés
+LAYOUT_VERSION = 1
+ISSUER = 'Commandly'
+DEFAULT_CHUNK_SIZE = 200
+
+MARGIN = 50
+RIGHT = PAGE_WIDTH - MARGIN
+ROW_HEIGHT = 18
+# Colonnes du tableau des lignes : (titre, abscisse du bord droit, ou gauche pour la première)
+COLUMNS = [
+    ('Désignation', MARGIN + 6),
+    ('Qté', 330),
+    ('PU HT', 410),
+    ('TVA', 460),
+    ('Total HT', RIGHT - 6),
+]
+
+
+def format_amount(amount):
+    """Montant arrondi à l'unité avec séparateur de milliers, comme dans les pages"""
+    return f'{amount:,.0f}'.replace(',', ' ') + ' FCFA'
+
+
+def format_rate(rate):
+    return f'{rate:.2f}'.rstrip('0').rstrip('.').replace('.', ',') + ' %'
+
+
+def format_date(value):
+    return value.strftime('%d/%m/%Y') if value else ''
+
+
+def invoice_queryset():
+    """Factures avec tout ce qu'il faut pour le rendu, en trois requêtes par lot"""
+    return Invoice.objects.select_related('customer', 'order').prefetch_related(
+        Prefetch('order__items', queryset=OrderItem.objects.select_related('product').order_by('pk')),
+    )
+
+
+def fingerprint(invoice):
+    """Empreinte du contenu rendu : version de la mise en page et dates de modification"""
+    parts = [LAYOUT_VERSION, invoice.pk, invoice.updated_at, invoice.order.updated_at, invoice.customer.updated_at]
+    return hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()[:16]
+
+
+def cache_dir():
+    return Path(settings.INVOICE_PDF_DIR)
+
+
+def cache_path(invoice):
+    return cache_dir() / f'{invoice.pk}-{fingerprint(invoice)}.pdf'
+
+
+def filename(invoice):
+    return f'facture_{invoice.invoice_number}.pdf'
+
+
+def invoice_data(invoice):
+    """Valeurs affichées sur la facture, en types simples (transmissibles à un autre processus)"""
+    customer = invoice.customer
+    address = [customer.address_line1, customer.address_line2, f'{customer.postal_code} {customer.city}', customer.country]
+    return {
+        'number': invoice.invoice_number,
+        'status': invoice.get_status_display(),
+        'invoice_date': invoice.invoice_date,
+        'due_date': invoice.due_date,
+        'order_number': invoice.order.order_number,
+        'payment_terms': invoice.payment_terms,
+        'notes': invoice.notes or '',
+        'customer': {
+            'name': str(customer),
+            'address': [line for line in address if line and line.strip()],
+            'email': customer.email or '',
+            'phone': customer.phone or '',
+        },
+        'lines': [
+            {
+                'name': item.product.name,
+                'sku': item.product.sku or '',
+                'quantity': item.quantity,
+                'unit_price': item.unit_price,
+                'tax_rate': item.tax_rate,
+                'total_ht': item.line_total_ht,
+            }
+            for item in invoice.order.items.all()
+        ],
+        'subtotal_ht': invoice.subtotal_ht,
+        'tax_amount': invoice.tax_amount,
+        'total_amount': invoice.total_amount,
+        'paid_amount': invoice.paid_amount,
+        'remaining_amount': invoice.remaining_amount,
+    }
+
+
+def _table_header(document, y):
+    document.rect(MARGIN, y - 6, RIGHT - MARGIN, ROW_HEIGHT)
+    for index, (title, x) in enumerate(COLUMNS):
+        document.text(x, y, title, size=9, bold=True, align='left' if index == 0 else 'right')
+    return y - ROW_HEIGHT
+
+
+def render(data):
+    """Octets du PDF d'une facture à partir de invoice_data()"""
+    document = PDFDocument(title=f"Facture {data['number']}")
+    top = PAGE_HEIGHT - MARGIN
+
+    # En-tête : émetteur, numéro et dates
+    document.text(MARGIN, top - 10, ISSUER, size=18, bold=True)
+    document.text(RIGHT, top - 10, 'FACTURE', size=18, bold=True, align='right')
+    details = [
+        f"N° {data['number']}",
+        f"Date : {format_date(data['invoice_date'])}",
+        f"Échéance : {format_date(data['due_date'])}",
+        f"Commande : {data['order_number']}",
+        f"Statut : {data['status']}",
+    ]
+    for index, text in enumerate(details):
+        document.text(RIGHT, top - 32 - index * 13, text, size=9, align='right')
+
+    # Client
+    y = top - 110
+    document.text(MARGIN, y, 'Facturé à', size=9, bold=True)
+    customer = data['customer']
+    for index, text in enumerate([customer['name'], *customer['address'], customer['email'], customer['phone']]):
+        if text:
+            document.text(MARGIN, y - 14 - index * 12, text, size=10, bold=index == 0)
+
+    # Lignes, sur autant de pages que nécessaire
+    y = _table_header(document, top - 220)
+    for line in data['lines']:
+        if y < MARGIN + 60:
+            document.new_page()
+            y = _table_header(document, top)
+        name = line['name'] if len(line['name']) <= 48 else line['name'][:47] + '…'
+        if line['sku']:
+            name = f"{name} ({line['sku']})"
+        values = [name, str(line['quantity']), format_amount(line['unit_price']), format_rate(line['tax_rate']), format_amount(line['total_ht'])]
+        for index, ((_, x), text) in enumerate(zip(COLUMNS, values)):
+            document.text(x, y, text, size=9, align='left' if index == 0 else 'right')
+        document.line(MARGIN, y - 6, RIGHT, y - 6, width=0.25)
+        y -= ROW_HEIGHT
+
+    # Totaux
+    totals = [
+        ('Sous-total HT', data['subtotal_ht'], False),
+        ('TVA', data['tax_amount'], False),
+        ('Total TTC', data['total_amount'], True),
+        ('Déjà payé', data['paid_amount'], False),
+        ('Restant dû', data['remaining_amount'], True),
+    ]
+    if y - len(totals) * 15 < MARGIN + 40:
+        document.new_page()
+        y = top
+    y -= 10
+    for label, amount, bold in totals:
+        document.text(420, y, label, size=10, bold=bold, align='right')
+        document.text(RIGHT - 6, y, format_amount(amount), size=10, bold=bold, align='right')
+        y -= 15
+
+    y -= 15
+    document.text(MARGIN, y, f"Conditions de paiement : {data['payment_terms']}", size=9)
+    if data['notes']:
+        document.text(MARGIN, y - 13, data['notes'][:110], size=9)
+
+    # Pied de page : numéros de page, connus une fois la mise en page terminée
+    count = len(document.pages)
+    for page in range(1, count + 1):
+        document.text(PAGE_WIDTH / 2, MARGIN - 20, f"{data['number']} — page {page} / {count}", size=8, align='center', page=page)
+    return document.render()
+
+
+def _write(path, content):
+    """
+    Écrit un fichier de façon atomique (fichier temporaire renommé) et supprime les
+    rendus précédents de la même facture
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    with os.fdopen(descriptor, 'wb') as stream:
+        stream.write(content)
+    os.replace(temporary, path)
+    invoice_id = path.name.split('-', 1)[0]
+    for previous in path.parent.glob(f'{invoice_id}-*.pdf'):
+        if previous != path:
+            previous.unlink(missing_ok=True)
+    return path
+
+
+def get_or_render(invoice):
+    """Chemin du PDF à jour d'une facture, rendu s'il n'est pas en cache"""
+    path = cache_path(invoice)
+    if not path.exists():
+        _write(path, render(invoice_data(invoice)))
+    return path
+
+
+# Rendu par lots
+
+def _render_file(task):
+    path, data = task
+    _write(path, render(data))
+    return path
+
+
+class BatchReport:
+    """
+    Compte rendu d'un rendu par lots : factures rendues, déjà en cache, durée
+    """
+
+    def __init__(self):
+        self.rendered = 0
+        self.cached = 0
+        self.duration = 0.0
+
+    def as_dict(self):
+        return {'rendered': self.rendered, 'cached': self.cached, 'duration': round(self.duration, 3)}
+
+
+def _chunks(invoices, chunk_size):
+    last_id = 0
+    while True:
+        chunk = list(invoices.filter(pk__gt=last_id).order_by('pk')[:chunk_size])
+        if not chunk:
+            return
+        yield chunk
+        last_id = chunk[-1].pk
+
+
+def render_batch(invoices=None, workers=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Rend les factures du queryset donné (toutes par défaut) absentes du cache.
+    Les données sont lues par lots de `chunk_size` factures et mises en page par
+    `workers` processus (nombre de processeurs par défaut ; 0 : dans ce processus).
+    """
+    report = BatchReport()
+    started = time.perf_counter()
+    invoices = invoice_queryset().filter(pk__in=invoices.values('pk')) if invoices is not None else invoice_queryset()
+
+    executor = None
+    if workers != 0:
+        workers = workers or os.cpu_count() or 1
+        # Les connexions ouvertes ne doivent pas être partagées avec les processus créés ;
+        # django.setup() initialise les processus démarrés sans copie du parent (spawn)
+        connections.close_all()
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=django.setup)
+    try:
+        for chunk in _chunks(invoices, chunk_size):
+            tasks = []
+            for invoice in chunk:
+                path = cache_path(invoice)
+                if path.exists():
+                    report.cached += 1
+                else:
+                    tasks.append((path, invoice_data(invoice)))
+            if executor is None:
+                results = map(_render_file, tasks)
+            else:
+                results = executor.map(_render_file, tasks, chunksize=max(1, len(tasks) // (4 * workers)))
+            report.rendered += sum(1 for _ in results)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report.duration = time.perf_counter() - started
+    return report
@@ -1,3 +1,359 @@
-from django.test import TestCase
+import json
+import re
+import tempfile
+import zipfile
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from commandly.testing import TRANSACTION_STATEMENTS, QueryCountTestCase, QueryPlanTestCase
+from customers.models import CustomerStats
+from customers.services import lifetime, summary
+from dashboard.models import DashboardMetrics
+from dashboard.services import metrics
+from invoices.forms import InvoiceForm
+from invoices.models import Invoice
+from invoices.services import aging, billing, overdue, pdf
+from invoices.views import InvoiceListView
+from orders.models import Order, OrderItem
+from payments.models import Payment
 
-# Create your tests here.
+
+class InvoiceQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_invoice_list_queries(self):
+        self.assertMaxQueries(5, reverse('invoices:invoice_list'))
+
+    def test_invoice_detail_queries(self):
+        self.assertMaxQueries(5, reverse('invoices:invoice_detail', args=[self.data['invoice'].pk]))
+
+
+class InvoiceQueryPlanTests(QueryPlanTestCase):
+    """
+    La première page de la liste des factures est lue par index pour chaque filtre
+    """
+
+    def assertListUsesIndex(self, ordered=True, **params):
+        queryset = self.list_queryset(InvoiceListView, {'search_type': 'invoice_number', **params})
+        self.assertUsesIndex(queryset, ordered=ordered)
+
+    def test_default_sort(self):
+        self.assertListUsesIndex()
+
+    def test_status_filter(self):
+        self.assertListUsesIndex(status='pending')
+
+    def test_customer_filter(self):
+        self.assertListUsesIndex(customer=self.data['customer'].pk)
+
+    def test_date_range_filter(self):
+        self.assertListUsesIndex(date_from='2025-01-01', date_to='2025-01-31')
+
+    def test_due_date_range_filter(self):
+        # Intervalle sur l'échéance : les lignes trouvées sont triées ensuite par date de facture
+        self.assertListUsesIndex(ordered=False, due_date_from='2025-01-01', due_date_to='2025-01-31')
+
+    def test_overdue_sweep_chunk(self):
+        due = overdue.past_due()
+        self.assertUsesIndex(due.order_by().values_list('pk', 'customer_id')[:1000], ordered=False)
+
+
+class InvoiceOverdueSweepTests(QueryCountTestCase):
+    """
+    Passage en retard des factures échues par lots
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        invoices = Invoice.objects.order_by('pk')
+        # Les factures de test sont payées à moitié : les trois premières sont échues
+        self.late = list(invoices.values_list('pk', flat=True)[:3])
+        invoices.update(due_date=self.today + timedelta(days=30))
+        Invoice.objects.filter(pk__in=self.late).update(due_date=self.today - timedelta(days=1))
+        Invoice.objects.filter(pk=self.late[0]).update(status='pending')
+
+    def test_sweep(self):
+        self.assertFalse(Invoice.objects.filter(status='overdue').exists())
+        with CaptureQueriesContext(connection) as context:
+            report = overdue.sweep(self.today, chunk_size=2)
+        queries = [query for query in context.captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS)]
+        # Par lot : lecture des factures, UPDATE, datation des agrégats de leurs clients
+        self.assertEqual((report.updated, report.chunks, len(queries)), (3, 2, 6))
+        self.assertEqual(set(Invoice.objects.filter(status='overdue').values_list('pk', flat=True)), set(self.late))
+
+        # Idempotent : un second passage ne trouve rien
+        self.assertEqual(overdue.sweep(self.today).updated, 0)
+        response = self.client.get(reverse('invoices:invoice_list'), {'search_type': 'invoice_number', 'payment_status': 'overdue'})
+        self.assertEqual(response.context['paginator'].count, 3)
+
+    def test_sweep_refreshes_customer_summary(self):
+        customer = Invoice.objects.get(pk=self.late[0]).customer
+        stats = lifetime.stats_for(customer)
+        CustomerStats.objects.filter(pk=customer.pk).update(updated_at=stats.updated_at - timedelta(minutes=1))
+        before = summary.cache_key(customer, CustomerStats.objects.get(pk=customer.pk))
+        overdue.sweep(self.today)
+        # La clé de cache de la vue 360 change : les factures y apparaissent en retard
+        self.assertNotEqual(summary.cache_key(customer, CustomerStats.objects.get(pk=customer.pk)), before)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('sweep_overdue_invoices', '--date', (self.today - timedelta(days=1)).isoformat(), stdout=out)
+        self.assertIn('0 facture(s)', out.getvalue())
+        call_command('sweep_overdue_invoices', stdout=out)
+        self.assertIn('3 facture(s)', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('sweep_overdue_invoices', '--date', '2025-02-30', stdout=out)
+
+
+class InvoiceAgingTests(QueryCountTestCase):
+    """
+    Balance âgée par client en une requête groupée
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.today = timezone.localdate()
+        cache.delete(aging.cache_key(self.today))
+        # Quatre factures, une par tranche : échéance dans 10 jours, il y a 45, 75 et 120 jours
+        self.invoices = list(Invoice.objects.order_by('pk')[:4])
+        for invoice, days in zip(self.invoices, (-10, 45, 75, 120)):
+            Invoice.objects.filter(pk=invoice.pk).update(
+                due_date=self.today - timedelta(days=days), invoice_date=self.today - timedelta(days=days + 30),
+            )
+        Invoice.objects.exclude(pk__in=[invoice.pk for invoice in self.invoices]).update(status='cancelled')
+
+    def rows_by_customer(self, as_of):
+        return {row['customer_id']: row for row in aging.compute(as_of)}
+
+    def test_buckets(self):
+        with self.assertNumQueries(1):
+            rows = self.rows_by_customer(self.today)
+        self.assertEqual(len(rows), 4)
+        for invoice, (code, *_) in zip(self.invoices, aging.BUCKETS):
+            row = rows[invoice.customer_id]
+            self.assertEqual(row[code], row['total'])
+            self.assertEqual(row['total'], invoice.remaining_amount)
+        self.assertEqual(aging.totals(rows.values())['total'], sum(invoice.remaining_amount for invoice in self.invoices))
+
+    def test_past_date_adds_later_payments(self):
+        invoice = self.invoices[0]
+        Payment.objects.create(
+            invoice=invoice, customer=invoice.customer, amount=invoice.remaining_amount,
+            payment_method='cash', status='completed',
+        )
+        self.assertEqual(Invoice.objects.get(pk=invoice.pk).status, 'paid')
+        self.assertNotIn(invoice.customer_id, self.rows_by_customer(self.today))
+        # La veille, ni ce paiement ni celui du jeu de test (daté d'aujourd'hui) n'étaient reçus
+        yesterday = self.today - timedelta(days=1)
+        self.assertEqual(self.rows_by_customer(yesterday)[invoice.customer_id]['total'], invoice.total_amount)
+
+    def test_report_is_cached(self):
+        aging.report()
+        with self.assertNumQueries(0):
+            aging.report()
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('invoices:invoice_aging'), {'format': 'csv'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'Client;0–30 jours;31–60 jours;61–90 jours;+90 jours;Total')
+        self.assertEqual(len(lines), 5)
+
+    def test_json_export(self):
+        response = self.client.get(reverse('invoices:invoice_aging'), {'as_of': self.today.isoformat()})
+        data = json.loads(b''.join(response.streaming_content))
+        self.assertEqual(data['as_of'], self.today.isoformat())
+        self.assertEqual(len(data['rows']), 4)
+        self.assertEqual(Decimal(data['totals']['total']), sum(invoice.remaining_amount for invoice in self.invoices))
+
+    def test_impossible_date(self):
+        response = self.client.get(reverse('invoices:invoice_aging'), {'as_of': '2025-02-30'})
+        self.assertEqual(response.status_code, 400)
+
+
+class InvoicePDFTests(QueryCountTestCase):
+    """
+    Rendu PDF des factures, conservé sur disque tant que la facture ne change pas
+    """
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(INVOICE_PDF_DIR=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.invoice = pdf.invoice_queryset().get(pk=self.data['invoice'].pk)
+
+    def assertValidPDF(self, content):
+        self.assertTrue(content.startswith(b'%PDF-1.4'))
+        # Chaque entrée de la table xref pointe sur le début de son objet
+        xref = int(re.search(rb'startxref\n(\d+)', content).group(1))
+        offsets = re.findall(rb'(\d{10}) 00000 n', content[xref:])
+        for number, offset in enumerate(offsets, start=1):
+            self.assertTrue(content[int(offset):].startswith(b'%d 0 obj' % number))
+
+    def page_texts(self, content):
+        streams = re.findall(rb'stream\n(.*?)\nendstream', content, re.S)
+        return [zlib.decompress(stream).decode('cp1252') for stream in streams]
+
+    def test_render(self):
+        content = pdf.get_or_render(self.invoice).read_bytes()
+        self.assertValidPDF(content)
+        text = self.page_texts(content)[0]
+        self.assertIn(self.invoice.invoice_number, text)
+        self.assertIn(pdf.format_amount(self.invoice.total_amount), text)
+
+    def test_long_invoice_spans_pages(self):
+        data = pdf.invoice_data(self.invoice)
+        data['lines'] = data['lines'] * 60
+        pages = self.page_texts(pdf.render(data))
+        self.assertGreater(len(pages), 1)
+        self.assertIn(f'page {len(pages)} / {len(pages)}', pages[-1])
+        self.assertTrue(all('Désignation' in page for page in pages[:-1]))
+
+    def test_cache_follows_updates(self):
+        path = pdf.get_or_render(self.invoice)
+        with self.assertNumQueries(0):
+            self.assertEqual(pdf.get_or_render(self.invoice), path)
+
+        self.invoice.notes = 'Livraison comprise'
+        self.invoice.save()
+        invoice = pdf.invoice_queryset().get(pk=self.invoice.pk)
+        updated = pdf.get_or_render(invoice)
+        self.assertNotEqual(updated, path)
+        # L'ancien rendu est supprimé
+        self.assertEqual(list(updated.parent.iterdir()), [updated])
+
+    def test_view(self):
+        response = self.client.get(reverse('invoices:invoice_pdf', args=[self.invoice.pk]))
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertIn(f'facture_{self.invoice.invoice_number}.pdf', response['Content-Disposition'])
+        self.assertValidPDF(b''.join(response.streaming_content))
+        response.close()
+        # Second téléchargement : le fichier est servi sans relire les lignes de la commande
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse('invoices:invoice_pdf', args=[self.invoice.pk])).close()
+        self.assertFalse(any('orders_orderitem' in query['sql'] for query in context.captured_queries))
+
+    def test_batch(self):
+        report = pdf.render_batch(workers=2, chunk_size=3)
+        count = Invoice.objects.count()
+        self.assertEqual((report.rendered, report.cached), (count, 0))
+        for invoice in pdf.invoice_queryset():
+            self.assertValidPDF(pdf.cache_path(invoice).read_bytes())
+        self.assertEqual(pdf.render_batch(workers=0).as_dict()['cached'], count)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('render_invoice_pdfs', '--all', '--workers', '0', stdout=out)
+        self.assertIn(f'{Invoice.objects.count()} PDF rendu(s)', out.getvalue())
+
+
+class InvoiceBillingTests(QueryCountTestCase):
+    """
+    Facturation en masse des commandes livrées sans facture
+    """
+
+    def setUp(self):
+        super().setUp()
+        product = self.data['product']
+        self.orders = []
+        for index in range(5):
+            order = Order.objects.create(customer=self.data['customer'])
+            OrderItem.objects.create(order=order, product=product, quantity=index + 1, unit_price=product.unit_price)
+            self.orders.append(order)
+        # Livrées hors des vues : pas de mouvement de stock à gérer ici
+        Order.objects.filter(pk__in=[order.pk for order in self.orders]).update(status='delivered')
+        # Ni une commande en brouillon, ni une commande vide ne sont facturées
+        OrderItem.objects.create(order=Order.objects.create(customer=self.data['customer']), product=product, quantity=1)
+        Order.objects.create(customer=self.data['customer'], status='delivered')
+
+    def test_generate(self):
+        today = timezone.localdate()
+        progress = []
+        report = billing.generate(today, chunk_size=2, progress=lambda report: progress.append(report.created))
+        self.assertEqual((report.created, report.chunks), (5, 3))
+        self.assertEqual(progress, [2, 4, 5])
+
+        invoices = list(Invoice.objects.filter(order__in=self.orders).order_by('order_id'))
+        self.assertEqual(len(invoices), 5)
+        numbers = [int(invoice.invoice_number[-3:]) for invoice in invoices]
+        self.assertEqual(numbers, list(range(numbers[0], numbers[0] + 5)))
+        for order, invoice in zip(self.orders, invoices):
+            order.refresh_from_db()
+            self.assertEqual((invoice.total_amount, invoice.remaining_amount), (order.total_amount, order.total_amount))
+            self.assertEqual(invoice.due_date, today + timedelta(days=30))
+        self.assertEqual(report.total_amount, sum(invoice.total_amount for invoice in invoices))
+
+        # Rien à refacturer au second passage
+        self.assertEqual(billing.generate(today).created, 0)
+
+    def test_order_invoiced_during_run_is_skipped(self):
+        def invoice_next_order(report):
+            if report.chunks == 1:
+                order = self.orders[-1]
+                Invoice.objects.create(order=order, customer=order.customer, invoice_date=timezone.localdate())
+
+        report = billing.generate(chunk_size=2, progress=invoice_next_order)
+        self.assertEqual(report.created, 4)
+        self.assertEqual(Invoice.objects.filter(order__in=self.orders).count(), 5)
+
+    def test_queries_per_chunk(self):
+        billing.generate(chunk_size=5)
+        # Les commandes restantes sont facturées avec un nombre de requêtes indépendant de leur nombre
+        Invoice.objects.filter(order__in=self.orders).delete()
+        with CaptureQueriesContext(connection) as context:
+            billing.generate(chunk_size=5)
+        queries = [query['sql'] for query in context.captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS)]
+        inserts = [sql for sql in queries if sql.startswith('INSERT INTO "invoices_invoice"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertLess(len(queries), 20)
+
+    def test_dashboard_matches_rebuild(self):
+        metrics.build_metrics(full=True)
+        billing.generate()
+        fields = ('period_start', 'period_type', 'total_invoices', 'pending_invoices', 'total_outstanding')
+        incremental = list(DashboardMetrics.objects.order_by('period_start', 'period_type').values_list(*fields))
+        metrics.build_metrics(full=True)
+        self.assertEqual(incremental, list(DashboardMetrics.objects.order_by('period_start', 'period_type').values_list(*fields)))
+
+    def test_form_lists_uninvoiced_orders(self):
+        form = InvoiceForm()
+        self.assertEqual(set(form.fields['order'].queryset), set(self.orders) | set(Order.objects.filter(items__isnull=True)))
+        form = InvoiceForm(instance=self.data['invoice'])
+        self.assertIn(self.data['order'], form.fields['order'].queryset)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('generate_invoices', '--chunk-size', '3', stdout=out)
+        self.assertIn('Lot 2 : 5 facture(s)', out.getvalue())
+        self.assertIn('5 facture(s) créée(s)', out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('generate_invoices', '--date', '2025-02-30', stdout=out)
+
+
+class InvoiceExportTests(QueryCountTestCase):
+    """
+    Export des factures avec les filtres de la liste
+    """
+
+    def test_xlsx(self):
+        response = self.client.get(reverse('invoices:invoice_export'), {'search_type': 'invoice_number', 'format': 'xlsx'})
+        self.assertIn('factures_', response['Content-Disposition'])
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertEqual(archive.read('xl/worksheets/sheet1.xml').count(b'<row>'), Invoice.objects.count() + 1)
+
+    def test_csv_filter(self):
+        response = self.client.get(reverse('invoices:invoice_export'), {'search_type': 'invoice_number', 'status': 'paid'})
+        self.assertEqual(b''.join(response.streaming_content).decode().splitlines()[1:], [])
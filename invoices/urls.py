@@ -5,6 +5,8 @@ app_name = 'invoices'
 
 urlpatterns = [
     path('', views.InvoiceListView.as_view(), name='invoice_list'),
+    path('aging/', views.InvoiceAgingReportView.as_view(), name='invoice_aging'),
+    path('export/', views.InvoiceExportView.as_view(), name='invoice_export'),
     path('create/', views.InvoiceCreateView.as_view(), name='invoice_create'),
     path('<int:pk>/', views.InvoiceDetailView.as_view(), name='invoice_detail'),
     path('<int:pk>/edit/', views.InvoiceUpdateView.as_view(), name='invoice_update'),
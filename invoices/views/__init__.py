@@ -1,4 +1,6 @@
 # Vues pour l'application invoices
+from .aging import InvoiceAgingReportView
+from .export import InvoiceExportView
 from .invoice import InvoiceListView, InvoiceCreateView, InvoiceDetailView, InvoiceUpdateView, InvoiceDeleteView, InvoicePDFView, InvoiceStatusUpdateView
 
-__all__ = ['InvoiceListView', 'InvoiceCreateView', 'InvoiceDetailView', 'InvoiceUpdateView', 'InvoiceDeleteView', 'InvoicePDFView', 'InvoiceStatusUpdateView']
+__all__ = ['InvoiceListView', 'InvoiceCreateView', 'InvoiceDetailView', 'InvoiceUpdateView', 'InvoiceDeleteView', 'InvoicePDFView', 'InvoiceStatusUpdateView', 'InvoiceAgingReportView', 'InvoiceExportView']
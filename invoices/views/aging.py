@@ -0,0 +1,33 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse, StreamingHttpResponse
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views import View
+from invoices.services import aging
+
+
+class InvoiceAgingReportView(LoginRequiredMixin, View):
+    """
+    Balance âgée des créances par client, en CSV (?format=csv) ou en JSON,
+    à la date d'arrêté ?as_of=AAAA-MM-JJ (aujourd'hui par défaut)
+    """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request):
+        as_of = timezone.localdate()
+        if request.GET.get('as_of'):
+            try:
+                as_of = parse_date(request.GET['as_of'])
+            except ValueError:
+                # Date bien formée mais inexistante (2025-02-30)
+                as_of = None
+            if as_of is None:
+                return JsonResponse({'success': False, 'message': "Date d'arrêté invalide."}, status=400)
+        rows = aging.report(as_of, refresh='refresh' in request.GET)
+
+        if request.GET.get('format') == 'csv':
+            response = StreamingHttpResponse(aging.iter_csv(rows), content_type='text/csv; charset=utf-8')
+            response['Content-Disposition'] = f'attachment; filename="balance_agee_{as_of.isoformat()}.csv"'
+            return response
+        return StreamingHttpResponse(aging.iter_json(rows, as_of), content_type='application/json')
@@ -0,0 +1,24 @@
+from commandly.export import Column, ExportMixin, choice_column, customer_column
+from invoices.models import Invoice
+from invoices.views.invoice import InvoiceListView
+
+
+class InvoiceExportView(ExportMixin, InvoiceListView):
+    """
+    Export CSV / XLSX des factures, avec les filtres de la liste
+    """
+    export_filename = 'factures'
+    export_columns = [
+        Column('Numéro', 'invoice_number'),
+        Column('Commande', 'order__order_number'),
+        customer_column(),
+        choice_column('Statut', 'status', Invoice.STATUS_CHOICES),
+        Column('Date', 'invoice_date'),
+        Column('Échéance', 'due_date'),
+        Column('Payée le', 'paid_date'),
+        Column('Sous-total HT', 'subtotal_ht'),
+        Column('TVA', 'tax_amount'),
+        Column('Total TTC', 'total_amount'),
+        Column('Payé', 'paid_amount'),
+        Column('Restant dû', 'remaining_amount'),
+    ]
@@ -1,18 +1,21 @@
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Sum
-from django.http import JsonResponse, HttpResponse
+from django.db.models import Prefetch, Q
+from django.http import FileResponse, JsonResponse
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.views import View as BaseView
+from commandly.pagination import KeysetPaginationMixin
+from commandly.stats import count_by_choice, count_if, group, sum_of, summarize
 from invoices.models import Invoice
 from invoices.forms.invoice_forms import InvoiceForm, InvoiceSearchForm
-from orders.models import Order
+from invoices.services import pdf
+from orders.models import Order, OrderItem
 from customers.models import Customer
 
 
-class InvoiceListView(LoginRequiredMixin, ListView):
+class InvoiceListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Liste des factures avec recherche et pagination
     """
@@ -20,10 +23,12 @@ class InvoiceListView(LoginRequiredMixin, ListView):
     template_name = 'invoices/invoice_list.html'
     context_object_name = 'page_obj'
     paginate_by = 20
+    # Tri du mode de pagination par curseur (?pagination=keyset)
+    keyset_ordering = ('-invoice_date', '-id')
     login_url = reverse_lazy('users:login')
     
     def get_queryset(self):
-        invoices = Invoice.objects.all()
+        invoices = Invoice.objects.select_related('customer')
         
         # Récupération des paramètres de recherche
         search_form = InvoiceSearchForm(self.request.GET)
@@ -53,7 +58,7 @@ class InvoiceListView(LoginRequiredMixin, ListView):
                 elif search_type == 'status':
                     invoices = invoices.filter(status__icontains=search_query)
                 elif search_type == 'date':
-                    invoices = invoices.filter(invoice_date__date__icontains=search_query)
+                    invoices = invoices.filter(invoice_date__icontains=search_query)
                 elif search_type == 'amount':
                     invoices = invoices.filter(total_amount__icontains=search_query)
             
@@ -64,10 +69,10 @@ class InvoiceListView(LoginRequiredMixin, ListView):
                 invoices = invoices.filter(status=status)
             
             if date_from:
-                invoices = invoices.filter(invoice_date__date__gte=date_from)
+                invoices = invoices.filter(invoice_date__gte=date_from)
             
             if date_to:
-                invoices = invoices.filter(invoice_date__date__lte=date_to)
+                invoices = invoices.filter(invoice_date__lte=date_to)
             
             if due_date_from:
                 invoices = invoices.filter(due_date__gte=due_date_from)
@@ -96,26 +101,23 @@ class InvoiceListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         search_form = InvoiceSearchForm(self.request.GET)
-        invoices = self.get_queryset()
         
-        # Calcul des statistiques
-        total_invoices = invoices.count()
-        total_amount = invoices.aggregate(total=Sum('total_amount'))['total'] or 0
-        total_paid = invoices.aggregate(paid=Sum('paid_amount'))['paid'] or 0
-        total_remaining = total_amount - total_paid
-        
-        invoices_by_status = {}
-        for status_choice in Invoice.STATUS_CHOICES:
-            status_code = status_choice[0]
-            invoices_by_status[status_code] = invoices.filter(status=status_code).count()
+        # Calcul des statistiques en une seule requête sur la liste filtrée
+        stats = summarize(
+            self.object_list,
+            total_invoices=count_if(),
+            total_amount=sum_of('total_amount'),
+            total_paid=sum_of('paid_amount'),
+            **count_by_choice('status', Invoice.STATUS_CHOICES, 'status_'),
+        )
         
         context.update({
             'search_form': search_form,
-            'total_invoices': total_invoices,
-            'total_amount': total_amount,
-            'total_paid': total_paid,
-            'total_remaining': total_remaining,
-            'invoices_by_status': invoices_by_status,
+            'total_invoices': stats['total_invoices'],
+            'total_amount': stats['total_amount'],
+            'total_paid': stats['total_paid'],
+            'total_remaining': stats['total_amount'] - stats['total_paid'],
+            'invoices_by_status': group(stats, 'status_'),
         })
         
         return context
@@ -130,9 +132,14 @@ class InvoiceDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'invoice'
     login_url = reverse_lazy('users:login')
     
+    def get_queryset(self):
+        return Invoice.objects.select_related('customer', 'order').prefetch_related(
+            Prefetch('order__items', queryset=OrderItem.objects.select_related('product'))
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        invoice = self.get_object()
+        invoice = self.object
         
         # Récupération des paiements associés
         payments = invoice.payments.all().order_by('-payment_date')
@@ -249,17 +256,15 @@ class InvoicePDFView(LoginRequiredMixin, BaseView):
     login_url = reverse_lazy('users:login')
     
     def get(self, request, pk):
-        invoice = get_object_or_404(Invoice, pk=pk)
-        
-        # Ici nous générerions le PDF de la facture
-        # Pour l'instant, nous retournons une réponse simple
-        response = HttpResponse(content_type='application/pdf')
-        response['Content-Disposition'] = f'attachment; filename="facture_{invoice.invoice_number}.pdf"'
-        
-        # TODO: Implémenter la génération PDF
-        response.write(b'PDF content would go here')
-        
-        return response
+        invoice = get_object_or_404(Invoice.objects.select_related('customer', 'order'), pk=pk)
+        # Fichier en cache à jour, ou rendu maintenant ; servi sans copie en mémoire
+        path = pdf.cache_path(invoice)
+        if not path.exists():
+            invoice = get_object_or_404(pdf.invoice_queryset(), pk=pk)
+            path = pdf.get_or_render(invoice)
+        return FileResponse(
+            open(path, 'rb'), as_attachment=True, filename=pdf.filename(invoice), content_type='application/pdf',
+        )
 
 
 class InvoiceStatusUpdateView(LoginRequiredMixin, BaseView):
@@ -1,4 +1,4 @@
 # Formulaires pour l'application orders
-from .order_forms import OrderForm, OrderItemForm, OrderSearchForm
+from .order_forms import OrderForm, OrderItemForm, OrderSearchForm, validate_order_item
 
-__all__ = ['OrderForm', 'OrderItemForm', 'OrderSearchForm']
+__all__ = ['OrderForm', 'OrderItemForm', 'OrderSearchForm', 'validate_order_item']
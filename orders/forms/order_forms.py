@@ -4,6 +4,7 @@ from django.utils import timezone
 from orders.models import Order, OrderItem
 from customers.models import Customer
 from products.models import Product
+from stock.services import reservations
 
 
 class OrderForm(forms.ModelForm):
@@ -75,6 +76,34 @@ class OrderForm(forms.ModelForm):
         return cleaned_data
 
 
+def validate_order_item(product, quantity, unit_price, reserved=0):
+    """
+    Règles de validation d'une ligne de commande, partagées entre OrderItemForm
+    et l'import en masse. Retourne la liste des erreurs (champ, message).
+    `product` peut être toute structure exposant product_type et stock_quantity.
+    `reserved` est la quantité du produit déjà réservée par la commande, qui
+    s'ajoute au disponible. La réservation à la confirmation reste la vérification
+    qui fait foi.
+    """
+    errors = []
+    
+    # Validation : quantité positive
+    if quantity and quantity <= 0:
+        errors.append(('quantity', 'La quantité doit être strictement positive.'))
+    
+    # Validation : prix unitaire positif
+    if unit_price and unit_price <= 0:
+        errors.append(('unit_price', 'Le prix unitaire doit être strictement positif.'))
+    
+    # Validation : stock disponible pour les produits physiques
+    if product and product.product_type == 'product' and quantity:
+        available = product.stock_quantity + reserved
+        if quantity > available:
+            errors.append(('quantity', f'Stock insuffisant. Disponible : {available}'))
+    
+    return errors
+
+
 class OrderItemForm(forms.ModelForm):
     """
     Formulaire pour les lignes de commande
@@ -124,22 +153,19 @@ class OrderItemForm(forms.ModelForm):
     
     def clean(self):
         cleaned_data = super().clean()
-        quantity = cleaned_data.get('quantity')
-        unit_price = cleaned_data.get('unit_price')
-        product = cleaned_data.get('product')
         
-        # Validation : quantité positive
-        if quantity and quantity <= 0:
-            self.add_error('quantity', 'La quantité doit être strictement positive.')
-        
-        # Validation : prix unitaire positif
-        if unit_price and unit_price <= 0:
-            self.add_error('unit_price', 'Le prix unitaire doit être strictement positif.')
+        product = cleaned_data.get('product')
+        reserved = 0
+        if product and self.instance.order_id:
+            reserved = reservations.reserved_for(self.instance.order_id, product.pk)
         
-        # Validation : stock disponible pour les produits physiques
-        if product and product.product_type == 'product' and quantity:
-            if quantity > product.stock_quantity:
-                self.add_error('quantity', f'Stock insuffisant. Disponible : {product.stock_quantity}')
+        for field, message in validate_order_item(
+            product,
+            cleaned_data.get('quantity'),
+            cleaned_data.get('unit_price'),
+            reserved,
+        ):
+            self.add_error(field, message)
         
         return cleaned_data
 
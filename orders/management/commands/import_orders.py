@@ -0,0 +1,61 @@
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from orders.services.importer import DEFAULT_BATCH_SIZE, import_orders
+
+
+class Command(BaseCommand):
+    help = "Importe des commandes et leurs lignes depuis un fichier CSV ou JSONL"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Fichier à importer (.csv ou .jsonl)')
+        parser.add_argument(
+            '--format',
+            choices=['csv', 'jsonl'],
+            help="Format du fichier (déduit de l'extension par défaut)",
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Nombre de lignes écrites par lot (défaut : %(default)s)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Valide le fichier sans rien écrire en base",
+        )
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f'Fichier introuvable : {path}')
+
+        file_format = options['format'] or path.suffix.lstrip('.').lower()
+        if file_format not in ('csv', 'jsonl'):
+            raise CommandError(f"Format non reconnu pour {path.name}, utilisez --format.")
+        if options['batch_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+
+        started = time.perf_counter()
+        with path.open(newline='', encoding='utf-8') as stream:
+            report = import_orders(
+                stream,
+                file_format,
+                batch_size=options['batch_size'],
+                dry_run=options['dry_run'],
+            )
+        elapsed = time.perf_counter() - started
+
+        for line_no, message in report.errors:
+            self.stderr.write(f'Ligne {line_no} : {message}')
+        if report.error_count > len(report.errors):
+            self.stderr.write(f'... {report.error_count - len(report.errors)} erreur(s) supplémentaire(s)')
+
+        rate = report.lines_read / elapsed if elapsed else 0
+        prefix = '[simulation] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{report.orders_created} commande(s) et {report.lines_imported} ligne(s) importées, '
+            f'{report.orders_rejected} commande(s) rejetée(s) '
+            f'({report.lines_read} lignes lues en {elapsed:.2f} s, {rate:.0f} lignes/s).'
+        ))
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from customers.models import Customer
@@ -103,38 +103,67 @@ class Order(models.Model):
         verbose_name = 'Commande'
         verbose_name_plural = 'Commandes'
         ordering = ['-order_date']
+        # Index alignés sur les filtres et le tri de la liste des commandes
+        indexes = [
+            models.Index(fields=['-order_date'], name='order_date_idx'),
+            models.Index(fields=['status', '-order_date'], name='order_status_date_idx'),
+            models.Index(fields=['customer', '-order_date'], name='order_customer_date_idx'),
+        ]
+    
+    # Champs mis à jour uniquement par le moteur de totaux
+    TOTAL_FIELDS = ('subtotal_ht', 'tax_amount', 'total_amount')
     
     def __str__(self):
         return f"Commande {self.order_number} - {self.customer}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut enregistré, pour répercuter ses changements sur le stock
+        instance._previous_status = instance.__dict__.get('status')
+        return instance
+    
     def save(self, *args, **kwargs):
-        # Génération automatique du numéro de commande
-        if not self.order_number:
-            self.order_number = self.generate_order_number()
+        # Les totaux sont maintenus par le moteur de totaux (orders.services.totals) :
+        # une mise à jour classique ne doit pas écraser les montants déjà stockés
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.TOTAL_FIELDS
+            ]
         
-        # Calcul automatique des montants
-        self.calculate_totals()
+        from stock.services import reservations
+        previous_status = getattr(self, '_previous_status', None)
         
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Numéro attribué dans la transaction de l'enregistrement : un échec
+            # annule aussi l'allocation et ne laisse pas de trou dans la séquence
+            if not self.order_number:
+                self.order_number = self.generate_order_number()
+            super().save(*args, **kwargs)
+            
+            # Réservation, sortie ou libération du stock selon le nouveau statut ;
+            # InsufficientStock annule aussi l'enregistrement de la commande
+            reservations.apply_transition(self.pk, previous_status, self.status)
+        self._previous_status = self.status
+    
+    def delete(self, *args, **kwargs):
+        from stock.services import reservations
+        with transaction.atomic():
+            # Le stock réservé par une commande en cours revient au disponible
+            if getattr(self, '_previous_status', self.status) in reservations.HOLDING_STATUSES:
+                reservations.release(self.pk)
+            return super().delete(*args, **kwargs)
     
     def generate_order_number(self):
         """Génère un numéro de commande unique"""
-        from datetime import datetime
-        prefix = "CMD"
-        date_str = datetime.now().strftime("%Y%m%d")
-        # Trouver le dernier numéro pour aujourd'hui
-        today_orders = Order.objects.filter(
-            order_date__date=datetime.now().date()
-        ).count()
-        sequence = today_orders + 1
-        return f"{prefix}{date_str}{sequence:03d}"
+        from sequences.services import next_number, seed_from
+        return next_number('CMD', seed=seed_from(Order, 'order_number'))
     
     def calculate_totals(self):
-        """Calcule les totaux de la commande"""
-        items = self.items.all()
-        self.subtotal_ht = sum(item.line_total_ht for item in items)
-        self.tax_amount = sum(item.line_tax_amount for item in items)
-        self.total_amount = self.subtotal_ht + self.tax_amount
+        """Recalcule et enregistre les totaux de la commande en une seule requête agrégée"""
+        from orders.services import totals
+        return totals.recalculate(self)
     
     def can_be_confirmed(self):
         """Vérifie si la commande peut être confirmée"""
@@ -212,9 +241,26 @@ class OrderItem(models.Model):
         verbose_name_plural = 'Lignes de commande'
         ordering = ['order', 'id']
     
+    # Champs dont dépend la contribution de la ligne aux totaux
+    TRACKED_FIELDS = ('order_id', 'unit_price', 'quantity', 'tax_rate')
+    
     def __str__(self):
         return f"{self.product.name} x{self.quantity} - {self.order.order_number}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_line()
+        return instance
+    
+    def _remember_line(self):
+        """Mémorise l'état actuel de la ligne pour calculer les deltas de totaux"""
+        fields = self.__dict__
+        if all(name in fields for name in self.TRACKED_FIELDS):
+            self._previous_line = tuple(fields[name] for name in self.TRACKED_FIELDS)
+        else:
+            self._previous_line = None
+    
     @property
     def line_total_ht(self):
         """Calcule le total HT de la ligne"""
@@ -237,8 +283,39 @@ class OrderItem(models.Model):
         if not self.tax_rate:
             self.tax_rate = self.product.tax_rate
         
-        super().save(*args, **kwargs)
+        from orders.services import totals
+        adding = self._state.adding
+        previous = getattr(self, '_previous_line', None)
         
-        # Recalcul des totaux de la commande
-        self.order.calculate_totals()
-        self.order.save()
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            
+            # Mise à jour incrémentale des totaux de la commande
+            if adding:
+                totals.apply_line_change(self)
+            elif previous is not None:
+                totals.apply_line_change(self, previous)
+            else:
+                # État précédent inconnu : recalcul complet
+                totals.recalculate(self.order)
+            
+            # Ajustement de la réservation si la commande retient déjà du stock
+            self._sync_reservations(previous[0] if previous else None)
+        self._remember_line()
+    
+    def delete(self, *args, **kwargs):
+        from orders.services import totals
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            
+            # Retrait de la contribution de la ligne
+            totals.apply_line_removal(self)
+            self._sync_reservations()
+        return result
+    
+    def _sync_reservations(self, previous_order_id=None):
+        from stock.services import reservations
+        order_ids = {self.order_id, previous_order_id} - {None}
+        holding = Order.objects.filter(pk__in=order_ids, status__in=reservations.HOLDING_STATUSES)
+        for order_id in holding.values_list('pk', flat=True):
+            reservations.reserve(order_id)
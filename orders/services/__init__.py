@@ -0,0 +1,4 @@
+# Services pour l'application orders
+from . import totals
+
+__all__ = ['totals']
@@ -0,0 +1,394 @@
+import csv
+import json
+from collections import Counter, namedtuple
+from datetime import datetime, time
+from decimal import Decimal, InvalidOperation
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from commandly import viewcache
+from customers.models import Customer
+from customers.services import lifetime
+from dashboard.services import events
+from orders.forms.order_forms import validate_order_item
+from orders.models import Order, OrderItem
+from orders.services import totals
+from products.models import Product
+from search.services import reindex
+from sequences.services import allocate_block, seed_from
+from stock.services import InsufficientStock, reservations
+
+
+# Informations produit gardées en mémoire pendant l'import
+ProductInfo = namedtuple('ProductInfo', ['id', 'product_type', 'unit_price', 'tax_rate', 'stock_quantity'])
+
+DEFAULT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+ORDER_STATUSES = dict(Order.STATUS_CHOICES)
+# Statuts dont les lignes prennent du stock (réservé ou sorti)
+HOLDING_OR_COMMITTED = reservations.HOLDING_STATUSES + reservations.COMMITTED_STATUSES
+
+
+class ImportLineError(Exception):
+    """Erreur de validation d'une ligne d'import"""
+
+
+class ImportReport:
+    """
+    Compte rendu d'un import : compteurs et premières erreurs rencontrées
+    """
+
+    def __init__(self):
+        self.lines_read = 0
+        self.lines_imported = 0
+        self.orders_created = 0
+        self.orders_rejected = 0
+        self.error_count = 0
+        self.errors = []
+
+    def add_error(self, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append((line_no, message))
+
+    def as_dict(self):
+        return {
+            'lines_read': self.lines_read,
+            'lines_imported': self.lines_imported,
+            'orders_created': self.orders_created,
+            'orders_rejected': self.orders_rejected,
+            'error_count': self.error_count,
+            'errors': self.errors,
+        }
+
+
+def read_rows(stream, file_format):
+    """
+    Lit un flux CSV ou JSONL ligne par ligne.
+    Génère des tuples (numéro de ligne, dictionnaire des colonnes).
+    """
+    if file_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+    elif file_format == 'jsonl':
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except json.JSONDecodeError as exc:
+                yield line_no, {'__error__': f'JSON invalide : {exc.msg}'}
+    else:
+        raise ValueError(f"Format d'import non supporté : {file_format}")
+
+
+def load_product_map():
+    """Charge en une seule requête les produits actifs, indexés par id et par SKU"""
+    by_id, by_sku = {}, {}
+    rows = Product.objects.filter(is_active=True).values_list(
+        'id', 'sku', 'product_type', 'unit_price', 'tax_rate', 'stock_quantity'
+    )
+    for product_id, sku, product_type, unit_price, tax_rate, stock_quantity in rows.iterator(chunk_size=2000):
+        info = ProductInfo(product_id, product_type, unit_price, tax_rate, stock_quantity)
+        by_id[product_id] = info
+        if sku:
+            by_sku[sku] = info
+    return by_id, by_sku
+
+
+def _value(row, key):
+    value = row.get(key)
+    if isinstance(value, str):
+        value = value.strip()
+    return value if value not in (None, '') else None
+
+
+def _decimal(row, key):
+    value = _value(row, key)
+    if value is None:
+        return None
+    try:
+        return Decimal(str(value))
+    except InvalidOperation:
+        raise ImportLineError(f'Valeur décimale invalide pour {key} : {value}')
+
+
+def _order_date(value):
+    if value is None:
+        return timezone.now()
+    value = str(value)
+    try:
+        parsed = parse_datetime(value)
+        day = parse_date(value) if parsed is None else None
+    except ValueError:
+        # Date bien formée mais inexistante (2025-02-30)
+        day = parsed = None
+    if parsed is None:
+        if day is None:
+            raise ImportLineError(f'Date de commande invalide : {value}')
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class OrderImporter:
+    """
+    Import en flux de commandes et de leurs lignes.
+
+    Les lignes d'une même commande partagent la même colonne `order_ref` et doivent
+    se suivre dans le fichier. Colonnes reconnues : order_ref, customer_id ou
+    customer_email, product_id ou product_sku, quantity, unit_price, tax_rate,
+    notes (ligne), order_date, status, order_notes (commande).
+
+    Les commandes sont écrites par lots avec bulk_create ; les totaux sont calculés
+    une seule fois par commande et les numéros sont pré-alloués par bloc.
+    Une commande dont une ligne est invalide est rejetée en entier.
+
+    Le stock disponible est lu une fois au début de l'import ; les lignes des
+    commandes confirmées ou livrées acceptées en sont déduites au fil de l'eau,
+    puis leur stock est réservé (ou sorti) comme pour une saisie. Si la base
+    manque de stock à l'écriture (autre écriture entre-temps), le lot est annulé.
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.report = ImportReport()
+        self.products_by_id, self.products_by_sku = load_product_map()
+        # Quantités prises sur le disponible lu au début, par les commandes acceptées
+        self.consumed = Counter()
+
+    def run(self, stream, file_format):
+        """Importe un flux complet et retourne le compte rendu"""
+        pending = []
+        pending_lines = 0
+        current = None
+
+        for line_no, row in read_rows(stream, file_format):
+            self.report.lines_read += 1
+            ref = _value(row, 'order_ref')
+            if current is None or ref != current['ref']:
+                if current is not None:
+                    pending.append(current)
+                    pending_lines += len(current['lines'])
+                    if pending_lines >= self.batch_size:
+                        self.flush(pending)
+                        pending, pending_lines = [], 0
+                current = {
+                    'ref': ref, 'line_no': line_no, 'row': row, 'lines': [], 'errors': [],
+                    'holds_stock': _value(row, 'status') in HOLDING_OR_COMMITTED, 'consumed': Counter(),
+                }
+            self.add_line(current, line_no, row)
+
+        if current is not None:
+            pending.append(current)
+        if pending:
+            self.flush(pending)
+        return self.report
+
+    def add_line(self, order, line_no, row):
+        """Valide une ligne et l'ajoute à la commande en cours"""
+        try:
+            if '__error__' in row:
+                raise ImportLineError(row['__error__'])
+            line = self.build_line(row, order)
+        except ImportLineError as exc:
+            order['errors'].append((line_no, str(exc)))
+            # Commande rejetée : son stock redevient disponible pour les suivantes
+            self.give_back(order)
+            return
+        order['lines'].append(line)
+        product_id = line['product_id']
+        if order['holds_stock'] and not order['errors'] and self.products_by_id[product_id].product_type == 'product':
+            order['consumed'][product_id] += line['quantity']
+            self.consumed[product_id] += line['quantity']
+
+    def give_back(self, order):
+        self.consumed -= order['consumed']
+        order['consumed'] = Counter()
+
+    def resolve_product(self, row):
+        product_id = _value(row, 'product_id')
+        if product_id is not None:
+            try:
+                product = self.products_by_id.get(int(product_id))
+            except (TypeError, ValueError):
+                raise ImportLineError(f'Identifiant produit invalide : {product_id}')
+        else:
+            product = self.products_by_sku.get(_value(row, 'product_sku'))
+        if product is None:
+            raise ImportLineError('Produit introuvable ou inactif.')
+        return product
+
+    def build_line(self, row, order):
+        """Construit les valeurs d'une ligne en appliquant les règles d'OrderItemForm"""
+        product = self.resolve_product(row)
+        if order['holds_stock']:
+            # Disponible diminué des lignes déjà acceptées
+            product = product._replace(stock_quantity=product.stock_quantity - self.consumed[product.id])
+
+        quantity = _value(row, 'quantity')
+        try:
+            quantity = int(quantity)
+        except (TypeError, ValueError):
+            raise ImportLineError(f'Quantité invalide : {quantity}')
+        unit_price = _decimal(row, 'unit_price')
+        tax_rate = _decimal(row, 'tax_rate')
+
+        errors = validate_order_item(product, quantity, unit_price)
+        if quantity <= 0 and not errors:
+            errors.append(('quantity', 'La quantité doit être strictement positive.'))
+        if errors:
+            raise ImportLineError(' '.join(message for field, message in errors))
+
+        # Prix et TVA du produit par défaut, comme OrderItem.save()
+        return {
+            'product_id': product.id,
+            'quantity': quantity,
+            'unit_price': unit_price or product.unit_price,
+            'tax_rate': tax_rate or product.tax_rate,
+            'notes': _value(row, 'notes'),
+        }
+
+    def resolve_customers(self, orders):
+        """Résout en deux requêtes au plus les clients référencés par un lot"""
+        ids, emails = set(), set()
+        for order in orders:
+            customer_id = _value(order['row'], 'customer_id')
+            if customer_id is not None:
+                try:
+                    ids.add(int(customer_id))
+                except (TypeError, ValueError):
+                    pass
+            else:
+                email = _value(order['row'], 'customer_email')
+                if email:
+                    emails.add(email.lower())
+
+        by_id, by_email = {}, {}
+        if ids:
+            by_id = dict(Customer.objects.filter(id__in=ids).values_list('id', 'id'))
+        if emails:
+            rows = Customer.objects.filter(email__in=emails).values_list('email', 'id')
+            by_email = {email.lower(): customer_id for email, customer_id in rows}
+        return by_id, by_email
+
+    def build_order(self, order, customers_by_id, customers_by_email):
+        """Construit l'instance Order (non enregistrée) d'une commande du fichier"""
+        row = order['row']
+        customer_id = _value(row, 'customer_id')
+        if customer_id is not None:
+            try:
+                customer_id = customers_by_id.get(int(customer_id))
+            except (TypeError, ValueError):
+                customer_id = None
+        else:
+            customer_id = customers_by_email.get((_value(row, 'customer_email') or '').lower())
+        if customer_id is None:
+            raise ImportLineError('Client introuvable.')
+
+        status = _value(row, 'status') or 'draft'
+        if status not in ORDER_STATUSES:
+            raise ImportLineError(f'Statut de commande invalide : {status}')
+
+        subtotal = tax = totals.ZERO
+        for line in order['lines']:
+            line_ht, line_tax = totals.line_amounts(line['unit_price'], line['quantity'], line['tax_rate'])
+            subtotal += line_ht
+            tax += line_tax
+
+        return Order(
+            customer_id=customer_id,
+            status=status,
+            order_date=_order_date(_value(row, 'order_date')),
+            notes=_value(row, 'order_notes'),
+            subtotal_ht=subtotal,
+            tax_amount=tax,
+            total_amount=subtotal + tax,
+        )
+
+    def flush(self, orders):
+        """Valide puis écrit un lot de commandes en quelques requêtes"""
+        customers_by_id, customers_by_email = self.resolve_customers(orders)
+
+        accepted = []
+        for order in orders:
+            if not order['errors'] and not order['lines']:
+                order['errors'].append((order['line_no'], 'Commande sans ligne.'))
+            if not order['errors']:
+                try:
+                    accepted.append((self.build_order(order, customers_by_id, customers_by_email), order['lines']))
+                except ImportLineError as exc:
+                    order['errors'].append((order['line_no'], str(exc)))
+                    self.give_back(order)
+            if order['errors']:
+                self.report.orders_rejected += 1
+                for line_no, message in order['errors']:
+                    self.report.add_error(line_no, f"[{order['ref']}] {message}")
+
+        if not accepted:
+            return
+        if not self.dry_run:
+            try:
+                self.write(accepted)
+            except InsufficientStock as exc:
+                for order in orders:
+                    if not order['errors']:
+                        self.report.orders_rejected += 1
+                        self.report.add_error(order['line_no'], f"[{order['ref']}] Lot annulé : {exc}")
+                        self.give_back(order)
+                return
+        self.report.orders_created += len(accepted)
+        self.report.lines_imported += sum(len(lines) for _, lines in accepted)
+
+    def write(self, accepted):
+        """Écrit commandes et lignes avec bulk_create dans une transaction"""
+        with transaction.atomic():
+            numbers = allocate_block('CMD', len(accepted), seed=seed_from(Order, 'order_number'))
+            new_orders = []
+            for number, (order, _) in zip(numbers, accepted):
+                order.order_number = number
+                new_orders.append(order)
+            Order.objects.bulk_create(new_orders, batch_size=self.batch_size)
+
+            if not connection.features.can_return_rows_from_bulk_insert:
+                order_ids = dict(Order.objects.filter(order_number__in=numbers).values_list('order_number', 'id'))
+                for order in new_orders:
+                    order.pk = order_ids[order.order_number]
+
+            items = [
+                OrderItem(order_id=order.pk, **line)
+                for order, lines in accepted
+                for line in lines
+            ]
+            OrderItem.objects.bulk_create(items, batch_size=self.batch_size)
+
+            # bulk_create n'émet pas de signaux : métriques du tableau de bord mises à jour en un delta
+            changes = events.Changes()
+            for order, lines in accepted:
+                events.order_contribution(changes, {
+                    'status': order.status,
+                    'order_date': order.order_date,
+                    'total_amount': order.total_amount,
+                    'customer_id': order.customer_id,
+                }, 1, events.lines_contribution(lines))
+            changes.apply()
+
+            # Réservation (ou sortie) du stock des commandes confirmées ou livrées,
+            # comme à l'enregistrement d'une commande
+            for order in new_orders:
+                reservations.apply_transition(order.pk, 'draft', order.status)
+
+            # bulk_create n'émet pas de signaux : indexation explicite pour la recherche
+            # et agrégats des clients recalculés
+            reindex('orders', [order.pk for order in new_orders])
+            lifetime.rebuild({order.customer_id for order in new_orders})
+            viewcache.invalidate(Order, OrderItem)
+
+
+def import_orders(stream, file_format, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+    """Point d'entrée de l'import de commandes depuis un flux CSV ou JSONL"""
+    return OrderImporter(batch_size=batch_size, dry_run=dry_run).run(stream, file_format)
@@ -0,0 +1,123 @@
+from decimal import Decimal, ROUND_HALF_UP
+from django.db.models import F
+from django.utils import timezone
+from orders.models import Order, OrderItem
+from orders.signals import order_totals_changed
+
+
+CENT = Decimal('0.01')
+ZERO = Decimal('0.00')
+
+
+def quantize(amount):
+    """Arrondit un montant au centime"""
+    return Decimal(amount).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def line_amounts(unit_price, quantity, tax_rate):
+    """
+    Retourne la contribution (HT, TVA) d'une ligne aux totaux de la commande.
+    La TVA est arrondie par ligne, comme dans le recalcul (aggregate_totals).
+    """
+    if unit_price is None or quantity is None or tax_rate is None:
+        return ZERO, ZERO
+    line_ht = quantize(Decimal(unit_price) * quantity)
+    line_tax = quantize(line_ht * Decimal(tax_rate) / 100)
+    return line_ht, line_tax
+
+
+def apply_delta(order, subtotal_delta, tax_delta):
+    """
+    Applique un delta aux totaux stockés d'une commande en une seule requête UPDATE.
+    `order` peut être une instance ou une clé primaire ; une instance est mise à jour en mémoire.
+    """
+    subtotal_delta = quantize(subtotal_delta)
+    tax_delta = quantize(tax_delta)
+    if not subtotal_delta and not tax_delta:
+        return
+
+    order_id = getattr(order, 'pk', order)
+    Order.objects.filter(pk=order_id).update(
+        subtotal_ht=F('subtotal_ht') + subtotal_delta,
+        tax_amount=F('tax_amount') + tax_delta,
+        total_amount=F('total_amount') + subtotal_delta + tax_delta,
+        updated_at=timezone.now(),
+    )
+    order_totals_changed.send(sender=Order, order_id=order_id, delta=subtotal_delta + tax_delta)
+
+    if isinstance(order, Order):
+        order.subtotal_ht = quantize(order.subtotal_ht + subtotal_delta)
+        order.tax_amount = quantize(order.tax_amount + tax_delta)
+        order.total_amount = order.subtotal_ht + order.tax_amount
+
+
+def apply_line_change(item, previous=None):
+    """
+    Répercute l'ajout ou la modification d'une ligne sur les totaux de sa commande.
+    `previous` est le tuple (order_id, unit_price, quantity, tax_rate) de la ligne
+    avant modification, tel que mémorisé par OrderItem.
+    """
+    new_ht, new_tax = line_amounts(item.unit_price, item.quantity, item.tax_rate)
+
+    if previous is None:
+        apply_delta(item.order, new_ht, new_tax)
+        return
+
+    old_order_id, *old_line = previous
+    old_ht, old_tax = line_amounts(*old_line)
+    if old_order_id == item.order_id:
+        apply_delta(item.order, new_ht - old_ht, new_tax - old_tax)
+    else:
+        # La ligne a changé de commande
+        apply_delta(old_order_id, -old_ht, -old_tax)
+        apply_delta(item.order, new_ht, new_tax)
+
+
+def apply_line_removal(item):
+    """Retire la contribution d'une ligne supprimée des totaux de sa commande"""
+    line_ht, line_tax = line_amounts(item.unit_price, item.quantity, item.tax_rate)
+    apply_delta(item.order_id, -line_ht, -line_tax)
+
+
+def aggregate_totals(order_ids):
+    """
+    Calcule les totaux (HT, TVA) de plusieurs commandes en une seule requête.
+    Les lignes sont sommées avec line_amounts(), comme les deltas : le recalcul
+    arrondit la TVA de chaque ligne au demi-centime supérieur (ROUND_HALF_UP),
+    sans les écarts d'un centime d'un arrondi flottant en SQL.
+    Retourne un dictionnaire {order_id: (HT, TVA)}.
+    """
+    results = {}
+    lines = (
+        OrderItem.objects
+        .filter(order_id__in=order_ids)
+        .order_by()
+        .values_list('order_id', 'unit_price', 'quantity', 'tax_rate')
+    )
+    for order_id, unit_price, quantity, tax_rate in lines.iterator():
+        line_ht, line_tax = line_amounts(unit_price, quantity, tax_rate)
+        subtotal, tax = results.get(order_id, (ZERO, ZERO))
+        results[order_id] = (subtotal + line_ht, tax + line_tax)
+    return results
+
+
+def recalculate(order):
+    """
+    Recalcule intégralement les totaux d'une commande (une requête d'agrégation
+    et une requête de mise à jour). Sert de filet de sécurité en cas de dérive.
+    """
+    order_id = getattr(order, 'pk', order)
+    subtotal, tax = aggregate_totals([order_id]).get(order_id, (ZERO, ZERO))
+    Order.objects.filter(pk=order_id).update(
+        subtotal_ht=subtotal,
+        tax_amount=tax,
+        total_amount=subtotal + tax,
+        updated_at=timezone.now(),
+    )
+    order_totals_changed.send(sender=Order, order_id=order_id, delta=None)
+
+    if isinstance(order, Order):
+        order.subtotal_ht = subtotal
+        order.tax_amount = tax
+        order.total_amount = subtotal + tax
+    return subtotal, tax
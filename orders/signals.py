@@ -0,0 +1,11 @@
+"""
+Signaux émis par l'application orders.
+
+order_totals_changed : les totaux d'une commande ont été modifiés par le moteur de
+totaux (UPDATE relatif ou recalcul), sans passer par Order.save() et ses signaux.
+Arguments : order_id et delta (variation du total TTC, None si inconnue).
+"""
+from django.dispatch import Signal
+
+
+order_totals_changed = Signal()
@@ -1,3 +1,379 @@
+import tempfile
+import zipfile
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from xml.etree import ElementTree
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.template import Context, Template
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from commandly.badges import status_badge, status_color
+from commandly.pagination import KeysetPaginator
+from commandly.testing import QueryCountTestCase, QueryPlanTestCase
+from customers.models import Customer
+from orders.models import Order, OrderItem
+from orders.services import totals
+from orders.services.importer import import_orders
+from orders.views import OrderListView
+from products.models import Category, Product
+from users.models import CustomUser
 
-# Create your tests here.
+
+class OrderTotalsTests(TestCase):
+    """
+    Totaux de commande tenus par deltas (orders.services.totals) : ajout,
+    modification, déplacement et suppression de lignes, recalcul complet
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Catégorie')
+        cls.product = Product.objects.create(
+            name='Produit', sku='SKU-TOT', category=category, product_type='service',
+            unit_price=Decimal('1000.00'), tax_rate=Decimal('18.00'),
+        )
+        cls.customer = Customer.objects.create(
+            first_name='Awa', last_name='Diop', email='awa@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='awa-diop',
+        )
+
+    def add_line(self, order, unit_price, quantity=1, tax_rate='18.00'):
+        return OrderItem.objects.create(
+            order=order, product=self.product, quantity=quantity,
+            unit_price=Decimal(unit_price), tax_rate=Decimal(tax_rate),
+        )
+
+    def assertTotals(self, order, subtotal, tax):
+        order.refresh_from_db()
+        self.assertEqual((order.subtotal_ht, order.tax_amount), (Decimal(subtotal), Decimal(tax)))
+        self.assertEqual(order.total_amount, order.subtotal_ht + order.tax_amount)
+
+    def test_add_edit_delete_line(self):
+        order = Order.objects.create(customer=self.customer)
+        line = self.add_line(order, '1000.00', 2)
+        self.assertTotals(order, '2000.00', '360.00')
+
+        line = OrderItem.objects.get(pk=line.pk)
+        line.quantity = 3
+        line.save()
+        self.assertTotals(order, '3000.00', '540.00')
+
+        line.delete()
+        self.assertTotals(order, '0.00', '0.00')
+
+    def test_line_moved_to_another_order(self):
+        first = Order.objects.create(customer=self.customer)
+        second = Order.objects.create(customer=self.customer)
+        line = self.add_line(first, '500.00')
+        line = OrderItem.objects.get(pk=line.pk)
+        line.order = second
+        line.save()
+        self.assertTotals(first, '0.00', '0.00')
+        self.assertTotals(second, '500.00', '90.00')
+
+    def test_recalculate_matches_deltas_on_half_cents(self):
+        # TVA des lignes à un demi-centime près : arrondie au centime supérieur dans les deux cas
+        order = Order.objects.create(customer=self.customer)
+        for unit_price, tax_rate in (('1.05', '10.00'), ('0.05', '10.00'), ('2.25', '18.00'), ('0.15', '10.00')):
+            self.add_line(order, unit_price, tax_rate=tax_rate)
+        expected = ('3.50', '0.55')
+        self.assertTotals(order, *expected)
+
+        Order.objects.filter(pk=order.pk).update(subtotal_ht=0, tax_amount=0, total_amount=0)
+        self.assertEqual(totals.recalculate(order.pk), tuple(Decimal(value) for value in expected))
+        self.assertTotals(order, *expected)
+
+    def test_line_write_queries_independent_of_line_count(self):
+        def queries_to_add_line(order):
+            with CaptureQueriesContext(connection) as context:
+                self.add_line(order, '100.00')
+            return len(context.captured_queries)
+
+        small = Order.objects.create(customer=self.customer)
+        large = Order.objects.create(customer=self.customer)
+        for _ in range(20):
+            self.add_line(large, '100.00')
+        self.assertEqual(queries_to_add_line(small), queries_to_add_line(large))
+
+
+class OrderImportTests(TestCase):
+    """
+    Import en masse (orders.services.importer) et commande import_orders
+    """
+
+    HEADER = 'order_ref,customer_email,product_sku,quantity,status,order_date\n'
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Catégorie')
+        cls.product = Product.objects.create(
+            name='Produit', sku='SKU-IMP', category=category,
+            unit_price=Decimal('1000.00'), tax_rate=Decimal('18.00'), stock_quantity=5,
+        )
+        Product.objects.create(
+            name='Service', sku='SRV-IMP', category=category, product_type='service',
+            unit_price=Decimal('200.00'), tax_rate=Decimal('18.00'),
+        )
+        cls.customer = Customer.objects.create(
+            first_name='Awa', last_name='Diop', email='awa@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='awa-diop',
+        )
+
+    def run_import(self, rows, **kwargs):
+        return import_orders(StringIO(self.HEADER + ''.join(f'{row}\n' for row in rows)), 'csv', **kwargs)
+
+    def test_lines_grouped_by_order_ref(self):
+        report = self.run_import([
+            'A,awa@example.com,SKU-IMP,1,,2025-08-20',
+            'A,awa@example.com,SRV-IMP,2,,2025-08-20',
+            'B,awa@example.com,SRV-IMP,1,,',
+        ])
+        self.assertEqual((report.orders_created, report.lines_imported, report.error_count), (2, 3, 0))
+        order = Order.objects.get(order_date__date='2025-08-20')
+        self.assertEqual(order.items.count(), 2)
+        self.assertEqual(order.total_amount, Decimal('1652.00'))
+        numbers = sorted(Order.objects.values_list('order_number', flat=True))
+        self.assertEqual([number[-3:] for number in numbers], ['001', '002'])
+
+    def test_invalid_line_rejects_whole_order(self):
+        report = self.run_import([
+            'A,awa@example.com,SRV-IMP,1,,',
+            'A,awa@example.com,INCONNU,1,,',
+            'B,awa@example.com,SRV-IMP,0,,',
+            'C,inconnu@example.com,SRV-IMP,1,,',
+            'D,awa@example.com,SRV-IMP,1,livree,',
+            'E,awa@example.com,SRV-IMP,1,,2025-02-30',
+        ])
+        self.assertEqual((report.orders_created, report.orders_rejected), (0, 5))
+        self.assertEqual([line_no for line_no, _ in report.errors], [3, 4, 5, 6, 7])
+        self.assertIn('2025-02-30', report.errors[-1][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_batches_and_numbering(self):
+        report = self.run_import([f'{ref},awa@example.com,SRV-IMP,1,,' for ref in 'ABCDE'], batch_size=2)
+        self.assertEqual(report.orders_created, 5)
+        numbers = sorted(Order.objects.values_list('order_number', flat=True))
+        self.assertEqual(len(set(numbers)), 5)
+        self.assertEqual(numbers[-1][-3:], '005')
+
+    def test_dry_run_writes_nothing(self):
+        report = self.run_import(['A,awa@example.com,SRV-IMP,1,,'], dry_run=True)
+        self.assertEqual(report.orders_created, 1)
+        self.assertFalse(Order.objects.exists())
+
+    def test_stock_taken_by_accepted_orders(self):
+        # 5 en stock : la deuxième commande confirmée ne peut plus être servie
+        report = self.run_import([
+            'A,awa@example.com,SKU-IMP,3,confirmed,',
+            'B,awa@example.com,SKU-IMP,3,confirmed,',
+            'C,awa@example.com,SKU-IMP,2,delivered,',
+        ])
+        self.assertEqual((report.orders_created, report.orders_rejected), (2, 1))
+        self.assertIn('[B]', report.errors[0][1])
+        self.product.refresh_from_db()
+        self.assertEqual((self.product.stock_quantity, self.product.reserved_quantity), (0, 3))
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'commandes.csv'
+            path.write_text(self.HEADER + 'A,awa@example.com,SRV-IMP,1,,\nB,awa@example.com,SRV-IMP,1,,2025-02-30\n')
+            stdout, stderr = StringIO(), StringIO()
+            call_command('import_orders', str(path), '--dry-run', stdout=stdout, stderr=stderr)
+        self.assertIn('[simulation] 1 commande(s)', stdout.getvalue())
+        self.assertIn('Ligne 3', stderr.getvalue())
+        self.assertFalse(Order.objects.exists())
+
+
+class OrderQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_order_list_queries(self):
+        self.assertMaxQueries(6, reverse('orders:order_list'))
+
+    def test_order_detail_queries(self):
+        self.assertMaxQueries(5, reverse('orders:order_detail', args=[self.data['order'].pk]))
+
+    def test_order_list_keyset_queries(self):
+        self.assertMaxQueries(6, reverse('orders:order_list') + '?pagination=keyset')
+
+
+class OrderKeysetPaginationTests(QueryCountTestCase):
+    """
+    Pagination par curseur de la liste des commandes, y compris à dates égales
+    """
+
+    def setUp(self):
+        super().setUp()
+        # Dates identiques : seul l'identifiant départage les commandes
+        Order.objects.update(order_date=timezone.now())
+        self.url = reverse('orders:order_list')
+        self.expected = list(Order.objects.order_by('-order_date', '-id').values_list('pk', flat=True))
+
+    def get_page(self, cursor=None):
+        params = {'pagination': 'keyset'}
+        if cursor:
+            params['cursor'] = cursor
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.context['page_obj']
+
+    def test_walk_forward_and_back(self):
+        first = self.get_page()
+        self.assertFalse(first.has_previous())
+        self.assertTrue(first.has_next())
+        second = self.get_page(first.next_cursor)
+        self.assertFalse(second.has_next())
+        self.assertEqual([order.pk for order in first] + [order.pk for order in second], self.expected)
+
+        back = self.get_page(second.previous_cursor)
+        self.assertEqual([order.pk for order in back], [order.pk for order in first])
+        self.assertFalse(back.has_previous())
+        self.assertTrue(back.has_next())
+
+    def test_approximate_count(self):
+        self.assertEqual(self.get_page().paginator.count, len(self.expected))
+
+    def test_pagination_component(self):
+        response = self.client.get(self.url, {'pagination': 'keyset'})
+        self.assertContains(response, f'?cursor={response.context["page_obj"].next_cursor}')
+        self.assertNotContains(response, '?page=')
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url, {'pagination': 'keyset', 'cursor': 'invalide'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_offset_mode_is_default(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['page_obj'].number, 1)
+        self.assertContains(response, '?page=2')
+
+
+class OrderQueryPlanTests(QueryPlanTestCase):
+    """
+    La première page de la liste des commandes est lue par index pour chaque filtre
+    """
+
+    def assertListUsesIndex(self, **params):
+        self.assertUsesIndex(self.list_queryset(OrderListView, {'search_type': 'order_number', **params}))
+
+    def test_default_sort(self):
+        self.assertListUsesIndex()
+
+    def test_status_filter(self):
+        self.assertListUsesIndex(status='confirmed')
+
+    def test_customer_filter(self):
+        self.assertListUsesIndex(customer=self.data['customer'].pk)
+
+    def test_date_range_filter(self):
+        self.assertListUsesIndex(date_from='2025-01-01', date_to='2025-01-31')
+
+    def test_status_and_date_filter(self):
+        self.assertListUsesIndex(status='confirmed', date_from='2025-01-01')
+
+    def test_keyset_pages(self):
+        queryset = self.list_queryset(OrderListView, {'search_type': 'order_number'}, page_size=None)
+        paginator = KeysetPaginator(queryset, 20, OrderListView.keyset_ordering)
+        for direction in ('n', 'p'):
+            with self.subTest(direction=direction):
+                page_queryset, _ = paginator.page_queryset(paginator.cursor_for(self.data['order'], direction))
+                self.assertUsesIndex(page_queryset)
+
+
+class OrderExportTests(QueryCountTestCase):
+    """
+    Export en flux de la liste des commandes, avec ses filtres
+    """
+    NS = {'s': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+    def export(self, **params):
+        return self.client.get(reverse('orders:order_export'), {'search_type': 'order_number', **params})
+
+    def test_csv(self):
+        lines = b''.join(self.export().streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(';')[:3], ['Numéro', 'Date', 'Client'])
+        self.assertEqual(len(lines), Order.objects.count() + 1)
+        self.assertIn(';Livrée;', lines[1])
+        # Mêmes filtres que la liste
+        self.assertEqual(len(b''.join(self.export(status='cancelled').streaming_content).splitlines()), 1)
+
+    def test_streams_before_query(self):
+        response = self.export()
+        chunks = iter(response.streaming_content)
+        with CaptureQueriesContext(connection) as context:
+            next(chunks)
+        self.assertEqual(context.captured_queries, [])
+        with CaptureQueriesContext(connection) as context:
+            rows = list(chunks)
+        self.assertEqual((len(rows), len(context.captured_queries)), (Order.objects.count(), 1))
+
+    def test_xlsx(self):
+        response = self.export(format='xlsx')
+        self.assertEqual(response['Content-Type'], 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+        archive = zipfile.ZipFile(BytesIO(b''.join(response.streaming_content)))
+        self.assertIsNone(archive.testzip())
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+        rows = sheet.findall('s:sheetData/s:row', self.NS)
+        self.assertEqual(len(rows), Order.objects.count() + 1)
+        self.assertEqual(rows[0].find('s:c/s:is/s:t', self.NS).text, 'Numéro')
+        # Montants et dates en cellules numériques formatées
+        total = rows[1].findall('s:c', self.NS)[-1]
+        self.assertEqual((total.get('s'), total.find('s:v', self.NS).text), ('3', str(Order.objects.order_by('-order_date').first().total_amount)))
+
+    def test_unknown_format(self):
+        self.assertEqual(self.export(format='pdf').status_code, 400)
+
+
+class StatusBadgeTests(QueryCountTestCase):
+    """
+    Badges de statut (commandly.badges) et fragments en cache du gabarit de base
+    """
+
+    def setUp(self):
+        super().setUp()
+        caches['template_fragments'].clear()
+
+    def test_status_badge(self):
+        self.assertEqual(
+            status_badge('delivered', 'order'),
+            '<span class="badge bg-success status-badge"><i class="bi bi-truck"></i> Livrée</span>',
+        )
+        # Libellé du modèle, booléens, type et statut inconnus
+        self.assertIn('> Livrée le 12</span>', status_badge('delivered', 'order', 'Livrée le 12'))
+        self.assertIn('bg-danger', status_badge(False, 'product'))
+        self.assertIn('bg-success', status_badge(3, 'stock'))
+        self.assertIn('> Archived</span>', status_badge('archived', 'unknown'))
+        self.assertIn('&lt;b&gt;', status_badge('draft', 'order', '<b>'))
+
+    def test_status_color(self):
+        self.assertEqual(status_color('partially_paid', 'invoice'), 'warning')
+        self.assertEqual(status_color('archived', 'order'), 'secondary')
+
+    def test_include_matches_tag(self):
+        context = Context({'order': self.data['order']})
+        included = Template(
+            "{% include 'components/status_badge.html' with status=order.status type='order' %}"
+        ).render(context)
+        tag = Template("{% load badges %}{% status_badge order.status 'order' %}").render(context)
+        self.assertEqual(included.strip(), tag)
+
+    def test_list_badges(self):
+        response = self.client.get(reverse('orders:order_list'))
+        self.assertContains(response, 'badge status-badge bg-success')
+
+    def test_cached_sidebar_is_shared(self):
+        self.assertContains(self.client.get(reverse('orders:order_list')), self.user.username)
+        other = CustomUser.objects.create_user(username='comptable', password='motdepasse', role='admin')
+        self.client.force_login(other)
+        response = self.client.get(reverse('dashboard:home'))
+        # Menu lu dans le cache, compte de l'utilisateur rendu à chaque requête
+        self.assertContains(response, reverse('payments:payment_list'))
+        self.assertContains(response, 'comptable')
+        self.assertNotContains(response, self.user.username)
@@ -5,6 +5,7 @@ app_name = 'orders'
 
 urlpatterns = [
     path('', views.OrderListView.as_view(), name='order_list'),
+    path('export/', views.OrderExportView.as_view(), name='order_export'),
     path('create/', views.OrderCreateView.as_view(), name='order_create'),
     path('<int:pk>/', views.OrderDetailView.as_view(), name='order_detail'),
     path('<int:pk>/edit/', views.OrderUpdateView.as_view(), name='order_update'),
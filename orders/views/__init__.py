@@ -1,4 +1,5 @@
 # Vues pour l'application orders
+from .export import OrderExportView
 from .order import (
     OrderListView, OrderCreateView, OrderDetailView, OrderUpdateView, OrderDeleteView, 
     OrderStatusUpdateView, OrderQuickSearchView, OrderItemCreateView, OrderItemUpdateView, OrderItemDeleteView
@@ -6,5 +7,6 @@ from .order import (
 
 __all__ = [
     'OrderListView', 'OrderCreateView', 'OrderDetailView', 'OrderUpdateView', 'OrderDeleteView', 
-    'OrderStatusUpdateView', 'OrderQuickSearchView', 'OrderItemCreateView', 'OrderItemUpdateView', 'OrderItemDeleteView'
+    'OrderStatusUpdateView', 'OrderQuickSearchView', 'OrderItemCreateView', 'OrderItemUpdateView', 'OrderItemDeleteView',
+    'OrderExportView'
 ]
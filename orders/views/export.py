@@ -0,0 +1,21 @@
+from commandly.export import Column, ExportMixin, choice_column, customer_column
+from orders.models import Order
+from orders.views.order import OrderListView
+
+
+class OrderExportView(ExportMixin, OrderListView):
+    """
+    Export CSV / XLSX des commandes, avec les filtres de la liste
+    """
+    export_filename = 'commandes'
+    export_columns = [
+        Column('Numéro', 'order_number'),
+        Column('Date', 'order_date'),
+        customer_column(),
+        choice_column('Statut', 'status', Order.STATUS_CHOICES),
+        Column('Livraison prévue', 'expected_delivery_date'),
+        Column('Livrée le', 'delivered_date'),
+        Column('Sous-total HT', 'subtotal_ht'),
+        Column('TVA', 'tax_amount'),
+        Column('Total TTC', 'total_amount'),
+    ]
@@ -1,30 +1,41 @@
+from datetime import timedelta
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.paginator import Paginator
-from django.db.models import Q, Sum
+from django.db.models import Q
 from django.http import JsonResponse
 from django.utils import timezone
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from commandly.dates import start_of_day
+from commandly.pagination import KeysetPaginationMixin
+from commandly.stats import count_by_choice, count_if, group, sum_of, summarize
+from commandly.viewcache import CachedViewMixin
 from orders.models import Order, OrderItem
 from orders.forms.order_forms import OrderForm, OrderItemForm, OrderSearchForm
 from customers.models import Customer
 from products.models import Product
+from search.services import autocomplete, search
+from stock.services import InsufficientStock
 
 
-class OrderListView(LoginRequiredMixin, ListView):
+class OrderListView(LoginRequiredMixin, CachedViewMixin, KeysetPaginationMixin, ListView):
     """
     Liste des commandes avec recherche et pagination
     """
     model = Order
     template_name = 'orders/order_list.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['orders.Order', 'customers.Customer']
     context_object_name = 'page_obj'
     paginate_by = 20
+    # Tri du mode de pagination par curseur (?pagination=keyset)
+    keyset_ordering = ('-order_date', '-id')
     login_url = reverse_lazy('users:login')
     
     def get_queryset(self):
-        orders = Order.objects.all()
+        orders = Order.objects.select_related('customer')
         
         # Récupération des paramètres de recherche
         search_form = OrderSearchForm(self.request.GET)
@@ -59,11 +70,12 @@ class OrderListView(LoginRequiredMixin, ListView):
             if status:
                 orders = orders.filter(status=status)
             
+            # Bornes de jour plutôt que __date : la recherche reste indexée
             if date_from:
-                orders = orders.filter(order_date__date__gte=date_from)
+                orders = orders.filter(order_date__gte=start_of_day(date_from))
             
             if date_to:
-                orders = orders.filter(order_date__date__lte=date_to)
+                orders = orders.filter(order_date__lt=start_of_day(date_to + timedelta(days=1)))
             
             if amount_min:
                 orders = orders.filter(total_amount__gte=amount_min)
@@ -76,41 +88,45 @@ class OrderListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         search_form = OrderSearchForm(self.request.GET)
-        orders = self.get_queryset()
         
-        # Calcul des statistiques
-        total_orders = orders.count()
-        total_amount = orders.aggregate(total=Sum('total_amount'))['total'] or 0
-        orders_by_status = {}
-        for status_choice in Order.STATUS_CHOICES:
-            status_code = status_choice[0]
-            orders_by_status[status_code] = orders.filter(status=status_code).count()
+        # Calcul des statistiques en une seule requête sur la liste filtrée
+        stats = summarize(
+            self.object_list,
+            total_orders=count_if(),
+            total_amount=sum_of('total_amount'),
+            **count_by_choice('status', Order.STATUS_CHOICES, 'status_'),
+        )
         
         context.update({
             'search_form': search_form,
-            'total_orders': total_orders,
-            'total_amount': total_amount,
-            'orders_by_status': orders_by_status,
+            'total_orders': stats['total_orders'],
+            'total_amount': stats['total_amount'],
+            'orders_by_status': group(stats, 'status_'),
         })
         
         return context
 
 
-class OrderDetailView(LoginRequiredMixin, DetailView):
+class OrderDetailView(LoginRequiredMixin, CachedViewMixin, DetailView):
     """
     Détail d'une commande
     """
     model = Order
     template_name = 'orders/order_detail.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['orders.Order', 'orders.OrderItem', 'customers.Customer', 'products.Product', 'invoices.Invoice']
     context_object_name = 'order'
     login_url = reverse_lazy('users:login')
     
+    def get_queryset(self):
+        return Order.objects.select_related('customer')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        order = self.get_object()
+        order = self.object
         
         # Récupération des lignes de commande
-        order_items = order.items.all().order_by('id')
+        order_items = order.items.select_related('product').order_by('id')
         
         # Récupération de la facture associée si elle existe
         invoice = getattr(order, 'invoice', None)
@@ -179,7 +195,11 @@ class OrderUpdateView(LoginRequiredMixin, UpdateView):
         return reverse('orders:order_detail', kwargs={'pk': self.object.pk})
     
     def form_valid(self, form):
-        response = super().form_valid(form)
+        try:
+            response = super().form_valid(form)
+        except InsufficientStock as exc:
+            form.add_error('status', str(exc))
+            return self.form_invalid(form)
         messages.success(self.request, f'Commande "{self.object.order_number}" modifiée avec succès.')
         return response
     
@@ -237,7 +257,10 @@ class OrderStatusUpdateView(LoginRequiredMixin, View):
             if new_status == 'delivered' and not order.delivered_date:
                 order.delivered_date = timezone.now().date()
             
-            order.save()
+            try:
+                order.save()
+            except InsufficientStock as exc:
+                return JsonResponse({'success': False, 'message': str(exc)})
             
             messages.success(request, f'Statut de la commande {order.order_number} mis à jour : {old_status} → {new_status}')
             
@@ -266,11 +289,12 @@ class OrderQuickSearchView(LoginRequiredMixin, View):
         if len(query) < 2:
             return JsonResponse({'results': []})
         
-        orders = Order.objects.filter(
-            Q(order_number__icontains=query) |
-            Q(customer__first_name__icontains=query) |
-            Q(customer__last_name__icontains=query)
-        )[:10]
+        results = autocomplete.cached_results('orders', query, lambda: self.get_results(query))
+        return JsonResponse({'results': results})
+    
+    def get_results(self, query):
+        # Index plein texte : recherche par préfixe des mots, classée par pertinence
+        orders = search('orders', query, limit=10)
         
         results = []
         for order in orders:
@@ -281,8 +305,7 @@ class OrderQuickSearchView(LoginRequiredMixin, View):
                 'status': order.get_status_display(),
                 'total': str(order.total_amount)
             })
-        
-        return JsonResponse({'results': results})
+        return results
 
 
 # Vues pour les lignes de commande
@@ -311,10 +334,20 @@ class OrderItemCreateView(LoginRequiredMixin, CreateView):
     def get_success_url(self):
         return reverse('orders:order_detail', kwargs={'pk': self.order.pk})
     
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        # La ligne connaît sa commande dès la validation (stock déjà réservé par la commande)
+        kwargs['instance'] = OrderItem(order=self.order)
+        return kwargs
+    
     def form_valid(self, form):
         order_item = form.save(commit=False)
         order_item.order = self.order
-        order_item.save()
+        try:
+            order_item.save()
+        except InsufficientStock as exc:
+            form.add_error('quantity', str(exc))
+            return self.form_invalid(form)
         
         messages.success(self.request, f'Produit ajouté à la commande avec succès.')
         return super().form_valid(form)
@@ -352,7 +385,11 @@ class OrderItemUpdateView(LoginRequiredMixin, UpdateView):
         return reverse('orders:order_detail', kwargs={'pk': self.object.order.pk})
     
     def form_valid(self, form):
-        response = super().form_valid(form)
+        try:
+            response = super().form_valid(form)
+        except InsufficientStock as exc:
+            form.add_error('quantity', str(exc))
+            return self.form_invalid(form)
         messages.success(self.request, f'Ligne de commande modifiée avec succès.')
         return response
     
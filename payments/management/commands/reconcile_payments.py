@@ -0,0 +1,41 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from payments.services.reconciliation import DEFAULT_BATCH_SIZE, reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare le solde des factures (payé, restant dû, statut) à l'agrégat de leurs "
+        "paiements complétés et liste les écarts (à planifier, ex. chaque nuit)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--fix',
+            action='store_true',
+            help='Corrige les soldes des factures en écart',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='Nombre de factures contrôlées par lot (défaut : %(default)s)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('La taille de lot doit être strictement positive.')
+
+        started = time.perf_counter()
+        drifts = reconcile(fix=options['fix'], batch_size=options['batch_size'])
+        elapsed = time.perf_counter() - started
+
+        for drift in drifts:
+            stored, expected = drift.stored, drift.expected
+            self.stdout.write(self.style.WARNING(
+                f"{drift.invoice_number} : payé {stored.paid_amount} au lieu de {expected.paid_amount}, "
+                f"restant {stored.remaining_amount} au lieu de {expected.remaining_amount}, "
+                f"statut {stored.status} au lieu de {expected.status}"
+            ))
+        action = 'corrigée(s)' if options['fix'] else 'en écart'
+        self.stdout.write(self.style.SUCCESS(f"{len(drifts)} facture(s) {action}, contrôle en {elapsed:.2f} s."))
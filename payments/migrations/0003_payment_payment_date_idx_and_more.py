@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("customers", "0002_alter_customer_phone"),
+        ("invoices", "0002_invoice_invoice_date_idx_and_more"),
+        ("payments", "0002_initial"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(fields=["-payment_date"], name="payment_date_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["payment_method", "-payment_date"],
+                name="payment_method_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["invoice", "-payment_date"], name="payment_invoice_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["customer", "-payment_date"], name="payment_customer_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payment",
+            index=models.Index(
+                fields=["status", "payment_date"], name="payment_status_date_idx"
+            ),
+        ),
+    ]
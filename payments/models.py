@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import MinValueValidator
 from django.utils import timezone
 from invoices.models import Invoice
@@ -130,41 +130,73 @@ class Payment(models.Model):
         verbose_name = 'Paiement'
         verbose_name_plural = 'Paiements'
         ordering = ['-payment_date']
+        # Index alignés sur les filtres et le tri de la liste des paiements
+        indexes = [
+            models.Index(fields=['-payment_date'], name='payment_date_idx'),
+            models.Index(fields=['payment_method', '-payment_date'], name='payment_method_date_idx'),
+            models.Index(fields=['invoice', '-payment_date'], name='payment_invoice_date_idx'),
+            models.Index(fields=['customer', '-payment_date'], name='payment_customer_date_idx'),
+            models.Index(fields=['status', 'payment_date'], name='payment_status_date_idx'),
+        ]
     
     def __str__(self):
         return f"Paiement {self.payment_number} - {self.amount}€ - {self.customer}"
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._remember_balance()
+        return instance
+    
+    def _remember_balance(self):
+        """Mémorise la contribution enregistrée du paiement au solde de sa facture"""
+        from payments.services.reconciliation import contribution
+        if {'invoice_id', 'status', 'amount'} <= self.__dict__.keys():
+            self._previous_balance = (self.invoice_id, contribution(self.status, self.amount))
+        else:
+            self._previous_balance = None
+    
     def save(self, *args, **kwargs):
-        # Génération automatique du numéro de paiement
-        if not self.payment_number:
-            self.payment_number = self.generate_payment_number()
-        
         # Mise à jour automatique du statut
         if self.status == 'completed' and not self.processed_date:
             self.processed_date = timezone.now()
         
-        super().save(*args, **kwargs)
+        from payments.services import reconciliation
+        adding = self._state.adding
+        previous = getattr(self, '_previous_balance', None)
         
-        # Mise à jour de la facture associée
-        self.update_invoice_payment()
+        with transaction.atomic():
+            # Numéro attribué dans la transaction de l'enregistrement (pas de trou en cas d'échec)
+            if not self.payment_number:
+                self.payment_number = self.generate_payment_number()
+            super().save(*args, **kwargs)
+            
+            # Mise à jour incrémentale du solde de la facture associée
+            if adding or previous is not None:
+                reconciliation.apply_payment_change(self, previous)
+            else:
+                # État précédent inconnu : recalcul complet du solde
+                reconciliation.reconcile([self.invoice_id], fix=True)
+        self._remember_balance()
+    
+    def delete(self, *args, **kwargs):
+        from payments.services import reconciliation
+        previous = getattr(self, '_previous_balance', None)
+        with transaction.atomic():
+            result = super().delete(*args, **kwargs)
+            
+            # Retrait de la contribution du paiement
+            if previous is not None:
+                reconciliation.apply_payment_removal(self, previous)
+            else:
+                reconciliation.reconcile([self.invoice_id], fix=True)
+        return result
     
     def generate_payment_number(self):
         """Génère un numéro de paiement unique"""
-        from datetime import datetime
-        prefix = "PAY"
-        date_str = datetime.now().strftime("%Y%m%d")
-        # Trouver le dernier numéro pour aujourd'hui
-        today_payments = Payment.objects.filter(
-            payment_date=datetime.now().date()
-        ).count()
-        sequence = today_payments + 1
-        return f"{prefix}{date_str}{sequence:03d}"
+        from sequences.services import next_number, seed_from
+        return next_number('PAY', seed=seed_from(Payment, 'payment_number'))
 
-    def update_invoice_payment(self):
-        """Met à jour le paiement de la facture associée"""
-        if self.status == 'completed':
-            self.invoice.mark_as_paid(self.amount)
-    
     def can_be_processed(self):
         """Vérifie si le paiement peut être traité"""
         return self.status == 'pending'
@@ -0,0 +1,4 @@
+# Services pour l'application payments
+from . import reconciliation
+
+__all__ = ['reconciliation']
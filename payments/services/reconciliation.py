@@ -0,0 +1,204 @@
+"""
+Rapprochement des paiements et des factures.
+
+Le solde d'une facture (`paid_amount`, `remaining_amount`, `status`) est la
+projection de ses paiements complétés :
+
+- à chaque écriture d'un paiement, la variation de sa contribution (montant s'il
+  est complété, zéro sinon) est appliquée par un UPDATE relatif
+  `paid_amount = paid_amount + delta`, le restant dû et le statut étant recalculés
+  dans la même requête : deux paiements simultanés ne peuvent pas s'écraser, et
+  réenregistrer un paiement complété ne le compte pas deux fois ;
+- reconcile() recalcule les soldes par agrégat des paiements, par lots de factures
+  contigus, et signale (ou corrige) les factures dont le solde a dérivé.
+
+Une facture annulée garde son statut ; une facture en retard le reste tant
+qu'elle n'est pas soldée (voir invoices.services.overdue).
+"""
+from collections import namedtuple
+from django.db import transaction
+from django.db.models import Case, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.db.models.lookups import GreaterThanOrEqual, LessThanOrEqual
+from django.utils import timezone
+from invoices.models import Invoice
+from orders.services.totals import ZERO, quantize
+from payments.models import Payment
+from payments.signals import invoice_balance_changed
+
+
+# Champs du solde transmis par invoice_balance_changed
+BALANCE_FIELDS = ('status', 'invoice_date', 'total_amount', 'paid_amount', 'remaining_amount')
+# Statuts qui dépendent des paiements reçus
+PAYMENT_STATUSES = ('paid', 'partially_paid')
+DEFAULT_BATCH_SIZE = 5000
+
+# Facture dont le solde enregistré diffère de l'agrégat de ses paiements
+Drift = namedtuple('Drift', ['invoice_id', 'invoice_number', 'stored', 'expected'])
+Balance = namedtuple('Balance', ['paid_amount', 'remaining_amount', 'status'])
+
+
+def contribution(status, amount):
+    """Part d'un paiement dans le montant payé de sa facture"""
+    return quantize(amount) if status == 'completed' and amount is not None else ZERO
+
+
+def balance_status(status, paid_amount, total_amount):
+    """Statut d'une facture selon le montant payé (en Python)"""
+    if status == 'cancelled':
+        return status
+    if paid_amount <= 0:
+        return 'pending' if status in PAYMENT_STATUSES else status
+    if paid_amount >= total_amount:
+        return 'paid'
+    return 'overdue' if status == 'overdue' else 'partially_paid'
+
+
+def balance_status_expression(paid_amount):
+    """Statut d'une facture calculé par la base pour le nouveau montant payé `paid_amount`"""
+    return Case(
+        When(status='cancelled', then=F('status')),
+        When(
+            LessThanOrEqual(paid_amount, 0),
+            then=Case(When(status__in=PAYMENT_STATUSES, then=Value('pending')), default=F('status')),
+        ),
+        When(GreaterThanOrEqual(paid_amount, F('total_amount')), then=Value('paid')),
+        When(status='overdue', then=F('status')),
+        default=Value('partially_paid'),
+    )
+
+
+def _states(invoice_ids):
+    rows = Invoice.objects.filter(pk__in=invoice_ids).values('pk', *BALANCE_FIELDS)
+    return {row.pop('pk'): row for row in rows}
+
+
+def _notify(invoice_id, previous, current):
+    if previous is not None and current is not None and previous != current:
+        invoice_balance_changed.send(sender=Invoice, invoice_id=invoice_id, previous=previous, current=current)
+
+
+def apply_delta(invoice_id, amount):
+    """
+    Ajoute `amount` (négatif pour un retrait) au montant payé d'une facture et
+    recalcule son restant dû et son statut, en un UPDATE relatif
+    """
+    amount = quantize(amount)
+    if not amount or invoice_id is None:
+        return
+    listening = invoice_balance_changed.has_listeners(Invoice)
+    with transaction.atomic():
+        previous = _states([invoice_id]).get(invoice_id) if listening else None
+        paid = F('paid_amount') + amount
+        Invoice.objects.filter(pk=invoice_id).update(
+            paid_amount=paid,
+            remaining_amount=F('total_amount') - paid,
+            status=balance_status_expression(paid),
+            # Date à laquelle la facture a été soldée
+            paid_date=Case(
+                When(LessThanOrEqual(paid, 0), then=Value(None)),
+                When(
+                    GreaterThanOrEqual(paid, F('total_amount')),
+                    then=Coalesce(F('paid_date'), Value(timezone.localdate())),
+                ),
+                default=Value(None),
+            ),
+            updated_at=timezone.now(),
+        )
+        if listening:
+            _notify(invoice_id, previous, _states([invoice_id]).get(invoice_id))
+
+
+def apply_payment_change(payment, previous=None):
+    """
+    Répercute l'écriture d'un paiement sur le solde de sa facture. `previous` est le
+    tuple (invoice_id, contribution) mémorisé au chargement du paiement (None à la création).
+    """
+    current = contribution(payment.status, payment.amount)
+    old_invoice_id, old_contribution = previous or (payment.invoice_id, ZERO)
+    if old_invoice_id == payment.invoice_id:
+        apply_delta(payment.invoice_id, current - old_contribution)
+    else:
+        # Le paiement a changé de facture
+        apply_delta(old_invoice_id, -old_contribution)
+        apply_delta(payment.invoice_id, current)
+
+
+def apply_payment_removal(payment, previous):
+    """Retire la contribution enregistrée d'un paiement supprimé du solde de sa facture"""
+    invoice_id, amount = previous
+    apply_delta(invoice_id, -amount)
+
+
+def paid_totals(first_id, last_id):
+    """
+    Montant des paiements complétés et date du dernier, par facture d'identifiant
+    compris entre first_id et last_id (une requête sur l'index des paiements par facture)
+    """
+    rows = (
+        Payment.objects
+        .filter(invoice_id__gte=first_id, invoice_id__lte=last_id, status='completed')
+        .order_by()
+        .values('invoice_id')
+        .annotate(total=Sum('amount'), last_date=Max('payment_date'))
+    )
+    return {row['invoice_id']: (quantize(row['total']), row['last_date']) for row in rows}
+
+
+def _batches(invoice_ids, batch_size):
+    invoices = Invoice.objects.order_by('pk').values(
+        'pk', 'invoice_number', 'paid_date', *BALANCE_FIELDS,
+    )
+    if invoice_ids is not None:
+        invoices = invoices.filter(pk__in=invoice_ids)
+    last_id = 0
+    while True:
+        batch = list(invoices.filter(pk__gt=last_id)[:batch_size])
+        if not batch:
+            return
+        yield batch
+        last_id = batch[-1]['pk']
+
+
+def _fix(row, expected, paid_date):
+    """Corrige un solde s'il n'a pas changé depuis sa lecture ; retourne True si corrigé"""
+    stored = {name: row[name] for name in BALANCE_FIELDS}
+    updated = Invoice.objects.filter(
+        pk=row['pk'], paid_amount=row['paid_amount'], total_amount=row['total_amount'], status=row['status'],
+    ).update(
+        paid_amount=expected.paid_amount,
+        remaining_amount=expected.remaining_amount,
+        status=expected.status,
+        paid_date=paid_date,
+        updated_at=timezone.now(),
+    )
+    if updated:
+        _notify(row['pk'], stored, {**stored, **expected._asdict()})
+    return bool(updated)
+
+
+def reconcile(invoice_ids=None, fix=False, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Compare le solde de chaque facture à l'agrégat de ses paiements complétés.
+    Deux requêtes par lot de `batch_size` factures. Retourne la liste des Drift ;
+    avec `fix`, les soldes sont corrigés (sauf ceux modifiés entre-temps, repris
+    au passage suivant).
+    """
+    drifts = []
+    for batch in _batches(invoice_ids, batch_size):
+        totals = paid_totals(batch[0]['pk'], batch[-1]['pk'])
+        with transaction.atomic():
+            for row in batch:
+                paid, last_date = totals.get(row['pk'], (ZERO, None))
+                expected = Balance(
+                    paid, quantize(row['total_amount']) - paid,
+                    balance_status(row['status'], paid, row['total_amount']),
+                )
+                stored = Balance(quantize(row['paid_amount']), quantize(row['remaining_amount']), row['status'])
+                if stored == expected:
+                    continue
+                drifts.append(Drift(row['pk'], row['invoice_number'], stored, expected))
+                if fix:
+                    paid_date = (row['paid_date'] or last_date) if expected.status == 'paid' else None
+                    _fix(row, expected, paid_date)
+    return drifts
@@ -0,0 +1,11 @@
+"""
+Signaux émis par l'application payments.
+
+invoice_balance_changed : le solde d'une facture (payé, restant dû, statut) a été
+modifié par un UPDATE relatif, sans passer par Invoice.save() et ses signaux.
+Arguments : invoice_id, previous et current (états BALANCE_FIELDS avant/après).
+"""
+from django.dispatch import Signal
+
+
+invoice_balance_changed = Signal()
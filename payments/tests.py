@@ -1,3 +1,151 @@
-from django.test import TestCase
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from commandly.pagination import KeysetPaginator
+from commandly.testing import TRANSACTION_STATEMENTS, QueryCountTestCase, QueryPlanTestCase
+from invoices.models import Invoice
+from orders.models import Order, OrderItem
+from payments.models import Payment
+from payments.services import reconciliation
+from payments.views import PaymentListView
 
-# Create your tests here.
+
+class PaymentQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_payment_list_queries(self):
+        self.assertMaxQueries(5, reverse('payments:payment_list'))
+
+    def test_payment_detail_queries(self):
+        self.assertMaxQueries(4, reverse('payments:payment_detail', args=[self.data['payment'].pk]))
+
+
+class PaymentExportTests(QueryCountTestCase):
+    """
+    Export des paiements avec les filtres de la liste
+    """
+
+    def test_csv(self):
+        invoice = self.data['invoice']
+        response = self.client.get(reverse('payments:payment_export'), {'search_type': 'payment_number', 'customer': invoice.customer_id})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 2)
+        self.assertIn(f';{invoice.invoice_number};', lines[1])
+        self.assertIn(';Complété;', lines[1])
+
+
+class PaymentQueryPlanTests(QueryPlanTestCase):
+    """
+    La première page de la liste des paiements est lue par index pour chaque filtre
+    """
+
+    def assertListUsesIndex(self, **params):
+        self.assertUsesIndex(self.list_queryset(PaymentListView, {'search_type': 'payment_number', **params}))
+
+    def test_default_sort(self):
+        self.assertListUsesIndex()
+
+    def test_payment_method_filter(self):
+        self.assertListUsesIndex(payment_method='cash')
+
+    def test_invoice_filter(self):
+        self.assertListUsesIndex(invoice=self.data['invoice'].pk)
+
+    def test_customer_filter(self):
+        self.assertListUsesIndex(customer=self.data['customer'].pk)
+
+    def test_date_range_filter(self):
+        self.assertListUsesIndex(date_from='2025-01-01', date_to='2025-01-31')
+
+    def test_keyset_pages(self):
+        queryset = self.list_queryset(PaymentListView, {'search_type': 'payment_number'}, page_size=None)
+        paginator = KeysetPaginator(queryset, 20, PaymentListView.keyset_ordering)
+        for direction in ('n', 'p'):
+            with self.subTest(direction=direction):
+                page_queryset, _ = paginator.page_queryset(paginator.cursor_for(self.data['payment'], direction))
+                self.assertUsesIndex(page_queryset)
+
+
+class PaymentReconciliationTests(QueryCountTestCase):
+    """
+    Solde des factures maintenu par les paiements, et rapprochement par agrégat
+    """
+
+    def create_invoice(self):
+        order = Order.objects.create(customer=self.data['customer'])
+        OrderItem.objects.create(order=order, product=self.data['product'], quantity=1, unit_price=Decimal('1000.00'))
+        order.refresh_from_db()
+        return Invoice.objects.create(order=order, customer=order.customer)
+
+    def pay(self, invoice, amount, status='completed'):
+        return Payment.objects.create(
+            invoice=invoice, customer=invoice.customer, amount=Decimal(amount), payment_method='cash', status=status,
+        )
+
+    def assertBalance(self, invoice, paid, remaining, status):
+        invoice.refresh_from_db()
+        self.assertEqual(
+            (invoice.paid_amount, invoice.remaining_amount, invoice.status),
+            (Decimal(paid), Decimal(remaining), status),
+        )
+
+    def test_payments_update_balance(self):
+        invoice = self.create_invoice()
+        pending = self.pay(invoice, '180.00', status='pending')
+        self.assertBalance(invoice, '0', '1180.00', 'pending')
+        payment = self.pay(invoice, '1000.00')
+        self.assertBalance(invoice, '1000.00', '180.00', 'partially_paid')
+        # Réenregistrer un paiement complété ne le compte pas deux fois
+        Payment.objects.get(pk=payment.pk).save()
+        payment.save()
+        self.assertBalance(invoice, '1000.00', '180.00', 'partially_paid')
+
+        pending.mark_as_completed()
+        self.assertBalance(invoice, '1180.00', '0.00', 'paid')
+        self.assertIsNotNone(Invoice.objects.get(pk=invoice.pk).paid_date)
+
+        Payment.objects.get(pk=payment.pk).mark_as_cancelled()
+        self.assertBalance(invoice, '180.00', '1000.00', 'partially_paid')
+        Payment.objects.get(pk=pending.pk).delete()
+        self.assertBalance(invoice, '0.00', '1180.00', 'pending')
+        self.assertEqual(reconciliation.reconcile(), [])
+
+    def test_stale_instances_do_not_lose_payments(self):
+        invoice = self.create_invoice()
+        first = Payment(invoice=invoice, customer=invoice.customer, amount=Decimal('100.00'), payment_method='cash')
+        second = Payment(invoice=invoice, customer=invoice.customer, amount=Decimal('200.00'), payment_method='cash')
+        first.status = second.status = 'completed'
+        first.save()
+        second.save()
+        # Une facture chargée avant les paiements puis enregistrée ne les écrase pas
+        invoice.notes = 'Relance'
+        invoice.save()
+        self.assertBalance(invoice, '300.00', '880.00', 'partially_paid')
+
+    def test_reconcile_reports_and_fixes_drift(self):
+        invoice = self.create_invoice()
+        self.pay(invoice, '500.00')
+        Invoice.objects.filter(pk=invoice.pk).update(paid_amount=Decimal('900.00'), status='paid')
+        Invoice.objects.filter(pk=self.data['invoice'].pk).update(remaining_amount=Decimal('0.00'))
+
+        drifts = reconciliation.reconcile(batch_size=7)
+        self.assertEqual({drift.invoice_id for drift in drifts}, {invoice.pk, self.data['invoice'].pk})
+        drift = next(drift for drift in drifts if drift.invoice_id == invoice.pk)
+        self.assertEqual(drift.expected, (Decimal('500.00'), Decimal('680.00'), 'partially_paid'))
+
+        call_command('reconcile_payments', '--fix', stdout=StringIO())
+        self.assertBalance(invoice, '500.00', '680.00', 'partially_paid')
+        self.assertEqual(reconciliation.reconcile(), [])
+
+    def test_reconcile_query_count(self):
+        with CaptureQueriesContext(connection) as context:
+            reconciliation.reconcile(batch_size=10)
+        queries = [query for query in context.captured_queries if not query['sql'].startswith(TRANSACTION_STATEMENTS)]
+        # Deux requêtes par lot de factures, plus la lecture du dernier lot, vide
+        batches = -(-Invoice.objects.count() // 10)
+        self.assertEqual(len(queries), 2 * batches + 1)
@@ -5,6 +5,7 @@ app_name = 'payments'
 
 urlpatterns = [
     path('', views.PaymentListView.as_view(), name='payment_list'),
+    path('export/', views.PaymentExportView.as_view(), name='payment_export'),
     path('create/', views.PaymentCreateView.as_view(), name='payment_create'),
     path('<int:pk>/', views.PaymentDetailView.as_view(), name='payment_detail'),
     path('<int:pk>/edit/', views.PaymentUpdateView.as_view(), name='payment_update'),
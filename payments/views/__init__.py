@@ -1,4 +1,5 @@
 # Vues pour l'application payments
+from .export import PaymentExportView
 from .payment import PaymentListView, PaymentCreateView, PaymentDetailView, PaymentUpdateView, PaymentDeleteView
 
-__all__ = ['PaymentListView', 'PaymentCreateView', 'PaymentDetailView', 'PaymentUpdateView', 'PaymentDeleteView']
+__all__ = ['PaymentListView', 'PaymentCreateView', 'PaymentDetailView', 'PaymentUpdateView', 'PaymentDeleteView', 'PaymentExportView']
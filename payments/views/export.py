@@ -0,0 +1,21 @@
+from commandly.export import Column, ExportMixin, choice_column, customer_column
+from payments.models import Payment
+from payments.views.payment import PaymentListView
+
+
+class PaymentExportView(ExportMixin, PaymentListView):
+    """
+    Export CSV / XLSX des paiements, avec les filtres de la liste
+    """
+    export_filename = 'paiements'
+    export_columns = [
+        Column('Numéro', 'payment_number'),
+        Column('Date', 'payment_date'),
+        Column('Facture', 'invoice__invoice_number'),
+        customer_column(),
+        choice_column('Mode de paiement', 'payment_method', Payment.PAYMENT_METHOD_CHOICES),
+        choice_column('Statut', 'status', Payment.STATUS_CHOICES),
+        Column('Montant', 'amount'),
+        Column('Référence', 'reference'),
+        Column('Transaction', 'transaction_id'),
+    ]
@@ -1,17 +1,19 @@
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Q, Sum
+from django.db.models import Prefetch, Q
 from django.http import JsonResponse
 from django.urls import reverse_lazy, reverse
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
+from commandly.pagination import KeysetPaginationMixin
+from commandly.stats import count_by_choice, count_if, group, sum_of, summarize
 from payments.models import Payment
 from payments.forms.payment_forms import PaymentForm, PaymentSearchForm
 from invoices.models import Invoice
 from customers.models import Customer
 
 
-class PaymentListView(LoginRequiredMixin, ListView):
+class PaymentListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     """
     Liste des paiements avec recherche et pagination
     """
@@ -19,10 +21,12 @@ class PaymentListView(LoginRequiredMixin, ListView):
     template_name = 'payments/payment_list.html'
     context_object_name = 'page_obj'
     paginate_by = 20
+    # Tri du mode de pagination par curseur (?pagination=keyset)
+    keyset_ordering = ('-payment_date', '-id')
     login_url = reverse_lazy('users:login')
     
     def get_queryset(self):
-        payments = Payment.objects.all()
+        payments = Payment.objects.select_related('customer', 'invoice')
         
         # Récupération des paramètres de recherche
         search_form = PaymentSearchForm(self.request.GET)
@@ -78,22 +82,20 @@ class PaymentListView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         search_form = PaymentSearchForm(self.request.GET)
-        payments = self.get_queryset()
         
-        # Calcul des statistiques
-        total_payments = payments.count()
-        total_amount = payments.aggregate(total=Sum('amount'))['total'] or 0
-        
-        payments_by_method = {}
-        for method_choice in Payment.PAYMENT_METHOD_CHOICES:
-            method_code = method_choice[0]
-            payments_by_method[method_code] = payments.filter(payment_method=method_code).count()
+        # Calcul des statistiques en une seule requête sur la liste filtrée
+        stats = summarize(
+            self.object_list,
+            total_payments=count_if(),
+            total_amount=sum_of('amount'),
+            **count_by_choice('payment_method', Payment.PAYMENT_METHOD_CHOICES, 'method_'),
+        )
         
         context.update({
             'search_form': search_form,
-            'total_payments': total_payments,
-            'total_amount': total_amount,
-            'payments_by_method': payments_by_method,
+            'total_payments': stats['total_payments'],
+            'total_amount': stats['total_amount'],
+            'payments_by_method': group(stats, 'method_'),
         })
         
         return context
@@ -108,13 +110,24 @@ class PaymentDetailView(LoginRequiredMixin, DetailView):
     context_object_name = 'payment'
     login_url = reverse_lazy('users:login')
     
+    def get_queryset(self):
+        # Les autres paiements du client sont affichés avec leur facture
+        return Payment.objects.select_related('customer', 'invoice').prefetch_related(
+            Prefetch(
+                'customer__payments',
+                queryset=Payment.objects.select_related('invoice').order_by('-payment_date'),
+            )
+        )
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        payment = self.get_object()
+        payment = self.object
+        invoice = payment.invoice
         
         context.update({
-            'invoice': payment.invoice,
+            'invoice': invoice,
             'customer': payment.customer,
+            'payment_percentage': (payment.amount / invoice.total_amount * 100) if invoice.total_amount else 0,
         })
         
         return context
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:19
+
+from django.db import migrations, models
+from django.db.models import Case, F, Value, When
+
+
+def compute_stock_levels(apps, schema_editor):
+    """Niveau de stock des produits existants, en un UPDATE"""
+    Product = apps.get_model("products", "Product")
+    Product.objects.update(
+        stock_level=Case(
+            When(product_type="service", then=Value("none")),
+            When(stock_quantity__lte=0, then=Value("out")),
+            When(stock_quantity__lte=F("min_stock_level"), then=Value("low")),
+            default=Value("ok"),
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("products", "0002_product_reserved_quantity"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="stock_level",
+            field=models.CharField(
+                choices=[
+                    ("out", "Rupture"),
+                    ("low", "Faible"),
+                    ("ok", "Disponible"),
+                    ("none", "N/A"),
+                ],
+                default="ok",
+                editable=False,
+                max_length=4,
+                verbose_name="Niveau de stock",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="product",
+            index=models.Index(
+                fields=["-stock_level", "name"], name="product_stock_level_idx"
+            ),
+        ),
+        migrations.RunPython(compute_stock_levels, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,47 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.lookups import LessThanOrEqual
 from django.core.validators import MinValueValidator
 from django.utils.text import slugify
 
 
+# Niveau de stock d'un produit, dénormalisé et indexé pour les alertes
+STOCK_LEVEL_CHOICES = [
+    ('out', 'Rupture'),
+    ('low', 'Faible'),
+    ('ok', 'Disponible'),
+    ('none', 'N/A'),
+]
+# Niveaux en alerte ; le tri décroissant sur stock_level liste les ruptures d'abord
+ALERT_STOCK_LEVELS = ('out', 'low')
+
+
+def compute_stock_level(product_type, stock_quantity, min_stock_level):
+    """Niveau de stock d'un produit, calculé en Python (création)"""
+    if product_type == 'service':
+        return 'none'
+    if stock_quantity <= 0:
+        return 'out'
+    if stock_quantity <= min_stock_level:
+        return 'low'
+    return 'ok'
+
+
+def stock_level_expression(stock_quantity=F('stock_quantity')):
+    """
+    Niveau de stock calculé par la base, pour un UPDATE : `stock_quantity` est
+    l'expression du nouveau stock (ex. F('stock_quantity') - 3), les valeurs
+    lues dans un SET étant celles d'avant la mise à jour
+    """
+    return Case(
+        When(product_type='service', then=Value('none')),
+        When(LessThanOrEqual(stock_quantity, 0), then=Value('out')),
+        When(LessThanOrEqual(stock_quantity, F('min_stock_level')), then=Value('low')),
+        default=Value('ok'),
+        output_field=models.CharField(),
+    )
+
+
 class Category(models.Model):
     """
     Catégorie de produits/services
@@ -114,11 +153,27 @@ class Product(models.Model):
         verbose_name='Quantité en stock'
     )
     
+    # Quantité réservée par les commandes confirmées et non encore livrées :
+    # elle est déjà retirée de stock_quantity, qui est le stock disponible
+    reserved_quantity = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Quantité réservée'
+    )
+    
     min_stock_level = models.PositiveIntegerField(
         default=0,
         verbose_name='Niveau d\'alerte stock'
     )
     
+    # Maintenu à chaque écriture du stock ou du seuil (voir stock_level_expression)
+    stock_level = models.CharField(
+        max_length=4,
+        choices=STOCK_LEVEL_CHOICES,
+        default='ok',
+        editable=False,
+        verbose_name='Niveau de stock'
+    )
+    
     # Informations supplémentaires
     sku = models.CharField(
         max_length=50,
@@ -147,10 +202,54 @@ class Product(models.Model):
         verbose_name = 'Produit/Service'
         verbose_name_plural = 'Produits/Services'
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['-stock_level', 'name'], name='product_stock_level_idx'),
+        ]
+    
+    # Champs de stock mis à jour par le journal et les réservations (stock.services)
+    STOCK_FIELDS = ('stock_quantity', 'reserved_quantity', 'stock_level')
     
     def __str__(self):
         return self.name
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Stock lu, pour journaliser une modification saisie comme un ajustement
+        instance._stored_stock = instance.__dict__.get('stock_quantity')
+        instance._stored_threshold = (instance.__dict__.get('product_type'), instance.__dict__.get('min_stock_level'))
+        return instance
+    
+    def save(self, *args, **kwargs):
+        from stock.services import ledger
+        adding = self._state.adding
+        stored_stock = getattr(self, '_stored_stock', None)
+        threshold = (self.product_type, self.min_stock_level)
+        if adding:
+            self.stock_level = compute_stock_level(self.product_type, self.stock_quantity, self.min_stock_level)
+        
+        # Une mise à jour classique n'écrase pas le stock, modifié en parallèle
+        # par les réservations : l'écart saisi est appliqué par le journal,
+        # seul à écrire le stock, y compris quand update_fields le cite
+        if not adding:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+            kwargs['update_fields'] = [name for name in update_fields if name not in self.STOCK_FIELDS]
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if adding:
+                ledger.record_applied(self.pk, 'receipt', self.stock_quantity, note='Stock initial')
+            elif stored_stock is not None and self.stock_quantity != stored_stock:
+                # Le mouvement recalcule aussi le niveau de stock
+                ledger.record(self.pk, 'adjustment', self.stock_quantity - stored_stock)
+            elif threshold != getattr(self, '_stored_threshold', threshold):
+                # Seuil ou type modifié : niveau recalculé sur le stock enregistré
+                Product.objects.filter(pk=self.pk).update(stock_level=stock_level_expression())
+        self._stored_stock = self.stock_quantity
+        self._stored_threshold = threshold
+    
     @property
     def price_with_tax(self):
         """Calcule le prix TTC"""
@@ -1,3 +1,233 @@
-from django.test import TestCase
+import re
+from decimal import Decimal
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from commandly.pagination import KeysetPaginator
+from commandly.testing import QueryCountTestCase, QueryPlanTestCase
+from commandly import viewcache
+from commandly.viewcache import CSRF_PLACEHOLDER
+from customers.models import Customer
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from products.views import ProductListView, ProductLowStockView
+from stock.services import ledger
+from users.models import CustomUser
 
-# Create your tests here.
+
+class ProductQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_product_list_queries(self):
+        self.assertMaxQueries(6, reverse('products:product_list'))
+
+    def test_product_detail_queries(self):
+        self.assertMaxQueries(5, reverse('products:product_detail', args=[self.data['product'].pk]))
+
+    def test_category_list_queries(self):
+        self.assertMaxQueries(5, reverse('products:category_list'))
+
+    def test_category_detail_queries(self):
+        self.assertMaxQueries(5, reverse('products:category_detail', args=[self.data['category'].pk]))
+
+
+class ProductStockLevelTests(TestCase):
+    """
+    Le niveau de stock dénormalisé suit le stock et le seuil d'alerte
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name='Matériel')
+        cls.customer = Customer.objects.create(
+            first_name='Awa', last_name='Diop', email='awa@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='awa-diop',
+        )
+
+    def create_product(self, stock, min_stock_level=3, **kwargs):
+        return Product.objects.create(
+            name=f'Produit {stock}', category=self.category, unit_price=Decimal('10.00'),
+            stock_quantity=stock, min_stock_level=min_stock_level, **kwargs
+        )
+
+    def assertLevel(self, product, level):
+        self.assertEqual(Product.objects.get(pk=product.pk).stock_level, level)
+
+    def test_level_on_create(self):
+        self.assertEqual(self.create_product(10).stock_level, 'ok')
+        self.assertEqual(self.create_product(3).stock_level, 'low')
+        self.assertEqual(self.create_product(0).stock_level, 'out')
+        self.assertEqual(self.create_product(0, product_type='service').stock_level, 'none')
+
+    def test_level_follows_reservations(self):
+        product = self.create_product(5)
+        order = Order.objects.create(customer=self.customer)
+        OrderItem.objects.create(order=order, product=product, quantity=3)
+        order.status = 'confirmed'
+        order.save()
+        self.assertLevel(product, 'low')
+        order.status = 'cancelled'
+        order.save()
+        self.assertLevel(product, 'ok')
+
+    def test_level_follows_ledger(self):
+        product = self.create_product(5)
+        ledger.record(product.pk, 'adjustment', -5)
+        self.assertLevel(product, 'out')
+        ledger.record(product.pk, 'receipt', 2)
+        self.assertLevel(product, 'low')
+
+    def test_level_follows_threshold(self):
+        product = Product.objects.get(pk=self.create_product(5).pk)
+        product.min_stock_level = 8
+        product.save()
+        self.assertLevel(product, 'low')
+        product.product_type = 'service'
+        product.save()
+        self.assertLevel(product, 'none')
+
+
+class ProductLowStockViewTests(QueryCountTestCase):
+    """
+    Flux des produits en alerte de stock
+    """
+
+    def test_feed_pages(self):
+        url = reverse('products:product_low_stock')
+        Product.objects.filter(pk=self.data['product'].pk).update(stock_quantity=2, stock_level='low')
+        expected = list(
+            Product.objects.filter(stock_level__in=['out', 'low'])
+            .order_by('-stock_level', 'name', 'id').values_list('pk', flat=True)
+        )
+        seen, cursor = [], ''
+        while True:
+            data = self.client.get(url, {'cursor': cursor} if cursor else {}).json()
+            seen += [row['id'] for row in data['results']]
+            cursor = data['next_cursor']
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
+        self.assertEqual(seen[-1], self.data['product'].pk)
+
+        data = self.client.get(url, {'level': 'low'}).json()
+        self.assertEqual([row['id'] for row in data['results']], [self.data['product'].pk])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('products:product_low_stock'), {'cursor': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductQueryPlanTests(QueryPlanTestCase):
+    """
+    Les alertes de stock sont lues par l'index du niveau de stock
+    """
+
+    def test_stock_status_filter(self):
+        for status in ('low', 'out'):
+            with self.subTest(status=status):
+                self.assertUsesIndex(self.list_queryset(ProductListView, {'search_type': 'name', 'stock_status': status}))
+
+    def test_low_stock_feed(self):
+        products = Product.objects.filter(stock_level__in=['out', 'low'])
+        paginator = KeysetPaginator(products, 50, ProductLowStockView.ordering, count_mode='none')
+        first_page, _ = paginator.page_queryset()
+        self.assertUsesIndex(first_page)
+        next_page, _ = paginator.page_queryset(paginator.cursor_for(self.data['product'], 'n'))
+        self.assertUsesIndex(next_page)
+
+
+class ViewCacheTests(QueryCountTestCase):
+    """
+    Cache des pages (commandly.viewcache) : blocs servis sans requête, invalidés par les écritures
+    """
+
+    def get_page(self, url, client=None):
+        with CaptureQueriesContext(connection) as context:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, [query for query in context.captured_queries if '"products_' in query['sql']]
+
+    def test_hit_and_invalidation(self):
+        url = reverse('products:product_detail', args=[self.data['product'].pk])
+        _, queries = self.get_page(url)
+        self.assertTrue(queries)
+        _, queries = self.get_page(url)
+        self.assertEqual(queries, [])
+
+        product = self.data['product']
+        product.name = 'Produit renommé'
+        product.save()
+        response, queries = self.get_page(url)
+        self.assertTrue(queries)
+        self.assertContains(response, 'Produit renommé')
+
+    def test_stock_updates_invalidate(self):
+        url = reverse('products:product_list')
+        self.get_page(url)
+        ledger.record(self.data['product'].pk, 'adjustment', 7)
+        _, queries = self.get_page(url)
+        self.assertTrue(queries)
+
+    def test_key_includes_query_and_role(self):
+        url = reverse('products:product_list')
+        self.get_page(url)
+        _, queries = self.get_page(url + '?search_type=name&search_query=Produit')
+        self.assertTrue(queries)
+
+        admin = CustomUser.objects.create_user(username='gerant', password='motdepasse', role='admin')
+        client = Client()
+        client.force_login(admin)
+        response, queries = self.get_page(url, client)
+        self.assertTrue(queries)
+        self.assertContains(response, 'gerant')
+
+    def test_user_specific_parts_are_not_cached(self):
+        url = reverse('orders:order_detail', args=[self.data['order'].pk])
+        self.client.get(url)
+        other = CustomUser.objects.create_user(username='vendeuse', password='motdepasse', role='seller')
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(other)
+        with CaptureQueriesContext(connection) as context:
+            response = client.get(url)
+        self.assertFalse([query for query in context.captured_queries if '"orders_orderitem"' in query['sql']])
+        self.assertContains(response, 'vendeuse')
+        self.assertNotContains(response, CSRF_PLACEHOLDER)
+
+        # Le jeton servi depuis le cache est celui de la session qui affiche la page
+        token = re.search(r"csrfToken.value = '([^']+)'", response.content.decode()).group(1)
+        response = client.post(
+            reverse('products:product_toggle_status', args=[self.data['product'].pk]), {'csrfmiddlewaretoken': token},
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_login_required(self):
+        url = reverse('products:product_list')
+        self.get_page(url)
+        self.client.logout()
+        response = self.client.get(url)
+        self.assertRedirects(response, f"{reverse('users:login')}?next={url}", fetch_redirect_response=False)
+
+    def test_versions_written_by_another_process(self):
+        from django.conf import settings
+        from django.core.cache.backends.filebased import FileBasedCache
+
+        url = reverse('products:product_list')
+        self.get_page(url)
+        # Commande de gestion ou autre serveur : même répertoire, autre instance du cache
+        other = FileBasedCache(settings.CACHES[viewcache.VERSIONS_ALIAS]['LOCATION'], {})
+        other.set(viewcache._version_key('products.product'), 0, None)
+        _, queries = self.get_page(url)
+        self.assertTrue(queries)
+
+    def test_process_local_versions_rejected_outside_debug(self):
+        from django.conf import settings
+        from django.test import override_settings
+
+        local = {**settings.CACHES, viewcache.VERSIONS_ALIAS: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(CACHES=local, DEBUG=False):
+            self.assertEqual([error.id for error in viewcache.check_versions_cache(None)], ['commandly.E001'])
+        with override_settings(DEBUG=False):
+            self.assertEqual(viewcache.check_versions_cache(None), [])
@@ -15,6 +15,7 @@ urlpatterns = [
     path('categories/<int:pk>/edit/', views.CategoryUpdateView.as_view(), name='category_update'),
     path('categories/<int:pk>/delete/', views.CategoryDeleteView.as_view(), name='category_delete'),
     path('toggle-status/<int:pk>/', views.ProductToggleStatusView.as_view(), name='product_toggle_status'),
+    path('low-stock/', views.ProductLowStockView.as_view(), name='product_low_stock'),
     path('quick-search/', views.ProductQuickSearchView.as_view(), name='product_quick_search'),
     path('activate/<int:pk>/', views.ProductActivateView.as_view(), name='product_activate'),
     path('deactivate/<int:pk>/', views.ProductDeactivateView.as_view(), name='product_deactivate'),
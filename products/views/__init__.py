@@ -11,6 +11,7 @@ from .product import (
     ProductToggleStatusView,
     ProductPriceUpdateView,
     ProductQuickSearchView,
+    ProductLowStockView,
     CategoryListView,
     CategoryDetailView,
     CategoryCreateView,
@@ -31,6 +32,7 @@ __all__ = [
     'ProductToggleStatusView',
     'ProductPriceUpdateView',
     'ProductQuickSearchView',
+    'ProductLowStockView',
     'CategoryListView',
     'CategoryDetailView',
     'CategoryCreateView',
@@ -5,20 +5,29 @@ from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.http import JsonResponse
 from django.urls import reverse_lazy, reverse
-from django.db.models import Q, F
-from products.models import Product, Category
+from django.db.models import Count, Sum
+from commandly.pagination import InvalidCursor, KeysetPaginationMixin, KeysetPaginator
+from commandly.stats import count_if, summarize
+from commandly.viewcache import CachedViewMixin
+from products.models import ALERT_STOCK_LEVELS, Product, Category
 from products.forms import ProductForm, CategoryForm, ProductSearchForm
+from search.services import autocomplete, search
+from stock.services import InsufficientStock, ledger
 
 # --- Produits ---
 
-class ProductListView(LoginRequiredMixin, ListView):
+class ProductListView(LoginRequiredMixin, CachedViewMixin, KeysetPaginationMixin, ListView):
     model = Product
     template_name = 'products/product_list.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['products.Product', 'products.Category']
     context_object_name = 'page_obj'
     paginate_by = 20
+    # Tri du mode de pagination par curseur (?pagination=keyset)
+    keyset_ordering = ('name', 'id')
 
     def get_queryset(self):
-        products = Product.objects.all()
+        products = Product.objects.select_related('category')
         self.search_form = ProductSearchForm(self.request.GET)
         if self.search_form.is_valid():
             search_type = self.search_form.cleaned_data.get('search_type')
@@ -50,52 +59,61 @@ class ProductListView(LoginRequiredMixin, ListView):
                 products = products.filter(unit_price__lte=price_max)
                 # lte pour less than or equal to
             if stock_status:
+                # Niveau précalculé et indexé (Product.stock_level)
                 if stock_status == 'available':
-                    products = products.filter(stock_quantity__gt=0)
-                elif stock_status == 'low':
-                    products = products.filter(
-                        stock_quantity__gt=0,
-                        stock_quantity__lte=F('min_stock_level')
-                    )
-                elif stock_status == 'out':
-                    products = products.filter(stock_quantity=0)
+                    products = products.filter(stock_level__in=['ok', 'low'])
+                else:
+                    products = products.filter(stock_level=stock_status)
             if is_active:
                 products = products.filter(is_active=is_active == 'True')
         return products.order_by('name')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        products = self.get_queryset()
         context['search_form'] = getattr(self, 'search_form', ProductSearchForm(self.request.GET))
-        context['total_products'] = products.count()
-        context['active_products'] = products.filter(is_active=True).count()
-        context['product_products'] = products.filter(product_type='product').count()
-        context['service_products'] = products.filter(product_type='service').count()
-        context['low_stock_products'] = Product.objects.filter(
-            product_type='product',
-            stock_quantity__gt=0,
-            stock_quantity__lte=F('min_stock_level')
-        ).count()
-        context['out_of_stock_products'] = Product.objects.filter(
-            product_type='product',
-            stock_quantity=0
-        ).count()
+
+        # Les alertes de stock portent sur tout le catalogue, les autres cartes sur
+        # la liste filtrée : une seule requête sur le catalogue dans les deux cas
+        products = self.object_list
+        in_list = {'pk__in': products.values('pk')} if products.query.has_filters() else {}
+        context.update(summarize(
+            Product.objects.all(),
+            total_products=count_if(**in_list),
+            active_products=count_if(is_active=True, **in_list),
+            product_products=count_if(product_type='product', **in_list),
+            service_products=count_if(product_type='service', **in_list),
+            low_stock_products=count_if(stock_level='low'),
+            out_of_stock_products=count_if(stock_level='out'),
+        ))
         return context
 
 
-class ProductDetailView(LoginRequiredMixin, DetailView):
+class ProductDetailView(LoginRequiredMixin, CachedViewMixin, DetailView):
     model = Product
     template_name = 'products/product_detail.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['products.Product', 'products.Category', 'orders.Order', 'orders.OrderItem', 'customers.Customer']
     context_object_name = 'product'
     pk_url_kwarg = 'pk'
 
+    def get_queryset(self):
+        return Product.objects.select_related('category')
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         product = self.object
-        order_items = product.orderitem_set.all().order_by('-order__order_date')[:10]
+        order_items = (
+            product.orderitem_set
+            .select_related('order__customer')
+            .order_by('-order__order_date')[:10]
+        )
+        stats = product.orderitem_set.aggregate(
+            total_orders=Count('id'),
+            total_quantity_ordered=Sum('quantity'),
+        )
         context['order_items'] = order_items
-        context['total_orders'] = product.orderitem_set.count()
-        context['total_quantity_ordered'] = sum(item.quantity for item in product.orderitem_set.all())
+        context['total_orders'] = stats['total_orders']
+        context['total_quantity_ordered'] = stats['total_quantity_ordered'] or 0
         return context
 
 
@@ -196,10 +214,11 @@ class ProductQuickSearchView(LoginRequiredMixin, View):
         query = request.GET.get('q', '')
         if len(query) < 2:
             return JsonResponse({'results': []})
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(sku__icontains=query)
-        ).filter(is_active=True)[:10]
+        results = autocomplete.cached_results('products', query, lambda: self.get_results(query))
+        return JsonResponse({'results': results})
+
+    def get_results(self, query):
+        products = search('products', query, limit=10)
         results = []
         for product in products:
             results.append({
@@ -209,28 +228,69 @@ class ProductQuickSearchView(LoginRequiredMixin, View):
                 'price': str(product.unit_price),
                 'stock': product.stock_quantity if product.product_type == 'product' else 'N/A'
             })
-        return JsonResponse({'results': results})
+        return results
+
+class ProductLowStockView(LoginRequiredMixin, View):
+    """
+    Flux JSON des produits en alerte de stock (ruptures puis stocks faibles, par nom),
+    paginé par curseur sur l'index du niveau de stock : ?level=out|low, ?cursor=
+    """
+    paginate_by = 50
+    ordering = ('-stock_level', 'name', 'id')
+
+    def get(self, request):
+        level = request.GET.get('level')
+        levels = [level] if level in ALERT_STOCK_LEVELS else list(ALERT_STOCK_LEVELS)
+        products = Product.objects.filter(stock_level__in=levels).only(
+            'id', 'name', 'sku', 'stock_level', 'stock_quantity', 'reserved_quantity', 'min_stock_level',
+        )
+        paginator = KeysetPaginator(products, self.paginate_by, self.ordering, count_mode='none')
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return JsonResponse({'success': False, 'message': 'Curseur invalide.'}, status=400)
+        return JsonResponse({
+            'results': [
+                {
+                    'id': product.id,
+                    'name': product.name,
+                    'sku': product.sku or '',
+                    'level': product.stock_level,
+                    'stock': product.stock_quantity,
+                    'reserved': product.reserved_quantity,
+                    'min_stock_level': product.min_stock_level,
+                }
+                for product in page
+            ],
+            'next_cursor': page.next_cursor,
+        })
 
 # --- Catégories ---
 
-class CategoryListView(LoginRequiredMixin, ListView):
+class CategoryListView(LoginRequiredMixin, CachedViewMixin, ListView):
     model = Category
     template_name = 'products/category_list.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['products.Category', 'products.Product']
     context_object_name = 'categories'
 
     def get_queryset(self):
-        return Category.objects.all().order_by('name')
+        return Category.objects.annotate(products_count=Count('products')).order_by('name')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        categories = self.get_queryset()
-        context['total_categories'] = categories.count()
-        context['active_categories'] = categories.filter(is_active=True).count()
+        context.update(summarize(
+            Category.objects.all(),
+            total_categories=count_if(),
+            active_categories=count_if(is_active=True),
+        ))
         return context
 
-class CategoryDetailView(LoginRequiredMixin, DetailView):
+class CategoryDetailView(LoginRequiredMixin, CachedViewMixin, DetailView):
     model = Category
     template_name = 'products/category_detail.html'
+    # Modèles lus par la page : toute écriture de l'un d'eux invalide son cache
+    cache_models = ['products.Category', 'products.Product']
     context_object_name = 'category'
     pk_url_kwarg = 'pk'
 
@@ -239,8 +299,11 @@ class CategoryDetailView(LoginRequiredMixin, DetailView):
         category = self.object
         produits = category.products.all()
         context['products'] = produits
-        context['total_products'] = produits.count()
-        context['active_products'] = produits.filter(is_active=True).count()
+        context.update(summarize(
+            produits,
+            total_products=count_if(),
+            active_products=count_if(is_active=True),
+        ))
         return context
 
 class CategoryCreateView(LoginRequiredMixin, CreateView):
@@ -340,19 +403,30 @@ class ProductDeactivateView(LoginRequiredMixin, View):
         return JsonResponse({'success': True, 'is_active': produit.is_active})
 
 class ProductStockUpdateView(LoginRequiredMixin, View):
+    # Types de mouvement saisissables (les ventes viennent des commandes livrées)
+    MOVEMENT_KINDS = ('receipt', 'adjustment', 'return')
+
     def post(self, request, pk):
         produit = get_object_or_404(Product, pk=pk)
+        kind = request.POST.get('kind') or 'adjustment'
         try:
             new_stock = int(request.POST.get('stock_quantity', None))
-            if new_stock < 0:
+            if new_stock < 0 or kind not in self.MOVEMENT_KINDS:
                 raise ValueError
-            produit.stock_quantity = new_stock
-            produit.save()
-            messages.success(request, f'Stock du produit "{produit.name}" mis à jour à {new_stock}.')
-            return JsonResponse({'success': True, 'stock_quantity': produit.stock_quantity})
         except (TypeError, ValueError):
             messages.error(request, "Valeur de stock invalide.")
             return JsonResponse({'success': False, 'message': 'Valeur de stock invalide.'}, status=400)
+        # L'écart avec le stock affiché est enregistré comme un mouvement du journal ;
+        # une réception ou un retour ne peut pas faire baisser le stock
+        try:
+            ledger.record(produit.pk, kind, new_stock - produit.stock_quantity, note=request.POST.get('note', ''))
+        except ValueError as exc:
+            return JsonResponse({'success': False, 'message': str(exc)}, status=400)
+        except InsufficientStock as exc:
+            return JsonResponse({'success': False, 'message': str(exc)}, status=409)
+        produit.refresh_from_db(fields=['stock_quantity'])
+        messages.success(request, f'Stock du produit "{produit.name}" mis à jour à {produit.stock_quantity}.')
+        return JsonResponse({'success': True, 'stock_quantity': produit.stock_quantity})
 
 class ProductPriceUpdateView(LoginRequiredMixin, View):
     def post(self, request, pk):
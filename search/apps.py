@@ -0,0 +1,11 @@
+from django.apps import AppConfig
+
+
+class SearchConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'search'
+    verbose_name = 'Recherche plein texte'
+
+    def ready(self):
+        # Synchronisation des index à chaque écriture
+        from search import signals  # noqa: F401
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from search.services import INDEXES, rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit les index de recherche plein texte (clients, produits, commandes)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'indexes', nargs='*',
+            help=f"Index à reconstruire parmi : {', '.join(INDEXES)} (tous par défaut)",
+        )
+
+    def handle(self, *args, **options):
+        names = options['indexes'] or list(INDEXES)
+        unknown = [name for name in names if name not in INDEXES]
+        if unknown:
+            raise CommandError(f"Index inconnu(s) : {', '.join(unknown)}")
+
+        for name in names:
+            started = time.monotonic()
+            with transaction.atomic():
+                count = rebuild_index(name)
+            self.stdout.write(self.style.SUCCESS(
+                f'Index {name} : {count} objet(s) indexé(s) en {time.monotonic() - started:.2f} s.'
+            ))
@@ -0,0 +1,61 @@
+# Tables FTS5 des index de recherche (SQLite uniquement)
+
+from django.db import migrations
+
+
+TABLES = ("search_customers", "search_products", "search_orders")
+
+# Remplissage initial : même texte que les documents de search.services.indexes
+POPULATE = {
+    "search_customers": """
+        SELECT id,
+               first_name || ' ' || last_name || ' ' || coalesce(company_name, ''),
+               coalesce(email, '') || ' ' || coalesce(phone, '')
+        FROM customers_customer WHERE is_active
+    """,
+    "search_products": """
+        SELECT id, name, coalesce(sku, '')
+        FROM products_product WHERE is_active
+    """,
+    "search_orders": """
+        SELECT o.id,
+               o.order_number || ' ' || ltrim(o.order_number, 'ABCDEFGHIJKLMNOPQRSTUVWXYZ-_'),
+               c.first_name || ' ' || c.last_name || ' ' || coalesce(c.company_name, '')
+        FROM orders_order o INNER JOIN customers_customer c ON c.id = o.customer_id
+    """,
+}
+
+
+def create_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {table} USING fts5("
+                "title, body, prefix='2 3 4', tokenize='unicode61 remove_diacritics 2')"
+            )
+            cursor.execute(f"INSERT INTO {table} (rowid, title, body) {POPULATE[table]}")
+
+
+def drop_tables(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    with schema_editor.connection.cursor() as cursor:
+        for table in TABLES:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ("customers", "0002_alter_customer_phone"),
+        ("orders", "0002_order_order_date_idx_order_order_status_date_idx_and_more"),
+        ("products", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_tables, drop_tables),
+    ]
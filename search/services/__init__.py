@@ -0,0 +1,12 @@
+# Services pour l'application search
+from . import autocomplete
+from .backends import BaseSearchBackend, DatabaseSearchBackend, SQLiteFTSBackend, get_backend
+from .indexes import INDEXES, SearchIndex, get_index
+from .query import rebuild_index, reindex, remove_from_index, search, update_index
+
+__all__ = [
+    'autocomplete',
+    'BaseSearchBackend', 'DatabaseSearchBackend', 'SQLiteFTSBackend', 'get_backend',
+    'INDEXES', 'SearchIndex', 'get_index',
+    'rebuild_index', 'reindex', 'remove_from_index', 'search', 'update_index',
+]
@@ -0,0 +1,163 @@
+"""
+Cache des réponses d'autocomplétion.
+
+Les résultats d'une recherche rapide sont mis en cache (alias de cache
+`autocomplete`, LocMemCache borné et LRU par défaut) sous une clé formée de
+l'index et de la requête normalisée : casse, accents, ponctuation et ordre des
+mots sont ignorés, comme par l'index plein texte.
+
+Chaque processus tient le registre des requêtes qu'il a mises en cache. Quand un
+objet indexé est enregistré ou supprimé, seules les requêtes dont tous les mots
+sont des préfixes de mots de son document (avant ou après l'écriture) sont
+invalidées. La durée de vie des entrées borne le reste (montants mis à jour par
+requête UPDATE, autres processus).
+"""
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from search.services.backends import tokenize
+
+
+CACHE_ALIAS = 'autocomplete'
+KEY_PREFIX = 'autocomplete'
+# Au-delà de ce nombre de documents modifiés, tout l'index est invalidé
+MAX_PRECISE_DOCUMENTS = 100
+
+_lock = threading.Lock()
+# {index: OrderedDict(requête normalisée -> None)}, dans l'ordre d'insertion
+_registry = {}
+# {index: {'hits': n, 'misses': n}}
+_counters = {}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def max_entries():
+    options = settings.CACHES.get(CACHE_ALIAS, {}).get('OPTIONS', {})
+    return options.get('MAX_ENTRIES', 300)
+
+
+def normalize_words(text):
+    """Mots en minuscules et sans accents"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return tokenize(text.lower())
+
+
+def normalize(query):
+    """Forme canonique d'une requête : mots normalisés, dédoublonnés et triés"""
+    return ' '.join(sorted(set(normalize_words(query))))
+
+
+def cache_key(name, normalized):
+    # Empreinte de la requête : clé sans espaces et de longueur fixe, valide pour tout cache
+    digest = hashlib.md5(normalized.encode(), usedforsecurity=False).hexdigest()
+    return f'{KEY_PREFIX}:{name}:{digest}'
+
+
+def _count(name, counter):
+    with _lock:
+        counters = _counters.setdefault(name, {'hits': 0, 'misses': 0})
+        counters[counter] += 1
+
+
+def _register(name, normalized):
+    """Mémorise une requête mise en cache ; la plus ancienne est oubliée au-delà de la capacité"""
+    evicted = []
+    with _lock:
+        queries = _registry.setdefault(name, OrderedDict())
+        queries[normalized] = None
+        queries.move_to_end(normalized)
+        while len(queries) > max_entries():
+            evicted.append(queries.popitem(last=False)[0])
+    if evicted:
+        # Une entrée absente du registre ne serait plus invalidée : on la retire aussi du cache
+        get_cache().delete_many([cache_key(name, query) for query in evicted])
+
+
+def cached_results(name, query, build):
+    """
+    Retourne les résultats en cache pour (index, requête normalisée),
+    ou les calcule avec `build()` et les met en cache
+    """
+    normalized = normalize(query)
+    if not normalized:
+        return build()
+    key = cache_key(name, normalized)
+    results = get_cache().get(key)
+    if results is not None:
+        _count(name, 'hits')
+        return results
+    _count(name, 'misses')
+    results = build()
+    get_cache().set(key, results)
+    _register(name, normalized)
+    return results
+
+
+def _matches(query_words, document_words):
+    return all(
+        any(word.startswith(query_word) for word in document_words)
+        for query_word in query_words
+    )
+
+
+def _invalidate(name, documents):
+    with _lock:
+        queries = _registry.get(name)
+        if not queries:
+            return
+        if documents is None or len(documents) > MAX_PRECISE_DOCUMENTS:
+            stale = list(queries)
+        else:
+            words = [normalize_words(' '.join(filter(None, document))) for document in documents]
+            stale = [
+                query for query in queries
+                if any(_matches(query.split(), document_words) for document_words in words)
+            ]
+        for query in stale:
+            del queries[query]
+    if stale:
+        get_cache().delete_many([cache_key(name, query) for query in stale])
+
+
+def invalidate(name, documents):
+    """
+    Invalide les requêtes de l'index `name` qui correspondent à l'un des documents
+    (couples title, body). `documents=None` invalide tout l'index. L'invalidation
+    est refaite à la validation de la transaction, pour écarter les résultats mis
+    en cache entre-temps à partir de l'ancien état.
+    """
+    documents = None if documents is None else list(documents)
+    _invalidate(name, documents)
+    transaction.on_commit(lambda: _invalidate(name, documents))
+
+
+def stats():
+    """Compteurs de succès et d'échecs du cache par index (processus courant)"""
+    with _lock:
+        report = {}
+        for name, counters in sorted(_counters.items()):
+            total = counters['hits'] + counters['misses']
+            report[name] = {
+                **counters,
+                'hit_rate': round(counters['hits'] / total, 3) if total else 0,
+                'entries': len(_registry.get(name, ())),
+            }
+        return report
+
+
+def reset():
+    """Vide le cache d'autocomplétion et remet les compteurs à zéro"""
+    with _lock:
+        names = list(_registry)
+        keys = [cache_key(name, query) for name in names for query in _registry[name]]
+        _registry.clear()
+        _counters.clear()
+    get_cache().delete_many(keys)
@@ -0,0 +1,149 @@
+"""
+Moteurs de recherche.
+
+Le moteur utilisé est défini par le réglage SEARCH_BACKEND (chemin d'import
+d'une classe). Par défaut : SQLiteFTSBackend sous SQLite, DatabaseSearchBackend
+(icontains, sans index) pour les autres bases.
+"""
+import re
+from functools import lru_cache
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+
+# Mots de la requête (lettres et chiffres, accents compris)
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query or '')
+
+
+class BaseSearchBackend:
+    """
+    Interface d'un moteur de recherche.
+    `search` retourne les clés primaires des objets trouvés, les plus pertinents d'abord.
+    """
+
+    def search(self, index, query, limit):
+        raise NotImplementedError
+
+    def update(self, index, objects):
+        """Indexe (ou réindexe) des objets"""
+
+    def remove(self, index, pks):
+        """Retire des objets de l'index"""
+
+    def clear(self, index):
+        """Vide l'index"""
+
+    def documents(self, index, pks):
+        """Documents (title, body) indexés des objets donnés, None si le moteur ne les conserve pas"""
+        return None
+
+
+class DatabaseSearchBackend(BaseSearchBackend):
+    """
+    Moteur de repli sans index : chaque mot doit apparaître dans l'un des champs
+    de recherche (icontains). Aucune synchronisation n'est nécessaire.
+    """
+
+    def search(self, index, query, limit):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        queryset = index.get_queryset()
+        for token in tokens:
+            condition = Q()
+            for field in index.search_fields:
+                condition |= Q(**{f'{field}__icontains': token})
+            queryset = queryset.filter(condition)
+        return list(queryset.values_list('pk', flat=True)[:limit])
+
+
+class SQLiteFTSBackend(BaseSearchBackend):
+    """
+    Moteur plein texte SQLite FTS5 : une table virtuelle `search_<index>` par index,
+    dont le rowid est la clé primaire de l'objet. Chaque mot de la requête est
+    cherché en préfixe et les résultats sont classés par bm25.
+    """
+
+    RANK_WINDOW = 1000
+
+    def table(self, index):
+        return f'search_{index.name}'
+
+    def match_expression(self, query):
+        """Expression MATCH : tous les mots, chacun en préfixe (« dial » trouve « Diallo »)"""
+        tokens = tokenize(query)
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    def search(self, index, query, limit):
+        expression = self.match_expression(query)
+        if not expression:
+            return []
+        table = self.table(index)
+        title_weight, body_weight = index.weights
+        # Le classement porte sur les RANK_WINDOW correspondances les plus récentes :
+        # un préfixe court (« di ») en trouve des centaines de milliers à 1M de lignes
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM ('
+                f'SELECT rowid, bm25({table}, {title_weight}, {body_weight}) AS score '
+                f'FROM {table} WHERE {table} MATCH %s ORDER BY rowid DESC LIMIT %s'
+                f') ORDER BY score LIMIT %s',
+                [expression, self.RANK_WINDOW, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    def update(self, index, objects):
+        rows, removed = [], []
+        for obj in objects:
+            if index.is_indexable(obj):
+                rows.append((obj.pk, *index.document(obj)))
+            else:
+                removed.append(obj.pk)
+        table = self.table(index)
+        with connection.cursor() as cursor:
+            if rows:
+                cursor.executemany(
+                    f'INSERT OR REPLACE INTO {table} (rowid, title, body) VALUES (%s, %s, %s)', rows
+                )
+        if removed:
+            self.remove(index, removed)
+
+    def remove(self, index, pks):
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {self.table(index)} WHERE rowid = %s', [(pk,) for pk in pks]
+            )
+
+    def clear(self, index):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table(index)}')
+
+    def documents(self, index, pks):
+        pks = list(pks)
+        documents = []
+        with connection.cursor() as cursor:
+            for start in range(0, len(pks), 500):
+                chunk = pks[start:start + 500]
+                placeholders = ', '.join(['%s'] * len(chunk))
+                cursor.execute(
+                    f'SELECT title, body FROM {self.table(index)} WHERE rowid IN ({placeholders})', chunk
+                )
+                documents.extend(cursor.fetchall())
+        return documents
+
+
+@lru_cache(maxsize=None)
+def get_backend():
+    """Instance du moteur de recherche configuré"""
+    path = getattr(settings, 'SEARCH_BACKEND', None)
+    if path is None:
+        if connection.vendor == 'sqlite':
+            return SQLiteFTSBackend()
+        return DatabaseSearchBackend()
+    return import_string(path)()
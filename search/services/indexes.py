@@ -0,0 +1,96 @@
+"""
+Définition des index de recherche : quels objets sont indexés et avec quel texte.
+
+Chaque document a deux champs : `title` (nom, numéro), pondéré fortement dans
+le classement, et `body` (email, téléphone, SKU, client...).
+"""
+import re
+from customers.models import Customer
+from orders.models import Order
+from products.models import Product
+
+
+def _join(*parts):
+    return ' '.join(part for part in parts if part)
+
+
+class SearchIndex:
+    """Index de recherche d'un modèle"""
+
+    name = None
+    model = None
+    # Champs utilisés par le moteur de repli (recherche icontains)
+    search_fields = ()
+    # Poids de title et body dans le classement
+    weights = (10.0, 1.0)
+    # Modèles dont la modification change le texte indexé : {modèle: lookup vers ce modèle}
+    dependencies = {}
+    # Champs de ces modèles repris dans le texte indexé : {modèle: champs}
+    dependency_fields = {}
+
+    def get_queryset(self):
+        return self.model.objects.all()
+
+    def is_indexable(self, obj):
+        return True
+
+    def document(self, obj):
+        """Retourne le couple (title, body) indexé pour un objet"""
+        raise NotImplementedError
+
+
+class CustomerIndex(SearchIndex):
+    name = 'customers'
+    model = Customer
+    search_fields = ('first_name', 'last_name', 'company_name', 'email')
+
+    def get_queryset(self):
+        return Customer.objects.filter(is_active=True)
+
+    def is_indexable(self, obj):
+        return obj.is_active
+
+    def document(self, obj):
+        return _join(obj.first_name, obj.last_name, obj.company_name), _join(obj.email, obj.phone)
+
+
+class ProductIndex(SearchIndex):
+    name = 'products'
+    model = Product
+    search_fields = ('name', 'sku')
+
+    def get_queryset(self):
+        return Product.objects.filter(is_active=True)
+
+    def is_indexable(self, obj):
+        return obj.is_active
+
+    def document(self, obj):
+        return obj.name, obj.sku
+
+
+class OrderIndex(SearchIndex):
+    name = 'orders'
+    model = Order
+    search_fields = ('order_number', 'customer__first_name', 'customer__last_name')
+    dependencies = {Customer: 'customer'}
+    dependency_fields = {Customer: ('first_name', 'last_name', 'company_name')}
+
+    def get_queryset(self):
+        return Order.objects.select_related('customer')
+
+    def document(self, obj):
+        # La partie numérique seule permet de chercher « 20250821 » sans le préfixe
+        digits = re.sub(r'\D', '', obj.order_number or '')
+        customer = obj.customer
+        return (
+            _join(obj.order_number, digits),
+            _join(customer.first_name, customer.last_name, customer.company_name),
+        )
+
+
+INDEXES = {index.name: index for index in (CustomerIndex(), ProductIndex(), OrderIndex())}
+
+
+def get_index(name):
+    return INDEXES[name]
@@ -0,0 +1,82 @@
+"""
+Point d'entrée de la recherche : interrogation et mise à jour des index.
+Toute mise à jour d'un index invalide les réponses d'autocomplétion concernées.
+"""
+from search.services import autocomplete
+from search.services.backends import get_backend
+from search.services.indexes import get_index
+
+
+# Taille des lots lors de la réindexation
+CHUNK_SIZE = 2000
+
+
+def search(name, query, limit=10):
+    """
+    Retourne au plus `limit` objets de l'index `name` correspondant à la requête,
+    les plus pertinents d'abord (deux requêtes : l'index puis les objets).
+    """
+    index = get_index(name)
+    pks = get_backend().search(index, query, limit)
+    if not pks:
+        return []
+    objects = index.get_queryset().in_bulk(pks)
+    return [objects[pk] for pk in pks if pk in objects]
+
+
+def _update(index, objects, removed=()):
+    """Met à jour l'index et invalide les réponses qui correspondent à l'ancien ou au nouveau texte"""
+    backend = get_backend()
+    pks = [obj.pk for obj in objects] + list(removed)
+    previous = backend.documents(index, pks)
+    if objects:
+        backend.update(index, objects)
+    if removed:
+        backend.remove(index, removed)
+    if previous is None:
+        autocomplete.invalidate(index.name, None)
+    else:
+        current = [index.document(obj) for obj in objects if index.is_indexable(obj)]
+        autocomplete.invalidate(index.name, previous + current)
+
+
+def update_index(name, objects):
+    """Indexe des objets déjà chargés"""
+    _update(get_index(name), list(objects))
+
+
+def reindex(name, pks):
+    """
+    Recharge puis indexe les objets de clés données (après un bulk_create par exemple) ;
+    ceux qui ne sont plus indexables sont retirés
+    """
+    index = get_index(name)
+    pks = list(pks)
+    for start in range(0, len(pks), CHUNK_SIZE):
+        chunk = pks[start:start + CHUNK_SIZE]
+        objects = list(index.get_queryset().filter(pk__in=chunk))
+        missing = set(chunk) - {obj.pk for obj in objects}
+        _update(index, objects, missing)
+
+
+def remove_from_index(name, pks):
+    _update(get_index(name), [], list(pks))
+
+
+def rebuild_index(name):
+    """Reconstruit entièrement un index ; retourne le nombre d'objets indexés"""
+    index = get_index(name)
+    backend = get_backend()
+    backend.clear(index)
+    batch, count = [], 0
+    for obj in index.get_queryset().iterator(chunk_size=CHUNK_SIZE):
+        batch.append(obj)
+        if len(batch) >= CHUNK_SIZE:
+            backend.update(index, batch)
+            count += len(batch)
+            batch = []
+    if batch:
+        backend.update(index, batch)
+        count += len(batch)
+    autocomplete.invalidate(name, None)
+    return count
@@ -0,0 +1,63 @@
+"""
+Synchronisation des index de recherche à l'enregistrement et à la suppression.
+
+Les objets qui reprennent le texte d'un autre modèle (les commandes reprennent
+le nom du client) ne sont réindexés que si les champs repris ont changé : leurs
+valeurs enregistrées sont lues avant l'écriture (pre_save).
+"""
+from django.db.models.signals import post_delete, post_save, pre_save
+from search.services import INDEXES, reindex, remove_from_index, update_index
+
+
+def index_saved(sender, instance, **kwargs):
+    for index in INDEXES.values():
+        if index.model is sender:
+            update_index(index.name, [instance])
+
+
+def index_deleted(sender, instance, **kwargs):
+    for index in INDEXES.values():
+        if index.model is sender:
+            remove_from_index(index.name, [instance.pk])
+
+
+def _dependency_fields(model):
+    """Champs de `model` repris par au moins un index"""
+    fields = set()
+    for index in INDEXES.values():
+        fields.update(index.dependency_fields.get(model, ()))
+    return sorted(fields)
+
+
+def remember_indexed_fields(sender, instance, update_fields=None, **kwargs):
+    """Valeurs enregistrées des champs repris par d'autres index, avant l'écriture"""
+    instance._search_previous = None
+    if instance._state.adding or instance.pk is None:
+        return
+    fields = _dependency_fields(sender)
+    if update_fields is not None:
+        fields = [name for name in fields if name in update_fields]
+    if fields:
+        instance._search_previous = sender._base_manager.filter(pk=instance.pk).values(*fields).first()
+
+
+def index_dependents(sender, instance, **kwargs):
+    """Réindexe les objets dont le texte indexé reprend un champ modifié de l'objet"""
+    previous = getattr(instance, '_search_previous', None)
+    if kwargs.get('created') or not previous:
+        return
+    changed = {name for name, value in previous.items() if getattr(instance, name) != value}
+    for index in INDEXES.values():
+        lookup = index.dependencies.get(sender)
+        if lookup and changed.intersection(index.dependency_fields.get(sender, ())):
+            pks = index.model._base_manager.filter(**{lookup: instance}).values_list('pk', flat=True)
+            reindex(index.name, pks)
+
+
+for model in {index.model for index in INDEXES.values()}:
+    post_save.connect(index_saved, sender=model, dispatch_uid=f'search_index_{model._meta.label}')
+    post_delete.connect(index_deleted, sender=model, dispatch_uid=f'search_remove_{model._meta.label}')
+
+for model in {model for index in INDEXES.values() for model in index.dependencies}:
+    pre_save.connect(remember_indexed_fields, sender=model, dispatch_uid=f'search_previous_{model._meta.label}')
+    post_save.connect(index_dependents, sender=model, dispatch_uid=f'search_dependents_{model._meta.label}')
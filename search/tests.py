@@ -0,0 +1,179 @@
+from django.test import TestCase
+from django.urls import reverse
+from commandly.testing import build_sample_data
+from customers.models import Customer
+from orders.models import Order
+from products.models import Product
+from search.services import DatabaseSearchBackend, autocomplete, get_index, rebuild_index, search
+
+
+class SearchIndexTests(TestCase):
+    """
+    Index plein texte : recherche par préfixe, classement et synchronisation
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.data = build_sample_data(5)
+        cls.customer = Customer.objects.create(
+            first_name='Aïssatou',
+            last_name='Diallo',
+            email='aissatou.diallo@example.com',
+            address_line1='1 rue de test',
+            city='Dakar',
+            postal_code='10000',
+            slug='aissatou-diallo',
+        )
+
+    def test_prefix_and_accent_insensitive(self):
+        self.assertEqual(search('customers', 'aissa dial'), [self.customer])
+        self.assertEqual(search('customers', 'Diallo'), [self.customer])
+
+    def test_all_words_must_match(self):
+        self.assertEqual(search('customers', 'aissatou inconnu'), [])
+
+    def test_ranking_prefers_title(self):
+        other = Customer.objects.create(
+            first_name='Moussa',
+            last_name='Ndiaye',
+            email='diallo.moussa@example.com',
+            address_line1='2 rue de test',
+            city='Dakar',
+            postal_code='10000',
+            slug='moussa-ndiaye',
+        )
+        self.assertEqual(search('customers', 'diallo'), [self.customer, other])
+
+    def test_sync_on_save_and_delete(self):
+        self.customer.last_name = 'Sow'
+        self.customer.save()
+        self.assertEqual(search('customers', 'diallo sow'), [self.customer])
+
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(search('customers', 'sow'), [])
+
+        product = self.data['product']
+        product.delete()
+        self.assertNotIn(product, search('products', product.sku))
+
+    def test_orders_follow_customer_name(self):
+        order = Order.objects.create(customer=self.customer)
+        self.assertEqual(search('orders', 'aissatou'), [order])
+        self.assertEqual(search('orders', order.order_number), [order])
+
+        self.customer.first_name = 'Fatou'
+        self.customer.save()
+        self.assertEqual(search('orders', 'fatou diallo'), [order])
+
+    def test_orders_not_reindexed_when_name_unchanged(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        Order.objects.create(customer=self.customer)
+        with CaptureQueriesContext(connection) as context:
+            self.customer.phone = '+221 77 000 00 00'
+            self.customer.save()
+            self.customer.save(update_fields=['is_active'])
+        self.assertFalse([query for query in context.captured_queries if '"orders_order"' in query['sql']])
+
+    def test_rebuild(self):
+        self.assertEqual(rebuild_index('products'), Product.objects.filter(is_active=True).count())
+        self.assertEqual(search('products', 'SKU-00003'), [Product.objects.get(sku='SKU-00003')])
+
+    def test_database_backend(self):
+        backend = DatabaseSearchBackend()
+        self.assertEqual(backend.search(get_index('customers'), 'aissatou dial', 10), [self.customer.pk])
+
+
+class QuickSearchViewTests(TestCase):
+    """
+    Les vues d'autocomplétion gardent leur format de réponse JSON
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        from users.models import CustomUser
+
+        cls.user = CustomUser.objects.create_user(username='vendeur', password='motdepasse', role='seller')
+        cls.data = build_sample_data(5)
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_customer_quick_search(self):
+        customer = self.data['customer']
+        response = self.client.get(reverse('customers:customer_quick_search'), {'q': customer.last_name})
+        result = response.json()['results'][0]
+        self.assertEqual(result['id'], customer.pk)
+        self.assertEqual(set(result), {'id', 'text', 'email', 'phone', 'address'})
+
+    def test_product_quick_search(self):
+        product = self.data['product']
+        response = self.client.get(reverse('products:product_quick_search'), {'q': product.sku})
+        self.assertEqual(response.json()['results'][0]['id'], product.pk)
+
+    def test_order_quick_search(self):
+        order = self.data['order']
+        response = self.client.get(reverse('orders:order_quick_search'), {'q': order.order_number})
+        result = response.json()['results'][0]
+        self.assertEqual(result['id'], order.pk)
+        self.assertEqual(set(result), {'id', 'text', 'customer', 'status', 'total'})
+
+
+class AutocompleteCacheTests(TestCase):
+    """
+    Cache des recherches rapides : clé normalisée, invalidation ciblée et compteurs
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        from users.models import CustomUser
+
+        cls.user = CustomUser.objects.create_user(username='admin', password='motdepasse', role='admin')
+        cls.data = build_sample_data(5)
+
+    def setUp(self):
+        autocomplete.reset()
+        self.client.force_login(self.user)
+        self.url = reverse('customers:customer_quick_search')
+
+    def quick_search(self, query):
+        return self.client.get(self.url, {'q': query}).json()['results']
+
+    def test_normalized_queries_share_an_entry(self):
+        self.quick_search('Nom1 Prénom1')
+        self.quick_search('prenom1   NOM1')
+        self.assertEqual(autocomplete.stats()['customers'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5, 'entries': 1})
+
+    def test_matching_write_invalidates(self):
+        customer = self.data['customer']
+        self.assertEqual(self.quick_search('Nom0')[0]['email'], customer.email)
+
+        customer.email = 'nouveau@example.com'
+        customer.save()
+        self.assertEqual(self.quick_search('Nom0')[0]['email'], 'nouveau@example.com')
+        self.assertEqual(autocomplete.stats()['customers']['misses'], 2)
+
+    def test_renamed_object_invalidates_old_and_new_queries(self):
+        customer = self.data['customer']
+        self.assertEqual(len(self.quick_search('Nom0')), 1)
+        self.assertEqual(self.quick_search('Ndiaye'), [])
+
+        customer.last_name = 'Ndiaye'
+        customer.save()
+        self.assertEqual(self.quick_search('Nom0'), [])
+        self.assertEqual(len(self.quick_search('Ndiaye')), 1)
+
+    def test_unrelated_write_keeps_entry(self):
+        self.quick_search('Nom0')
+        other = Customer.objects.get(last_name='Nom3')
+        other.phone = '770000000'
+        other.save()
+        self.quick_search('Nom0')
+        self.assertEqual(autocomplete.stats()['customers']['hits'], 1)
+
+    def test_stats_view(self):
+        self.quick_search('Nom0')
+        response = self.client.get(reverse('search:autocomplete_stats'))
+        self.assertEqual(response.json()['indexes']['customers']['misses'], 1)
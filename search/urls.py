@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'search'
+
+urlpatterns = [
+    path('autocomplete/stats/', views.AutocompleteStatsView.as_view(), name='autocomplete_stats'),
+]
@@ -0,0 +1,18 @@
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import JsonResponse
+from django.urls import reverse_lazy
+from django.views import View
+from search.services import autocomplete
+
+
+class AutocompleteStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Compteurs du cache d'autocomplétion du processus courant (administrateurs)
+    """
+    login_url = reverse_lazy('users:login')
+
+    def test_func(self):
+        return self.request.user.is_admin
+
+    def get(self, request):
+        return JsonResponse({'indexes': autocomplete.stats()})
@@ -0,0 +1,7 @@
+from django.apps import AppConfig
+
+
+class SequencesConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sequences'
+    verbose_name = 'Numérotation des documents'
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-17 01:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = []
+
+    operations = [
+        migrations.CreateModel(
+            name="DocumentSequence",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("prefix", models.CharField(max_length=10, verbose_name="Préfixe")),
+                ("day", models.DateField(verbose_name="Jour")),
+                (
+                    "last_value",
+                    models.PositiveIntegerField(
+                        default=0, verbose_name="Dernière valeur attribuée"
+                    ),
+                ),
+                (
+                    "updated_at",
+                    models.DateTimeField(
+                        auto_now=True, verbose_name="Dernière modification"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Séquence de numérotation",
+                "verbose_name_plural": "Séquences de numérotation",
+                "ordering": ["-day", "prefix"],
+                "unique_together": {("prefix", "day")},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+from django.db import models
+
+
+class DocumentSequence(models.Model):
+    """
+    Compteur de numérotation par préfixe et par jour (CMD, FAC, PAY...)
+    Une seule ligne est mise à jour par allocation, ce qui garantit des numéros
+    uniques et sans trou même avec plusieurs processus en parallèle.
+    """
+    
+    prefix = models.CharField(
+        max_length=10,
+        verbose_name='Préfixe'
+    )
+    
+    day = models.DateField(
+        verbose_name='Jour'
+    )
+    
+    last_value = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Dernière valeur attribuée'
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Dernière modification'
+    )
+    
+    class Meta:
+        verbose_name = 'Séquence de numérotation'
+        verbose_name_plural = 'Séquences de numérotation'
+        ordering = ['-day', 'prefix']
+        unique_together = ['prefix', 'day']
+    
+    def __str__(self):
+        return f"{self.prefix} {self.day} - {self.last_value}"
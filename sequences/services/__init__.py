@@ -0,0 +1,4 @@
+# Services pour l'application sequences
+from .numbering import allocate, allocate_block, format_number, next_number, seed_from
+
+__all__ = ['allocate', 'allocate_block', 'format_number', 'next_number', 'seed_from']
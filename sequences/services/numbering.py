@@ -0,0 +1,88 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Length
+from django.utils import timezone
+from sequences.models import DocumentSequence
+
+
+# Plus grand caractère Unicode : borne supérieure des chaînes commençant par un préfixe
+PREFIX_UPPER_BOUND = '\U0010ffff'
+
+
+def number_prefix(prefix, day):
+    """Retourne la partie fixe d'un numéro de document (ex: CMD20250821)"""
+    return f"{prefix}{day.strftime('%Y%m%d')}"
+
+
+def format_number(prefix, day, value):
+    """Formate un numéro de document (ex: CMD20250821001)"""
+    return f"{number_prefix(prefix, day)}{value:03d}"
+
+
+def seed_from(model, field):
+    """
+    Construit une fonction d'amorçage qui retrouve la dernière valeur déjà utilisée
+    dans `model.field` pour un préfixe donné. Elle n'est appelée qu'à la création
+    du compteur d'un jour, pour reprendre proprement des numéros existants.
+    """
+    def seed(fixed_part):
+        numbers = (
+            model.objects
+            # Intervalle plutôt que LIKE : la recherche utilise l'index unique du numéro
+            .filter(**{f'{field}__gte': fixed_part, f'{field}__lt': fixed_part + PREFIX_UPPER_BOUND})
+            .order_by(Length(field).desc(), f'-{field}')
+            .values_list(field, flat=True)
+        )
+        # Le plus long numéro dont la fin est numérique (les numéros saisis à la main sont ignorés)
+        for number in numbers.iterator():
+            suffix = number[len(fixed_part):]
+            if suffix.isdigit():
+                return int(suffix)
+        return 0
+    return seed
+
+
+def allocate(prefix, count=1, day=None, seed=None):
+    """
+    Réserve `count` valeurs consécutives pour le préfixe et le jour donnés.
+    Retourne un range des valeurs attribuées.
+
+    L'allocation est une seule mise à jour de la ligne du compteur (verrou de ligne).
+    Exécutée dans la transaction de l'appelant, elle est annulée avec elle :
+    aucun numéro n'est perdu en cas de rollback.
+    """
+    if count < 1:
+        raise ValueError("Le nombre de valeurs à réserver doit être strictement positif.")
+    day = day or timezone.localdate()
+    counter = DocumentSequence.objects.filter(prefix=prefix, day=day)
+
+    with transaction.atomic():
+        updated = counter.update(last_value=F('last_value') + count, updated_at=timezone.now())
+        if not updated:
+            start = seed(number_prefix(prefix, day)) if seed else 0
+            try:
+                with transaction.atomic():
+                    DocumentSequence.objects.create(prefix=prefix, day=day, last_value=start + count)
+                return range(start + 1, start + count + 1)
+            except IntegrityError:
+                # Un autre processus vient de créer le compteur
+                counter.update(last_value=F('last_value') + count, updated_at=timezone.now())
+        last_value = counter.values_list('last_value', flat=True).get()
+
+    return range(last_value - count + 1, last_value + 1)
+
+
+def next_number(prefix, day=None, seed=None):
+    """Attribue le prochain numéro de document pour le préfixe donné"""
+    day = day or timezone.localdate()
+    value = allocate(prefix, 1, day=day, seed=seed)[0]
+    return format_number(prefix, day, value)
+
+
+def allocate_block(prefix, count, day=None, seed=None):
+    """
+    Pré-alloue un bloc de `count` numéros consécutifs (imports et traitements en masse).
+    Retourne la liste des numéros formatés.
+    """
+    day = day or timezone.localdate()
+    return [format_number(prefix, day, value) for value in allocate(prefix, count, day=day, seed=seed)]
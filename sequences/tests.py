@@ -0,0 +1,89 @@
+from datetime import date
+from django.db import IntegrityError, transaction
+from django.test import TestCase
+from customers.models import Customer
+from orders.models import Order
+from sequences.models import DocumentSequence
+from sequences.services import allocate, allocate_block, format_number, next_number, seed_from
+
+
+DAY = date(2025, 8, 21)
+
+
+class AllocationTests(TestCase):
+
+    def test_allocate_consecutive_values(self):
+        self.assertEqual(list(allocate('CMD', day=DAY)), [1])
+        self.assertEqual(list(allocate('CMD', 3, day=DAY)), [2, 3, 4])
+        # Compteurs indépendants par préfixe et par jour
+        self.assertEqual(list(allocate('FAC', day=DAY)), [1])
+        self.assertEqual(list(allocate('CMD', day=date(2025, 8, 22))), [1])
+        self.assertEqual(DocumentSequence.objects.get(prefix='CMD', day=DAY).last_value, 4)
+
+    def test_allocate_rejects_empty_block(self):
+        with self.assertRaises(ValueError):
+            allocate('CMD', 0, day=DAY)
+
+    def test_allocate_block(self):
+        next_number('PAY', day=DAY)
+        self.assertEqual(
+            allocate_block('PAY', 2, day=DAY),
+            ['PAY20250821002', 'PAY20250821003'],
+        )
+
+    def test_rollover_past_999(self):
+        DocumentSequence.objects.create(prefix='CMD', day=DAY, last_value=998)
+        self.assertEqual(allocate_block('CMD', 3, day=DAY), ['CMD20250821999', 'CMD202508211000', 'CMD202508211001'])
+
+    def test_rollback_leaves_no_gap(self):
+        next_number('CMD', day=DAY)
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                next_number('CMD', day=DAY)
+                raise RuntimeError
+        self.assertEqual(next_number('CMD', day=DAY), 'CMD20250821002')
+
+    def test_counter_created_concurrently(self):
+        def seed(fixed_part):
+            # Un autre processus crée le compteur pendant l'amorçage
+            DocumentSequence.objects.create(prefix='CMD', day=DAY, last_value=5)
+            return 0
+
+        self.assertEqual(list(allocate('CMD', 2, day=DAY, seed=seed)), [6, 7])
+        self.assertEqual(DocumentSequence.objects.get(prefix='CMD', day=DAY).last_value, 7)
+
+
+class SeedTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Customer.objects.create(
+            first_name='Awa', last_name='Diop', email='awa@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='awa-diop',
+        )
+
+    def create_order(self, number):
+        # Numéros saisis avant la création des compteurs
+        Order.objects.create(customer=self.customer, order_number=number)
+        DocumentSequence.objects.all().delete()
+
+    def test_seed_from_existing_numbers(self):
+        self.create_order(format_number('CMD', DAY, 7))
+        self.create_order(format_number('CMD', DAY, 12))
+        self.create_order('CMD20250821-ancien')
+        seed = seed_from(Order, 'order_number')
+        self.assertEqual(seed('CMD20250821'), 12)
+        self.assertEqual(seed('CMD20250822'), 0)
+        self.assertEqual(next_number('CMD', day=DAY, seed=seed), 'CMD20250821013')
+
+    def test_seed_after_rollover(self):
+        # 1000 suit 999 bien qu'il soit plus petit dans l'ordre alphabétique
+        self.create_order(format_number('CMD', DAY, 999))
+        self.create_order(format_number('CMD', DAY, 1000))
+        self.assertEqual(seed_from(Order, 'order_number')('CMD20250821'), 1000)
+
+    def test_failed_save_releases_number(self):
+        # Commande sans client : l'insertion échoue, l'allocation est annulée avec elle
+        with self.assertRaises(IntegrityError):
+            Order().save()
+        self.assertTrue(Order.objects.create(customer=self.customer).order_number.endswith('001'))
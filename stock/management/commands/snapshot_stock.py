@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand
+from stock.services import ledger
+
+
+class Command(BaseCommand):
+    help = "Prend un instantané du stock des produits ayant des mouvements depuis le précédent (à planifier, ex. chaque nuit)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Compare ensuite le stock du journal au stock disponible + réservé des produits',
+        )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created = ledger.take_snapshots()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f"{created} instantané(s) de stock créé(s) en {elapsed:.2f} s."))
+
+        if options['verify']:
+            differences = ledger.drift()
+            for product, on_hand in differences:
+                self.stdout.write(self.style.WARNING(
+                    f"{product.name} : journal {on_hand}, produit "
+                    f"{product.stock_quantity + product.reserved_quantity} "
+                    f"(disponible {product.stock_quantity} + réservé {product.reserved_quantity})"
+                ))
+            if not differences:
+                self.stdout.write(self.style.SUCCESS('Journal et stocks des produits concordent.'))
@@ -0,0 +1,175 @@
+# Generated by Django 5.2.5 on 2026-10-17 02:16
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_ledger(apps, schema_editor):
+    """Solde d'ouverture du journal : stock physique actuel (disponible + réservé)"""
+    Product = apps.get_model("products", "Product")
+    StockMovement = apps.get_model("stock", "StockMovement")
+    StockSnapshot = apps.get_model("stock", "StockSnapshot")
+    now = django.utils.timezone.now()
+    products = Product.objects.filter(product_type="product").values_list(
+        "pk", "stock_quantity", "reserved_quantity"
+    )
+    movements = [
+        StockMovement(
+            product_id=product_id,
+            kind="adjustment",
+            quantity=available + reserved,
+            note="Solde d'ouverture",
+            created_at=now,
+        )
+        for product_id, available, reserved in products.iterator()
+        if available + reserved
+    ]
+    StockMovement.objects.bulk_create(movements, batch_size=1000)
+    snapshots = [
+        StockSnapshot(
+            product_id=product_id,
+            last_movement_id=movement_id,
+            taken_at=now,
+            quantity=quantity,
+        )
+        for movement_id, product_id, quantity in StockMovement.objects.values_list(
+            "pk", "product_id", "quantity"
+        ).iterator()
+    ]
+    StockSnapshot.objects.bulk_create(snapshots, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("orders", "0002_order_order_date_idx_order_order_status_date_idx_and_more"),
+        ("products", "0002_product_reserved_quantity"),
+        ("stock", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockMovement",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "kind",
+                    models.CharField(
+                        choices=[
+                            ("receipt", "Réception"),
+                            ("sale", "Vente"),
+                            ("adjustment", "Ajustement"),
+                            ("return", "Retour"),
+                        ],
+                        max_length=10,
+                        verbose_name="Type de mouvement",
+                    ),
+                ),
+                ("quantity", models.IntegerField(verbose_name="Quantité")),
+                (
+                    "note",
+                    models.CharField(blank=True, max_length=255, verbose_name="Note"),
+                ),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        default=django.utils.timezone.now,
+                        verbose_name="Date du mouvement",
+                    ),
+                ),
+                (
+                    "order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="stock_movements",
+                        to="orders.order",
+                        verbose_name="Commande",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_movements",
+                        to="products.product",
+                        verbose_name="Produit",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Mouvement de stock",
+                "verbose_name_plural": "Mouvements de stock",
+                "ordering": ["product", "created_at", "id"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "created_at"],
+                        name="stock_move_product_date_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "last_movement_id",
+                    models.BigIntegerField(verbose_name="Dernier mouvement inclus"),
+                ),
+                (
+                    "taken_at",
+                    models.DateTimeField(
+                        verbose_name="Date du dernier mouvement inclus"
+                    ),
+                ),
+                ("quantity", models.IntegerField(verbose_name="Stock physique")),
+                (
+                    "created_at",
+                    models.DateTimeField(
+                        auto_now_add=True, verbose_name="Date de création"
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="stock_snapshots",
+                        to="products.product",
+                        verbose_name="Produit",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Instantané de stock",
+                "verbose_name_plural": "Instantanés de stock",
+                "ordering": ["product", "-taken_at"],
+                "indexes": [
+                    models.Index(
+                        fields=["product", "-taken_at"],
+                        name="stock_snap_product_date_idx",
+                    )
+                ],
+                "unique_together": {("product", "last_movement_id")},
+            },
+        ),
+        migrations.RunPython(open_ledger, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,175 @@
+from django.db import models
+from django.utils import timezone
+from orders.models import Order
+from products.models import Product
+
+
+class StockReservation(models.Model):
+    """
+    Quantité d'un produit réservée par une commande.
+    Une ligne par commande et par produit : la réservation est prise à la
+    confirmation, consommée à la livraison et rendue à l'annulation.
+    """
+    
+    STATUS_CHOICES = [
+        ('reserved', 'Réservée'),
+        ('committed', 'Consommée'),
+        ('released', 'Libérée'),
+    ]
+    
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name='Commande'
+    )
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_reservations',
+        verbose_name='Produit'
+    )
+    
+    quantity = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Quantité'
+    )
+    
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default='reserved',
+        verbose_name='Statut'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Dernière modification'
+    )
+    
+    class Meta:
+        verbose_name = 'Réservation de stock'
+        verbose_name_plural = 'Réservations de stock'
+        ordering = ['order', 'product']
+        unique_together = ['order', 'product']
+    
+    def __str__(self):
+        return f"{self.order.order_number} - {self.product.name} x{self.quantity} ({self.get_status_display()})"
+
+
+class StockMovement(models.Model):
+    """
+    Mouvement du stock physique d'un produit (journal en ajout seul).
+    La quantité est signée : positive pour une entrée, négative pour une sortie.
+    """
+    
+    KIND_CHOICES = [
+        ('receipt', 'Réception'),
+        ('sale', 'Vente'),
+        ('adjustment', 'Ajustement'),
+        ('return', 'Retour'),
+    ]
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_movements',
+        verbose_name='Produit'
+    )
+    
+    kind = models.CharField(
+        max_length=10,
+        choices=KIND_CHOICES,
+        verbose_name='Type de mouvement'
+    )
+    
+    quantity = models.IntegerField(
+        verbose_name='Quantité'
+    )
+    
+    order = models.ForeignKey(
+        Order,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name='stock_movements',
+        verbose_name='Commande'
+    )
+    
+    note = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name='Note'
+    )
+    
+    created_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name='Date du mouvement'
+    )
+    
+    class Meta:
+        verbose_name = 'Mouvement de stock'
+        verbose_name_plural = 'Mouvements de stock'
+        ordering = ['product', 'created_at', 'id']
+        # Historique d'un produit sur une période
+        indexes = [
+            models.Index(fields=['product', 'created_at'], name='stock_move_product_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} {self.quantity:+d} ({self.get_kind_display()})"
+    
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Un mouvement de stock ne se modifie pas : enregistrer un mouvement inverse.')
+        super().save(*args, **kwargs)
+
+
+class StockSnapshot(models.Model):
+    """
+    Stock physique d'un produit après tous ses mouvements d'identifiant inférieur
+    ou égal à `last_movement_id`. Le stock à une date se calcule à partir du dernier
+    instantané antérieur et des seuls mouvements qui le suivent.
+    """
+    
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        related_name='stock_snapshots',
+        verbose_name='Produit'
+    )
+    
+    last_movement_id = models.BigIntegerField(
+        verbose_name='Dernier mouvement inclus'
+    )
+    
+    taken_at = models.DateTimeField(
+        verbose_name='Date du dernier mouvement inclus'
+    )
+    
+    quantity = models.IntegerField(
+        verbose_name='Stock physique'
+    )
+    
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Date de création'
+    )
+    
+    class Meta:
+        verbose_name = 'Instantané de stock'
+        verbose_name_plural = 'Instantanés de stock'
+        ordering = ['product', '-taken_at']
+        unique_together = ['product', 'last_movement_id']
+        indexes = [
+            models.Index(fields=['product', '-taken_at'], name='stock_snap_product_date_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.product.name} : {self.quantity} au {self.taken_at:%d/%m/%Y %H:%M}"
@@ -0,0 +1,5 @@
+# Services pour l'application stock
+from . import ledger, reservations
+from .reservations import InsufficientStock
+
+__all__ = ['InsufficientStock', 'ledger', 'reservations']
@@ -0,0 +1,165 @@
+"""
+Journal des mouvements de stock.
+
+Chaque variation du stock physique d'un produit est un StockMovement (réception,
+vente, ajustement, retour). `Product.stock_quantity` (disponible) et
+`Product.reserved_quantity` en sont la projection courante, mise à jour dans la
+même transaction que le mouvement : stock physique = disponible + réservé.
+
+Le stock à une date est lu sur le dernier StockSnapshot antérieur, plus les
+mouvements qui le suivent. Les instantanés sont pris périodiquement
+(commande snapshot_stock) : la lecture ne parcourt qu'une courte fin de journal,
+quelle que soit sa taille totale.
+"""
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import F, Max, Sum
+from django.utils import timezone
+from commandly import viewcache
+from products.models import Product, stock_level_expression
+from stock.models import StockMovement, StockSnapshot
+from stock.services.reservations import InsufficientStock
+
+
+# Sens imposé par le type de mouvement (les ajustements vont dans les deux sens)
+INCOMING_KINDS = ('receipt', 'return')
+OUTGOING_KINDS = ('sale',)
+
+
+def check_direction(kind, quantity):
+    """Lève ValueError si le signe de la quantité contredit le type de mouvement"""
+    label = dict(StockMovement.KIND_CHOICES).get(kind, kind)
+    if kind in INCOMING_KINDS and quantity < 0:
+        raise ValueError(f'Un mouvement « {label} » ne peut pas retirer du stock.')
+    if kind in OUTGOING_KINDS and quantity > 0:
+        raise ValueError(f'Un mouvement « {label} » ne peut pas ajouter du stock.')
+
+
+def record(product_id, kind, quantity, order_id=None, note=''):
+    """
+    Enregistre un mouvement et l'applique au stock disponible du produit.
+    Une sortie n'est acceptée que si le disponible la couvre (UPDATE conditionnel).
+    Lève ValueError si le signe de la quantité contredit le type de mouvement.
+    """
+    check_direction(kind, quantity)
+    if not quantity:
+        return None
+    with transaction.atomic():
+        products = Product.objects.filter(pk=product_id)
+        if quantity < 0:
+            products = products.filter(stock_quantity__gte=-quantity)
+        updated = products.update(
+            stock_quantity=F('stock_quantity') + quantity,
+            stock_level=stock_level_expression(F('stock_quantity') + quantity),
+            updated_at=timezone.now(),
+        )
+        if not updated:
+            product = Product.objects.get(pk=product_id)
+            raise InsufficientStock([(product, -quantity, product.stock_quantity)])
+        viewcache.invalidate(Product)
+        return StockMovement.objects.create(
+            product_id=product_id, kind=kind, quantity=quantity, order_id=order_id, note=note,
+        )
+
+
+def record_applied(product_id, kind, quantity, order_id=None, note=''):
+    """Journalise un mouvement déjà répercuté sur le produit (stock initial d'un produit créé)"""
+    if quantity:
+        return StockMovement.objects.create(
+            product_id=product_id, kind=kind, quantity=quantity, order_id=order_id, note=note,
+        )
+    return None
+
+
+def record_sales(order_id, quantities):
+    """Journalise les sorties d'une commande livrée : le stock a été retiré à la réservation"""
+    now = timezone.now()
+    StockMovement.objects.bulk_create([
+        StockMovement(product_id=product_id, kind='sale', quantity=-quantity, order_id=order_id, created_at=now)
+        for product_id, quantity in sorted(quantities.items())
+        if quantity
+    ])
+
+
+def _latest_snapshot(product_id, moment=None):
+    snapshots = StockSnapshot.objects.filter(product_id=product_id)
+    if moment is not None:
+        snapshots = snapshots.filter(taken_at__lte=moment)
+    return snapshots.order_by('-taken_at', '-last_movement_id').first()
+
+
+def _tail(product_id, snapshot):
+    movements = StockMovement.objects.filter(product_id=product_id)
+    if snapshot is not None:
+        movements = movements.filter(pk__gt=snapshot.last_movement_id)
+    return movements
+
+
+def stock_at(product_id, moment=None):
+    """Stock physique d'un produit à une date (maintenant par défaut)"""
+    snapshot = _latest_snapshot(product_id, moment)
+    movements = _tail(product_id, snapshot)
+    if moment is not None:
+        movements = movements.filter(created_at__lte=moment)
+    tail = movements.aggregate(total=Sum('quantity'))['total'] or 0
+    return (snapshot.quantity if snapshot else 0) + tail
+
+
+def history(product_id, start, end):
+    """
+    Mouvements d'un produit sur [start, end] avec le solde après chacun,
+    et le solde d'ouverture. Lecture par l'index (produit, date).
+    """
+    opening = stock_at(product_id, start - timedelta(microseconds=1))
+    movements = (
+        StockMovement.objects
+        .filter(product_id=product_id, created_at__gte=start, created_at__lte=end)
+        .order_by('created_at', 'id')
+    )
+    balance = opening
+    lines = []
+    for movement in movements:
+        balance += movement.quantity
+        lines.append((movement, balance))
+    return opening, lines
+
+
+def take_snapshot(product_id):
+    """Instantané d'un produit s'il a des mouvements depuis le précédent ; retourne l'instantané créé"""
+    previous = _latest_snapshot(product_id)
+    tail = _tail(product_id, previous).aggregate(
+        total=Sum('quantity'), last_id=Max('id'), last_at=Max('created_at'),
+    )
+    if tail['last_id'] is None:
+        return None
+    taken_at = tail['last_at'] if previous is None else max(previous.taken_at, tail['last_at'])
+    return StockSnapshot.objects.create(
+        product_id=product_id,
+        last_movement_id=tail['last_id'],
+        taken_at=taken_at,
+        quantity=(previous.quantity if previous else 0) + tail['total'],
+    )
+
+
+def take_snapshots(product_ids=None):
+    """Instantanés de tous les produits (ou de ceux donnés) ; retourne le nombre créé"""
+    if product_ids is None:
+        product_ids = Product.objects.filter(product_type='product').values_list('pk', flat=True)
+    created = 0
+    for product_id in list(product_ids):
+        with transaction.atomic():
+            created += take_snapshot(product_id) is not None
+    return created
+
+
+def drift(product_ids=None):
+    """Produits dont le stock physique du journal diffère de disponible + réservé"""
+    products = Product.objects.filter(product_type='product')
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+    differences = []
+    for product in products.only('pk', 'name', 'stock_quantity', 'reserved_quantity').iterator():
+        on_hand = stock_at(product.pk)
+        if on_hand != product.stock_quantity + product.reserved_quantity:
+            differences.append((product, on_hand))
+    return differences
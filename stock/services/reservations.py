@@ -0,0 +1,185 @@
+"""
+Réservation du stock des commandes.
+
+Le stock disponible d'un produit est `Product.stock_quantity` ; la quantité mise
+de côté par les commandes en cours est `Product.reserved_quantity`.
+
+- confirmation (et statuts en cours) : les quantités des lignes sont réservées,
+  retirées du disponible par un UPDATE conditionnel
+  `stock_quantity = stock_quantity - n WHERE stock_quantity >= n` ;
+- livraison (ou clôture) : la réservation est consommée (reserved_quantity - n) ;
+- annulation (ou retour en brouillon) : la réservation est rendue au disponible.
+
+Le même UPDATE recalcule `Product.stock_level` (alerte de stock faible).
+
+Les quantités des lignes sont cumulées par produit et les produits traités par
+identifiant croissant, un UPDATE chacun, dans une transaction. La condition est
+évaluée par la base sur la ligne verrouillée en écriture : deux confirmations
+simultanées ne peuvent pas vendre la même unité, sans verrou de table. Si un produit manque, InsufficientStock est levée et toute
+l'opération est annulée.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+from commandly import viewcache
+from orders.models import OrderItem
+from products.models import Product, stock_level_expression
+from stock.models import StockReservation
+
+
+# Statuts de commande qui retiennent du stock
+HOLDING_STATUSES = ('confirmed', 'in_progress', 'ready')
+# Statuts de commande dont le stock est sorti
+COMMITTED_STATUSES = ('delivered', 'closed')
+
+
+class InsufficientStock(Exception):
+    """Stock disponible insuffisant pour une ou plusieurs lignes"""
+
+    def __init__(self, shortages):
+        # [(produit, quantité demandée, quantité disponible)]
+        self.shortages = shortages
+        details = ', '.join(
+            f'{product.name} (demandé : {requested}, disponible : {available})'
+            for product, requested, available in shortages
+        )
+        super().__init__(f'Stock insuffisant : {details}')
+
+
+def required_quantities(order_id):
+    """Quantités demandées par produit physique pour une commande (une requête)"""
+    rows = (
+        OrderItem.objects
+        .filter(order_id=order_id, product__product_type='product')
+        .order_by()
+        .values('product_id')
+        .annotate(total_quantity=Sum('quantity'))
+    )
+    return {row['product_id']: row['total_quantity'] for row in rows}
+
+
+def reserved_for(order_id, product_id):
+    """Quantité d'un produit actuellement réservée par une commande"""
+    return (
+        StockReservation.objects
+        .filter(order_id=order_id, product_id=product_id, status='reserved')
+        .values_list('quantity', flat=True)
+        .first()
+    ) or 0
+
+
+def _take(quantities):
+    """Retire les quantités du disponible ; lève InsufficientStock si un produit manque"""
+    failed = {}
+    for product_id, quantity in sorted(quantities.items()):
+        updated = Product.objects.filter(pk=product_id, stock_quantity__gte=quantity).update(
+            stock_quantity=F('stock_quantity') - quantity,
+            stock_level=stock_level_expression(F('stock_quantity') - quantity),
+            reserved_quantity=F('reserved_quantity') + quantity,
+        )
+        if not updated:
+            failed[product_id] = quantity
+    viewcache.invalidate(Product)
+    if failed:
+        products = Product.objects.filter(pk__in=failed).order_by('pk')
+        raise InsufficientStock([(product, failed[product.pk], product.stock_quantity) for product in products])
+
+
+def _give_back(quantities):
+    """Rend des quantités réservées au disponible"""
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(pk=product_id).update(
+            stock_quantity=F('stock_quantity') + quantity,
+            stock_level=stock_level_expression(F('stock_quantity') + quantity),
+            reserved_quantity=F('reserved_quantity') - quantity,
+        )
+    viewcache.invalidate(Product)
+
+
+def _consume(quantities):
+    """Sort du stock des quantités réservées"""
+    for product_id, quantity in sorted(quantities.items()):
+        Product.objects.filter(pk=product_id).update(reserved_quantity=F('reserved_quantity') - quantity)
+    viewcache.invalidate(Product)
+
+
+def _reservations(order_id):
+    return {row.product_id: row for row in StockReservation.objects.filter(order_id=order_id)}
+
+
+def reserve(order_id):
+    """
+    Aligne la réservation d'une commande sur ses lignes : réserve ce qui manque,
+    rend ce qui n'est plus demandé. Les produits déjà livrés ne sont pas modifiés.
+    """
+    with transaction.atomic():
+        required = required_quantities(order_id)
+        reservations = _reservations(order_id)
+        increases, decreases = {}, {}
+        changed, created = [], []
+        for product_id in sorted(set(required) | set(reservations)):
+            reservation = reservations.get(product_id)
+            if reservation is not None and reservation.status == 'committed':
+                continue
+            held = reservation.quantity if reservation is not None and reservation.status == 'reserved' else 0
+            wanted = required.get(product_id, 0)
+            if wanted > held:
+                increases[product_id] = wanted - held
+            elif wanted < held:
+                decreases[product_id] = held - wanted
+            else:
+                continue
+            status = 'reserved' if wanted else 'released'
+            if reservation is None:
+                created.append(StockReservation(order_id=order_id, product_id=product_id, quantity=wanted, status=status))
+            else:
+                reservation.quantity, reservation.status = wanted, status
+                changed.append(reservation)
+
+        _take(increases)
+        _give_back(decreases)
+        now = timezone.now()
+        for reservation in changed:
+            reservation.updated_at = now
+        StockReservation.objects.bulk_create(created)
+        StockReservation.objects.bulk_update(changed, ['quantity', 'status', 'updated_at'])
+
+
+def commit(order_id):
+    """
+    Consomme la réservation d'une commande livrée (en la complétant au besoin)
+    et journalise les sorties de stock
+    """
+    from stock.services import ledger
+    with transaction.atomic():
+        reserve(order_id)
+        reserved = StockReservation.objects.filter(order_id=order_id, status='reserved')
+        quantities = dict(reserved.values_list('product_id', 'quantity'))
+        _consume(quantities)
+        ledger.record_sales(order_id, quantities)
+        reserved.update(status='committed', updated_at=timezone.now())
+
+
+def release(order_id):
+    """Rend au disponible la réservation d'une commande annulée ou remise en brouillon"""
+    with transaction.atomic():
+        reserved = StockReservation.objects.filter(order_id=order_id, status='reserved')
+        _give_back(dict(reserved.values_list('product_id', 'quantity')))
+        reserved.update(status='released', quantity=0, updated_at=timezone.now())
+
+
+def apply_transition(order_id, previous_status, status):
+    """
+    Répercute un changement de statut d'une commande sur sa réservation.
+    Une commande livrée puis annulée n'est pas remise en stock : un retour est
+    un mouvement de stock à part entière.
+    """
+    if status == previous_status:
+        return
+    if status in HOLDING_STATUSES:
+        reserve(order_id)
+    elif status in COMMITTED_STATUSES:
+        if previous_status not in COMMITTED_STATUSES:
+            commit(order_id)
+    elif previous_status in HOLDING_STATUSES:
+        release(order_id)
@@ -0,0 +1,290 @@
+from datetime import timedelta
+from decimal import Decimal
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from customers.models import Customer
+from orders.models import Order, OrderItem
+from products.models import Category, Product
+from stock.models import StockMovement, StockReservation, StockSnapshot
+from stock.services import InsufficientStock, ledger
+from users.models import CustomUser
+
+
+class StockTestCase(TestCase):
+    """
+    Deux produits en stock, un service et un client
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        category = Category.objects.create(name='Matériel')
+        cls.chair = Product.objects.create(
+            name='Chaise', sku='CH-1', category=category, unit_price=Decimal('100.00'), stock_quantity=5,
+        )
+        cls.table = Product.objects.create(
+            name='Table', sku='TB-1', category=category, unit_price=Decimal('300.00'), stock_quantity=2,
+        )
+        cls.service = Product.objects.create(
+            name='Montage', sku='SV-1', category=category, unit_price=Decimal('50.00'), product_type='service',
+        )
+        cls.customer = Customer.objects.create(
+            first_name='Awa', last_name='Diop', email='awa@example.com',
+            address_line1='1 rue de test', city='Dakar', postal_code='10000', slug='awa-diop',
+        )
+
+    def create_order(self, *lines):
+        order = Order.objects.create(customer=self.customer)
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity)
+        return order
+
+    def assertStock(self, product, available, reserved):
+        product.refresh_from_db()
+        self.assertEqual((product.stock_quantity, product.reserved_quantity), (available, reserved))
+
+    def set_status(self, order, status):
+        order.status = status
+        order.save()
+
+
+class StockReservationTests(StockTestCase):
+    """
+    Réservation du stock à la confirmation, sortie à la livraison, libération à l'annulation
+    """
+
+    def test_confirm_deliver(self):
+        order = self.create_order((self.chair, 2), (self.chair, 1), (self.table, 1), (self.service, 4))
+        self.assertStock(self.chair, 5, 0)
+
+        self.set_status(order, 'confirmed')
+        self.assertStock(self.chair, 2, 3)
+        self.assertStock(self.table, 1, 1)
+        self.assertFalse(StockReservation.objects.filter(product=self.service).exists())
+
+        # Les statuts intermédiaires gardent la réservation
+        self.set_status(order, 'in_progress')
+        self.assertStock(self.chair, 2, 3)
+
+        self.set_status(order, 'delivered')
+        self.assertStock(self.chair, 2, 0)
+        self.assertStock(self.table, 1, 0)
+        self.assertEqual(set(order.stock_reservations.values_list('status', flat=True)), {'committed'})
+
+    def test_cancel_releases(self):
+        order = self.create_order((self.chair, 4))
+        self.set_status(order, 'confirmed')
+        self.assertStock(self.chair, 1, 4)
+        self.set_status(order, 'cancelled')
+        self.assertStock(self.chair, 5, 0)
+
+    def test_delete_releases(self):
+        order = self.create_order((self.chair, 4))
+        self.set_status(order, 'confirmed')
+        Order.objects.get(pk=order.pk).delete()
+        self.assertStock(self.chair, 5, 0)
+
+    def test_insufficient_stock_rolls_back(self):
+        order = self.create_order((self.chair, 1), (self.table, 3))
+        order.status = 'confirmed'
+        with self.assertRaises(InsufficientStock) as raised:
+            order.save()
+        self.assertEqual([product.pk for product, _, _ in raised.exception.shortages], [self.table.pk])
+        # La chaise réservée avant l'échec est rendue, le statut n'est pas enregistré
+        self.assertStock(self.chair, 5, 0)
+        self.assertEqual(Order.objects.get(pk=order.pk).status, 'draft')
+        self.assertFalse(StockReservation.objects.exists())
+
+    def test_competing_confirmations(self):
+        # Deux commandes validées sur le même stock : seule la première est confirmée
+        first = self.create_order((self.chair, 3))
+        second = self.create_order((self.chair, 3))
+        self.set_status(first, 'confirmed')
+        with self.assertRaises(InsufficientStock):
+            self.set_status(second, 'confirmed')
+        self.assertStock(self.chair, 2, 3)
+
+    def test_one_conditional_update_per_product(self):
+        order = self.create_order((self.chair, 1), (self.chair, 1), (self.table, 1))
+        order.status = 'confirmed'
+        with CaptureQueriesContext(connection) as context:
+            order.save()
+        updates = [query['sql'] for query in context.captured_queries if 'UPDATE "products_product"' in query['sql']]
+        self.assertEqual(len(updates), 2)
+        self.assertTrue(all('"stock_quantity" >= ' in sql for sql in updates))
+
+    def test_line_changes_on_confirmed_order(self):
+        order = self.create_order((self.chair, 1))
+        self.set_status(order, 'confirmed')
+
+        item = OrderItem.objects.create(order=order, product=self.table, quantity=2)
+        self.assertStock(self.table, 0, 2)
+        item.quantity = 1
+        item.save()
+        self.assertStock(self.table, 1, 1)
+        with self.assertRaises(InsufficientStock):
+            OrderItem.objects.create(order=order, product=self.chair, quantity=5)
+        self.assertEqual(order.items.count(), 2)
+        item.delete()
+        self.assertStock(self.table, 2, 0)
+        self.assertStock(self.chair, 4, 1)
+
+
+class StockReservationViewTests(StockTestCase):
+    """
+    Les vues signalent un stock insuffisant au lieu de confirmer la commande
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = CustomUser.objects.create_user(username='vendeur', password='motdepasse', role='seller')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_status_update_view(self):
+        order = self.create_order((self.table, 3))
+        response = self.client.post(reverse('orders:order_status_update', args=[order.pk]), {'status': 'confirmed'})
+        self.assertFalse(response.json()['success'])
+        self.assertIn('Stock insuffisant', response.json()['message'])
+        order.refresh_from_db()
+        self.assertEqual(order.status, 'draft')
+
+    def test_line_form_counts_own_reservation(self):
+        order = self.create_order()
+        item = OrderItem.objects.create(order=order, product=self.table, quantity=2)
+        self.set_status(order, 'confirmed')
+        # Disponible 0, mais les 2 tables sont déjà réservées par cette commande
+        response = self.client.post(
+            reverse('orders:order_item_update', args=[order.pk, item.pk]),
+            {'product': self.table.pk, 'quantity': 2, 'unit_price': '300.00', 'tax_rate': '18.00'},
+        )
+        self.assertEqual(response.status_code, 302)
+
+
+class StockLedgerTests(StockTestCase):
+    """
+    Journal des mouvements : projection sur le produit, stock à une date, instantanés
+    """
+
+    def movements(self, product):
+        return list(product.stock_movements.order_by('id').values_list('kind', 'quantity'))
+
+    def test_opening_and_manual_adjustment(self):
+        self.assertEqual(self.movements(self.chair), [('receipt', 5)])
+        chair = Product.objects.get(pk=self.chair.pk)
+        # Réservation concurrente entre la lecture et l'enregistrement du formulaire
+        order = self.create_order((self.chair, 2))
+        self.set_status(order, 'confirmed')
+        chair.stock_quantity = 8
+        chair.save()
+        self.assertEqual(self.movements(self.chair), [('receipt', 5), ('adjustment', 3)])
+        # L'écart saisi (+3) s'ajoute au disponible, la réservation n'est pas écrasée
+        self.assertStock(self.chair, 6, 2)
+        self.assertEqual(ledger.drift(), [])
+
+    def test_adjustment_with_update_fields(self):
+        chair = Product.objects.get(pk=self.chair.pk)
+        chair.stock_quantity = 10
+        chair.save(update_fields=['stock_quantity', 'name'])
+        # Le stock n'est écrit qu'une fois, par le journal
+        self.assertEqual(self.movements(self.chair), [('receipt', 5), ('adjustment', 5)])
+        self.assertEqual(Product.objects.get(pk=self.chair.pk).stock_quantity, 10)
+        self.assertEqual(ledger.drift(), [])
+
+    def test_delivery_records_sales(self):
+        order = self.create_order((self.chair, 2), (self.table, 1), (self.service, 1))
+        self.set_status(order, 'delivered')
+        self.assertEqual(self.movements(self.chair), [('receipt', 5), ('sale', -2)])
+        self.assertEqual(ledger.stock_at(self.chair.pk), 3)
+        self.assertEqual(ledger.stock_at(self.table.pk), 1)
+        self.assertEqual(ledger.drift(), [])
+
+    def test_stock_at_uses_snapshot_and_tail(self):
+        start = timezone.now() - timedelta(days=10)
+        StockMovement.objects.filter(product=self.chair).update(created_at=start)
+        for day, quantity in ((1, 10), (2, -3), (3, 4), (4, -1)):
+            StockMovement.objects.create(
+                product=self.chair, kind='adjustment', quantity=quantity, created_at=start + timedelta(days=day),
+            )
+        ledger.take_snapshot(self.chair.pk)
+        StockMovement.objects.create(
+            product=self.chair, kind='receipt', quantity=6, created_at=start + timedelta(days=5),
+        )
+
+        for day, expected in ((0, 5), (1, 15), (3, 16), (4, 15), (5, 21)):
+            with self.subTest(day=day):
+                self.assertEqual(ledger.stock_at(self.chair.pk, start + timedelta(days=day, hours=1)), expected)
+        # Le solde courant ne relit que les mouvements postérieurs à l'instantané
+        with CaptureQueriesContext(connection) as context:
+            self.assertEqual(ledger.stock_at(self.chair.pk), 21)
+        self.assertIn('"stock_stockmovement"."id" > ', context.captured_queries[-1]['sql'])
+
+        opening, lines = ledger.history(self.chair.pk, start + timedelta(days=2), start + timedelta(days=4, hours=1))
+        self.assertEqual(opening, 15)
+        self.assertEqual([balance for _, balance in lines], [12, 16, 15])
+
+    def test_snapshots_only_for_changed_products(self):
+        self.assertEqual(ledger.take_snapshots(), 2)
+        self.assertEqual(ledger.take_snapshots(), 0)
+        ledger.record(self.chair.pk, 'receipt', 4)
+        self.assertEqual(ledger.take_snapshots(), 1)
+        self.assertEqual(StockSnapshot.objects.filter(product=self.chair).first().quantity, 9)
+
+    def test_negative_adjustment_is_conditional(self):
+        with self.assertRaises(InsufficientStock):
+            ledger.record(self.table.pk, 'adjustment', -3)
+        self.assertStock(self.table, 2, 0)
+
+    def test_movements_are_append_only(self):
+        movement = self.chair.stock_movements.get()
+        movement.quantity = 50
+        with self.assertRaises(ValueError):
+            movement.save()
+
+
+class StockLedgerViewTests(StockTestCase):
+    """
+    Saisie d'un mouvement et historique d'un produit
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.user = CustomUser.objects.create_user(username='magasinier', password='motdepasse', role='seller')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def test_stock_update_records_movement(self):
+        response = self.client.post(
+            reverse('products:product_stock_update', args=[self.chair.pk]),
+            {'stock_quantity': 12, 'kind': 'receipt', 'note': 'Livraison fournisseur'},
+        )
+        self.assertEqual(response.json(), {'success': True, 'stock_quantity': 12})
+        self.assertEqual(self.chair.stock_movements.latest('id').quantity, 7)
+
+    def test_stock_update_rejects_direction_contrary_to_kind(self):
+        movements = self.chair.stock_movements.count()
+        response = self.client.post(
+            reverse('products:product_stock_update', args=[self.chair.pk]),
+            {'stock_quantity': 2, 'kind': 'receipt'},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.chair.stock_movements.count(), movements)
+        with self.assertRaises(ValueError):
+            ledger.record(self.chair.pk, 'sale', 3)
+
+    def test_history(self):
+        ledger.record(self.chair.pk, 'adjustment', -1)
+        response = self.client.get(reverse('stock:stock_history', args=[self.chair.pk]))
+        data = response.json()
+        self.assertEqual((data['opening'], data['closing']), (0, 4))
+        self.assertEqual([line['balance'] for line in data['movements']], [5, 4])
+
+    def test_history_rejects_impossible_date(self):
+        response = self.client.get(reverse('stock:stock_history', args=[self.chair.pk]), {'date_from': '2025-02-30'})
+        self.assertEqual(response.status_code, 400)
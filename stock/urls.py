@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'stock'
+
+urlpatterns = [
+    path('products/<int:pk>/history/', views.StockHistoryView.as_view(), name='stock_history'),
+]
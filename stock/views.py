@@ -0,0 +1,50 @@
+from datetime import timedelta
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse_lazy
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from django.views import View
+from commandly.dates import day_range
+from products.models import Product
+from stock.services import ledger
+
+
+class StockHistoryView(LoginRequiredMixin, View):
+    """
+    Historique du stock physique d'un produit : solde d'ouverture, mouvements de la
+    période (30 derniers jours par défaut) avec le solde après chacun
+    """
+    login_url = reverse_lazy('users:login')
+
+    def get(self, request, pk):
+        product = get_object_or_404(Product, pk=pk)
+        today = timezone.localdate()
+        try:
+            date_from = parse_date(request.GET.get('date_from', '')) or today - timedelta(days=30)
+            date_to = parse_date(request.GET.get('date_to', '')) or today
+        except ValueError:
+            # Date bien formée mais inexistante (2025-02-30)
+            return JsonResponse({'success': False, 'message': 'Date invalide.'}, status=400)
+        start, end = day_range(date_from, date_to)
+
+        opening, lines = ledger.history(product.pk, start, end - timedelta(microseconds=1))
+        return JsonResponse({
+            'product': product.name,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'opening': opening,
+            'closing': lines[-1][1] if lines else opening,
+            'movements': [
+                {
+                    'date': movement.created_at.isoformat(),
+                    'kind': movement.get_kind_display(),
+                    'quantity': movement.quantity,
+                    'order_id': movement.order_id,
+                    'note': movement.note,
+                    'balance': balance,
+                }
+                for movement, balance in lines
+            ],
+        })
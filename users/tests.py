@@ -1,3 +1,11 @@
-from django.test import TestCase
+from django.urls import reverse
+from commandly.testing import QueryCountTestCase
 
-# Create your tests here.
+
+class UserQueryCountTests(QueryCountTestCase):
+    """
+    Nombre maximal de requêtes SQL par page, indépendant du nombre de lignes
+    """
+
+    def test_profile_queries(self):
+        self.assertMaxQueries(2, reverse('users:profile'))